@@ -75,6 +75,10 @@ async function callMlEndpoint(endpoint: string, init: RequestInit, timeoutMs?: n
     if (authHeaders["x-api-key"] && !mergedHeaders.has("x-api-key") && !mergedHeaders.has("X-API-Key")) {
       mergedHeaders.set("x-api-key", authHeaders["x-api-key"]);
     }
+    // Let the ML service stop early and return partial results instead of being aborted
+    if (!mergedHeaders.has("X-Deadline-Ms")) {
+      mergedHeaders.set("X-Deadline-Ms", String(ms));
+    }
 
     const resp = await fetch(`${ML_BASE}${endpoint}`, {
       ...init,
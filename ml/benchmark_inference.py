@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# ml/benchmark_inference.py
+"""
+Latency benchmark and equivalence check for single-quote inference.
+
+Compares the pandas path (build_feature_row -> pipeline.predict) with the
+compiled encoder (feature_encoder.compile_predictor, which also flattens
+forest / XGBoost estimators with tree_engine.flatten) on the models in
+models/, using random questionnaires, one quote at a time and as whole
+batches. Any prediction that is not bit-identical is reported and makes the
+script exit non-zero.
+
+Usage: python benchmark_inference.py [--n 2000]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+import warnings
+
+warnings.filterwarnings("ignore")
+
+import main  # noqa: E402  (the active model bundle is loaded by main.active_models() below)
+
+GRADES = ["Basic", "Standard", "Premium", "Bespoke"]
+PROJECT_TYPES = ["windows", "doors", "staircase", "", "conservatory"]
+LEAD_SOURCES = ["website", "referral", "google", "", "facebook"]
+REGIONS = ["uk", "south east", "london", ""]
+
+def random_quote(rng: random.Random) -> main.QuoteIn:
+    return main.QuoteIn(
+        area_m2=round(rng.uniform(0, 120), 2) if rng.random() > 0.05 else 0.0,
+        materials_grade=rng.choice(GRADES),
+        project_type=rng.choice(PROJECT_TYPES) or None,
+        lead_source=rng.choice(LEAD_SOURCES) or None,
+        region=rng.choice(REGIONS) or None,
+    )
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+def bench(label, fn, quotes):
+    times = []
+    for q in quotes:
+        t = time.perf_counter()
+        fn(q)
+        times.append((time.perf_counter() - t) * 1e6)
+    print(f"  {label:<10} p50 {percentile(times, 0.5):8.1f} µs   p95 {percentile(times, 0.95):8.1f} µs   mean {statistics.mean(times):8.1f} µs")
+    return statistics.mean(times)
+
+def bench_batch(model, fast, method, quotes):
+    expected = getattr(model, method)(main.build_feature_frame(quotes))
+    got = getattr(fast, method + "_many")([main.quote_feature_values(q) for q in quotes])
+    if expected.shape != got.shape or expected.tobytes() != got.tobytes():
+        print(f"  MISMATCH batch of {len(quotes)}")
+        return 1
+    timings = {}
+    for label, fn in (("pandas", lambda: getattr(model, method)(main.build_feature_frame(quotes))),
+                      ("compiled", lambda: getattr(fast, method + "_many")([main.quote_feature_values(q) for q in quotes]))):
+        t = time.perf_counter()
+        for _ in range(5):
+            fn()
+        timings[label] = (time.perf_counter() - t) / 5 * 1000
+        print(f"  {label:<10} batch of {len(quotes)}: {timings[label]:8.2f} ms")
+    return 0
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    quotes = [random_quote(rng) for _ in range(args.n)]
+
+    m = main.active_models()
+    print(f"model version {m.version}")
+    cases = []
+    if m.price_model is not None:
+        cases.append(("price", m.price_model, m.price_fast, "predict"))
+    if m.win_model is not None:
+        method = "predict_proba" if hasattr(m.win_model, "predict_proba") else "predict"
+        cases.append(("win", m.win_model, m.win_fast, method))
+    if not cases:
+        print("No models in models/ - nothing to benchmark")
+        return 0
+
+    failures = 0
+    for name, model, fast, method in cases:
+        print(f"{name} model ({type(model).__name__}, {method})")
+        if fast is None:
+            print("  no compiled encoder for this model; /predict uses the pandas path")
+            continue
+        mismatches = 0
+        for q in quotes:
+            expected = getattr(model, method)(main.build_feature_row(q))
+            got = getattr(fast, method)(main.quote_feature_values(q))
+            if expected.shape != got.shape or expected.tobytes() != got.tobytes():
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f"  MISMATCH {q!r}: {expected!r} != {got!r}")
+        print(f"  {len(quotes) - mismatches}/{len(quotes)} bit-identical")
+        failures += mismatches
+        pandas_us = bench("pandas", lambda q: getattr(model, method)(main.build_feature_row(q)), quotes)
+        fast_us = bench("compiled", lambda q: getattr(fast, method)(main.quote_feature_values(q)), quotes)
+        print(f"  speedup    {pandas_us / fast_us:.1f}x")
+        failures += bench_batch(model, fast, method, quotes)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# ml/benchmark_startup.py
+"""
+Startup-time regression benchmark for the ML service.
+
+Each run starts a fresh interpreter, which measures:
+  - import:  seconds to `import main` and the RSS afterwards;
+  - health:  seconds from the start of the import until GET /health first
+             answers (the startup event has run);
+  - models:  seconds until the background warm-up has loaded the models.
+It also lists which heavy modules the import pulled in. None of LAZY_MODULES
+may be imported by `import main`; they are loaded on first use (see
+startup_profile.py).
+
+The script exits non-zero when a heavy module is imported eagerly, or when
+the median import time exceeds --max-import-seconds or the saved baseline
+by more than --tolerance. --save writes the medians as the new baseline.
+
+Usage: python benchmark_startup.py [--runs 5] [--baseline startup_baseline.json] [--save]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+LAZY_MODULES = ["pandas", "joblib", "sklearn", "xgboost", "fitz", "PyPDF2", "pytesseract", "psycopg", "email_trainer"]
+
+# Runs in a fresh interpreter; prints one JSON line
+PROBE = r"""
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter() - started
+from startup_profile import rss_mb
+rss = rss_mb()
+eager = [m for m in LAZY if m in sys.modules]
+from fastapi.testclient import TestClient
+from model_registry import tenant_models_loaded
+with TestClient(main.app) as client:
+    status = client.get("/health").status_code
+    health = time.perf_counter() - started
+    while not tenant_models_loaded() and time.perf_counter() - started < 120:
+        time.sleep(0.01)
+    models = time.perf_counter() - started
+print(json.dumps({"import": imported, "health": health, "health_status": status, "models": models,
+                  "rss_mb": rss, "eager": eager}))
+"""
+
+def probe() -> dict:
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    code = f"LAZY = {LAZY_MODULES!r}\n{PROBE}"
+    out = subprocess.run([sys.executable, "-c", code], cwd=HERE, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-seconds", type=float,
+                        default=float(os.getenv("ML_STARTUP_MAX_IMPORT_SECONDS", "3")))
+    parser.add_argument("--baseline", default=os.path.join(HERE, "startup_baseline.json"))
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown over the baseline (0.25 = 25%%)")
+    parser.add_argument("--save", action="store_true", help="write the medians as the new baseline")
+    args = parser.parse_args()
+
+    runs = [probe() for _ in range(max(1, args.runs))]
+    medians = {k: round(statistics.median(r[k] for r in runs), 3) for k in ("import", "health", "models", "rss_mb")}
+    for i, r in enumerate(runs, 1):
+        print(f"run {i}: import {r['import']:.3f}s  /health {r['health']:.3f}s ({r['health_status']})  "
+              f"models {r['models']:.3f}s  RSS {r['rss_mb']} MB")
+    print(f"median: import {medians['import']:.3f}s  /health {medians['health']:.3f}s  models {medians['models']:.3f}s  "
+          f"RSS {medians['rss_mb']} MB")
+
+    failures = 0
+    eager = sorted({m for r in runs for m in r["eager"]})
+    if eager:
+        failures += 1
+        print(f"FAIL imported at startup: {', '.join(eager)}")
+    if any(r["health_status"] != 200 for r in runs):
+        failures += 1
+        print("FAIL /health did not answer 200")
+    if medians["import"] > args.max_import_seconds:
+        failures += 1
+        print(f"FAIL import {medians['import']:.3f}s > {args.max_import_seconds:.3f}s")
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ("import", "health"):
+            limit = baseline[key] * (1 + args.tolerance)
+            if medians[key] > limit:
+                failures += 1
+                print(f"FAIL {key} {medians[key]:.3f}s > baseline {baseline[key]:.3f}s +{args.tolerance:.0%}")
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(medians, f, indent=2)
+        print("[ok] wrote", args.baseline)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
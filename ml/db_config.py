@@ -10,6 +10,8 @@ from psycopg_pool import ConnectionPool
 from typing import Optional, Dict, Any
 import logging
 
+from fallback_stats import get_fallback_stats
+
 class MLDatabaseManager:
     """
     Manages database connections for ML service with production optimizations.
@@ -137,7 +139,8 @@ class MLDatabaseManager:
                         ) for record in training_records
                     ])
                     conn.commit()
-                    return len(training_records)
+            get_fallback_stats().record(training_records)
+            return len(training_records)
         except Exception as e:
             self.logger.error(f"Failed to save training data: {e}")
             raise
@@ -0,0 +1,80 @@
+# ml/deadline.py
+"""
+Request deadlines for extraction and parsing.
+
+The API aborts ML calls after at most 25s (api/src/lib/ml.ts). Callers pass their
+remaining budget as an ``X-Deadline-Ms`` header or a ``deadlineMs`` body field;
+it is turned into an absolute wall-clock instant (``time.time()`` based, so it
+means the same thing inside pool worker processes) and checked between stages,
+pages and OCR calls so work stops early and a partial result is returned.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from typing import Any, Mapping, Optional
+
+DEADLINE_HEADER = "x-deadline-ms"
+# Reserved for serialising and sending the response after work stops
+DEADLINE_MARGIN_MS = int(os.getenv("ML_DEADLINE_MARGIN_MS", "300"))
+# Upper bound so a bogus header cannot pin a worker forever
+MAX_DEADLINE_MS = int(os.getenv("ML_MAX_DEADLINE_MS", "600000"))
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage could not finish before the request deadline."""
+
+class Deadline:
+    """An absolute point in (wall-clock) time by which work should stop; ``at=None`` means no deadline."""
+
+    __slots__ = ("at",)
+
+    def __init__(self, at: Optional[float] = None):
+        self.at = at
+
+    @classmethod
+    def from_budget_ms(cls, budget_ms: Optional[float], margin_ms: int = DEADLINE_MARGIN_MS) -> "Deadline":
+        if budget_ms is None:
+            return cls(None)
+        budget_ms = min(float(budget_ms), MAX_DEADLINE_MS)
+        return cls(time.time() + max(0.0, budget_ms - margin_ms) / 1000.0)
+
+    @classmethod
+    def from_request(cls, headers: Mapping[str, str], body: Optional[Mapping[str, Any]] = None) -> "Deadline":
+        """Read the budget from the X-Deadline-Ms header, falling back to a deadlineMs body field."""
+        raw = headers.get(DEADLINE_HEADER)
+        if raw is None and body is not None:
+            raw = body.get("deadlineMs")
+        try:
+            budget = float(raw) if raw not in (None, "") else None
+        except (TypeError, ValueError):
+            budget = None
+        if budget is not None and budget <= 0:
+            budget = None
+        return cls.from_budget_ms(budget)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None without a deadline."""
+        if self.at is None:
+            return None
+        return max(0.0, self.at - time.time())
+
+    def cap(self, seconds: float) -> float:
+        """Clamp a timeout (e.g. for a download) to the time left, keeping it positive."""
+        left = self.remaining()
+        return seconds if left is None else max(0.1, min(seconds, left))
+
+    def expired(self) -> bool:
+        return self.at is not None and time.time() >= self.at
+
+    def __bool__(self) -> bool:
+        return self.at is not None
+
+def expired(deadline_at: Optional[float]) -> bool:
+    """Check a raw absolute deadline (as passed to worker processes)."""
+    return deadline_at is not None and time.time() >= deadline_at
+
+def remaining(deadline_at: Optional[float]) -> Optional[float]:
+    if deadline_at is None:
+        return None
+    return max(0.0, deadline_at - time.time())
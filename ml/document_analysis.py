@@ -0,0 +1,179 @@
+# ml/document_analysis.py
+"""
+Per-request, lazily evaluated analysis of one document.
+
+Endpoints used to call the parsers directly, so one request could parse the
+same text twice: /debug-parse ran the supplier parser and then
+parse_totals_from_text, which runs it again, and /process-quote ran both
+parsers for unclassified quotes. DocumentAnalysis computes each stage
+(extraction, text, lines, tokens, quote type, supplier parse and client parse)
+on first use and at most once. Concurrent awaits of a stage share one
+computation. Extraction and parsing still run in the PDF worker pool and go
+through the extraction cache.
+
+status() reports what happened: "truncated", the pipeline "stages_completed"
+(extraction stages plus classify / parse) and "stages_run", the analysis
+stages this request evaluated, in order.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from deadline import DeadlineExceeded
+from extract_cache import pdf_digest
+from pdf_pool import PdfSource, PdfWorkerPool, get_pdf_pool
+from quote_lexer import TokenStream, tokenize
+from supplier_registry import GENERIC
+
+EMPTY_SUPPLIER_PARSE: Dict[str, Any] = {
+    "currency": None,
+    "lines": [],
+    "detected_totals": [],
+    "estimated_total": None,
+    "confidence": 0.0,
+    "supplier": None,
+    "parser": GENERIC,
+}
+
+class DocumentAnalysis:
+    """
+    Memoized view of a document for one request. Build it from a PDF (text is
+    extracted on demand) or from text that is already known. The PDF may be bytes
+    or a binary file such as a spooled download; a file is hashed off the event
+    loop, and is closed once its text has been extracted.
+    """
+
+    def __init__(
+        self,
+        pdf: Optional[PdfSource] = None,
+        text: Optional[str] = None,
+        digest: Optional[str] = None,
+        deadline_at: Optional[float] = None,
+        fingerprints: Optional[List[Dict[str, Any]]] = None,
+        pool: Optional[PdfWorkerPool] = None,
+    ):
+        if pdf is None and text is None:
+            raise ValueError("DocumentAnalysis needs a pdf or text")
+        self.pool = pool or get_pdf_pool()
+        self.deadline_at = deadline_at
+        self.fingerprints = fingerprints or None
+        self._pdf = pdf
+        self.digest = digest or (pdf_digest(pdf) if isinstance(pdf, (bytes, bytearray)) else None)
+        self.truncated = False
+        self.stages_completed: List[str] = []
+        self.stages_run: List[str] = []
+        self._values: Dict[str, Any] = {}
+        self._tasks: Dict[str, "asyncio.Future[Any]"] = {}
+        self._lines: Optional[List[str]] = None
+        if text is not None:
+            self._values["extraction"] = {"text": text, "method": "provided", "pages": [],
+                                          "stages_completed": [], "truncated": False, "cached": False}
+
+    # ----------------- memoization -----------------
+    async def _run(self, stage: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        self.stages_run.append(stage)
+        try:
+            value = await compute()
+        except DeadlineExceeded:
+            self.truncated = True
+            raise
+        self._values[stage] = value
+        return value
+
+    async def _once(self, stage: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        if stage in self._values:
+            return self._values[stage]
+        # Concurrent callers await the same task
+        task = self._tasks.get(stage)
+        if task is None:
+            task = self._tasks[stage] = asyncio.ensure_future(self._run(stage, compute))
+        return await task
+
+    def has(self, stage: str) -> bool:
+        """True if a stage has been evaluated (or started) for this document."""
+        return stage in self._values or stage in self._tasks
+
+    # ----------------- stages -----------------
+    async def extraction(self) -> Dict[str, Any]:
+        """Extraction result from PdfWorkerPool.extract (text, method, per-page provenance)."""
+        async def compute():
+            if self.digest is None:
+                self.digest = await asyncio.to_thread(pdf_digest, self._pdf)
+            try:
+                result = await self.pool.extract(self._pdf, self.digest, self.deadline_at)
+            finally:
+                if not isinstance(self._pdf, (bytes, bytearray)):
+                    self._pdf.close()
+            self.truncated = self.truncated or bool(result.get("truncated"))
+            self.stages_completed.extend(result.get("stages_completed") or [])
+            return result
+        return await self._once("extraction", compute)
+
+    async def text(self) -> str:
+        return (await self.extraction()).get("text") or ""
+
+    async def lines(self) -> List[str]:
+        if self._lines is None:
+            self._lines = (await self.text()).split("\n")
+            self.stages_run.append("lines")
+        return self._lines
+
+    async def tokens(self) -> TokenStream:
+        """Lexed lines (see quote_lexer.py), tokenized off the event loop."""
+        async def compute():
+            return await asyncio.to_thread(tokenize, await self.text())
+        return await self._once("tokens", compute)
+
+    @property
+    def parse_digest(self) -> Optional[str]:
+        """Cache key for parser outputs; parses of partial text must not be cached against the full PDF."""
+        return None if self.truncated else self.digest
+
+    async def _parse(self, kind: str, completes: str) -> Any:
+        text = await self.text()
+        value = await self.pool.parse(kind, text, self.parse_digest, self.deadline_at, self.fingerprints)
+        if completes not in self.stages_completed:
+            self.stages_completed.append(completes)
+        return value
+
+    async def quote_type(self) -> str:
+        """'supplier', 'client' or 'unknown' (pdf_parser.determine_quote_type)."""
+        return await self._once("quote_type", lambda: self._parse("quote_type", "classify"))
+
+    async def supplier(self) -> Dict[str, Any]:
+        """Supplier parse (pdf_parser.parse_quote_lines_from_text); also serves the legacy totals parse."""
+        async def compute():
+            if not (await self.text()):
+                return dict(EMPTY_SUPPLIER_PARSE)
+            return await self._parse("supplier", "parse")
+        return await self._once("supplier", compute)
+
+    async def client(self) -> Dict[str, Any]:
+        """Client parse (pdf_parser.parse_client_quote_from_text)."""
+        return await self._once("client", lambda: self._parse("client", "parse"))
+
+    async def resolved_type(self) -> str:
+        """
+        The quote type, settling 'unknown' by running both parsers (concurrently)
+        and choosing by signal strength. Either parse is reused by supplier()/client().
+        """
+        quote_type = await self.quote_type()
+        if quote_type != "unknown":
+            return quote_type
+        supplier_parsed, client_parsed = await asyncio.gather(self.supplier(), self.client())
+        if len(supplier_parsed.get("lines", [])) >= 1:
+            return "supplier"
+        if float(client_parsed.get("confidence", 0.0)) >= 0.2:
+            return "client"
+        return "unknown"
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "truncated": self.truncated,
+            "stages_completed": list(self.stages_completed),
+            "stages_run": list(self.stages_run),
+        }
+
+__all__ = ["DocumentAnalysis", "EMPTY_SUPPLIER_PARSE"]
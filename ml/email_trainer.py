@@ -18,6 +18,7 @@ import pandas as pd
 import psycopg
 from pdf_parser import parse_client_quote_from_text, extract_text_from_pdf_bytes
 from db_config import DatabaseManager
+from fallback_stats import get_fallback_stats
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -401,6 +402,9 @@ class EmailTrainingWorkflow:
             
             # Execute batch insert
             result = self.db_manager.execute_batch(insert_sql, batch_data)
+            get_fallback_stats().record(
+                {"tenant_id": self.tenant_id, "quoted_price": row[5], "confidence": row[14]} for row in batch_data
+            )
             
             logger.info(f"Saved {len(batch_data)} training records to database")
             return len(batch_data)
@@ -0,0 +1,230 @@
+# ml/extract_cache.py
+"""
+Content-addressed cache for PDF extraction and parse results.
+
+Retried uploads, re-sent supplier PDFs and repeated /train attachments all
+produce byte-identical PDFs. Results are keyed by the SHA-256 of the PDF bytes
+plus pdf_parser.PARSER_VERSION, and each record holds the extracted text, the
+extraction method and the output of every parser run against it.
+
+Two tiers:
+  - memory: LRU bounded by ML_EXTRACT_CACHE_MEM_MB (default 64)
+  - disk:   one JSON file per PDF under ML_EXTRACT_CACHE_DIR (default ./cache/extract),
+            bounded by ML_EXTRACT_CACHE_DISK_MB (default 512), oldest files evicted first
+
+Set ML_EXTRACT_CACHE=0 to disable.
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import IO, Any, Dict, Optional, Tuple, Union
+
+from lru import LRUCache
+from pdf_parser import PARSER_VERSION
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("ML_EXTRACT_CACHE", "1") not in ("0", "false", "no")
+CACHE_DIR = os.getenv("ML_EXTRACT_CACHE_DIR", "cache/extract")
+MEM_BYTES = int(float(os.getenv("ML_EXTRACT_CACHE_MEM_MB", "64")) * 1024 * 1024)
+DISK_BYTES = int(float(os.getenv("ML_EXTRACT_CACHE_DISK_MB", "512")) * 1024 * 1024)
+
+DIGEST_CHUNK = 1024 * 1024
+
+def pdf_digest(pdf: Union[bytes, IO[bytes]]) -> str:
+    """SHA-256 hex digest of the raw PDF bytes; a binary file is hashed in chunks from the start."""
+    if isinstance(pdf, (bytes, bytearray)):
+        return hashlib.sha256(pdf).hexdigest()
+    h = hashlib.sha256()
+    pdf.seek(0)
+    for chunk in iter(lambda: pdf.read(DIGEST_CHUNK), b""):
+        h.update(chunk)
+    pdf.seek(0)
+    return h.hexdigest()
+
+def _record_size(record: Dict[str, Any]) -> int:
+    return int(record.get("_size") or 0)
+
+class ExtractionCache:
+    """Two-tier (memory + disk) cache of extraction/parse records keyed by PDF digest."""
+
+    def __init__(self, directory: Optional[str] = CACHE_DIR, mem_bytes: int = MEM_BYTES, disk_bytes: int = DISK_BYTES):
+        self.memory = LRUCache(max_items=100_000, max_bytes=mem_bytes, sizeof=_record_size)
+        self.directory = Path(directory) if directory else None
+        self.disk_bytes = disk_bytes
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.disk_evictions = 0
+        self._disk_total = 0
+        self._lock = threading.Lock()
+        if self.directory is not None:
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._evict_disk()
+            except Exception as e:
+                logger.warning(f"Extraction cache disk tier disabled: {e}")
+                self.directory = None
+
+    # ----------------- record storage -----------------
+    def _key(self, digest: str) -> str:
+        return f"{digest}-v{PARSER_VERSION}"
+
+    def _path(self, key: str) -> Optional[Path]:
+        if self.directory is None:
+            return None
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _load(self, digest: str) -> Optional[Dict[str, Any]]:
+        key = self._key(digest)
+        record = self.memory.get(key)
+        if record is not None:
+            return record
+        path = self._path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "r") as f:
+                record = json.load(f)
+            os.utime(path, None)  # refresh recency for disk eviction
+        except FileNotFoundError:
+            self.disk_misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry {path}: {e}")
+            self.disk_misses += 1
+            return None
+        self.disk_hits += 1
+        record["_size"] = path.stat().st_size
+        self.memory.put(key, record)
+        return record
+
+    def _store(self, digest: str, record: Dict[str, Any]):
+        key = self._key(digest)
+        record.pop("_size", None)
+        blob = json.dumps(record)
+        record["_size"] = len(blob)
+        self.memory.put(key, record)
+        path = self._path(key)
+        if path is None:
+            return
+        try:
+            data = blob.encode("utf-8")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".tmp{os.getpid()}")
+            with open(tmp, "wb") as f:
+                f.write(data)
+            try:
+                replaced = path.stat().st_size  # put_parsed rewrites an existing record
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp, path)
+            with self._lock:
+                self._disk_total += len(data) - replaced
+            if self._disk_total > self.disk_bytes:
+                self._evict_disk()
+        except Exception as e:
+            logger.warning(f"Failed to write extraction cache entry: {e}")
+
+    def _evict_disk(self):
+        if self.directory is None:
+            return
+        with self._lock:
+            entries = []
+            total = 0
+            for p in self.directory.glob("*/*.json"):
+                try:
+                    st = p.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, p))
+                total += st.st_size
+            if total > self.disk_bytes:
+                # Evict down to 90% of the budget so we don't rescan on every write
+                target = int(self.disk_bytes * 0.9)
+                entries.sort()
+                for _mtime, size, p in entries:
+                    if total <= target:
+                        break
+                    try:
+                        p.unlink()
+                        total -= size
+                        self.disk_evictions += 1
+                    except FileNotFoundError:
+                        pass
+            self._disk_total = total
+
+    # ----------------- public API -----------------
+    def get_text(self, digest: str) -> Optional[Tuple[str, str]]:
+        """Return (text, method) for a PDF digest, or None on miss."""
+        record = self._load(digest)
+        if not record or "text" not in record:
+            return None
+        return record["text"], record.get("method") or "unknown"
+
+    def get_extraction(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Return {"text", "method", "pages"} (per-page provenance) for a PDF digest, or None on miss."""
+        record = self._load(digest)
+        if not record or "text" not in record:
+            return None
+        return {
+            "text": record["text"],
+            "method": record.get("method") or "unknown",
+            "pages": copy.deepcopy(record.get("pages") or []),
+        }
+
+    def put_text(self, digest: str, text: str, method: str, pages: Optional[list] = None):
+        record = dict(self._load(digest) or {})
+        record["text"] = text
+        record["method"] = method
+        record["pages"] = pages or []
+        record.setdefault("parsed", {})
+        self._store(digest, record)
+
+    def get_parsed(self, digest: str, parser: str) -> Tuple[bool, Any]:
+        """Return (hit, value) for a parser's output on a PDF digest."""
+        record = self._load(digest)
+        parsed = (record or {}).get("parsed") or {}
+        if parser not in parsed:
+            return False, None
+        return True, copy.deepcopy(parsed[parser])
+
+    def put_parsed(self, digest: str, parser: str, value: Any):
+        record = dict(self._load(digest) or {})
+        parsed = dict(record.get("parsed") or {})
+        parsed[parser] = copy.deepcopy(value)
+        record["parsed"] = parsed
+        self._store(digest, record)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "parser_version": PARSER_VERSION,
+            "memory": self.memory.stats(),
+            "disk": {
+                "directory": str(self.directory) if self.directory else None,
+                "max_bytes": self.disk_bytes,
+                "bytes": self._disk_total,
+                "hits": self.disk_hits,
+                "misses": self.disk_misses,
+                "evictions": self.disk_evictions,
+            },
+        }
+
+# Global cache instance
+_cache: Optional[ExtractionCache] = None
+
+def get_extraction_cache() -> Optional[ExtractionCache]:
+    """Get or create the global extraction cache (None when disabled)."""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = ExtractionCache()
+    return _cache
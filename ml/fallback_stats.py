@@ -0,0 +1,196 @@
+# ml/fallback_stats.py
+"""
+In-memory pricing statistics for the /predict fallback path.
+
+When no model is loaded, /predict prices a quote from the tenant's average
+training total. That used to be an AVG/COUNT over ml_training_data on every
+call. FallbackStats keeps running sums per tenant (and for all tenants,
+tenant None) instead:
+  - the first request for a tenant seeds its sums from the database;
+  - save_training_data adds each saved quote to the sums as it is written;
+  - entries older than ML_FALLBACK_STATS_TTL seconds (default 300) are
+    re-seeded in a background thread while the stale sums keep being served.
+A seed that overlaps a save may or may not have read the saved rows, so a
+seed during which record() touched the tenant is read again (up to
+SEED_ATTEMPTS times, after which it is stored already stale and re-seeded on
+the next request).
+After the first request a tenant's lookup is a dict read with no DB round
+trip. The periodic re-seed reconciles any rows written by other processes.
+
+Configuration (environment):
+  - ML_FALLBACK_STATS_TTL       seconds before an entry is re-read (default 300)
+  - ML_FALLBACK_STATS_TENANTS   tenants kept in memory (default 1024)
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+STATS_TTL = float(os.getenv("ML_FALLBACK_STATS_TTL", "300"))
+MAX_TENANTS = int(os.getenv("ML_FALLBACK_STATS_TENANTS", "1024"))
+SEED_ATTEMPTS = 3
+
+STATS_SQL = """
+    SELECT
+        COALESCE(SUM(estimated_total), 0) as total,
+        COUNT(*) as count,
+        COALESCE(SUM(confidence), 0) as confidence_total,
+        COUNT(confidence) as confidence_count
+    FROM ml_training_data
+    WHERE estimated_total > 0
+    AND (tenant_id = %s OR %s IS NULL)
+"""
+
+class PriceStats:
+    """Running sums behind AVG(estimated_total), COUNT(*) and AVG(confidence)."""
+
+    def __init__(self, total: float = 0.0, count: int = 0, confidence_total: float = 0.0, confidence_count: int = 0):
+        self.total = float(total)
+        self.count = int(count)
+        self.confidence_total = float(confidence_total)
+        self.confidence_count = int(confidence_count)
+        self.loaded_at = time.monotonic()
+
+    def add(self, price: float, confidence: Optional[float]):
+        self.total += price
+        self.count += 1
+        if confidence is not None:
+            self.confidence_total += confidence
+            self.confidence_count += 1
+
+    def as_dict(self) -> Optional[Dict[str, Any]]:
+        """avg_total / count / avg_confidence for the training-data fallback; None when there is no priced data."""
+        if not self.count or not self.total:
+            return None
+        avg_confidence = self.confidence_total / self.confidence_count if self.confidence_count else 0.0
+        return {
+            "avg_total": self.total / self.count,
+            "count": self.count,
+            "avg_confidence": avg_confidence if avg_confidence else 0.5,
+        }
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+class FallbackStats:
+    """Per-tenant PriceStats, seeded lazily, updated on save and re-seeded after ``ttl`` seconds."""
+
+    def __init__(self, ttl: float = STATS_TTL, max_tenants: int = MAX_TENANTS):
+        self.ttl = ttl
+        self._entries = LRUCache(max_items=max_tenants)
+        self._lock = threading.Lock()
+        self._refreshing: Set[Optional[str]] = set()
+        # Tenants being seeded: [seeds in flight, records seen since the first of them started]
+        self._seeding: Dict[Optional[str], List[int]] = {}
+        self.loads = 0
+        self.updates = 0
+
+    def _load(self, tenant_id: Optional[str]) -> PriceStats:
+        from db_config import get_db_manager
+        with get_db_manager().get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(STATS_SQL, (tenant_id, tenant_id))
+                row = cur.fetchone()
+        self.loads += 1
+        return PriceStats(*(row or ()))
+
+    def _seeded(self, tenant_id: Optional[str], marker: List[int]):
+        marker[0] -= 1
+        if not marker[0]:
+            del self._seeding[tenant_id]
+
+    def _seed(self, tenant_id: Optional[str]) -> PriceStats:
+        """Load and store a tenant's sums, reading again if record() touched the tenant during the load."""
+        for _ in range(SEED_ATTEMPTS):
+            with self._lock:
+                marker = self._seeding.setdefault(tenant_id, [0, 0])
+                marker[0] += 1
+                writes = marker[1]
+            try:
+                stats = self._load(tenant_id)
+            except Exception:
+                with self._lock:
+                    self._seeded(tenant_id, marker)
+                raise
+            with self._lock:
+                self._seeded(tenant_id, marker)
+                if marker[1] == writes:
+                    self._entries.put(tenant_id, stats)
+                    return stats
+        stats.loaded_at -= self.ttl + 1  # still racing with saves: serve it, re-seed on the next request
+        with self._lock:
+            self._entries.put(tenant_id, stats)
+        return stats
+
+    def _refresh(self, tenant_id: Optional[str]):
+        try:
+            self._seed(tenant_id)
+        except Exception as e:
+            logger.warning(f"Failed to refresh fallback pricing stats for {tenant_id or 'all tenants'}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(tenant_id)
+
+    def get(self, tenant_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Average total, sample count and confidence for a tenant (all tenants for None), or None."""
+        stats = self._entries.get(tenant_id)
+        if stats is None:
+            # First use: seed synchronously (raises if the database is unavailable)
+            stats = self._seed(tenant_id)
+        elif time.monotonic() - stats.loaded_at > self.ttl:
+            with self._lock:
+                start = tenant_id not in self._refreshing
+                self._refreshing.add(tenant_id)
+            if start:
+                threading.Thread(target=self._refresh, args=(tenant_id,), daemon=True,
+                                 name="fallback-stats-refresh").start()
+        with self._lock:
+            return stats.as_dict()
+
+    def record(self, records: Iterable[Dict[str, Any]]):
+        """Add saved training records to the in-memory sums of their tenant and of all tenants."""
+        with self._lock:
+            for record in records:
+                price = _number(record.get("estimated_total", record.get("quoted_price")))
+                if price is None or price <= 0:
+                    continue
+                confidence = _number(record.get("confidence"))
+                for key in (record.get("tenant_id"), None):
+                    stats = self._entries.get(key)
+                    if stats is not None:
+                        stats.add(price, confidence)
+                    marker = self._seeding.get(key)
+                    if marker is not None:
+                        marker[1] += 1
+                self.updates += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._entries.stats(), "ttl": self.ttl, "loads": self.loads, "updates": self.updates}
+
+# Global stats instance
+_stats: Optional[FallbackStats] = None
+_stats_lock = threading.Lock()
+
+def get_fallback_stats() -> FallbackStats:
+    """Get or create the global fallback pricing stats."""
+    global _stats
+    if _stats is None:
+        with _stats_lock:
+            if _stats is None:
+                _stats = FallbackStats()
+    return _stats
+
+__all__ = ["FallbackStats", "PriceStats", "get_fallback_stats"]
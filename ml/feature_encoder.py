@@ -0,0 +1,209 @@
+# ml/feature_encoder.py
+"""
+Compiled, pandas-free feature encoding for single-quote inference.
+
+build_feature_row builds a one-row DataFrame, coerces every column and hands
+it to the pipeline, whose ColumnTransformer then takes it apart again. For a
+single /predict call that pandas round trip costs more than the model itself.
+
+compile_predictor() inspects a fitted model once, at load time, and produces
+a FastPredictor. For a Pipeline(ColumnTransformer -> estimator) it records,
+for every input column, where its value lands in the transformer output:
+  - a passthrough numeric column is copied to one slot;
+  - a OneHotEncoder column is a dict from category to slot.
+Encoding a quote then means copying a preallocated template row and setting a
+handful of slots, after which the final estimator is called on the numpy row
+directly. Forest and XGBoost estimators are first flattened into numpy arrays
+(see tree_engine.py); the original estimator remains their fallback.
+
+The output must match the pipeline exactly, so compilation refuses
+(returns None) for anything it cannot reproduce bit for bit: other
+transformers, dropped or infrequent categories, non-string categories and
+unknown column selectors. Callers keep the pandas path for those. When the
+ColumnTransformer produces a sparse matrix and the estimator is XGBoost,
+implicit zeros are "missing" to XGBoost, so the compiled row carries NaN
+in those slots.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from tree_engine import flatten
+
+logger = logging.getLogger(__name__)
+
+def _to_number(value: Any) -> float:
+    """pd.to_numeric(value, errors="coerce") followed by fillna(0.0), for one value."""
+    if isinstance(value, bool):
+        return float(value)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if math.isnan(number) else number
+
+def _is_xgboost(estimator: Any) -> bool:
+    return type(estimator).__module__.split(".")[0] == "xgboost"
+
+class FastPredictor:
+    """A fitted model's final estimator plus a compiled encoder for its input row."""
+
+    def __init__(
+        self,
+        estimator: Any,
+        n_features: int,
+        numeric_slots: List[Tuple[str, int]],
+        onehot_slots: List[Tuple[str, Dict[str, int], bool]],
+        columns: Sequence[str],
+        numeric_columns: Set[str],
+        zero_is_missing: bool,
+    ):
+        self.estimator = estimator
+        self.n_features = n_features
+        self._numeric_slots = numeric_slots
+        self._onehot_slots = onehot_slots
+        self._defaults = {c: (0 if c in numeric_columns else "") for c in columns}
+        self._zero_is_missing = zero_is_missing
+        self._template = np.zeros((1, n_features), dtype=np.float64)
+
+    def encode(self, values: Dict[str, Any]) -> np.ndarray:
+        """Feature row (1 x n_features) for a dict of raw column values (see quote_feature_values)."""
+        row = self._template.copy()
+        self._fill(row[0], values)
+        if self._zero_is_missing:
+            row[row == 0.0] = np.nan
+        return row
+
+    def encode_many(self, rows: List[Dict[str, Any]]) -> np.ndarray:
+        """Feature matrix (len(rows) x n_features), one encode() row per dict."""
+        matrix = np.zeros((len(rows), self.n_features), dtype=np.float64)
+        for i, values in enumerate(rows):
+            self._fill(matrix[i], values)
+        if self._zero_is_missing:
+            matrix[matrix == 0.0] = np.nan
+        return matrix
+
+    def _fill(self, out: np.ndarray, values: Dict[str, Any]):
+        defaults = self._defaults
+        for column, slot in self._numeric_slots:
+            out[slot] = _to_number(values.get(column, defaults.get(column, 0)))
+        for column, categories, strict in self._onehot_slots:
+            category = str(values.get(column, defaults.get(column, "")))
+            slot = categories.get(category)
+            if slot is not None:
+                out[slot] = 1.0
+            elif strict:
+                raise ValueError(f"Found unknown category {category!r} in column {column!r}")
+
+    def predict(self, values: Dict[str, Any]) -> np.ndarray:
+        return self.estimator.predict(self.encode(values))
+
+    def predict_proba(self, values: Dict[str, Any]) -> np.ndarray:
+        return self.estimator.predict_proba(self.encode(values))
+
+    def predict_many(self, rows: List[Dict[str, Any]]) -> np.ndarray:
+        return self.estimator.predict(self.encode_many(rows))
+
+    def predict_proba_many(self, rows: List[Dict[str, Any]]) -> np.ndarray:
+        return self.estimator.predict_proba(self.encode_many(rows))
+
+def _selected_columns(selector: Any, input_columns: Sequence[str]) -> Optional[List[str]]:
+    if isinstance(selector, str):
+        return [selector]
+    if isinstance(selector, (list, tuple, np.ndarray)):
+        out = []
+        for c in selector:
+            if isinstance(c, str):
+                out.append(c)
+            elif isinstance(c, (int, np.integer)) and not isinstance(c, bool) and 0 <= int(c) < len(input_columns):
+                out.append(input_columns[int(c)])
+            else:
+                return None
+        return out
+    return None
+
+def _is_passthrough(transformer: Any) -> bool:
+    # Fitted ColumnTransformers replace "passthrough" with an identity FunctionTransformer
+    if isinstance(transformer, str):
+        return transformer == "passthrough"
+    return (type(transformer).__name__ == "FunctionTransformer" and transformer.func is None
+            and not getattr(transformer, "validate", False))
+
+def _compile_column_transformer(ct: Any, numeric: Set[str], categorical: Set[str]):
+    input_columns = [str(c) for c in getattr(ct, "feature_names_in_", [])]
+    output_indices = getattr(ct, "output_indices_", None)
+    if not input_columns or output_indices is None:
+        return None
+    numeric_slots: List[Tuple[str, int]] = []
+    onehot_slots: List[Tuple[str, Dict[str, int], bool]] = []
+    for name, transformer, selector in ct.transformers_:
+        out = output_indices.get(name)
+        if out is None:
+            return None
+        columns = _selected_columns(selector, input_columns)
+        if columns is None:
+            return None
+        if (isinstance(transformer, str) and transformer == "drop") or not columns:
+            continue
+        start = out.start
+        if _is_passthrough(transformer):
+            if not all(c in numeric for c in columns) or out.stop - start != len(columns):
+                return None
+            numeric_slots.extend((c, start + i) for i, c in enumerate(columns))
+        elif type(transformer).__name__ == "OneHotEncoder":
+            if getattr(transformer, "drop_idx_", None) is not None or getattr(transformer, "_infrequent_enabled", False):
+                return None
+            if not all(c in categorical for c in columns):
+                return None
+            strict = transformer.handle_unknown == "error"
+            offset = start
+            for column, cats in zip(columns, transformer.categories_):
+                if not all(isinstance(v, str) for v in cats):
+                    return None
+                onehot_slots.append((column, {v: offset + i for i, v in enumerate(cats)}, strict))
+                offset += len(cats)
+            if offset != out.stop:
+                return None
+        else:
+            return None
+    n_features = max((o.stop for o in output_indices.values()), default=0)
+    return numeric_slots, onehot_slots, n_features, bool(getattr(ct, "sparse_output_", False))
+
+def compile_predictor(
+    model: Any,
+    columns: Sequence[str],
+    numeric_columns: Iterable[str],
+    categorical_columns: Iterable[str],
+    flat: Any = None,
+) -> Optional[FastPredictor]:
+    """
+    FastPredictor reproducing ``model.predict`` on build_feature_row frames, or None if unsupported.
+    ``flat`` is the final estimator already flattened (e.g. memory-mapped by model_registry).
+    """
+    if model is None:
+        return None
+    numeric, categorical = set(numeric_columns), set(categorical_columns)
+    # Only Pipeline(ColumnTransformer -> estimator); bare estimators keep the frame path
+    steps = getattr(model, "steps", None)
+    if not steps or len(steps) != 2 or type(steps[0][1]).__name__ != "ColumnTransformer":
+        return None
+    try:
+        compiled = _compile_column_transformer(steps[0][1], numeric, categorical)
+        if compiled is None:
+            return None
+        numeric_slots, onehot_slots, n_features, sparse = compiled
+        if n_features <= 0:
+            return None
+        estimator = steps[-1][1]
+        return FastPredictor(flat or flatten(estimator) or estimator, n_features, numeric_slots, onehot_slots, columns,
+                             numeric, zero_is_missing=sparse and _is_xgboost(estimator))
+    except Exception as e:
+        logger.warning(f"Could not compile a fast predictor for {type(model).__name__}: {e}")
+        return None
+
+__all__ = ["FastPredictor", "compile_predictor"]
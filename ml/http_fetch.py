@@ -0,0 +1,204 @@
+# ml/http_fetch.py
+"""
+Shared HTTP client for downloading PDFs (attachment URLs, signed storage links).
+
+Replaces the per-call urllib.urlopen downloads, which opened a new connection
+(and TLS handshake) every time, had no size cap and buffered the whole body
+before extraction could start. One requests.Session keeps a keep-alive
+connection pool per host. Bodies are streamed in chunks into a spooled temp
+file, which stays in memory up to ML_FETCH_SPOOL_MB and moves to disk after
+that. fetch() returns that file; main.py passes it on to the PDF pool, which
+hashes it and copies it into shared memory in chunks (see pdf_pool.py).
+fetch_bytes() reads the body back into one bytes object, so it is only meant
+for small bodies and callers that need bytes. Downloads larger than
+ML_FETCH_MAX_MB are refused. GETs that fail on a
+connection error, a 429 or a 5xx are retried with exponential backoff and
+full jitter.
+
+Configuration (environment):
+  - ML_FETCH_MAX_MB          largest accepted body (default 50)
+  - ML_FETCH_SPOOL_MB        in-memory size before spooling to disk (default 8)
+  - ML_FETCH_POOL_SIZE       pooled connections kept per host (default 16)
+  - ML_FETCH_RETRIES         retries after the first attempt (default 2)
+  - ML_FETCH_BACKOFF         base backoff in seconds (default 0.5)
+
+Every download is timed; stats() reports counts, bytes and latency.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import IO, Any, Deque, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+MAX_BYTES = int(float(os.getenv("ML_FETCH_MAX_MB", "50")) * 1024 * 1024)
+SPOOL_BYTES = int(float(os.getenv("ML_FETCH_SPOOL_MB", "8")) * 1024 * 1024)
+POOL_SIZE = int(os.getenv("ML_FETCH_POOL_SIZE", "16"))
+RETRIES = int(os.getenv("ML_FETCH_RETRIES", "2"))
+BACKOFF = float(os.getenv("ML_FETCH_BACKOFF", "0.5"))
+CHUNK_BYTES = 64 * 1024
+USER_AGENT = "JoineryAI-ML/1.0"
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+class FetchError(Exception):
+    """A download failed (bad status, too large, or out of retries)."""
+
+class BodyTooLarge(FetchError):
+    """The body exceeds the configured maximum size."""
+
+class HttpFetcher:
+    """Pooled, retrying, size-capped downloader. Thread-safe; one shared instance per process."""
+
+    def __init__(self, max_bytes: int = MAX_BYTES, spool_bytes: int = SPOOL_BYTES, pool_size: int = POOL_SIZE,
+                 retries: int = RETRIES, backoff: float = BACKOFF):
+        self.max_bytes = max_bytes
+        self.spool_bytes = spool_bytes
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = USER_AGENT
+        self._lock = threading.Lock()
+        self.downloads = 0
+        self.failures = 0
+        self.retried = 0
+        self.bytes = 0
+        self.total_ms = 0.0
+        self._recent_ms: Deque[float] = deque(maxlen=200)
+
+    # ----------------- download -----------------
+    def _sleep_before_retry(self, attempt: int, deadline: Optional[float]):
+        # Full jitter: uniform in [0, backoff * 2^attempt]
+        delay = random.uniform(0, self.backoff * (2 ** attempt))
+        if deadline is not None:
+            delay = min(delay, max(0.0, deadline - time.monotonic()))
+        time.sleep(delay)
+
+    def _download(self, url: str, timeout: float) -> IO[bytes]:
+        with self.session.get(url, stream=True, timeout=timeout) as resp:
+            if resp.status_code in RETRY_STATUSES:
+                raise _Retryable(f"HTTP {resp.status_code}")
+            if resp.status_code >= 400:
+                raise FetchError(f"HTTP {resp.status_code}")
+            declared = resp.headers.get("Content-Length")
+            if declared and declared.isdigit() and int(declared) > self.max_bytes:
+                raise BodyTooLarge(f"body of {declared} bytes exceeds {self.max_bytes}")
+            body = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+            size = 0
+            try:
+                for chunk in resp.iter_content(chunk_size=CHUNK_BYTES):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise BodyTooLarge(f"body exceeds {self.max_bytes} bytes")
+                    body.write(chunk)
+            except BaseException:
+                body.close()
+                raise
+            body.seek(0)
+            return body
+
+    def fetch(self, url: str, timeout: float = 30) -> IO[bytes]:
+        """
+        Download ``url`` into a spooled temp file (positioned at 0; caller closes it).
+        ``timeout`` bounds each connect/read and the total time spent retrying.
+        Raises FetchError (BodyTooLarge for oversize bodies).
+        """
+        started = time.perf_counter()
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            try:
+                body = self._download(url, timeout=max(0.1, deadline - time.monotonic()))
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError, _Retryable) as e:
+                if attempt >= self.retries or time.monotonic() >= deadline:
+                    self._record(started, None)
+                    raise FetchError(f"download failed after {attempt + 1} attempt(s): {e}") from None
+                with self._lock:
+                    self.retried += 1
+                self._sleep_before_retry(attempt, deadline)
+                attempt += 1
+            except FetchError:
+                self._record(started, None)
+                raise
+            except requests.RequestException as e:
+                self._record(started, None)
+                raise FetchError(str(e)) from None
+        body.seek(0, os.SEEK_END)
+        size = body.tell()
+        body.seek(0)
+        self._record(started, size)
+        return body
+
+    def fetch_bytes(self, url: str, timeout: float = 30) -> bytes:
+        """
+        Download ``url`` and return its body as bytes (see fetch). This holds the whole
+        body in memory: use fetch for PDFs and anything else that may be large.
+        """
+        body = self.fetch(url, timeout)
+        try:
+            return body.read()
+        finally:
+            body.close()
+
+    # ----------------- stats -----------------
+    def _record(self, started: float, size: Optional[int]):
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        with self._lock:
+            if size is None:
+                self.failures += 1
+                return
+            self.downloads += 1
+            self.bytes += size
+            self.total_ms += elapsed_ms
+            self._recent_ms.append(elapsed_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            recent = sorted(self._recent_ms)
+        def pct(p: float) -> Optional[float]:
+            return round(recent[min(len(recent) - 1, int(p * len(recent)))], 1) if recent else None
+        return {
+            "downloads": self.downloads,
+            "failures": self.failures,
+            "retries": self.retried,
+            "bytes": self.bytes,
+            "avg_ms": round(self.total_ms / self.downloads, 1) if self.downloads else None,
+            "p50_ms": pct(0.5),
+            "p95_ms": pct(0.95),
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self):
+        self.session.close()
+
+class _Retryable(Exception):
+    """Transient HTTP status worth retrying."""
+
+# Global fetcher instance
+_fetcher: Optional[HttpFetcher] = None
+_fetcher_lock = threading.Lock()
+
+def get_fetcher() -> HttpFetcher:
+    """Get or create the global HTTP fetcher."""
+    global _fetcher
+    if _fetcher is None:
+        with _fetcher_lock:
+            if _fetcher is None:
+                _fetcher = HttpFetcher()
+    return _fetcher
+
+__all__ = ["BodyTooLarge", "FetchError", "HttpFetcher", "get_fetcher"]
@@ -0,0 +1,91 @@
+# ml/incremental.py
+"""
+Incremental (warm-start) retraining helpers.
+
+A full retrain refits every model on the whole history. An incremental run
+fetches only the rows newer than the previous model's watermark and extends
+that model:
+  - forests (RandomForest*) get extra trees fitted on the new rows, through
+    sklearn's warm_start; the existing trees are kept as they are;
+  - XGBoost pipelines keep their fitted preprocessor and continue boosting
+    from the previous booster (fit(..., xgb_model=booster)).
+Categories that first appear in new rows are unknown to the kept encoders,
+and labels changed on old rows are not refetched. A full rebuild is therefore
+forced after ML_FULL_REBUILD_EVERY incremental runs (default 5).
+
+The watermark, the number of incremental runs since the last full rebuild and
+the metrics of that rebuild travel in each model version's feature metadata.
+Rolling back a version therefore rolls back its watermark too.
+
+Configuration (environment):
+  - ML_FULL_REBUILD_EVERY        incremental runs between full rebuilds (default 5)
+  - ML_INCREMENTAL_TREES         trees added to a forest per run (default 20)
+  - ML_INCREMENTAL_ROUNDS        boosting rounds added to XGBoost per run (default 50)
+"""
+
+from __future__ import annotations
+
+import copy
+import datetime
+import os
+from typing import Any, Dict, Optional
+
+FULL_REBUILD_EVERY = int(os.getenv("ML_FULL_REBUILD_EVERY", "5"))
+INCREMENTAL_TREES = int(os.getenv("ML_INCREMENTAL_TREES", "20"))
+INCREMENTAL_ROUNDS = int(os.getenv("ML_INCREMENTAL_ROUNDS", "50"))
+
+FULL, INCREMENTAL = "full", "incremental"
+
+def training_mode(requested: bool, meta: Optional[Dict[str, Any]], full_every: int = FULL_REBUILD_EVERY) -> str:
+    """INCREMENTAL if it was requested and the previous run left a watermark, unless a rebuild is due."""
+    if not requested or not meta or not meta.get("watermark"):
+        return FULL
+    if int(meta.get("incremental_rounds") or 0) >= full_every:
+        return FULL
+    return INCREMENTAL
+
+def watermark(values) -> Optional[str]:
+    """ISO timestamp of the newest value (datetimes or strings), or None."""
+    newest = None
+    for v in values:
+        if v is None:
+            continue
+        if isinstance(v, str):
+            try:
+                v = datetime.datetime.fromisoformat(v)
+            except ValueError:
+                continue
+        if newest is None or v > newest:
+            newest = v
+    return newest.isoformat() if newest is not None else None
+
+def warm_start_forest(previous: Any, X: Any, y: Any, extra_trees: int = INCREMENTAL_TREES) -> Any:
+    """A copy of ``previous`` with ``extra_trees`` more trees fitted on (X, y); ``previous`` is not modified."""
+    model = copy.deepcopy(previous)
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + extra_trees)
+    model.fit(X, y)
+    model.set_params(warm_start=False)
+    return model
+
+def continue_boosting(previous: Any, X: Any, y: Any, extra_rounds: int = INCREMENTAL_ROUNDS) -> Any:
+    """
+    A new Pipeline(pre -> XGBoost) whose booster continues from ``previous``'s
+    with ``extra_rounds`` more rounds fitted on (X, y). The fitted preprocessor
+    is reused unchanged, so the feature layout stays the same.
+    """
+    from sklearn.pipeline import Pipeline
+
+    pre_name, pre = previous.steps[0]
+    model_name, old = previous.steps[-1]
+    model = type(old)(**{**old.get_params(), "n_estimators": extra_rounds})
+    model.fit(pre.transform(X), y, xgb_model=old.get_booster())
+    return Pipeline(steps=[(pre_name, pre), (model_name, model)])
+
+def quality_delta(metrics: Dict[str, float], reference: Optional[Dict[str, float]]) -> Optional[Dict[str, float]]:
+    """metric - reference for each metric both have (positive MAE delta = worse than the reference)."""
+    if not reference:
+        return None
+    return {k: round(float(v) - float(reference[k]), 6) for k, v in metrics.items()
+            if k in reference and v is not None and reference[k] is not None}
+
+__all__ = ["FULL", "INCREMENTAL", "continue_boosting", "quality_delta", "training_mode", "warm_start_forest", "watermark"]
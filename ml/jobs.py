@@ -0,0 +1,488 @@
+# ml/jobs.py
+"""
+Persistent background jobs on the ml_training_jobs table.
+
+/train, /start-email-training and /train-client-quotes can take minutes
+(downloads, OCR, Gmail crawls and RandomForest fits), which is far longer
+than the API's ML timeout. They can instead be submitted as jobs: the
+submit call inserts a 'pending' row and returns its id straight away.
+Workers claim rows with FOR UPDATE SKIP LOCKED, so any number of uvicorn or
+gunicorn workers can share the queue without claiming the same job twice.
+
+A job's lifecycle is pending -> running -> completed | failed | cancelled.
+  - Progress: handlers call JobContext.progress(fraction, message). This only
+    updates memory. A heartbeat task writes it to the row every
+    ML_JOB_HEARTBEAT seconds, together with heartbeat_at.
+  - Crashes: a 'running' row whose heartbeat is older than ML_JOB_LEASE
+    seconds belongs to a dead worker. It is claimed again, up to the job's
+    max_attempts, and is failed once its attempts are used up.
+  - Cancellation: cancel() cancels pending rows immediately and sets
+    cancel_requested on running ones. The worker sees the flag on its next
+    heartbeat. Async handlers are cancelled outright. Sync handlers (run in a
+    thread) cannot be interrupted: they stop at their next progress() /
+    check() call, and until their thread has exited the job keeps its
+    concurrency slot and its heartbeat and is neither finished nor released.
+    Handlers call check() right before any side effect that must not happen
+    after a cancel (publishing a model).
+  - Restarts: rows are the only state, so jobs survive a restart. On a
+    graceful shutdown, running jobs are handed back to the queue without
+    spending an attempt. A sync handler that does not stop within the
+    shutdown timeout is not released; its lease expires and it is retried.
+
+Configuration (environment):
+  - ML_JOB_CONCURRENCY   jobs run at once per process (default 1; 0 = submit only)
+  - ML_JOB_POLL          seconds between polls of an empty queue (default 2)
+  - ML_JOB_HEARTBEAT     seconds between heartbeats (default 5)
+  - ML_JOB_LEASE         seconds without a heartbeat before a job is reclaimed (default 60)
+  - ML_JOB_MAX_ATTEMPTS  default attempts per job (default 3)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import inspect
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY = int(os.getenv("ML_JOB_CONCURRENCY", "1"))
+POLL_SECONDS = float(os.getenv("ML_JOB_POLL", "2"))
+HEARTBEAT_SECONDS = float(os.getenv("ML_JOB_HEARTBEAT", "5"))
+LEASE_SECONDS = float(os.getenv("ML_JOB_LEASE", "60"))
+MAX_ATTEMPTS = int(os.getenv("ML_JOB_MAX_ATTEMPTS", "3"))
+
+PENDING, RUNNING, COMPLETED, FAILED, CANCELLED = "pending", "running", "completed", "failed", "cancelled"
+FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS ml_training_jobs (
+    id SERIAL PRIMARY KEY,
+    tenant_id TEXT NOT NULL,
+    job_type TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    parameters JSONB,
+    results JSONB,
+    error_message TEXT,
+    started_at TIMESTAMP,
+    completed_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+ALTER TABLE ml_training_jobs
+    ADD COLUMN IF NOT EXISTS progress REAL NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS progress_message TEXT,
+    ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS max_attempts INTEGER NOT NULL DEFAULT 3,
+    ADD COLUMN IF NOT EXISTS worker_id TEXT,
+    ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT NOW();
+CREATE INDEX IF NOT EXISTS idx_ml_training_jobs_tenant_status ON ml_training_jobs(tenant_id, status);
+CREATE INDEX IF NOT EXISTS idx_ml_training_jobs_created_at ON ml_training_jobs(created_at);
+CREATE INDEX IF NOT EXISTS idx_ml_training_jobs_queue ON ml_training_jobs(created_at)
+    WHERE status IN ('pending', 'running');
+"""
+
+JOB_COLUMNS = (
+    "id, tenant_id, job_type, status, parameters, results, error_message, progress, progress_message, "
+    "attempts, max_attempts, worker_id, cancel_requested, created_at, started_at, completed_at, heartbeat_at"
+)
+
+class JobCancelled(BaseException):
+    """
+    Raised inside a handler when its job has been cancelled (or lost to another worker).
+    Like asyncio.CancelledError it is not an Exception, so the broad ``except Exception``
+    blocks in the training code do not swallow it.
+    """
+
+def _json(value: Any) -> Optional[str]:
+    return None if value is None else json.dumps(value, default=str)
+
+def _iso(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, (datetime.datetime, datetime.date)) else value
+
+def _row_to_job(row) -> Dict[str, Any]:
+    job = dict(zip([c.strip() for c in JOB_COLUMNS.split(",")], row))
+    for key in ("created_at", "started_at", "completed_at", "heartbeat_at"):
+        job[key] = _iso(job[key])
+    job["progress"] = float(job["progress"] or 0.0)
+    return job
+
+class JobQueue:
+    """SQL for the ml_training_jobs table. Every method is a short, self-committing transaction."""
+
+    def __init__(self, db_manager=None):
+        self._db = db_manager
+        self._schema_ready = False
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        if self._db is None:
+            from db_config import get_db_manager
+            self._db = get_db_manager()
+        if not self._schema_ready:
+            with self._lock:
+                if not self._schema_ready:
+                    with self._db.get_connection() as conn:
+                        conn.execute(SCHEMA_SQL)
+                        conn.commit()
+                    self._schema_ready = True
+        return self._db.get_connection()
+
+    def submit(self, tenant_id: str, job_type: str, parameters: Optional[Dict[str, Any]] = None,
+               max_attempts: int = MAX_ATTEMPTS) -> Dict[str, Any]:
+        with self._conn() as conn:
+            row = conn.execute(
+                f"INSERT INTO ml_training_jobs (tenant_id, job_type, status, parameters, max_attempts) "
+                f"VALUES (%s, %s, 'pending', %s, %s) RETURNING {JOB_COLUMNS}",
+                (tenant_id, job_type, _json(parameters or {}), max(1, int(max_attempts))),
+            ).fetchone()
+            conn.commit()
+        return _row_to_job(row)
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self._conn() as conn:
+            row = conn.execute(f"SELECT {JOB_COLUMNS} FROM ml_training_jobs WHERE id = %s", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def list(self, tenant_id: Optional[str] = None, status: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        where, params = [], []
+        if tenant_id:
+            where.append("tenant_id = %s")
+            params.append(tenant_id)
+        if status:
+            where.append("status = %s")
+            params.append(status)
+        sql = f"SELECT {JOB_COLUMNS} FROM ml_training_jobs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC LIMIT %s"
+        params.append(max(1, min(int(limit), 200)))
+        with self._conn() as conn:
+            rows = conn.execute(sql, tuple(params)).fetchall()
+        return [_row_to_job(r) for r in rows]
+
+    def cancel(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Cancel a pending job, or flag a running one. Returns the job (None if unknown)."""
+        with self._conn() as conn:
+            conn.execute(
+                """
+                UPDATE ml_training_jobs
+                SET cancel_requested = TRUE,
+                    status = CASE WHEN status = 'pending' THEN 'cancelled' ELSE status END,
+                    completed_at = CASE WHEN status = 'pending' THEN NOW() ELSE completed_at END,
+                    updated_at = NOW()
+                WHERE id = %s AND status IN ('pending', 'running')
+                """,
+                (job_id,),
+            )
+            conn.commit()
+        return self.get(job_id)
+
+    def claim(self, worker_id: str, job_types: List[str], lease_seconds: float = LEASE_SECONDS) -> Optional[Dict[str, Any]]:
+        """Take the oldest runnable job: pending, or running on a worker whose lease expired."""
+        if not job_types:
+            return None
+        with self._conn() as conn:
+            row = conn.execute(
+                f"""
+                UPDATE ml_training_jobs j
+                SET status = 'running', worker_id = %s, attempts = j.attempts + 1,
+                    heartbeat_at = NOW(), started_at = COALESCE(j.started_at, NOW()), updated_at = NOW()
+                FROM (
+                    SELECT id FROM ml_training_jobs
+                    WHERE job_type = ANY(%s)
+                      AND NOT cancel_requested
+                      AND attempts < max_attempts
+                      AND (status = 'pending'
+                           OR (status = 'running' AND heartbeat_at < NOW() - make_interval(secs => %s)))
+                    ORDER BY created_at
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                ) c
+                WHERE j.id = c.id
+                RETURNING {", ".join("j." + c.strip() for c in JOB_COLUMNS.split(","))}
+                """,
+                (worker_id, list(job_types), lease_seconds),
+            ).fetchone()
+            conn.commit()
+        return _row_to_job(row) if row else None
+
+    def reap(self, lease_seconds: float = LEASE_SECONDS) -> int:
+        """Finish running jobs whose worker died and which cannot be retried (attempts used up, or cancelled)."""
+        with self._conn() as conn:
+            cur = conn.execute(
+                """
+                UPDATE ml_training_jobs
+                SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE 'failed' END,
+                    error_message = CASE WHEN cancel_requested THEN error_message
+                        ELSE 'worker lost after ' || attempts || ' attempt(s)' END,
+                    completed_at = NOW(), updated_at = NOW()
+                WHERE status = 'running'
+                  AND heartbeat_at < NOW() - make_interval(secs => %s)
+                  AND (attempts >= max_attempts OR cancel_requested)
+                """,
+                (lease_seconds,),
+            )
+            conn.commit()
+            return cur.rowcount or 0
+
+    def heartbeat(self, job_id: int, worker_id: str, progress: float, message: Optional[str]) -> Optional[bool]:
+        """Record progress. Returns cancel_requested, or None if the job is no longer ours."""
+        with self._conn() as conn:
+            row = conn.execute(
+                """
+                UPDATE ml_training_jobs
+                SET heartbeat_at = NOW(), progress = %s, progress_message = %s, updated_at = NOW()
+                WHERE id = %s AND worker_id = %s AND status = 'running'
+                RETURNING cancel_requested
+                """,
+                (progress, message, job_id, worker_id),
+            ).fetchone()
+            conn.commit()
+        return bool(row[0]) if row else None
+
+    def finish(self, job_id: int, worker_id: str, status: str, results: Any = None,
+               error: Optional[str] = None, progress: Optional[float] = None, message: Optional[str] = None) -> bool:
+        with self._conn() as conn:
+            cur = conn.execute(
+                """
+                UPDATE ml_training_jobs
+                SET status = %s, results = %s, error_message = %s,
+                    progress = COALESCE(%s, progress), progress_message = COALESCE(%s, progress_message),
+                    completed_at = NOW(), heartbeat_at = NOW(), updated_at = NOW()
+                WHERE id = %s AND worker_id = %s AND status = 'running'
+                """,
+                (status, _json(results), error, progress, message, job_id, worker_id),
+            )
+            conn.commit()
+            return bool(cur.rowcount)
+
+    def release(self, job_id: int, worker_id: str) -> bool:
+        """Hand a running job back to the queue without spending an attempt (graceful shutdown)."""
+        with self._conn() as conn:
+            cur = conn.execute(
+                """
+                UPDATE ml_training_jobs
+                SET status = 'pending', worker_id = NULL, attempts = GREATEST(attempts - 1, 0), updated_at = NOW()
+                WHERE id = %s AND worker_id = %s AND status = 'running' AND NOT cancel_requested
+                """,
+                (job_id, worker_id),
+            )
+            conn.commit()
+            return bool(cur.rowcount)
+
+class JobContext:
+    """What a handler sees of its job: parameters, progress reporting and cancellation."""
+
+    def __init__(self, job: Dict[str, Any]):
+        self.job_id: int = job["id"]
+        self.tenant_id: str = job["tenant_id"]
+        self.job_type: str = job["job_type"]
+        self.parameters: Dict[str, Any] = job.get("parameters") or {}
+        self.attempt: int = job.get("attempts") or 1
+        self.fraction: float = float(job.get("progress") or 0.0)
+        self.message: Optional[str] = job.get("progress_message")
+        # Set when a cancel was requested through the API (as opposed to a shutdown)
+        self.cancel_requested = False
+        # Set when another worker reclaimed the job after a missed lease
+        self.lost = False
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check(self):
+        """Raise JobCancelled if the job has been cancelled."""
+        if self._cancelled.is_set():
+            raise JobCancelled(f"job {self.job_id} cancelled")
+
+    def progress(self, fraction: Optional[float] = None, message: Optional[str] = None):
+        """Report progress (0..1 and/or a message); persisted on the next heartbeat. Raises JobCancelled."""
+        if fraction is not None:
+            self.fraction = min(1.0, max(0.0, float(fraction)))
+        if message is not None:
+            self.message = str(message)[:500]
+        self.check()
+
+Handler = Callable[[JobContext], Any]
+
+class JobRunner:
+    """Registry of job handlers plus the claim / heartbeat loop that runs them in this process."""
+
+    def __init__(self, queue: Optional[JobQueue] = None, concurrency: int = CONCURRENCY):
+        self.queue = queue or JobQueue()
+        self.concurrency = max(0, concurrency)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._handlers: Dict[str, Handler] = {}
+        self._running: Dict[int, Any] = {}
+        self._loop_task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    def register(self, job_type: str, handler: Handler):
+        """Run ``job_type`` jobs with ``handler(ctx)``; sync handlers run in a thread. The return value is stored as results."""
+        self._handlers[job_type] = handler
+
+    def job_types(self) -> List[str]:
+        return list(self._handlers)
+
+    def submit(self, tenant_id: str, job_type: str, parameters: Optional[Dict[str, Any]] = None,
+               max_attempts: int = MAX_ATTEMPTS) -> Dict[str, Any]:
+        if job_type not in self._handlers:
+            raise ValueError(f"unknown job type {job_type!r}")
+        return self.queue.submit(tenant_id, job_type, parameters, max_attempts)
+
+    # ----------------- worker loop -----------------
+    def start(self):
+        if self.concurrency <= 0 or self._loop_task is not None:
+            return
+        self._stopping = False
+        self._loop_task = asyncio.get_running_loop().create_task(self._loop())
+        logger.info(f"Job worker {self.worker_id} started (concurrency {self.concurrency})")
+
+    async def _loop(self):
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        while not self._stopping:
+            await slots.acquire()
+            try:
+                await asyncio.to_thread(self.queue.reap)
+                job = await asyncio.to_thread(self.queue.claim, self.worker_id, self.job_types())
+            except Exception as e:
+                logger.warning(f"Job queue unavailable: {e}")
+                job = None
+            if job is None:
+                slots.release()
+                await asyncio.sleep(POLL_SECONDS)
+                continue
+            task = asyncio.ensure_future(self._execute(job))
+            tasks.add(task)
+            task.add_done_callback(lambda t: (tasks.discard(t), slots.release()))
+
+    async def _heartbeat(self, ctx: JobContext, handler_task: "asyncio.Future[Any]", interruptible: bool):
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            try:
+                cancel = await asyncio.to_thread(self.queue.heartbeat, ctx.job_id, self.worker_id, ctx.fraction, ctx.message)
+            except Exception as e:
+                logger.warning(f"Heartbeat for job {ctx.job_id} failed: {e}")
+                continue
+            if cancel is None:
+                ctx.lost = True
+            elif cancel:
+                ctx.cancel_requested = True
+            else:
+                continue
+            ctx.cancel()
+            if interruptible:
+                handler_task.cancel()
+                return
+            if ctx.lost:
+                return
+            # A sync handler stops at its next check(); keep the lease until its thread exits
+
+    async def _execute(self, job: Dict[str, Any]):
+        ctx = JobContext(job)
+        handler = self._handlers[ctx.job_type]
+        logger.info(f"Job {ctx.job_id} ({ctx.job_type}, tenant {ctx.tenant_id}) started, attempt {ctx.attempt}")
+        interruptible = inspect.iscoroutinefunction(handler)
+        if interruptible:
+            handler_task = asyncio.ensure_future(handler(ctx))
+        else:
+            handler_task = asyncio.ensure_future(asyncio.to_thread(handler, ctx))
+        self._running[ctx.job_id] = (ctx, handler_task, interruptible, asyncio.current_task())
+        beat = asyncio.ensure_future(self._heartbeat(ctx, handler_task, interruptible))
+        status, results, error = FAILED, None, None
+        try:
+            # shield: cancelling _execute (e.g. at loop shutdown) must not detach a still-running thread
+            results = await (handler_task if interruptible else asyncio.shield(handler_task))
+            status = COMPLETED
+        except (JobCancelled, asyncio.CancelledError):
+            if not interruptible and not handler_task.done():
+                # Only this coroutine was cancelled; the thread is still running the job
+                logger.warning(f"Job {ctx.job_id} is still running in its thread; leaving it to its lease")
+                beat.cancel()
+                raise
+            status, error = CANCELLED, "cancelled"
+        except Exception as e:
+            logger.exception(f"Job {ctx.job_id} failed")
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            beat.cancel()
+            self._running.pop(ctx.job_id, None)
+        if ctx.lost:
+            logger.warning(f"Job {ctx.job_id} was reclaimed by another worker; dropping this run")
+            return
+        try:
+            if status == CANCELLED and self._stopping and not ctx.cancel_requested:
+                await asyncio.to_thread(self.queue.release, ctx.job_id, self.worker_id)
+                return
+            await asyncio.to_thread(self.queue.finish, ctx.job_id, self.worker_id, status, results, error,
+                                    1.0 if status == COMPLETED else None, ctx.message)
+        except Exception as e:
+            # The lease expires and another worker retries the job
+            logger.error(f"Could not record the outcome of job {ctx.job_id}: {e}")
+            return
+        if status == COMPLETED:
+            self.completed += 1
+        elif status == CANCELLED:
+            self.cancelled += 1
+        else:
+            self.failed += 1
+        logger.info(f"Job {ctx.job_id} {status}")
+
+    async def stop(self, timeout: float = 5.0):
+        """Stop claiming; interrupt running jobs and hand them back to the queue."""
+        self._stopping = True
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
+        running = list(self._running.values())
+        for ctx, handler_task, interruptible, _ in running:
+            ctx.cancel()
+            if interruptible:
+                handler_task.cancel()
+        # Each run releases its own job once its handler has really exited (see _execute)
+        if running:
+            await asyncio.wait([execute for *_, execute in running], timeout=timeout)
+        for ctx, *_ in running:
+            if ctx.job_id in self._running:
+                logger.warning(f"Job {ctx.job_id} did not stop within {timeout:.0f}s; it is retried after its lease expires")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "started": self._loop_task is not None,
+            "job_types": self.job_types(),
+            "running": sorted(self._running),
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+        }
+
+# Global runner instance
+_runner: Optional[JobRunner] = None
+
+def get_job_runner() -> JobRunner:
+    """Get or create the global job runner."""
+    global _runner
+    if _runner is None:
+        _runner = JobRunner()
+    return _runner
+
+__all__ = ["CANCELLED", "COMPLETED", "FAILED", "FINISHED", "JobCancelled", "JobContext", "JobQueue", "JobRunner",
+           "PENDING", "RUNNING", "get_job_runner"]
@@ -1,27 +1,66 @@
 # ml/main.py - FastAPI ML service with Gmail integration (v2.1)
 from __future__ import annotations
+# First, so the import-time profile covers everything below (see startup_profile.py)
+from startup_profile import get_startup_profile, lazy_import
+get_startup_profile().begin()
+
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, List, Set
-import joblib, pandas as pd, numpy as np
-import json, os, traceback, urllib.request, datetime
+from typing import IO, Optional, Dict, Any, List
+import numpy as np
+import json, os, time, traceback, datetime
+import asyncio
 import logging
-
-from pdf_parser import extract_text_from_pdf_bytes, parse_totals_from_text, parse_client_quote_from_text, determine_quote_type, parse_quote_lines_from_text
+import threading
+
+from pdf_parser import extract_text_from_pdf_bytes, parse_client_quote_from_text
+from pdf_pool import PdfSource, get_pdf_pool
+from extract_cache import get_extraction_cache
+from deadline import Deadline, DeadlineExceeded
+from document_analysis import DocumentAnalysis
+from supplier_registry import tenant_fingerprints
+from http_fetch import get_fetcher
+from model_registry import MODELS_DIR, ModelBundle, ModelNotFound, get_tenant_models, tenant_models_loaded
+from incremental import FULL, INCREMENTAL, quality_delta, training_mode, warm_start_forest, watermark
+from prediction_cache import feature_key, get_prediction_cache
+from fallback_stats import get_fallback_stats
+from training_data import CLIENT_QUOTE_FEATURES, get_training_data_loader
+import model_benchmark
+from training_snapshots import get_snapshot_store
+from jobs import JobContext, get_job_runner
+from worker_memory import memory_report
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Optional import - email training only works if database is available
-try:
-    from email_trainer import EmailTrainingWorkflow
-    EMAIL_TRAINING_AVAILABLE = True
-except ImportError as e:
-    print(f"[WARNING] Email training not available: {e}")
-    EmailTrainingWorkflow = None
-    EMAIL_TRAINING_AVAILABLE = False
+# Heavy libraries and optional subsystems are imported on first use, not at startup
+pd = lazy_import("pandas")
+WARM_START = os.getenv("ML_WARM_START", "1").lower() not in ("0", "false", "no")
+
+# Optional subsystem - email training (psycopg, Gmail) only works if the database is available
+_email_workflow = None
+_email_workflow_lock = threading.Lock()
+
+def email_training_workflow():
+    """EmailTrainingWorkflow, imported on first use; None if email training is not available."""
+    global _email_workflow
+    if _email_workflow is None:
+        with _email_workflow_lock:
+            if _email_workflow is None:
+                with get_startup_profile().step("import email_trainer"):
+                    try:
+                        from email_trainer import EmailTrainingWorkflow
+                        _email_workflow = EmailTrainingWorkflow
+                    except ImportError as e:
+                        print(f"[WARNING] Email training not available: {e}")
+                        _email_workflow = False
+    return _email_workflow or None
+
+def email_training_available() -> bool:
+    return email_training_workflow() is not None
 
 app = FastAPI(title="JoineryAI ML API v2.2")
 
@@ -39,113 +78,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-PRICE_PATH = "models/price_model.joblib"
-WIN_PATH   = "models/win_model.joblib"
-META_PATH  = "models/feature_meta.json"
-
-def load_model(path: str):
+def _warm_up():
+    """Load the models in the background once the port is bound, so the first request does not pay for it."""
+    profile = get_startup_profile()
     try:
-        if not os.path.exists(path):
-            return None
-        # Load with joblib and handle sklearn compatibility issues
-        import warnings
-        with warnings.catch_warnings():
-            warnings.filterwarnings("ignore", category=UserWarning)
-            warnings.filterwarnings("ignore", category=FutureWarning)
-            model = joblib.load(path)
-            # Test if model can make predictions (compatibility check)
-            if hasattr(model, 'predict'):
-                return model
-            else:
-                logger.warning(f"Model at {path} loaded but doesn't have predict method")
-                return None
+        with profile.step("load models"):
+            get_tenant_models()
     except Exception as e:
-        logger.error(f"Failed to load model from {path}: {e}")
-        traceback.print_exc()
-        return None
-
-price_model = load_model(PRICE_PATH)
-win_model   = load_model(WIN_PATH)
+        logger.error(f"Model warm-up failed: {e}")
+    profile.log_summary()
+
+@app.on_event("startup")
+async def _start_job_worker():
+    profile = get_startup_profile()
+    if os.getenv("DATABASE_URL"):
+        with profile.step("start job runner"):
+            get_job_runner().start()
+    profile.finish()
+    if WARM_START:
+        threading.Thread(target=_warm_up, name="model-warm-up", daemon=True).start()
+    else:
+        profile.log_summary()
 
-feature_meta: Dict[str, Any] = {}
-if os.path.exists(META_PATH):
-    try:
-        with open(META_PATH, "r") as f:
-            feature_meta = json.load(f) or {}
-    except Exception:
-        traceback.print_exc()
-        feature_meta = {}
+@app.on_event("shutdown")
+async def _shutdown_pdf_pool():
+    await get_job_runner().stop()
+    get_pdf_pool().shutdown()
+    get_fetcher().close()
 
-# ----------------- expected columns discovery -----------------
-def _walk_estimators(obj):
-    try:
-        from sklearn.pipeline import Pipeline
-        from sklearn.compose import ColumnTransformer
-    except Exception:
-        return
-    if str(type(obj)).endswith("Pipeline'>") or getattr(obj, "steps", None):
-        for _, step in getattr(obj, "steps", []):
-            yield step
-            for inner in _walk_estimators(step):
-                yield inner
-    if hasattr(obj, "transformers"):
-        try:
-            for _name, trans, _cols in obj.transformers:  # type: ignore[attr-defined]
-                yield trans
-                if hasattr(trans, "transformers"):
-                    for inner in _walk_estimators(trans):
-                        yield inner
-        except Exception:
-            pass
-
-def expected_columns_from_model(model) -> List[str]:
-    try:
-        from sklearn.compose import ColumnTransformer  # noqa
-    except Exception:
-        return []
-    cols: List[str] = []
-    for est in _walk_estimators(model):
-        if hasattr(est, "transformers"):
-            try:
-                for _name, _trans, _cols in est.transformers:  # type: ignore[attr-defined]
-                    if isinstance(_cols, (list, tuple, np.ndarray)):
-                        cols.extend([c for c in _cols if isinstance(c, str)])
-            except Exception:
-                continue
-    seen = set()
-    out: List[str] = []
-    for c in cols:
-        if c not in seen:
-            seen.add(c)
-            out.append(c)
-    return out
-
-meta_cols: List[str] = list(feature_meta.get("columns") or [])
-price_cols = expected_columns_from_model(price_model) if price_model else []
-win_cols   = expected_columns_from_model(win_model) if win_model else []
-
-def _ordered_union(primary: List[str], extra: List[str]) -> List[str]:
-    seen: Set[str] = set()
-    out: List[str] = []
-    for c in primary + extra:
-        if c not in seen:
-            seen.add(c)
-            out.append(c)
-    return out
-
-DEFAULT_BASE = ["area_m2", "materials_grade", "project_type", "lead_source", "region"]
-COLUMNS: List[str] = _ordered_union(meta_cols or DEFAULT_BASE, price_cols)
-COLUMNS = _ordered_union(COLUMNS, win_cols)
-
-NUMERIC_COLUMNS: Set[str] = set(feature_meta.get("numeric_columns") or [])
-CATEGORICAL_COLUMNS: Set[str] = set(feature_meta.get("categorical_columns") or [])
-if not NUMERIC_COLUMNS and not CATEGORICAL_COLUMNS:
-    numeric_hints = ("area", "num_", "days_", "value", "gbp", "amount", "count")
-    known_numerics = {"area_m2", "num_emails_thread", "days_to_first_reply", "quote_value_gbp"}
-    for col in COLUMNS:
-        if col in known_numerics or any(h in col.lower() for h in numeric_hints):
-            NUMERIC_COLUMNS.add(col)
-    CATEGORICAL_COLUMNS = set(c for c in COLUMNS if c not in NUMERIC_COLUMNS)
+# Models, column lists and compiled encoders are served as one immutable bundle
+# (see model_registry.py); read active_models() once per request.
+def active_models(tenant_id: Optional[str] = None) -> ModelBundle:
+    """The tenant's own model bundle if it has one, else the global bundle."""
+    return get_tenant_models().active(tenant_id)
 
 # ----------------- prediction schema + builder -----------------
 class QuoteIn(BaseModel):
@@ -155,31 +120,90 @@ class QuoteIn(BaseModel):
     lead_source: Optional[str] = None
     region: Optional[str] = "uk"
 
-def build_feature_row(q: QuoteIn) -> pd.DataFrame:
-    base = {
+def quote_feature_values(q: QuoteIn) -> Dict[str, Any]:
+    """Raw feature values of a quote; columns it does not set default to 0 / ""."""
+    return {
         "area_m2": float(q.area_m2),
         "materials_grade": q.materials_grade or "",
         "project_type": (q.project_type or ""),
         "lead_source": (q.lead_source or ""),
         "region": (q.region or "uk"),
     }
+
+def build_feature_row(q: QuoteIn, m: Optional[ModelBundle] = None) -> pd.DataFrame:
+    m = m or active_models()
+    base = quote_feature_values(q)
     row: Dict[str, Any] = {}
-    for col in COLUMNS:
+    for col in m.columns:
         if col in base:
             row[col] = base[col]
         else:
-            row[col] = 0 if col in NUMERIC_COLUMNS else ""
-    df = pd.DataFrame([row], columns=COLUMNS)
-    for col in NUMERIC_COLUMNS:
+            row[col] = 0 if col in m.numeric_columns else ""
+    df = pd.DataFrame([row], columns=list(m.columns))
+    for col in m.numeric_columns:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0)
-    for col in CATEGORICAL_COLUMNS:
+    for col in m.categorical_columns:
         if col in df.columns:
             df[col] = df[col].astype(str)
     return df
 
+def build_feature_frame(quotes: List[QuoteIn], m: Optional[ModelBundle] = None) -> pd.DataFrame:
+    """build_feature_row for many quotes at once: one column array per feature, same values and dtypes."""
+    m = m or active_models()
+    n = len(quotes)
+    base = {
+        "area_m2": np.fromiter((float(q.area_m2) for q in quotes), dtype=float, count=n),
+        "materials_grade": np.array([q.materials_grade or "" for q in quotes], dtype=object),
+        "project_type": np.array([q.project_type or "" for q in quotes], dtype=object),
+        "lead_source": np.array([q.lead_source or "" for q in quotes], dtype=object),
+        "region": np.array([q.region or "uk" for q in quotes], dtype=object),
+    }
+    data: Dict[str, Any] = {}
+    for col in m.columns:
+        values = base.get(col)
+        if col in m.numeric_columns:
+            if values is None:
+                data[col] = np.zeros(n, dtype=np.int64)
+            else:
+                data[col] = np.nan_to_num(pd.to_numeric(values, errors="coerce").astype(float), nan=0.0)
+        elif values is None:
+            data[col] = np.full(n, "", dtype=object)
+        else:
+            data[col] = values.astype(str).astype(object) if col in m.categorical_columns else values
+    return pd.DataFrame(data, columns=list(m.columns))
+
+# Fallback pricing rules, shared by /predict and /predict-batch
+FALLBACK_PRICE_PER_M2 = {"Premium": 800.0, "Standard": 600.0}
+FALLBACK_BASIC_PRICE_PER_M2 = 400.0
+TRAINING_STATS_AREA_M2 = 30.0  # training averages are assumed to describe a ~30m² project
+TRAINING_STATS_GRADE_FACTOR = {"Premium": 1.3, "Basic": 0.7}
+
+def fallback_prices(area: np.ndarray, grades: np.ndarray) -> np.ndarray:
+    """Area x per-m² rate for the materials grade."""
+    rate = np.full(len(grades), FALLBACK_BASIC_PRICE_PER_M2)
+    for grade, value in FALLBACK_PRICE_PER_M2.items():
+        rate[grades == grade] = value
+    return area * rate
+
+def fallback_win_probabilities(prices: np.ndarray, grades: np.ndarray) -> np.ndarray:
+    """Win probability by price band; premium work is harder to win."""
+    win = np.select([prices < 5000, prices < 15000], [0.7, 0.5], default=0.3)
+    return np.where(grades == "Premium", win * 0.8, win)
+
+def training_stats_prices(avg_total: float, area: np.ndarray, grades: np.ndarray) -> np.ndarray:
+    """Scale the average training total by area and materials grade."""
+    factor = np.ones(len(grades))
+    for grade, value in TRAINING_STATS_GRADE_FACTOR.items():
+        factor[grades == grade] = value
+    return avg_total * (area / TRAINING_STATS_AREA_M2) * factor
+
 def models_status():
-    return {"price": bool(price_model), "win": bool(win_model)}
+    # Never wait for the warm-up: report models as unavailable until they are loaded
+    if not tenant_models_loaded():
+        return {"price": False, "win": False}
+    m = active_models()
+    return {"price": bool(m.price_model), "win": bool(m.win_model)}
 
 # ----------------- routes: health/meta/predict -----------------
 @app.get("/")
@@ -188,13 +212,45 @@ def root():
 
 @app.get("/health")
 def health():
-    """Health check endpoint showing service status and model availability"""
+    """Health check endpoint showing service status and model availability (answers while models load)"""
     return {
         "status": "ok",
-        "models": {
-            "price": price_model is not None,
-            "win": win_model is not None,
-        }
+        "models": models_status(),
+        "models_loading": not tenant_models_loaded(),
+    }
+
+@app.get("/startup-profile")
+def startup_profile():
+    """Time and memory per import, init step and lazy load of this worker (see startup_profile.py)."""
+    return {"ok": True, **get_startup_profile().report()}
+
+async def _supplier_fingerprints(tenant_id: Optional[str]) -> List[Dict[str, Any]]:
+    """A tenant's own supplier fingerprints for the supplier parser registry (DB read off the event loop)."""
+    if not tenant_id:
+        return []
+    return await asyncio.to_thread(tenant_fingerprints, tenant_id)
+
+async def _parse_pdf_bytes(pdf: PdfSource, deadline: Deadline, tenant_id: Optional[str] = None) -> Dict[str, Any]:
+    """Extract, classify and parse a PDF within the request deadline (shared by /parse branches)."""
+    doc = DocumentAnalysis(pdf, deadline_at=deadline.at, fingerprints=await _supplier_fingerprints(tenant_id))
+    text = await doc.text()
+
+    quote_type, parsed = "unknown", None
+    try:
+        quote_type = await doc.quote_type()
+        if quote_type == "supplier" or quote_type == "unknown":
+            parsed = await doc.supplier()
+        else:
+            parsed = await doc.client()
+    except DeadlineExceeded:
+        pass
+
+    return {
+        "ok": parsed is not None,
+        "text_chars": len(text),
+        "quote_type": quote_type,
+        "parsed": parsed,
+        **doc.status(),
     }
 
 @app.post("/parse")
@@ -203,6 +259,8 @@ async def parse_pdf_legacy(req: Request):
     Legacy /parse endpoint for backwards compatibility.
     Accepts multipart file upload or JSON body with URL.
     Returns parsed PDF data with line items.
+    An optional X-Deadline-Ms header (or deadlineMs field) bounds the work;
+    see _parse_pdf_bytes for the truncated / stages_completed fields.
     """
     from fastapi import UploadFile, File, Form
     import io
@@ -212,49 +270,24 @@ async def parse_pdf_legacy(req: Request):
     # Handle file upload
     if "multipart/form-data" in content_type:
         form_data = await req.form()
+        deadline = Deadline.from_request(req.headers, form_data)
         file = form_data.get("file")
         if not file:
             raise HTTPException(status_code=422, detail="missing file in form data")
         
         pdf_bytes = await file.read()
-        text = extract_text_from_pdf_bytes(pdf_bytes) or ""
-        
-        # Parse the PDF text
-        quote_type = determine_quote_type(text)
-        if quote_type == "supplier" or quote_type == "unknown":
-            parsed = parse_quote_lines_from_text(text)
-        else:
-            parsed = parse_client_quote_from_text(text)
-        
-        return {
-            "ok": True,
-            "text_chars": len(text),
-            "quote_type": quote_type,
-            "parsed": parsed,
-        }
+        return await _parse_pdf_bytes(pdf_bytes, deadline, form_data.get("tenantId"))
     
     # Handle JSON body with URL
     try:
         body = await req.json()
+        deadline = Deadline.from_request(req.headers, body)
         url = body.get("url")
         if not url:
             raise HTTPException(status_code=422, detail="missing url or file")
         
-        pdf_bytes = _http_get_bytes(url)
-        text = extract_text_from_pdf_bytes(pdf_bytes) or ""
-        
-        quote_type = determine_quote_type(text)
-        if quote_type == "supplier" or quote_type == "unknown":
-            parsed = parse_quote_lines_from_text(text)
-        else:
-            parsed = parse_client_quote_from_text(text)
-        
-        return {
-            "ok": True,
-            "text_chars": len(text),
-            "quote_type": quote_type,
-            "parsed": parsed,
-        }
+        pdf = await _download(url, timeout=deadline.cap(30))
+        return await _parse_pdf_bytes(pdf, deadline, body.get("tenantId"))
     except:
         raise HTTPException(status_code=422, detail="Request must be multipart/form-data with file or JSON with url")
 
@@ -263,11 +296,13 @@ async def parse_quote_upload(req: Request):
     """
     Upload endpoint that accepts PDF file uploads.
     Matches the API's callMlWithUpload() expectations.
-    Returns parsed supplier quote data.
+    Returns parsed supplier quote data, plus "truncated" / "stages_completed"
+    when an X-Deadline-Ms header (or deadlineMs form field) cut the work short.
     """
     from fastapi import UploadFile
     
     form_data = await req.form()
+    deadline = Deadline.from_request(req.headers, form_data)
     file = form_data.get("file")
     
     if not file:
@@ -276,22 +311,35 @@ async def parse_quote_upload(req: Request):
     pdf_bytes = await file.read()
     filename = file.filename if hasattr(file, 'filename') else "uploaded.pdf"
     
-    text = extract_text_from_pdf_bytes(pdf_bytes) or ""
+    doc = DocumentAnalysis(pdf_bytes, deadline_at=deadline.at,
+                           fingerprints=await _supplier_fingerprints(form_data.get("tenantId")))
+    text = await doc.text()
     if not text.strip():
         return {
             "ok": False,
             "message": "No text extracted from PDF",
             "filename": filename,
+            **doc.status(),
         }
     
     # Parse as supplier quote
-    parsed = parse_quote_lines_from_text(text)
+    try:
+        parsed = await doc.supplier()
+    except DeadlineExceeded:
+        return {
+            "ok": False,
+            "message": "Deadline reached before parsing finished",
+            "filename": filename,
+            "text_chars": len(text),
+            **doc.status(),
+        }
     
     return {
         "ok": True,
         "filename": filename,
         "text_chars": len(text),
         "parsed": parsed,
+        **doc.status(),
     }
 
 @app.post("/debug-pdf-text-extraction")
@@ -329,7 +377,7 @@ def debug_pdf_text_extraction():
             os.environ['GMAIL_CLIENT_SECRET'] = os.getenv('GMAIL_CLIENT_SECRET', '')
         
         # Initialize workflow and get the exact same email
-        workflow = EmailTrainingWorkflow(db_url, tenant_id)
+        workflow = email_training_workflow()(db_url, tenant_id)
         workflow.setup_email_service("gmail", gmail_credentials)
         
         # Search for the specific email
@@ -1297,15 +1345,34 @@ async def debug_attachment_processing(req: Request):
 
 @app.get("/meta")
 def meta():
+    m = active_models()
     return {
         "ok": True,
-        "columns": COLUMNS,
-        "numeric_columns": sorted(list(NUMERIC_COLUMNS)),
-        "categorical_columns": sorted(list(CATEGORICAL_COLUMNS)),
-        "has_meta": bool(feature_meta),
-        "models": models_status(),
+        "model_version": m.version,
+        "columns": list(m.columns),
+        "numeric_columns": sorted(list(m.numeric_columns)),
+        "categorical_columns": sorted(list(m.categorical_columns)),
+        "has_meta": bool(m.feature_meta),
+        "models": {"price": bool(m.price_model), "win": bool(m.win_model)},
+        "compiled_encoders": {"price": m.price_fast is not None, "win": m.win_fast is not None},
+        "flat_trees": {name: (getattr(fast.estimator, "kind", None) if fast else None)
+                       for name, fast in (("price", m.price_fast), ("win", m.win_fast))},
+        "pdf_pool": get_pdf_pool().status(),
+        "extraction_cache": (get_extraction_cache().stats() if get_extraction_cache() else {"enabled": False}),
+        "http_fetch": get_fetcher().stats(),
+        "prediction_cache": get_prediction_cache().stats(),
+        "tenant_models": get_tenant_models().stats(),
+        "fallback_stats": get_fallback_stats().stats(),
+        "training_snapshots": get_snapshot_store().stats(),
+        "jobs": get_job_runner().status(),
     }
 
+@app.get("/memory")
+def memory():
+    """Resident vs shared memory per worker, including the memory-mapped model arrays (see worker_memory.py)."""
+    m = active_models()
+    return {"ok": True, "model_version": m.version, "shared_models": m.shared, **memory_report(MODELS_DIR)}
+
 @app.post("/predict")
 async def predict(req: Request):
     """
@@ -1319,115 +1386,90 @@ async def predict(req: Request):
         raise HTTPException(status_code=422, detail=f"Validation failed: {e}")
 
     # If models are loaded, use them
-    if price_model and win_model:
+    tenant_id = payload.get("tenantId") or payload.get("tenant_id")
+    # A cold tenant loads its models from disk; keep that off the event loop
+    m = await asyncio.to_thread(active_models, tenant_id)
+    if m.active:
+        values = quote_feature_values(q)
+        cache = get_prediction_cache()
+        cache_key = feature_key(values, m.columns, m.numeric_columns)
+        cached = cache.get(m.version, cache_key)
+        if cached is not None:
+            price, win_prob = cached
+            return {
+                "predicted_price": round(price, 2),
+                "win_probability": round(win_prob, 3),
+                "columns_used": list(m.columns),
+                "model_status": "active"
+            }
         try:
-            X = build_feature_row(q)
+            X = None if m.price_fast and m.win_fast else build_feature_row(q, m)
+            model_ok = True
             
             # Enhanced error handling for model predictions
             try:
-                price = float(price_model.predict(X)[0])
+                price = float(m.price_fast.predict(values)[0] if m.price_fast else m.price_model.predict(X)[0])
             except Exception as model_error:
+                model_ok = False
                 logger.error(f"Price model prediction failed: {model_error}")
                 # Fallback: simple area-based pricing
-                area = q.area_m2
-                base_price_per_m2 = 800 if q.materials_grade == "Premium" else 600 if q.materials_grade == "Standard" else 400
-                price = area * base_price_per_m2
-                logger.info(f"Using fallback pricing: {area} m² × £{base_price_per_m2} = £{price}")
+                price = float(fallback_prices(np.array([q.area_m2]), np.array([q.materials_grade]))[0])
+                logger.info(f"Using fallback pricing: {q.area_m2} m² ({q.materials_grade}) = £{price}")
             
             try:
-                if hasattr(win_model, "predict_proba"):
-                    win_prob = float(win_model.predict_proba(X)[0][1])
+                if hasattr(m.win_model, "predict_proba"):
+                    win_prob = float(m.win_fast.predict_proba(values)[0][1] if m.win_fast else m.win_model.predict_proba(X)[0][1])
                 else:
-                    win_pred = float(win_model.predict(X)[0])
+                    win_pred = float(m.win_fast.predict(values)[0] if m.win_fast else m.win_model.predict(X)[0])
                     win_prob = float(max(0.0, min(1.0, win_pred)))
             except Exception as model_error:
+                model_ok = False
                 logger.error(f"Win model prediction failed: {model_error}")
                 # Fallback: simple probability based on price range and materials
-                if price < 5000:
-                    win_prob = 0.7
-                elif price < 15000:
-                    win_prob = 0.5
-                else:
-                    win_prob = 0.3
-                if q.materials_grade == "Premium":
-                    win_prob *= 0.8  # Premium is harder to win
+                win_prob = float(fallback_win_probabilities(np.array([price]), np.array([q.materials_grade]))[0])
                 logger.info(f"Using fallback win probability: {win_prob}")
                     
         except Exception as e:
             traceback.print_exc()
             raise HTTPException(status_code=500, detail=f"predict failed: {e}")
 
+        if model_ok:
+            cache.put(m.version, cache_key, (price, win_prob))
         return {
             "predicted_price": round(price, 2),
             "win_probability": round(win_prob, 3),
-            "columns_used": COLUMNS,
+            "columns_used": list(m.columns),
             "model_status": "active"
         }
     
     # Models not loaded - use training data statistics
     logger.info("Models not loaded, using training data statistics for prediction")
     
-    if EMAIL_TRAINING_AVAILABLE:
+    if email_training_available():
         try:
-            from db_config import get_db_manager
-            
             # Get average pricing from training data
-            tenant_id = payload.get("tenantId") or payload.get("tenant_id")
-            
-            db_manager = get_db_manager()
-            conn = db_manager.get_connection()
-            with conn.cursor() as cur:
-                # Get average estimated_total from training data
-                cur.execute("""
-                    SELECT 
-                        AVG(estimated_total) as avg_total,
-                        COUNT(*) as count,
-                        AVG(confidence) as avg_confidence
-                    FROM ml_training_data
-                    WHERE estimated_total > 0
-                    AND (tenant_id = %s OR %s IS NULL)
-                """, (tenant_id, tenant_id))
+            stats = await asyncio.to_thread(get_fallback_stats().get, tenant_id)
+            if stats:
+                price = float(training_stats_prices(stats["avg_total"], np.array([q.area_m2]), np.array([q.materials_grade]))[0])
+                sample_count = stats["count"]
+                logger.info(f"Using training data average: £{stats['avg_total']} from {sample_count} examples, adjusted to £{price} for {q.area_m2}m²")
                 
-                result = cur.fetchone()
-                if result and result[0]:
-                    avg_total = float(result[0])
-                    sample_count = int(result[1])
-                    avg_confidence = float(result[2]) if result[2] else 0.5
-                    
-                    # Adjust based on area if provided
-                    area = q.area_m2
-                    # Assume average is for ~30m² project
-                    assumed_avg_area = 30.0
-                    price = avg_total * (area / assumed_avg_area)
-                    
-                    # Adjust for materials grade
-                    if q.materials_grade == "Premium":
-                        price *= 1.3
-                    elif q.materials_grade == "Basic":
-                        price *= 0.7
-                    
-                    logger.info(f"Using training data average: £{avg_total} from {sample_count} examples, adjusted to £{price} for {area}m²")
-                    
-                    return {
-                        "predicted_price": round(price, 2),
-                        "win_probability": round(avg_confidence, 3),
-                        "model_status": "training_data",
-                        "training_samples": sample_count,
-                        "note": f"Prediction based on {sample_count} training examples (models not yet trained)"
-                    }
-            
-            conn.close()
+                return {
+                    "predicted_price": round(price, 2),
+                    "win_probability": round(stats["avg_confidence"], 3),
+                    "model_status": "training_data",
+                    "training_samples": sample_count,
+                    "note": f"Prediction based on {sample_count} training examples (models not yet trained)"
+                }
         except Exception as e:
             logger.error(f"Failed to get training data statistics: {e}")
             traceback.print_exc()
     
     # Final fallback: simple area-based pricing
-    area = q.area_m2
-    base_price_per_m2 = 800 if q.materials_grade == "Premium" else 600 if q.materials_grade == "Standard" else 400
-    price = area * base_price_per_m2
+    price = float(fallback_prices(np.array([q.area_m2]), np.array([q.materials_grade]))[0])
     win_prob = 0.5
     
-    logger.info(f"Using simple fallback: {area} m² × £{base_price_per_m2} = £{price}")
+    logger.info(f"Using simple fallback: {q.area_m2} m² ({q.materials_grade}) = £{price}")
     
     return {
         "predicted_price": round(price, 2),
@@ -1436,6 +1478,104 @@ async def predict(req: Request):
         "note": "No trained models or training data available - using simple area-based estimate"
     }
 
+# ----------------- batch prediction -----------------
+PREDICT_BATCH_MAX = int(os.getenv("ML_PREDICT_BATCH_MAX", "1000"))
+
+def _score_batch(quotes: List[QuoteIn], area: np.ndarray, grades: np.ndarray, m: ModelBundle):
+    """One predict call per model for the whole batch; the fallback rules apply if a model call fails."""
+    values = [quote_feature_values(q) for q in quotes]
+    X = None if m.price_fast and m.win_fast else build_feature_frame(quotes, m)
+    status = "active"
+    try:
+        prices = np.asarray(m.price_fast.predict_many(values) if m.price_fast else m.price_model.predict(X), dtype=float)
+    except Exception as model_error:
+        logger.error(f"Price model batch prediction failed: {model_error}")
+        prices = fallback_prices(area, grades)
+        status = "partial_fallback"
+    try:
+        if hasattr(m.win_model, "predict_proba"):
+            win = np.asarray(m.win_fast.predict_proba_many(values) if m.win_fast else m.win_model.predict_proba(X), dtype=float)[:, 1]
+        else:
+            win = np.clip(np.asarray(m.win_fast.predict_many(values) if m.win_fast else m.win_model.predict(X), dtype=float), 0.0, 1.0)
+    except Exception as model_error:
+        logger.error(f"Win model batch prediction failed: {model_error}")
+        win = fallback_win_probabilities(prices, grades)
+        status = "partial_fallback"
+    return prices, win, status
+
+@app.post("/predict-batch")
+async def predict_batch(req: Request):
+    """
+    Predict price and win probability for many questionnaires in one call.
+    Body: { tenantId?: string, items: [{ area_m2, materials_grade, project_type?, lead_source?, region? }, ...] }
+    (a bare list of items is accepted too).
+
+    Builds one feature frame and calls each model once, with the same fallbacks as /predict applied
+    to the whole batch. Results come back in input order; an item that fails validation gets
+    { index, error } without affecting the others.
+    """
+    try:
+        payload = await req.json()
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Invalid JSON: {e}")
+    items = payload if isinstance(payload, list) else (payload or {}).get("items")
+    tenant_id = None if isinstance(payload, list) else (payload.get("tenantId") or payload.get("tenant_id"))
+    if not isinstance(items, list):
+        raise HTTPException(status_code=422, detail="items must be a list")
+    if len(items) > PREDICT_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"too many items ({len(items)} > {PREDICT_BATCH_MAX})")
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    quotes: List[QuoteIn] = []
+    positions: List[int] = []
+    for i, item in enumerate(items):
+        try:
+            quotes.append(QuoteIn(**item))
+            positions.append(i)
+        except Exception as e:
+            results[i] = {"index": i, "error": f"Validation failed: {e}"}
+
+    m = await asyncio.to_thread(active_models, tenant_id)
+    model_status = "active" if m.active else "fallback"
+    extra: Dict[str, Any] = {}
+    if quotes:
+        area = np.fromiter((float(q.area_m2) for q in quotes), dtype=float, count=len(quotes))
+        grades = np.array([q.materials_grade for q in quotes], dtype=object)
+        if m.active:
+            prices, win, model_status = await asyncio.to_thread(_score_batch, quotes, area, grades, m)
+        else:
+            stats = None
+            if email_training_available():
+                try:
+                    stats = await asyncio.to_thread(get_fallback_stats().get, tenant_id)
+                except Exception as e:
+                    logger.error(f"Failed to get training data statistics: {e}")
+            if stats:
+                prices = training_stats_prices(stats["avg_total"], area, grades)
+                win = np.full(len(quotes), stats["avg_confidence"])
+                model_status = "training_data"
+                extra["training_samples"] = stats["count"]
+            else:
+                prices = fallback_prices(area, grades)
+                win = np.full(len(quotes), 0.5)
+        for k, i in enumerate(positions):
+            results[i] = {
+                "index": i,
+                "predicted_price": round(float(prices[k]), 2),
+                "win_probability": round(float(win[k]), 3),
+            }
+
+    return {
+        "ok": True,
+        "model_status": model_status,
+        "count": len(items),
+        "scored": len(quotes),
+        "failed": len(items) - len(quotes),
+        "columns_used": list(m.columns),
+        **extra,
+        "results": results,
+    }
+
 # ----------------- supplier→client quote builder -----------------
 def build_client_quote_from_supplier_parsed(
     supplier_parsed: Dict[str, Any],
@@ -1682,10 +1822,16 @@ def predict_lines(payload: PredictLinesIn):
         raise HTTPException(status_code=500, detail=f"predict-lines failed: {e}")
 
 # ----------------- parsing helpers -----------------
-def _http_get_bytes(url: str, timeout: int = 30) -> bytes:
-    req = urllib.request.Request(url, headers={"User-Agent": "JoineryAI-ML/1.0"})
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        return resp.read()
+def _http_get_bytes(url: str, timeout: float = 30) -> bytes:
+    """Blocking download through the shared pooled fetcher (see http_fetch.py)."""
+    return get_fetcher().fetch_bytes(url, timeout)
+
+async def _download(url: str, timeout: float = 30) -> IO[bytes]:
+    """
+    Download off the event loop through the shared pooled fetcher. Returns the spooled
+    body, which DocumentAnalysis hands to the PDF pool as a file (and closes).
+    """
+    return await asyncio.to_thread(get_fetcher().fetch, url, timeout)
 
 def _iso(dt_str: Optional[str]) -> Optional[str]:
     if not dt_str:
@@ -1714,6 +1860,7 @@ class TrainItem(BaseModel):
 class TrainPayload(BaseModel):
     tenantId: str
     items: List[TrainItem] = []
+    background: bool = False  # queue as a job and return its id (see /jobs)
 
 @app.post("/parse-quote")
 async def parse_quote(req: Request):
@@ -1730,18 +1877,13 @@ async def parse_quote(req: Request):
     quoted_at = _iso(body.get("quotedAt"))
 
     try:
-        pdf_bytes = _http_get_bytes(url)
+        pdf = await _download(url)
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"download_failed: {e}")
 
-    text = extract_text_from_pdf_bytes(pdf_bytes) or ""
-    parsed = parse_totals_from_text(text) if text else {
-        "currency": None,
-        "lines": [],
-        "detected_totals": [],
-        "estimated_total": None,
-        "confidence": 0,
-    }
+    doc = DocumentAnalysis(pdf, fingerprints=await _supplier_fingerprints(body.get("tenantId")))
+    text = await doc.text()
+    parsed = await doc.supplier()
 
     return {
         "ok": True,
@@ -1751,111 +1893,245 @@ async def parse_quote(req: Request):
         "parsed": parsed,
     }
 
-class ProcessQuoteIn(BaseModel):
-    url: str
-    filename: Optional[str] = None
-    quotedAt: Optional[str] = None
+class QuoteOptionsIn(BaseModel):
     markupPercent: float = 20.0
     vatPercent: float = 20.0
     markupDelivery: bool = False
     amalgamateDelivery: bool = True
     clientDeliveryGBP: Optional[float] = None
     clientDeliveryDescription: Optional[str] = None
+    deadlineMs: Optional[float] = None
+    tenantId: Optional[str] = None
 
-@app.post("/process-quote")
-async def process_quote(payload: ProcessQuoteIn):
-    """
-    Classify a PDF as supplier vs client, parse accordingly, and for supplier quotes
-    return a client-facing quote with markup applied.
-
-    Body: { url, filename?, quotedAt?, markupPercent?, vatPercent?, markupDelivery? }
-    """
-    try:
-        pdf_bytes = _http_get_bytes(payload.url)
-    except Exception as e:
-        raise HTTPException(status_code=404, detail=f"download_failed: {e}")
+class ProcessQuoteIn(QuoteOptionsIn):
+    url: str
+    filename: Optional[str] = None
+    quotedAt: Optional[str] = None
 
-    text = extract_text_from_pdf_bytes(pdf_bytes) or ""
+async def _process_quote_pdf(pdf: PdfSource, opts: QuoteOptionsIn, deadline: Deadline,
+                             fingerprints: List[Dict[str, Any]], filename: Optional[str],
+                             quoted_at: Optional[str]) -> Dict[str, Any]:
+    """Classify and parse one downloaded PDF (shared by /process-quote and /process-quotes/batch)."""
+    doc = DocumentAnalysis(pdf, deadline_at=deadline.at, fingerprints=fingerprints)
+    text = await doc.text()
     if not text.strip():
         return {
             "ok": False,
             "message": "No text extracted from PDF",
-            "filename": payload.filename or "attachment.pdf",
+            "filename": filename or "attachment.pdf",
             "quote_type": "unknown",
+            **doc.status(),
         }
 
-    quote_type = determine_quote_type(text)
-
-    # If unknown, try both parsers and choose by signal strength
-    if quote_type == "unknown":
-        supplier_try = parse_quote_lines_from_text(text)
-        client_try = parse_client_quote_from_text(text)
-        supplier_signal = len(supplier_try.get("lines", []))
-        client_signal = float(client_try.get("confidence", 0.0))
-        quote_type = "supplier" if supplier_signal >= 1 else ("client" if client_signal >= 0.2 else "unknown")
-
-    if quote_type == "supplier":
-        supplier_parsed = parse_quote_lines_from_text(text)
+    quote_type = "unknown"
+    supplier_parsed = client_parsed = None
+    try:
+        # Unknown quotes are settled by running both parsers; the winner is not parsed again
+        quote_type = await doc.resolved_type()
+        if quote_type == "supplier":
+            supplier_parsed = await doc.supplier()
+        elif quote_type == "client":
+            client_parsed = await doc.client()
+    except DeadlineExceeded:
+        pass
+    status = doc.status()
+
+    if quote_type == "supplier" and supplier_parsed is not None:
         client_quote = build_client_quote_from_supplier_parsed(
             supplier_parsed,
-            markup_percent=payload.markupPercent,
-            vat_percent=payload.vatPercent,
-            markup_delivery=payload.markupDelivery,
-            amalgamate_delivery=payload.amalgamateDelivery,
-            client_delivery_gbp=payload.clientDeliveryGBP,
-            client_delivery_description=payload.clientDeliveryDescription,
+            markup_percent=opts.markupPercent,
+            vat_percent=opts.vatPercent,
+            markup_delivery=opts.markupDelivery,
+            amalgamate_delivery=opts.amalgamateDelivery,
+            client_delivery_gbp=opts.clientDeliveryGBP,
+            client_delivery_description=opts.clientDeliveryDescription,
         )
         return {
             "ok": True,
-            "filename": payload.filename or "attachment.pdf",
-            "quotedAt": _iso(payload.quotedAt),
+            "filename": filename or "attachment.pdf",
+            "quotedAt": _iso(quoted_at),
             "quote_type": "supplier",
             "supplier_parsed": supplier_parsed,
             "client_quote": client_quote,
+            **status,
         }
-    elif quote_type == "client":
-        client_parsed = parse_client_quote_from_text(text)
+    elif quote_type == "client" and client_parsed is not None:
         return {
             "ok": True,
-            "filename": payload.filename or "attachment.pdf",
-            "quotedAt": _iso(payload.quotedAt),
+            "filename": filename or "attachment.pdf",
+            "quotedAt": _iso(quoted_at),
             "quote_type": "client",
             "training_candidate": client_parsed,
+            **status,
         }
     else:
-        # Unknown - return diagnostics
+        # Unknown (or out of time before parsing finished) - return diagnostics
         return {
             "ok": True,
-            "filename": payload.filename or "attachment.pdf",
-            "quotedAt": _iso(payload.quotedAt),
-            "quote_type": "unknown",
+            "filename": filename or "attachment.pdf",
+            "quotedAt": _iso(quoted_at),
+            "quote_type": quote_type,
             "raw_text_length": len(text),
-            "message": "Could not confidently classify quote type",
+            "message": ("Deadline reached before parsing finished" if "parse" not in status["stages_completed"]
+                        else "Could not confidently classify quote type"),
+            **status,
         }
 
+@app.post("/process-quote")
+async def process_quote(payload: ProcessQuoteIn, request: Request):
+    """
+    Classify a PDF as supplier vs client, parse accordingly, and for supplier quotes
+    return a client-facing quote with markup applied.
+
+    Body: { url, filename?, quotedAt?, markupPercent?, vatPercent?, markupDelivery?, deadlineMs?, tenantId? }
+    The time budget may also be sent as an X-Deadline-Ms header. Every response carries
+    "truncated" and "stages_completed"; when the deadline hits, the best partial result
+    (e.g. text-layer lines without OCR) is returned instead of an error.
+    """
+    deadline = Deadline.from_request(request.headers, {"deadlineMs": payload.deadlineMs})
+    try:
+        pdf = await _download(payload.url, timeout=deadline.cap(30))
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=f"download_failed: {e}")
+
+    fingerprints = await _supplier_fingerprints(payload.tenantId)
+    return await _process_quote_pdf(pdf, payload, deadline, fingerprints, payload.filename, payload.quotedAt)
+
+# ----------------- batch processing -----------------
+# Items processed at once per batch request (extraction/parsing also queue on the worker pool)
+BATCH_CONCURRENCY = int(os.getenv("ML_BATCH_CONCURRENCY", str(max(2, get_pdf_pool().workers * 2))))
+# Downloads in flight at once per batch request
+BATCH_DOWNLOADS = int(os.getenv("ML_BATCH_DOWNLOADS", "8"))
+BATCH_MAX_ITEMS = int(os.getenv("ML_BATCH_MAX_ITEMS", "100"))
+
+class BatchQuoteItemIn(BaseModel):
+    url: str
+    filename: Optional[str] = None
+    quotedAt: Optional[str] = None
+
+class ProcessQuotesBatchIn(QuoteOptionsIn):
+    items: List[BatchQuoteItemIn] = []
+    concurrency: Optional[int] = None
+
+@app.post("/process-quotes/batch")
+async def process_quotes_batch(request: Request):
+    """
+    /process-quote for many PDFs in one call, streamed back as NDJSON.
+
+    JSON body: { items: [{url, filename?, quotedAt?}], concurrency?, ...process-quote options }
+    or multipart/form-data with one or more "files" plus the same options as form fields.
+
+    Downloads run concurrently (ML_BATCH_DOWNLOADS) and at most `concurrency` items
+    (capped by ML_BATCH_CONCURRENCY) are extracted/parsed at once. One line is written
+    per item as it finishes, in completion order, carrying its "index" in the request:
+    the /process-quote response, or {"index", "ok": false, "error"} for a failed item.
+    A final {"done": true, ...} line summarises the batch. The deadline covers the batch.
+    """
+    content_type = request.headers.get("content-type", "")
+    jobs: List[Dict[str, Any]] = []
+    if "multipart/form-data" in content_type:
+        form = await request.form()
+        uploads = [f for f in form.getlist("files") + form.getlist("file") if hasattr(f, "read")]
+        fields = {k: v for k, v in form.items() if not hasattr(v, "read")}
+        try:
+            opts = ProcessQuotesBatchIn(**fields)
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=f"invalid options: {e}")
+        for upload in uploads:
+            jobs.append({"filename": getattr(upload, "filename", None), "quotedAt": None, "upload": upload})
+    else:
+        try:
+            opts = ProcessQuotesBatchIn(**(await request.json()))
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=f"invalid batch body: {e}")
+        for item in opts.items:
+            jobs.append({"filename": item.filename, "quotedAt": item.quotedAt, "url": item.url})
+
+    if not jobs:
+        raise HTTPException(status_code=422, detail="no items or files")
+    if len(jobs) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"batch too large (max {BATCH_MAX_ITEMS} items)")
+
+    deadline = Deadline.from_request(request.headers, {"deadlineMs": opts.deadlineMs})
+    fingerprints = await _supplier_fingerprints(opts.tenantId)
+    concurrency = max(1, min(opts.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY))
+    process_slots = asyncio.Semaphore(concurrency)
+    download_slots = asyncio.Semaphore(BATCH_DOWNLOADS)
+
+    async def run(index: int, job: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            if "upload" in job:
+                pdf = await job["upload"].read()
+            else:
+                async with download_slots:
+                    try:
+                        pdf = await _download(job["url"], timeout=deadline.cap(30))
+                    except Exception as e:
+                        return {"index": index, "ok": False, "filename": job["filename"], "error": f"download_failed: {e}"}
+            async with process_slots:
+                result = await _process_quote_pdf(pdf, opts, deadline, fingerprints, job["filename"], job["quotedAt"])
+        except Exception as e:
+            logger.warning(f"Batch item {index} failed: {e}")
+            return {"index": index, "ok": False, "filename": job["filename"], "error": str(e)}
+        return {"index": index, **result, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    async def stream():
+        batch_started = time.perf_counter()
+        tasks = [asyncio.ensure_future(run(i, job)) for i, job in enumerate(jobs)]
+        ok = failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                if line.get("ok"):
+                    ok += 1
+                else:
+                    failed += 1
+                yield json.dumps(line, default=str) + "\n"
+            yield json.dumps({
+                "done": True,
+                "count": len(jobs),
+                "ok": ok,
+                "failed": failed,
+                "concurrency": concurrency,
+                "elapsed_ms": round((time.perf_counter() - batch_started) * 1000, 1),
+            }) + "\n"
+        finally:
+            # Client went away (or the stream ended): stop anything still running
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.post("/train")
 async def train(payload: TrainPayload):
     """
     Process supplier quotes and store them as training examples.
     Can be called with uploaded files or email attachments.
     Returns stats and stores examples in database for future model training.
+    With background=true the work runs as a "train" job and the job is returned.
     """
-    if not EMAIL_TRAINING_AVAILABLE:
+    if payload.background:
+        return await _submit_job(payload.tenantId, "train", payload.model_dump(exclude={"background"}))
+    return await _train(payload)
+
+async def _train(payload: TrainPayload, job: Optional[JobContext] = None) -> Dict[str, Any]:
+    pool = get_pdf_pool()
+    fingerprints = await _supplier_fingerprints(payload.tenantId)
+
+    if not email_training_available():
         # Fall back to simple processing without database storage
         ok = 0
         fails: List[Dict[str, Any]] = []
         samples: List[Dict[str, Any]] = []
 
-        for item in payload.items:
+        for i, item in enumerate(payload.items):
+            if job:
+                job.progress(i / len(payload.items), f"Processing {item.filename or item.url} ({i + 1}/{len(payload.items)})")
             try:
-                pdf_bytes = _http_get_bytes(item.url)
-                text = extract_text_from_pdf_bytes(pdf_bytes) or ""
-                parsed = parse_quote_lines_from_text(text) if text else {
-                    "currency": None,
-                    "lines": [],
-                    "estimated_total": None,
-                    "confidence": 0,
-                }
+                doc = DocumentAnalysis(await _download(item.url), fingerprints=fingerprints, pool=pool)
+                text = await doc.text()
+                parsed = await doc.supplier()
                 ok += 1
 
                 if len(samples) < 5:
@@ -1892,10 +2168,12 @@ async def train(payload: TrainPayload):
     samples: List[Dict[str, Any]] = []
     training_records: List[Dict[str, Any]] = []
 
-    for item in payload.items:
+    for i, item in enumerate(payload.items):
+        if job:
+            job.progress(i / len(payload.items), f"Processing {item.filename or item.url} ({i + 1}/{len(payload.items)})")
         try:
-            pdf_bytes = _http_get_bytes(item.url)
-            text = extract_text_from_pdf_bytes(pdf_bytes) or ""
+            doc = DocumentAnalysis(await _download(item.url), fingerprints=fingerprints, pool=pool)
+            text = await doc.text()
             
             if not text.strip():
                 fails.append({
@@ -1906,13 +2184,13 @@ async def train(payload: TrainPayload):
                 continue
             
             # Determine quote type and parse accordingly
-            quote_type = determine_quote_type(text)
+            quote_type = await doc.quote_type()
             
             if quote_type == "supplier" or quote_type == "unknown":
-                parsed = parse_quote_lines_from_text(text)
+                parsed = await doc.supplier()
                 training_type = "supplier_quote"
             else:
-                parsed = parse_client_quote_from_text(text)
+                parsed = await doc.client()
                 training_type = "client_quote"
             
             confidence = float(parsed.get("confidence", 0.0))
@@ -1963,6 +2241,8 @@ async def train(payload: TrainPayload):
 
     # Save training records to database
     saved_count = 0
+    if job:
+        job.progress(1.0, f"Saving {len(training_records)} training records")
     if training_records:
         try:
             db_manager = get_db_manager()
@@ -2015,25 +2295,33 @@ async def debug_parse(req: Request):
     filename = body.get("filename") or "debug.pdf"
 
     try:
-        pdf_bytes = _http_get_bytes(url)
+        pdf = await _download(url)
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"download_failed: {e}")
 
-    # Extract raw text
-    raw_text = extract_text_from_pdf_bytes(pdf_bytes) or ""
+    # Extract raw text (with per-page provenance: which pages needed OCR/PyPDF2)
+    doc = DocumentAnalysis(pdf, fingerprints=await _supplier_fingerprints(body.get("tenantId")))
+    extraction = await doc.extraction()
+    raw_text = await doc.text()
     
     # Determine quote type
-    quote_type = determine_quote_type(raw_text)
+    quote_type = await doc.quote_type()
     
-    # Parse with both methods for comparison
-    supplier_parsed = parse_quote_lines_from_text(raw_text) if raw_text else {}
-    legacy_parsed = parse_totals_from_text(raw_text) if raw_text else {}
+    # The legacy totals parser delegates to the supplier parser, so both views share one parse
+    supplier_parsed = await doc.supplier()
+    legacy_parsed = supplier_parsed
 
     return {
         "ok": True,
         "filename": filename,
         "raw_text_length": len(raw_text),
         "raw_text_preview": raw_text[:1000] + "..." if len(raw_text) > 1000 else raw_text,
+        "extraction": {
+            "method": extraction.get("method"),
+            "cached": extraction.get("cached"),
+            "stages": extraction.get("stages"),
+            "pages": extraction.get("pages", []),
+        },
         "quote_type": quote_type,
         "supplier_parsing": {
             "lines_found": len(supplier_parsed.get("lines", [])),
@@ -2041,12 +2329,14 @@ async def debug_parse(req: Request):
             "estimated_total": supplier_parsed.get("estimated_total"),
             "confidence": supplier_parsed.get("confidence"),
             "supplier": supplier_parsed.get("supplier"),
+            "parser": supplier_parsed.get("parser"),
         },
         "legacy_parsing": {
             "lines_found": len(legacy_parsed.get("lines", [])),
             "estimated_total": legacy_parsed.get("estimated_total"),
             "detected_totals": legacy_parsed.get("detected_totals", []),
-        }
+        },
+        "analysis": doc.status(),
     }
 
 class EmailTrainingPayload(BaseModel):
@@ -2054,16 +2344,27 @@ class EmailTrainingPayload(BaseModel):
     emailProvider: str  # "gmail" or "m365"
     credentials: Optional[Dict[str, Any]] = None  # Make credentials optional - will be fetched from DB
     daysBack: int = 30
+    background: bool = False  # queue as a job and return its id (see /jobs)
+
+# Rough share of the email workflow done when each step is reported
+EMAIL_TRAINING_STEPS = {"setup": 0.05, "search": 0.1, "searching": 0.1, "processing": 0.3, "extracting": 0.3,
+                        "saving": 0.8, "training": 0.9, "completed": 1.0}
 
 @app.post("/start-email-training")
 async def start_email_training(payload: EmailTrainingPayload):
     """
     Start the automated email-to-ML training workflow.
     Finds client quotes in email, parses them, and trains ML models.
+    With background=true the workflow runs as an "email_training" job and the job is returned.
     """
-    if not EMAIL_TRAINING_AVAILABLE:
+    if not email_training_available():
         raise HTTPException(status_code=503, detail="Email training not available - database connection required")
-    
+    if payload.background:
+        return await _submit_job(payload.tenantId, "email_training",
+                                 payload.model_dump(exclude={"background", "credentials"}))
+    return await asyncio.to_thread(_email_training, payload)
+
+def _email_training(payload: EmailTrainingPayload, job: Optional[JobContext] = None) -> Dict[str, Any]:
     try:
         # Get database URL
         db_url = os.getenv("DATABASE_URL")
@@ -2105,7 +2406,7 @@ async def start_email_training(payload: EmailTrainingPayload):
                 raise HTTPException(status_code=400, detail=f"No Gmail connection found for tenant {tenant_id}. Please connect Gmail first.")
         
         # Initialize workflow
-        workflow = EmailTrainingWorkflow(db_url, tenant_id)
+        workflow = email_training_workflow()(db_url, tenant_id)
         
         # Collect progress messages
         progress_messages = []
@@ -2113,6 +2414,12 @@ async def start_email_training(payload: EmailTrainingPayload):
         def progress_callback(progress_info):
             """Collect progress messages for user feedback"""
             progress_messages.append(progress_info)
+            if job:
+                job.check()
+                step, message = progress_info.get("step"), progress_info.get("message")
+                if isinstance(message, dict):
+                    step, message = message.get("step"), message.get("message")
+                job.progress(EMAIL_TRAINING_STEPS.get(step), message)
         
         # Run the complete workflow with real Gmail credentials and progress tracking
         results = workflow.run_full_workflow(
@@ -2151,7 +2458,7 @@ async def upload_quote_training(request: dict):
     Supports drag-and-drop functionality for manual quote training.
     Expects JSON payload with base64 encoded file content.
     """
-    if not EMAIL_TRAINING_AVAILABLE:
+    if not email_training_available():
         raise HTTPException(status_code=503, detail="Quote training not available - database connection required")
     
     try:
@@ -2181,17 +2488,18 @@ async def upload_quote_training(request: dict):
             raise HTTPException(status_code=422, detail="Invalid base64 content")
         
         # Extract text from PDF
-        pdf_text = extract_text_from_pdf_bytes(file_content) or ""
+        doc = DocumentAnalysis(file_content, fingerprints=await _supplier_fingerprints(tenant_id))
+        pdf_text = await doc.text()
         
         if not pdf_text.strip():
             raise HTTPException(status_code=422, detail="Could not extract text from PDF")
         
         # Parse the quote based on type
         if quote_type == "supplier":
-            parsed_data = parse_quote_lines_from_text(pdf_text)
+            parsed_data = await doc.supplier()
             quote_type_result = "supplier"
         else:
-            parsed_data = parse_client_quote_from_text(pdf_text)
+            parsed_data = await doc.client()
             quote_type_result = "client"
         
         # Determine quote confidence
@@ -2255,7 +2563,7 @@ async def preview_email_quotes(payload: EmailTrainingPayload):
     Preview client quotes found in email without training.
     Useful for testing and validation before full training.
     """
-    if not EMAIL_TRAINING_AVAILABLE:
+    if not email_training_available():
         raise HTTPException(status_code=503, detail="Email training not available - database connection required")
     
     try:
@@ -2493,235 +2801,165 @@ async def train_client_quotes(req: Request):
     """
     Train price prediction and win probability models from stored training data.
     Loads data from ml_training_data table, trains sklearn models, and saves them.
+    With background=true the training runs as a "train_client_quotes" job and the job is returned.
     """
-    if not EMAIL_TRAINING_AVAILABLE:
+    if not email_training_available():
         return {
             "ok": False,
             "error": "Training not available - database connection required",
             "model_status": "unavailable"
         }
     
+    payload = await req.json()
+    if payload.get("background"):
+        params = {k: v for k, v in payload.items() if k not in ("background", "tenantId")}
+        return await _submit_job(payload.get("tenantId") or "all", "train_client_quotes", params)
+    return await asyncio.to_thread(_train_client_quotes, payload)
+
+def _price_forest():
+    from sklearn.ensemble import RandomForestRegressor
+    return RandomForestRegressor(
+        n_estimators=100,
+        max_depth=10,
+        min_samples_split=5,
+        min_samples_leaf=2,
+        random_state=42,
+        n_jobs=-1
+    )
+
+def _win_forest():
+    from sklearn.ensemble import RandomForestRegressor
+    return RandomForestRegressor(  # Using regressor for probabilities
+        n_estimators=100,
+        max_depth=8,
+        min_samples_split=5,
+        min_samples_leaf=2,
+        random_state=42,
+        n_jobs=-1
+    )
+
+def _client_quote_candidates(max_depth: int) -> List[model_benchmark.Candidate]:
+    """Model families and sizes benchmarked by /train-client-quotes with benchmark=true."""
+    from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+
+    def forest(cls, trees, depth):
+        return lambda: cls(n_estimators=trees, max_depth=depth, min_samples_split=5, min_samples_leaf=2,
+                           random_state=42, n_jobs=-1)
+
+    candidates = [(f"random_forest-{trees}-d{depth}", "random_forest", forest(RandomForestRegressor, trees, depth))
+                  for trees, depth in ((100, max_depth), (50, max_depth), (25, max_depth - 2))]
+    candidates += [(f"extra_trees-{trees}-d{max_depth}", "extra_trees", forest(ExtraTreesRegressor, trees, max_depth))
+                   for trees in (100, 50)]
+    try:
+        from xgboost import XGBRegressor
+    except ImportError:
+        return candidates
+    candidates += [(f"xgboost-{rounds}-d{depth}", "xgboost",
+                    lambda rounds=rounds, depth=depth: XGBRegressor(n_estimators=rounds, max_depth=depth, learning_rate=0.08,
+                                                                    subsample=0.9, colsample_bytree=0.9, random_state=42))
+                   for rounds, depth in ((200, 5), (80, 4))]
+    return candidates
+
+def _benchmark_summary(reports: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Per model: the selected candidate and the cost / quality of every candidate measured."""
+    keys = ("name", "mae", "r2", "single_p99_ms", "batch_p99_ms", "memory_mb", "artifact_mb", "feasible", "pareto", "error")
+    return {kind: {"selected": report["selected"], "ceilings_met": report["ceilings_met"],
+                   "candidates": [{k: c[k] for k in keys if k in c} for c in report["candidates"]]}
+            for kind, report in reports.items()}
+
+def _client_quote_metrics(price_model, win_model, X_test, y_price_test, y_win_test) -> Dict[str, float]:
+    from sklearn.metrics import mean_absolute_error, r2_score
+    y_price_pred = price_model.predict(X_test)
+    y_win_pred = np.clip(win_model.predict(X_test), 0, 1)  # Ensure probabilities are in [0, 1]
+    return {
+        "price_mae": float(mean_absolute_error(y_price_test, y_price_pred)),
+        "price_r2": float(r2_score(y_price_test, y_price_pred)),
+        "win_mae": float(mean_absolute_error(y_win_test, y_win_pred)),
+    }
+
+def _full_retrain_metrics(tenant_id: Optional[str], test_ids, X_test, y_price_test, y_win_test) -> Optional[Dict[str, float]]:
+    """Metrics of a from-scratch retrain (holdout rows excluded) on the same holdout, for comparison."""
+    frame = get_training_data_loader().client_quotes(tenant_id)
+    frame = frame[~frame["id"].isin(set(test_ids))]
+    if len(frame) < 5:
+        return None
+    X = frame[CLIENT_QUOTE_FEATURES]
+    price_model = _price_forest().fit(X, frame["target_price"])
+    win_model = _win_forest().fit(X, frame["win_probability"])
+    return _client_quote_metrics(price_model, win_model, X_test, y_price_test, y_win_test)
+
+def _log_client_quote_training(tenant_id: Optional[str], mode: str, samples: int, duration: float):
+    try:
+        from db_config import get_db_manager
+        get_db_manager().log_training_session({
+            'tenant_id': tenant_id or 'all',
+            'training_type': f'client_quotes_{mode}',
+            'quotes_processed': samples,
+            'training_records_created': 0,
+            'models_updated': ['price_model', 'win_model'],
+            'duration_seconds': int(round(duration)),
+            'status': 'completed'
+        })
+    except Exception as e:
+        logger.warning(f"Failed to log training session: {e}")
+
+def _train_client_quotes(payload: Dict[str, Any], job: Optional[JobContext] = None) -> Dict[str, Any]:
+    """
+    Full retrain, or with incremental=true a warm start from the tenant's current
+    models on the rows added since their watermark (see incremental.py).
+    compareFull=true also fits a from-scratch model to measure the quality delta.
+    benchmark=true (full retrains only) measures several model families and sizes
+    and ships the Pareto-optimal ones (see model_benchmark.py); the report is
+    saved as benchmark.json in the model version.
+    """
     try:
-        payload = await req.json()
         tenant_id = payload.get("tenantId")
         min_samples = int(payload.get("minSamples", 10))  # Minimum samples required for training
+        started = time.perf_counter()
         
-        from db_config import get_db_manager
-        import pandas as pd
-        from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
         from sklearn.model_selection import train_test_split
-        from sklearn.metrics import mean_absolute_error, r2_score, accuracy_score
-        import joblib
-        
-        logger.info(f"Starting model retraining for tenant: {tenant_id or 'all'}")
         
-        db_manager = get_db_manager()
-        conn = db_manager.get_connection()
-        
-        # Load training data from database
-        with conn.cursor() as cur:
-            if tenant_id:
-                cur.execute("""
-                    SELECT 
-                        id,
-                        parsed_data,
-                        confidence,
-                        estimated_total,
-                        project_type,
-                        quoted_price,
-                        quote_type,
-                        source_type
-                    FROM ml_training_data
-                    WHERE tenant_id = %s
-                    AND estimated_total > 0
-                    AND confidence > 0.3
-                    ORDER BY created_at DESC
-                    LIMIT 1000
-                """, (tenant_id,))
-            else:
-                cur.execute("""
-                    SELECT 
-                        id,
-                        parsed_data,
-                        confidence,
-                        estimated_total,
-                        project_type,
-                        quoted_price,
-                        quote_type,
-                        source_type
-                    FROM ml_training_data
-                    WHERE estimated_total > 0
-                    AND confidence > 0.3
-                    ORDER BY created_at DESC
-                    LIMIT 1000
-                """)
-            
-            rows = cur.fetchall()
-            
-        conn.close()
+        previous = get_tenant_models().own(tenant_id)
+        previous_meta = None
+        if previous is not None and list(previous.feature_meta.get("columns") or []) == CLIENT_QUOTE_FEATURES:
+            previous_meta = previous.feature_meta
+        mode = training_mode(bool(payload.get("incremental")), previous_meta)
+        if mode == INCREMENTAL and not (hasattr(previous.price_model, "estimators_") and hasattr(previous.win_model, "estimators_")):
+            mode = FULL  # a benchmark shipped a model that cannot be warm-started
+        benchmark = bool(payload.get("benchmark")) and mode == FULL
+        if mode == INCREMENTAL:
+            min_samples = int(payload.get("minNewSamples", 5))
+        
+        logger.info(f"Starting {mode} model retraining for tenant: {tenant_id or 'all'}")
+        
+        # Load encoded training data from database (features are built in SQL, see training_data.py)
+        df_encoded = get_training_data_loader().client_quotes(
+            tenant_id, since=previous_meta["watermark"] if mode == INCREMENTAL else None
+        )
         
-        if len(rows) < min_samples:
+        if mode == INCREMENTAL and len(df_encoded) < min_samples:
             return {
-                "ok": False,
-                "error": f"Insufficient training data: {len(rows)} samples (minimum {min_samples} required)",
-                "samples_found": len(rows),
-                "min_required": min_samples,
-                "message": "Upload more training quotes to enable model training"
+                "ok": True,
+                "message": f"{len(df_encoded)} new samples since the last training (minimum {min_samples}); models unchanged",
+                "training_mode": mode,
+                "new_samples": len(df_encoded),
+                "model_version": previous.version,
+                "model_status": "up_to_date"
             }
-        
-        logger.info(f"Loaded {len(rows)} training samples from database")
-        
-        # Extract features from training data
-        training_data = []
-        for row in rows:
-            try:
-                parsed_data = row[1] if isinstance(row[1], dict) else {}
-                
-                # Extract questionnaire answers if available
-                qa = parsed_data.get("questionnaire_answers", {})
-                
-                # Try to extract area_m2 from various sources
-                area_m2 = (
-                    qa.get("area_m2") or 
-                    parsed_data.get("area_m2") or
-                    parsed_data.get("total_area") or
-                    30.0  # default fallback
-                )
-                
-                # Extract materials grade
-                materials_grade = (
-                    qa.get("materials_grade") or
-                    parsed_data.get("materials_grade") or
-                    "Standard"
-                )
-                
-                # Extract project type
-                project_type = (
-                    row[4] or  # project_type column
-                    qa.get("project_type") or
-                    parsed_data.get("project_type") or
-                    "windows"
-                )
-                
-                # Extract standard premium features from questionnaire
-                glazing_type = qa.get("glazing_type", "Standard Double Glazing")
-                has_curves = bool(qa.get("has_curves", False))
-                premium_hardware = bool(qa.get("premium_hardware", False))
-                custom_finish = qa.get("custom_finish", "None")
-                installation_required = bool(qa.get("installation_required", False))
-                property_listed = bool(qa.get("property_listed", False))
-                
-                # Extract door/window specifics
-                door_height_mm = qa.get("door_height_mm", 2100)
-                door_width_mm = qa.get("door_width_mm", 900)
-                num_doors = qa.get("num_doors", 0)
-                num_windows = qa.get("num_windows", 0)
-                
-                # Extract context fields
-                lead_source = qa.get("lead_source", "website")
-                region = qa.get("region", "South East")
-                
-                # Use quoted_price if available, otherwise estimated_total
-                target_price = float(row[5] or row[3] or 0)
-                
-                if target_price <= 0:
-                    continue
-                
-                # Apply markup to supplier quotes (30-40% markup to get selling price)
-                # Supplier quotes are cost prices, not selling prices
-                source_type = row[7] if len(row) > 7 else 'client_quote'
-                if source_type == 'supplier_quote':
-                    # Apply 35% markup (typical trade markup for windows/doors)
-                    target_price = target_price * 1.35
-                    logger.debug(f"Applied 35% markup to supplier quote: {row[5] or row[3]:.2f} -> {target_price:.2f}")
-                
-                # Estimate win probability based on confidence and price range
-                confidence = float(row[2] or 0.5)
-                if target_price < 5000:
-                    win_prob = min(0.9, confidence * 1.2)
-                elif target_price < 15000:
-                    win_prob = confidence
-                else:
-                    win_prob = max(0.3, confidence * 0.8)
-                
-                training_data.append({
-                    "area_m2": float(area_m2),
-                    "materials_grade": str(materials_grade),
-                    "project_type": str(project_type),
-                    "glazing_type": str(glazing_type),
-                    "has_curves": has_curves,
-                    "premium_hardware": premium_hardware,
-                    "custom_finish": str(custom_finish),
-                    "installation_required": installation_required,
-                    "property_listed": property_listed,
-                    "door_height_mm": float(door_height_mm) if door_height_mm else 2100.0,
-                    "door_width_mm": float(door_width_mm) if door_width_mm else 900.0,
-                    "num_doors": int(num_doors) if num_doors else 0,
-                    "num_windows": int(num_windows) if num_windows else 0,
-                    "lead_source": str(lead_source),
-                    "region": str(region),
-                    "target_price": target_price,
-                    "win_probability": win_prob,
-                    "confidence": confidence
-                })
-                
-            except Exception as e:
-                logger.warning(f"Failed to extract features from training sample: {e}")
-                continue
-        
-        if len(training_data) < min_samples:
+        if len(df_encoded) < min_samples:
             return {
                 "ok": False,
-                "error": f"Insufficient valid training data: {len(training_data)} samples after feature extraction",
-                "samples_found": len(training_data),
-                "min_required": min_samples
+                "error": f"Insufficient training data: {len(df_encoded)} samples (minimum {min_samples} required)",
+                "samples_found": len(df_encoded),
+                "min_required": min_samples,
+                "message": "Upload more training quotes to enable model training"
             }
         
-        # Create DataFrame
-        df = pd.DataFrame(training_data)
-        logger.info(f"Prepared {len(df)} training samples with features")
-        
-        # Prepare features (X) and targets (y)
-        # Encode categorical variables
-        df_encoded = df.copy()
-        df_encoded["materials_grade_Premium"] = (df_encoded["materials_grade"] == "Premium").astype(int)
-        df_encoded["materials_grade_Standard"] = (df_encoded["materials_grade"] == "Standard").astype(int)
-        df_encoded["materials_grade_Basic"] = (df_encoded["materials_grade"] == "Basic").astype(int)
-        
-        # Simple project type encoding (can be enhanced)
-        df_encoded["project_type_windows"] = df_encoded["project_type"].str.contains("window", case=False, na=False).astype(int)
-        df_encoded["project_type_doors"] = df_encoded["project_type"].str.contains("door", case=False, na=False).astype(int)
-        
-        # Encode premium features (these capture expensive options like vacuum glass, curves)
-        df_encoded["glazing_vacuum"] = df_encoded["glazing_type"].str.contains("vacuum", case=False, na=False).astype(int)
-        df_encoded["glazing_triple"] = df_encoded["glazing_type"].str.contains("triple", case=False, na=False).astype(int)
-        df_encoded["has_curves_int"] = df_encoded["has_curves"].astype(int)
-        df_encoded["premium_hardware_int"] = df_encoded["premium_hardware"].astype(int)
-        df_encoded["has_custom_finish"] = (df_encoded["custom_finish"] != "None").astype(int)
-        df_encoded["installation_int"] = df_encoded["installation_required"].astype(int)
-        df_encoded["listed_building"] = df_encoded["property_listed"].astype(int)
-        
-        feature_columns = [
-            "area_m2",
-            "materials_grade_Premium",
-            "materials_grade_Standard", 
-            "materials_grade_Basic",
-            "project_type_windows",
-            "project_type_doors",
-            "glazing_vacuum",
-            "glazing_triple",
-            "has_curves_int",
-            "premium_hardware_int",
-            "has_custom_finish",
-            "installation_int",
-            "listed_building",
-            "door_height_mm",
-            "door_width_mm",
-            "num_doors",
-            "num_windows",
-            "confidence"
-        ]
+        logger.info(f"Loaded {len(df_encoded)} training samples from database")
+        if job:
+            job.progress(0.1, f"Loaded {len(df_encoded)} training samples")
         
+        feature_columns = CLIENT_QUOTE_FEATURES
         X = df_encoded[feature_columns]
         y_price = df_encoded["target_price"]
         y_win = df_encoded["win_probability"]
@@ -2733,82 +2971,92 @@ async def train_client_quotes(req: Request):
         
         # Train price prediction model
         logger.info("Training price prediction model...")
-        price_model_new = RandomForestRegressor(
-            n_estimators=100,
-            max_depth=10,
-            min_samples_split=5,
-            min_samples_leaf=2,
-            random_state=42,
-            n_jobs=-1
-        )
-        price_model_new.fit(X_train, y_price_train)
-        
-        # Evaluate price model
-        y_price_pred = price_model_new.predict(X_test)
-        price_mae = mean_absolute_error(y_price_test, y_price_pred)
-        price_r2 = r2_score(y_price_test, y_price_pred)
-        
-        logger.info(f"Price model - MAE: £{price_mae:.2f}, R²: {price_r2:.3f}")
+        if job:
+            job.progress(0.2, "Training price prediction model")
+        reports = {}
+        if mode == INCREMENTAL:
+            price_model_new = warm_start_forest(previous.price_model, X_train, y_price_train)
+        elif benchmark:
+            price_model_new, reports["price"] = model_benchmark.run(
+                _client_quote_candidates(10), "regression", X_train, y_price_train, X_test, y_price_test)
+        else:
+            price_model_new = _price_forest()
+            price_model_new.fit(X_train, y_price_train)
         
         # Train win probability model
         logger.info("Training win probability model...")
-        win_model_new = RandomForestRegressor(  # Using regressor for probabilities
-            n_estimators=100,
-            max_depth=8,
-            min_samples_split=5,
-            min_samples_leaf=2,
-            random_state=42,
-            n_jobs=-1
-        )
-        win_model_new.fit(X_train, y_win_train)
-        
-        # Evaluate win model
-        y_win_pred = win_model_new.predict(X_test)
-        y_win_pred = np.clip(y_win_pred, 0, 1)  # Ensure probabilities are in [0, 1]
-        win_mae = mean_absolute_error(y_win_test, y_win_pred)
-        
+        if job:
+            job.progress(0.6, "Training win probability model")
+        if mode == INCREMENTAL:
+            win_model_new = warm_start_forest(previous.win_model, X_train, y_win_train)
+        elif benchmark:
+            win_model_new, reports["win"] = model_benchmark.run(
+                _client_quote_candidates(8), "regression", X_train, y_win_train, X_test, y_win_test)
+        else:
+            win_model_new = _win_forest()
+            win_model_new.fit(X_train, y_win_train)
+        if benchmark and (price_model_new is None or win_model_new is None):
+            raise RuntimeError("No benchmark candidate could be trained")
+        
+        # Evaluate both models
+        metrics = _client_quote_metrics(price_model_new, win_model_new, X_test, y_price_test, y_win_test)
+        price_mae, price_r2, win_mae = metrics["price_mae"], metrics["price_r2"], metrics["win_mae"]
+        logger.info(f"Price model - MAE: £{price_mae:.2f}, R²: {price_r2:.3f}")
         logger.info(f"Win model - MAE: {win_mae:.3f}")
         
-        # Save models to disk
-        os.makedirs("models", exist_ok=True)
-        price_model_path = "models/price_model.joblib"
-        win_model_path = "models/win_model.joblib"
-        feature_meta_path = "models/feature_meta.json"
-        
-        joblib.dump(price_model_new, price_model_path)
-        joblib.dump(win_model_new, win_model_path)
-        
-        # Save feature metadata
+        # Quality against a full retrain: measured on this holdout with compareFull, else the last full rebuild's metrics
+        quality = None
+        if mode == INCREMENTAL:
+            reference, reference_kind = previous_meta.get("full_metrics"), "last_full_rebuild"
+            if payload.get("compareFull"):
+                if job:
+                    job.progress(0.75, "Training full models for comparison")
+                reference = _full_retrain_metrics(tenant_id, df_encoded.loc[X_test.index, "id"], X_test, y_price_test, y_win_test)
+                reference_kind = "full_retrain"
+            quality = {"reference": reference_kind, "reference_metrics": reference,
+                       "delta": quality_delta(metrics, reference)}
+        duration = round(time.perf_counter() - started, 3)
+        
+        # Publish a new model version and swap it in
+        if job:
+            job.progress(0.9, "Saving models")
+        previous_watermark = previous_meta.get("watermark") if mode == INCREMENTAL else None
         feature_meta = {
             "columns": feature_columns,
+            "numeric_columns": feature_columns,
+            "categorical_columns": [],
             "trained_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-            "training_samples": len(df),
+            "training_samples": len(df_encoded) + (int(previous_meta.get("training_samples") or 0) if mode == INCREMENTAL else 0),
             "test_samples": len(X_test),
-            "price_mae": float(price_mae),
-            "price_r2": float(price_r2),
-            "win_mae": float(win_mae),
+            "price_mae": price_mae,
+            "price_r2": price_r2,
+            "win_mae": win_mae,
             "tenant_id": tenant_id,
-            "version": "1.0"
+            "training_mode": mode,
+            "watermark": watermark(list(df_encoded["created_at"]) + [previous_watermark]),
+            "incremental_rounds": int(previous_meta.get("incremental_rounds") or 0) + 1 if mode == INCREMENTAL else 0,
+            "full_metrics": previous_meta.get("full_metrics") if mode == INCREMENTAL else metrics,
+            "duration_seconds": duration,
+            "quality_delta": quality,
+            "benchmark": {kind: report["selected"] for kind, report in reports.items()} or None,
         }
+        if job:
+            job.check()  # a cancel after the last progress() must not publish
+        bundle = get_tenant_models().publish(tenant_id, price_model_new, win_model_new, feature_meta,
+                                             reports={model_benchmark.REPORT_FILE: reports} if reports else None)
         
-        with open(feature_meta_path, "w") as f:
-            json.dump(feature_meta, f, indent=2)
-        
-        logger.info(f"Models saved to {price_model_path} and {win_model_path}")
-        
-        # Reload models globally
-        global price_model, win_model, COLUMNS, NUMERIC_COLUMNS
-        price_model = load_model(price_model_path)
-        win_model = load_model(win_model_path)
-        COLUMNS = feature_columns
-        NUMERIC_COLUMNS = ["area_m2", "confidence"]
-        
-        logger.info("Models reloaded successfully")
+        logger.info(f"Models saved and activated as version {bundle.version} ({mode}, {duration:.1f}s)")
+        _log_client_quote_training(tenant_id, mode, len(df_encoded), duration)
         
         return {
             "ok": True,
             "message": "Models trained and saved successfully",
-            "training_samples": len(df),
+            "model_version": bundle.version,
+            "training_mode": mode,
+            "duration_seconds": duration,
+            "quality_delta": quality,
+            "benchmark": _benchmark_summary(reports) if reports else None,
+            "training_samples": len(df_encoded),
             "test_samples": len(X_test),
             "metrics": {
                 "price_mae": round(float(price_mae), 2),
@@ -2817,9 +3065,9 @@ async def train_client_quotes(req: Request):
             },
             "feature_columns": feature_columns,
             "model_paths": {
-                "price": price_model_path,
-                "win": win_model_path,
-                "meta": feature_meta_path
+                "price": os.path.join(bundle.path, "price_model.joblib"),
+                "win": os.path.join(bundle.path, "win_model.joblib"),
+                "meta": os.path.join(bundle.path, "feature_meta.json")
             },
             "model_status": "trained"
         }
@@ -2830,6 +3078,124 @@ async def train_client_quotes(req: Request):
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Model training failed: {str(e)}")
 
+# ============================================================================
+# Background Jobs (see jobs.py)
+# ============================================================================
+
+async def _train_job(job: JobContext) -> Dict[str, Any]:
+    return await _train(TrainPayload.model_validate({**job.parameters, "tenantId": job.tenant_id}), job)
+
+def _email_training_job(job: JobContext) -> Dict[str, Any]:
+    return _email_training(EmailTrainingPayload.model_validate({**job.parameters, "tenantId": job.tenant_id}), job)
+
+def _train_client_quotes_job(job: JobContext) -> Dict[str, Any]:
+    tenant_id = None if job.tenant_id == "all" else job.tenant_id
+    return _train_client_quotes({**job.parameters, "tenantId": tenant_id}, job)
+
+get_job_runner().register("train", _train_job)
+get_job_runner().register("email_training", _email_training_job)
+get_job_runner().register("train_client_quotes", _train_client_quotes_job)
+
+def _job_out(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "jobId": job["id"],
+        "tenantId": job["tenant_id"],
+        "type": job["job_type"],
+        "status": job["status"],
+        "progress": round(job["progress"], 3),
+        "message": job["progress_message"],
+        "attempts": job["attempts"],
+        "maxAttempts": job["max_attempts"],
+        "cancelRequested": job["cancel_requested"],
+        "parameters": job["parameters"],
+        "results": job["results"],
+        "error": job["error_message"],
+        "createdAt": job["created_at"],
+        "startedAt": job["started_at"],
+        "completedAt": job["completed_at"],
+        "heartbeatAt": job["heartbeat_at"],
+    }
+
+def _require_job_store():
+    if not os.getenv("DATABASE_URL"):
+        raise HTTPException(status_code=503, detail="Background jobs not available - database connection required")
+
+async def _submit_job(tenant_id: str, job_type: str, parameters: Dict[str, Any], max_attempts: Optional[int] = None) -> Dict[str, Any]:
+    _require_job_store()
+    runner = get_job_runner()
+    kwargs = {"max_attempts": max_attempts} if max_attempts else {}
+    try:
+        job = await asyncio.to_thread(runner.submit, tenant_id, job_type, parameters, **kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"ok": True, **_job_out(job)}
+
+class JobIn(BaseModel):
+    tenantId: str
+    type: str  # "train", "email_training" or "train_client_quotes"
+    parameters: Dict[str, Any] = Field(default_factory=dict)
+    maxAttempts: Optional[int] = None
+
+@app.post("/jobs", status_code=202)
+async def submit_job(payload: JobIn):
+    """
+    Queue a background job and return it immediately; poll GET /jobs/{jobId} for progress.
+    parameters are the body the matching endpoint would take, without tenantId.
+    """
+    return await _submit_job(payload.tenantId, payload.type, payload.parameters, payload.maxAttempts)
+
+@app.get("/jobs")
+async def list_jobs(tenantId: Optional[str] = None, status: Optional[str] = None, limit: int = 20):
+    _require_job_store()
+    jobs = await asyncio.to_thread(get_job_runner().queue.list, tenantId, status, limit)
+    return {"ok": True, "jobs": [_job_out(j) for j in jobs]}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: int):
+    _require_job_store()
+    job = await asyncio.to_thread(get_job_runner().queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return {"ok": True, **_job_out(job)}
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: int):
+    """Cancel a pending job, or ask a running one to stop (it is cancelled at its next heartbeat)."""
+    _require_job_store()
+    job = await asyncio.to_thread(get_job_runner().queue.cancel, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return {"ok": True, **_job_out(job)}
+
+# ============================================================================
+# Model Versions (see model_registry.py)
+# ============================================================================
+
+@app.get("/models")
+def list_model_versions(tenantId: Optional[str] = None):
+    """
+    Published model versions, oldest first; the bundled models are version "baseline".
+    With ?tenantId= lists that tenant's own versions ("active" is what the tenant is served).
+    """
+    return {"ok": True, "active": active_models(tenantId).version, "versions": get_tenant_models().versions(tenantId)}
+
+def _activate(activate) -> Dict[str, Any]:
+    try:
+        bundle = activate()
+    except ModelNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"ok": True, "active": bundle.describe()}
+
+@app.post("/models/{version}/activate")
+async def activate_model_version(version: str, tenantId: Optional[str] = None):
+    """Serve a previously published version (or "baseline"); the swap is atomic."""
+    return await asyncio.to_thread(_activate, lambda: get_tenant_models().activate(tenantId, version))
+
+@app.post("/models/rollback")
+async def rollback_model_version(tenantId: Optional[str] = None):
+    """Activate the version published before the active one."""
+    return await asyncio.to_thread(_activate, lambda: get_tenant_models().rollback(tenantId))
+
 # ============================================================================
 # Project Actuals Feedback (Real Costs vs Estimates)
 # ============================================================================
@@ -2869,7 +3235,7 @@ class MaterialCostsPayload(BaseModel):
 @app.post("/save-material-costs")
 async def save_material_costs(payload: MaterialCostsPayload):
     """Save material cost changes from manual or uploaded purchase orders for trend tracking and ML feature enrichment."""
-    if not EMAIL_TRAINING_AVAILABLE:
+    if not email_training_available():
         raise HTTPException(status_code=503, detail="Material costs not available - database connection required")
     from db_config import get_db_manager
     db_manager = get_db_manager()
@@ -2925,7 +3291,7 @@ async def save_material_costs(payload: MaterialCostsPayload):
 @app.get("/material-costs/recent")
 async def recent_material_costs(tenantId: str, limit: int = 50):
     """Return recent material cost snapshots & latest change per material."""
-    if not EMAIL_TRAINING_AVAILABLE:
+    if not email_training_available():
         raise HTTPException(status_code=503, detail="material_costs_unavailable")
     from db_config import get_db_manager
     db_manager = get_db_manager()
@@ -2971,7 +3337,7 @@ async def recent_material_costs(tenantId: str, limit: int = 50):
 @app.get("/material-costs/trends")
 async def material_cost_trends(tenantId: str, window: int = 12):
     """Return per-material trend series (last N snapshots) with change metrics."""
-    if not EMAIL_TRAINING_AVAILABLE:
+    if not email_training_available():
         raise HTTPException(status_code=503, detail="material_costs_unavailable")
     from db_config import get_db_manager
     db_manager = get_db_manager()
@@ -3027,7 +3393,7 @@ async def save_project_actuals(payload: ProjectActualsPayload):
     Save completed project actuals for ML to learn from real-world results.
     This is the gold standard training data - what actually happened vs what we estimated.
     """
-    if not EMAIL_TRAINING_AVAILABLE:
+    if not email_training_available():
         raise HTTPException(status_code=503, detail="Project actuals not available - database connection required")
     
     try:
@@ -3126,7 +3492,7 @@ async def save_quote_markup(payload: QuoteMarkupPayload):
     Auto-save quote builder markup applications to ML training data.
     Captures supplier cost + client estimate to learn pricing patterns.
     """
-    if not EMAIL_TRAINING_AVAILABLE:
+    if not email_training_available():
         return {"ok": False, "message": "ML training not available"}
     
     try:
@@ -3199,7 +3565,7 @@ async def submit_lead_feedback(payload: LeadFeedbackPayload):
     Submit feedback on whether an email is actually a lead or not.
     This trains the lead classifier to be more accurate.
     """
-    if not EMAIL_TRAINING_AVAILABLE:
+    if not email_training_available():
         raise HTTPException(status_code=503, detail="Lead training not available - database connection required")
     
     try:
@@ -3287,7 +3653,7 @@ async def retrain_lead_classifier(payload: LeadClassifierRetrainPayload):
     Retrain the lead classifier using accumulated feedback.
     This improves the accuracy of email classification.
     """
-    if not EMAIL_TRAINING_AVAILABLE:
+    if not email_training_available():
         raise HTTPException(status_code=503, detail="Lead training not available - database connection required")
     
     try:
@@ -3386,7 +3752,7 @@ async def get_lead_classifier_stats(tenantId: str):
     """
     Get statistics about lead classifier training and performance.
     """
-    if not EMAIL_TRAINING_AVAILABLE:
+    if not email_training_available():
         raise HTTPException(status_code=503, detail="Lead training not available - database connection required")
     
     try:
@@ -0,0 +1,223 @@
+# ml/model_benchmark.py
+"""
+Cost / quality benchmark of candidate models, with Pareto selection.
+
+/train-client-quotes used to always ship a 100-tree depth-10 RandomForest and
+train.py always shipped XGBoost, without anyone measuring what that cost at
+serving time. benchmark() fits every candidate (a model family at a given
+size) on the same training split and records, per candidate:
+  - quality on the held-out split: MAE and R² (regression) or ROC-AUC
+    (classification);
+  - single-row latency p50 / p99 (one predict call per row) and batch
+    latency p50 / p99 (ML_BENCH_BATCH_SIZE rows per call), in milliseconds;
+  - artifact size (joblib), load time, and the memory the loaded model
+    holds, measured with tracemalloc around joblib.load.
+
+select() then drops the candidates over the latency / memory ceilings and
+keeps the Pareto front of the rest on (error, single-row p99, memory). From
+that front it picks the candidate with the lowest error. If no candidate
+fits under the ceilings, the most accurate one is kept and the report says
+so (ceilings_met: false). The report is saved as benchmark.json next to the
+model it selected.
+
+Configuration (environment):
+  - ML_BENCH_MAX_P99_MS      single-row p99 ceiling in milliseconds (default 20)
+  - ML_BENCH_MAX_MEMORY_MB   loaded-model memory ceiling in MB (default 256)
+  - ML_BENCH_LATENCY_ROWS    single-row predictions timed per candidate (default 200)
+  - ML_BENCH_BATCH_SIZE      rows per batch prediction (default 256)
+  - ML_BENCH_BATCH_REPEATS   batch predictions timed per candidate (default 20)
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import logging
+import math
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from startup_profile import lazy_import
+
+joblib = lazy_import("joblib")
+
+logger = logging.getLogger(__name__)
+
+MAX_P99_MS = float(os.getenv("ML_BENCH_MAX_P99_MS", "20"))
+MAX_MEMORY_MB = float(os.getenv("ML_BENCH_MAX_MEMORY_MB", "256"))
+LATENCY_ROWS = int(os.getenv("ML_BENCH_LATENCY_ROWS", "200"))
+BATCH_SIZE = int(os.getenv("ML_BENCH_BATCH_SIZE", "256"))
+BATCH_REPEATS = int(os.getenv("ML_BENCH_BATCH_REPEATS", "20"))
+
+REPORT_FILE = "benchmark.json"
+
+# Primary quality metric per task, and whether higher is better
+OBJECTIVES = {"regression": ("mae", False), "classification": ("auc", True)}
+
+# (name, family, factory returning an unfitted estimator or pipeline)
+Candidate = Tuple[str, str, Callable[[], Any]]
+
+def _rows(X: Any, start: int, stop: int) -> Any:
+    return X.iloc[start:stop] if hasattr(X, "iloc") else X[start:stop]
+
+def _percentiles_ms(samples: List[float]) -> Tuple[float, float]:
+    if not samples:
+        return math.nan, math.nan
+    p50, p99 = np.percentile(np.asarray(samples) * 1000.0, [50, 99])
+    return round(float(p50), 4), round(float(p99), 4)
+
+def _predict_fn(model: Any, task: str) -> Callable[[Any], np.ndarray]:
+    if task == "classification" and hasattr(model, "predict_proba"):
+        return lambda X: model.predict_proba(X)[:, 1]
+    return model.predict
+
+def quality(model: Any, task: str, X_test: Any, y_test: Any) -> Dict[str, float]:
+    """Held-out MAE / R² (regression) or ROC-AUC (classification)."""
+    from sklearn.metrics import mean_absolute_error, r2_score, roc_auc_score
+
+    predicted = _predict_fn(model, task)(X_test)
+    if task == "regression":
+        return {"mae": float(mean_absolute_error(y_test, predicted)), "r2": float(r2_score(y_test, predicted))}
+    try:
+        return {"auc": float(roc_auc_score(y_test, predicted))}
+    except ValueError:  # a single class in the held-out rows
+        return {"auc": math.nan}
+
+def latency(model: Any, task: str, X_test: Any, rows: int = LATENCY_ROWS, batch_size: int = BATCH_SIZE,
+            repeats: int = BATCH_REPEATS) -> Dict[str, float]:
+    """Single-row and batch p50 / p99 prediction latency in milliseconds."""
+    predict = _predict_fn(model, task)
+    n = len(X_test)
+    if not n:
+        return {}
+    single = [_rows(X_test, i % n, i % n + 1) for i in range(max(1, rows))]
+    predict(single[0])  # warm-up (lazy buffers, thread pools)
+    samples = []
+    for row in single:
+        started = time.perf_counter()
+        predict(row)
+        samples.append(time.perf_counter() - started)
+    single_p50, single_p99 = _percentiles_ms(samples)
+    batch = _rows(X_test, 0, batch_size)
+    samples = []
+    for _ in range(max(1, repeats)):
+        started = time.perf_counter()
+        predict(batch)
+        samples.append(time.perf_counter() - started)
+    batch_p50, batch_p99 = _percentiles_ms(samples)
+    return {"single_p50_ms": single_p50, "single_p99_ms": single_p99,
+            "batch_rows": int(len(batch)), "batch_p50_ms": batch_p50, "batch_p99_ms": batch_p99}
+
+def footprint(model: Any) -> Dict[str, float]:
+    """Artifact size, load time and the memory the loaded model holds."""
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        path = os.path.join(tmp, "model.joblib")
+        joblib.dump(model, path)
+        size = os.path.getsize(path)
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+        loaded = joblib.load(path)
+        load_seconds = time.perf_counter() - started
+        after, _ = tracemalloc.get_traced_memory()
+        if not tracing:
+            tracemalloc.stop()
+        del loaded
+    return {"artifact_mb": round(size / 1e6, 4), "load_ms": round(load_seconds * 1000.0, 3),
+            "memory_mb": round(max(0, after - before) / 1e6, 4)}
+
+def benchmark(candidates: Sequence[Candidate], task: str, X_train: Any, y_train: Any, X_test: Any,
+              y_test: Any) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Fit and measure every candidate; returns (records, fitted models by name). Failed candidates are recorded with their error."""
+    records: List[Dict[str, Any]] = []
+    models: Dict[str, Any] = {}
+    for name, family, factory in candidates:
+        record: Dict[str, Any] = {"name": name, "family": family}
+        try:
+            started = time.perf_counter()
+            model = factory()
+            model.fit(X_train, y_train)
+            record["fit_seconds"] = round(time.perf_counter() - started, 3)
+            record.update(quality(model, task, X_test, y_test))
+            record.update(latency(model, task, X_test))
+            record.update(footprint(model))
+            models[name] = model
+        except Exception as e:
+            logger.warning(f"Benchmark candidate {name} failed: {e}")
+            record["error"] = str(e)
+        records.append(record)
+    return records, models
+
+def _dominates(a: Tuple[float, ...], b: Tuple[float, ...]) -> bool:
+    return all(x <= y for x, y in zip(a, b)) and any(x < y for x, y in zip(a, b))
+
+def select(records: List[Dict[str, Any]], task: str, max_p99_ms: float = MAX_P99_MS,
+           max_memory_mb: float = MAX_MEMORY_MB) -> Optional[Dict[str, Any]]:
+    """
+    Mark each record "feasible" (under both ceilings) and "pareto" (on the feasible
+    front of error, single-row p99 and memory); return the selected record.
+    """
+    metric, higher_is_better = OBJECTIVES[task]
+
+    def error(record):
+        value = record.get(metric)
+        if value is None or not math.isfinite(value):
+            return math.inf
+        return -value if higher_is_better else value
+
+    def costs(record):
+        return (error(record), record.get("single_p99_ms", math.inf), record.get("memory_mb", math.inf))
+
+    measured = [r for r in records if "error" not in r and math.isfinite(error(r))]
+    measured_ids = {id(r) for r in measured}
+    for r in records:
+        r["feasible"] = (id(r) in measured_ids and r.get("single_p99_ms", math.inf) <= max_p99_ms
+                         and r.get("memory_mb", math.inf) <= max_memory_mb)
+    feasible = [r for r in measured if r["feasible"]]
+    for r in records:
+        r["pareto"] = r["feasible"] and not any(_dominates(costs(o), costs(r)) for o in feasible if o is not r)
+    front = [r for r in feasible if r["pareto"]] or measured
+    if not front:
+        return None
+    return min(front, key=lambda r: (error(r), r.get("single_p99_ms", math.inf)))
+
+def run(candidates: Sequence[Candidate], task: str, X_train: Any, y_train: Any, X_test: Any, y_test: Any,
+        max_p99_ms: float = MAX_P99_MS, max_memory_mb: float = MAX_MEMORY_MB) -> Tuple[Optional[Any], Dict[str, Any]]:
+    """Benchmark ``candidates`` and select one; returns (fitted selected model or None, report)."""
+    started = time.perf_counter()
+    records, models = benchmark(candidates, task, X_train, y_train, X_test, y_test)
+    chosen = select(records, task, max_p99_ms, max_memory_mb)
+    report = {
+        "task": task,
+        "objective": OBJECTIVES[task][0],
+        "ceilings": {"single_p99_ms": max_p99_ms, "memory_mb": max_memory_mb},
+        "selected": chosen["name"] if chosen else None,
+        "ceilings_met": bool(chosen and chosen["feasible"]),
+        "train_rows": int(len(X_train)),
+        "test_rows": int(len(X_test)),
+        "candidates": records,
+        "benchmarked_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    if chosen is None:
+        logger.warning(f"No {task} benchmark candidate could be measured")
+    else:
+        logger.info(f"Benchmark selected {chosen['name']} ({report['objective']} {chosen.get(report['objective'])}, "
+                    f"p99 {chosen.get('single_p99_ms')} ms, {chosen.get('memory_mb')} MB)")
+    return (models.get(chosen["name"]) if chosen else None), report
+
+def save_report(report: Dict[str, Any], directory: str) -> str:
+    """Write ``report`` as benchmark.json in ``directory``; returns its path."""
+    path = os.path.join(directory, REPORT_FILE)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    return path
+
+__all__ = ["Candidate", "REPORT_FILE", "benchmark", "footprint", "latency", "quality", "run", "save_report", "select"]
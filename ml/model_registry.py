@@ -0,0 +1,679 @@
+# ml/model_registry.py
+"""
+Versioned model storage and the active model bundle.
+
+Training used to overwrite models/*.joblib in place and then reassign the
+module globals (models, column lists, encoders) one by one, so a concurrent
+/predict could pair a new model with old columns. Now every published model
+set is written to its own directory and served through one immutable
+ModelBundle. Activating a version builds the complete bundle first and then
+swaps a single reference.
+
+Layout under ML_MODELS_DIR (default "models"):
+  price_model.joblib, win_model.joblib, feature_meta.json
+                          bundled baseline models, served as version "baseline"
+  versions/<version>/     one directory per published version (same three files)
+  ACTIVE                  id of the active version (absent -> baseline)
+
+A version directory is written under a temporary name and renamed into place.
+ACTIVE is replaced with os.replace. Neither is ever seen half-written. Other
+processes sharing the directory pick up a new ACTIVE within
+ML_MODEL_REFRESH_SECONDS (default 10). A background thread reads ACTIVE and
+loads the new bundle; requests keep the current bundle until it is ready.
+
+Models trained for one tenant live in their own registry under
+tenants/<tenant>/ (same layout, without baseline files). TenantModels loads a
+tenant's registry on first use, one loader per tenant, and keeps at most
+ML_TENANT_MODEL_CACHE_ITEMS registries / ML_TENANT_MODEL_CACHE_MB of model
+files resident, evicting the least recently used. Tenants without models of
+their own are served the global bundle.
+
+When DATABASE_URL is set, published versions are also recorded in ml_models
+and its is_active flags follow activation.
+
+Shared model memory (ML_SHARED_MODELS, default on): every gunicorn worker
+used to unpickle its own copy of every model, and a retrain replaced those
+copies worker by worker. Now each forest / XGBoost model also has its
+flattened arrays (tree_engine.save_arrays) in <model file>.flat/. The arrays
+are written at publish time, or on first load for files written elsewhere,
+and rewritten when the model file changes (ml/models/*.flat/ is git-ignored:
+they are derived from the tracked baseline files). Workers map them with
+mmap_mode="r", so all workers share one physical copy through the page
+cache. The unpickled estimator graph is private to each worker: sklearn
+copies its tree arrays when it unpickles them. Once the flat arrays serve
+predictions, the bundle drops that graph and keeps a SharedModel that reloads
+it only when something other than prediction needs it (warm starts, the
+pandas fallback path). Pickles are also loaded with mmap_mode="r", which maps
+any plain numpy arrays they contain.
+"""
+
+from __future__ import annotations
+
+import copy
+import datetime
+import hashlib
+import json
+import logging
+import os
+import re
+import secrets
+import shutil
+import threading
+import time
+import traceback
+import warnings
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from feature_encoder import FastPredictor, compile_predictor
+from tree_engine import FlatTreeEnsemble, flatten
+from lru import LRUCache
+from startup_profile import lazy_import
+
+joblib = lazy_import("joblib")
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = os.getenv("ML_MODELS_DIR", "models")
+REFRESH_SECONDS = float(os.getenv("ML_MODEL_REFRESH_SECONDS", "10"))
+TENANT_CACHE_ITEMS = int(os.getenv("ML_TENANT_MODEL_CACHE_ITEMS", "32"))
+TENANT_CACHE_BYTES = int(float(os.getenv("ML_TENANT_MODEL_CACHE_MB", "512")) * 1024 * 1024)
+TENANT_LOCK_STRIPES = 64
+SHARED_MODELS = os.getenv("ML_SHARED_MODELS", "1").lower() not in ("0", "false", "no")
+BASELINE = "baseline"
+
+PRICE_FILE = "price_model.joblib"
+WIN_FILE = "win_model.joblib"
+META_FILE = "feature_meta.json"
+ACTIVE_FILE = "ACTIVE"
+FLAT_SUFFIX = ".flat"
+FLAT_SOURCE_FILE = "source.json"
+
+DEFAULT_BASE = ["area_m2", "materials_grade", "project_type", "lead_source", "region"]
+KNOWN_NUMERICS = {"area_m2", "num_emails_thread", "days_to_first_reply", "quote_value_gbp"}
+NUMERIC_HINTS = ("area", "num_", "days_", "value", "gbp", "amount", "count")
+
+class ModelNotFound(Exception):
+    """The requested model version does not exist."""
+
+def load_model(path: str):
+    try:
+        if not os.path.exists(path):
+            return None
+        # Load with joblib and handle sklearn compatibility issues
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", category=UserWarning)
+            warnings.filterwarnings("ignore", category=FutureWarning)
+            model = joblib.load(path, mmap_mode="r" if SHARED_MODELS else None)
+            # Test if model can make predictions (compatibility check)
+            if hasattr(model, 'predict'):
+                return model
+            else:
+                logger.warning(f"Model at {path} loaded but doesn't have predict method")
+                return None
+    except Exception as e:
+        logger.error(f"Failed to load model from {path}: {e}")
+        traceback.print_exc()
+        return None
+
+def _load_meta(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f) or {}
+    except Exception:
+        traceback.print_exc()
+        return {}
+
+# ----------------- shared (memory-mapped) models -----------------
+def final_estimator(model: Any) -> Any:
+    steps = getattr(model, "steps", None)
+    return steps[-1][1] if steps else model
+
+def _file_signature(path: str) -> Dict[str, int]:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def write_flat(model_path: str, model: Any) -> bool:
+    """Write the flattened arrays of ``model`` (saved at ``model_path``) to <model_path>.flat/; False if unsupported."""
+    flat = flatten(final_estimator(model))
+    if flat is None:
+        return False
+    directory = model_path + FLAT_SUFFIX
+    tmp = f"{directory}.tmp-{os.getpid()}-{secrets.token_hex(3)}"
+    try:
+        flat.save_arrays(tmp)
+        with open(os.path.join(tmp, FLAT_SOURCE_FILE), "w") as f:
+            json.dump(_file_signature(model_path), f)
+        shutil.rmtree(directory, ignore_errors=True)  # stale arrays; processes mapping them keep their pages
+        try:
+            os.rename(tmp, directory)
+        except OSError:
+            pass  # another process wrote it first
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return True
+
+def load_flat(model_path: str, model: Any) -> Optional[FlatTreeEnsemble]:
+    """
+    The flattened final estimator of ``model``, memory-mapped from <model_path>.flat/.
+    The arrays are written first if they are missing or older than the model file.
+    Returns None if the estimator cannot be flattened.
+    """
+    directory = model_path + FLAT_SUFFIX
+    try:
+        source = _load_meta(os.path.join(directory, FLAT_SOURCE_FILE))
+        if source != _file_signature(model_path) and not write_flat(model_path, model):
+            return None
+        return FlatTreeEnsemble.load_arrays(directory, original=final_estimator(model))
+    except Exception as e:
+        logger.warning(f"Could not map flattened arrays for {model_path}: {e}")
+        return None
+
+class _Deferred:
+    """Attribute access forwarded to an object produced on first use (a SharedModel's estimator)."""
+
+    def __init__(self, resolve):
+        self._resolve = resolve
+
+    def __getattr__(self, name: str):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+class SharedModel:
+    """
+    Stands in for a model whose predictions run on memory-mapped flat arrays.
+    For a bare estimator, predict / predict_proba use ``flat``. Any other use
+    (including a pipeline's own predict) loads the full model from ``path``
+    once, in this process only. The model's public methods are recorded up
+    front, so hasattr() checks do not trigger a load. copy.deepcopy returns a
+    copy of the full model.
+    """
+
+    def __init__(self, path: str, model: Any, flat: Optional[FlatTreeEnsemble] = None):
+        self.path = path
+        self.model_type = type(model).__name__
+        self._methods = frozenset(n for n in dir(type(model)) if not n.startswith("_")
+                                  and callable(getattr(type(model), n, None)) and hasattr(model, n))
+        self._flat = flat
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self) -> Any:
+        """The full model, unpickled on first use."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    model = load_model(self.path)
+                    if model is None:
+                        raise RuntimeError(f"Model file {self.path} could not be loaded")
+                    logger.info(f"Loaded the full {self.model_type} from {self.path} (pid {os.getpid()})")
+                    self._model = model
+        return self._model
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in self._methods:
+            if self._flat is not None and name in ("predict", "predict_proba"):
+                return getattr(self._flat, name)
+            return lambda *args, **kwargs: getattr(self.load(), name)(*args, **kwargs)
+        return getattr(self.load(), name)
+
+    def __bool__(self) -> bool:
+        return True
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(self.load(), memo)
+
+    def __repr__(self) -> str:
+        return f"SharedModel({self.model_type}, {self.path!r}, loaded={self.loaded})"
+
+# ----------------- expected columns discovery -----------------
+def _walk_estimators(obj):
+    if str(type(obj)).endswith("Pipeline'>") or getattr(obj, "steps", None):
+        for _, step in getattr(obj, "steps", []):
+            yield step
+            for inner in _walk_estimators(step):
+                yield inner
+    if hasattr(obj, "transformers"):
+        try:
+            for _name, trans, _cols in obj.transformers:  # type: ignore[attr-defined]
+                yield trans
+                if hasattr(trans, "transformers"):
+                    for inner in _walk_estimators(trans):
+                        yield inner
+        except Exception:
+            pass
+
+def expected_columns_from_model(model) -> List[str]:
+    cols: List[str] = []
+    for est in _walk_estimators(model):
+        if hasattr(est, "transformers"):
+            try:
+                for _name, _trans, _cols in est.transformers:  # type: ignore[attr-defined]
+                    if isinstance(_cols, (list, tuple, np.ndarray)):
+                        cols.extend([c for c in _cols if isinstance(c, str)])
+            except Exception:
+                continue
+    return _ordered_union(cols, [])
+
+def _ordered_union(primary: Iterable[str], extra: Iterable[str]) -> List[str]:
+    seen = set()
+    out: List[str] = []
+    for c in list(primary) + list(extra):
+        if c not in seen:
+            seen.add(c)
+            out.append(c)
+    return out
+
+def derive_columns(feature_meta: Dict[str, Any], price_model: Any, win_model: Any) -> Tuple[List[str], set, set]:
+    """(columns, numeric columns, categorical columns) from feature metadata and the models' own selectors."""
+    meta_cols = list(feature_meta.get("columns") or [])
+    price_cols = expected_columns_from_model(price_model) if price_model is not None else []
+    win_cols = expected_columns_from_model(win_model) if win_model is not None else []
+    columns = _ordered_union(_ordered_union(meta_cols or DEFAULT_BASE, price_cols), win_cols)
+
+    numeric = set(feature_meta.get("numeric_columns") or [])
+    categorical = set(feature_meta.get("categorical_columns") or [])
+    if not numeric and not categorical:
+        for col in columns:
+            if col in KNOWN_NUMERICS or any(h in col.lower() for h in NUMERIC_HINTS):
+                numeric.add(col)
+        categorical = set(c for c in columns if c not in numeric)
+    return columns, numeric, categorical
+
+class ModelBundle:
+    """
+    Everything /predict needs from one model version. Built completely before it
+    is published and never mutated afterwards: columns are tuples, sets are frozen.
+    """
+
+    def __init__(self, version: str, price_model: Any, win_model: Any, feature_meta: Dict[str, Any],
+                 path: Optional[str] = None):
+        columns, numeric, categorical = derive_columns(feature_meta, price_model, win_model)
+        self.version = version
+        self.path = path
+        self.price_model = price_model
+        self.win_model = win_model
+        self.feature_meta: Dict[str, Any] = dict(feature_meta)
+        self.columns: Tuple[str, ...] = tuple(columns)
+        self.numeric_columns: FrozenSet[str] = frozenset(numeric)
+        self.categorical_columns: FrozenSet[str] = frozenset(categorical)
+        self.price_fast: Optional[FastPredictor] = None
+        self.win_fast: Optional[FastPredictor] = None
+        self.shared: Dict[str, bool] = {}
+        for kind, name, model in (("price", PRICE_FILE, price_model), ("win", WIN_FILE, win_model)):
+            flat = load_flat(os.path.join(path, name), model) if path and SHARED_MODELS and model is not None else None
+            fast = compile_predictor(model, columns, numeric, categorical, flat=flat)
+            setattr(self, f"{kind}_fast", fast)
+            bare = getattr(model, "steps", None) is None
+            # Release the private estimator graph once the mapped arrays serve every prediction
+            self.shared[kind] = flat is not None and (fast is not None or bare)
+            if self.shared[kind]:
+                shared = SharedModel(os.path.join(path, name), model, flat if bare else None)
+                flat.original = _Deferred(lambda shared=shared: final_estimator(shared.load()))
+                setattr(self, f"{kind}_model", shared)
+        self.loaded_at = time.time()
+        # Size of the model files, the resident-size estimate used by TenantModels
+        self.nbytes = 0
+        if path:
+            for name in (PRICE_FILE, WIN_FILE):
+                try:
+                    self.nbytes += os.path.getsize(os.path.join(path, name))
+                except OSError:
+                    pass
+
+    @property
+    def active(self) -> bool:
+        """True when both models are available (otherwise /predict uses its fallbacks)."""
+        return self.price_model is not None and self.win_model is not None
+
+    @classmethod
+    def load(cls, version: str, path: str) -> "ModelBundle":
+        return cls(version, load_model(os.path.join(path, PRICE_FILE)), load_model(os.path.join(path, WIN_FILE)),
+                   _load_meta(os.path.join(path, META_FILE)), path)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "trained_at": self.feature_meta.get("trained_at"),
+            "tenant_id": self.feature_meta.get("tenant_id"),
+            "training_samples": self.feature_meta.get("training_samples"),
+            "models": {"price": self.price_model is not None, "win": self.win_model is not None},
+            "shared": self.shared,
+            "bytes": self.nbytes,
+        }
+
+class ModelRegistry:
+    """
+    Publishes, lists and activates model versions; ``active`` is the bundle to serve.
+    ``tenant_id`` (None for the global registry) scopes its ml_models rows.
+    """
+
+    def __init__(self, root: str = MODELS_DIR, refresh_seconds: float = REFRESH_SECONDS,
+                 tenant_id: Optional[str] = None):
+        self.root = root
+        self.tenant_id = tenant_id
+        self.versions_dir = os.path.join(root, "versions")
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        self._checked_at = time.monotonic()
+        self._bundle = self._load(self._read_active())
+
+    # ----------------- reading -----------------
+    @property
+    def active(self) -> ModelBundle:
+        """
+        The bundle to serve (a plain read). Activations made by other processes are
+        picked up by a background refresh, started at most every refresh_seconds,
+        so a request never reads ACTIVE or loads a bundle itself.
+        """
+        if self.refresh_seconds >= 0 and time.monotonic() - self._checked_at > self.refresh_seconds:
+            self._refresh_in_background()
+        return self._bundle
+
+    def _refresh_in_background(self):
+        if not self._refreshing.acquire(blocking=False):
+            return  # a refresh is already running
+        self._checked_at = time.monotonic()
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Model refresh of {self.root} failed: {e}")
+            finally:
+                self._refreshing.release()
+
+        threading.Thread(target=run, name="model-refresh", daemon=True).start()
+
+    def refresh(self):
+        self._checked_at = time.monotonic()
+        version = self._read_active()
+        if version != self._bundle.version:
+            with self._lock:
+                if version != self._bundle.version:
+                    self._bundle = self._load(version)
+                    logger.info(f"Model version {version} activated by another process")
+
+    def _read_active(self) -> str:
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE), "r") as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return BASELINE
+        if version != BASELINE and not os.path.isdir(os.path.join(self.versions_dir, version)):
+            logger.warning(f"Active model version {version} is missing; serving the baseline models")
+            return BASELINE
+        return version or BASELINE
+
+    def _version_path(self, version: str) -> str:
+        if version == BASELINE:
+            return self.root
+        if os.sep in version or version.startswith(".") or not os.path.isdir(os.path.join(self.versions_dir, version)):
+            raise ModelNotFound(f"Model version {version} not found")
+        return os.path.join(self.versions_dir, version)
+
+    def _load(self, version: str) -> ModelBundle:
+        return ModelBundle.load(version, self._version_path(version))
+
+    def versions(self) -> List[Dict[str, Any]]:
+        """All versions, oldest first (baseline, then published versions by id)."""
+        out = [{"version": BASELINE, **self._version_meta(self.root)}]
+        if os.path.isdir(self.versions_dir):
+            for name in sorted(os.listdir(self.versions_dir)):
+                if not name.startswith("."):
+                    out.append({"version": name, **self._version_meta(os.path.join(self.versions_dir, name))})
+        active = self._bundle.version
+        for v in out:
+            v["active"] = v["version"] == active
+        return out
+
+    @staticmethod
+    def _version_meta(path: str) -> Dict[str, Any]:
+        meta = _load_meta(os.path.join(path, META_FILE))
+        return {k: meta.get(k) for k in ("trained_at", "tenant_id", "training_samples", "price_mae", "price_r2", "win_mae",
+                                         "training_mode", "duration_seconds", "quality_delta")}
+
+    # ----------------- writing -----------------
+    def publish(self, price_model: Any, win_model: Any, feature_meta: Dict[str, Any], activate: bool = True,
+                reports: Optional[Dict[str, Any]] = None) -> ModelBundle:
+        """
+        Write a new version atomically and (by default) make it the active bundle.
+        ``reports`` maps file names to JSON documents stored alongside the models.
+        """
+        version = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S%f") + "-" + secrets.token_hex(3)
+        feature_meta = {**feature_meta, "version": version}
+        os.makedirs(self.versions_dir, exist_ok=True)
+        tmp = os.path.join(self.versions_dir, f".tmp-{version}")
+        os.makedirs(tmp)
+        try:
+            joblib.dump(price_model, os.path.join(tmp, PRICE_FILE))
+            joblib.dump(win_model, os.path.join(tmp, WIN_FILE))
+            if SHARED_MODELS:
+                write_flat(os.path.join(tmp, PRICE_FILE), price_model)
+                write_flat(os.path.join(tmp, WIN_FILE), win_model)
+            with open(os.path.join(tmp, META_FILE), "w") as f:
+                json.dump(feature_meta, f, indent=2)
+            for name, report in (reports or {}).items():
+                with open(os.path.join(tmp, os.path.basename(name)), "w") as f:
+                    json.dump(report, f, indent=2, default=str)
+            os.rename(tmp, os.path.join(self.versions_dir, version))
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        logger.info(f"Published model version {version}")
+        self._record(version, feature_meta)
+        if activate:
+            return self.activate(version)
+        return self._load(version)
+
+    def activate(self, version: str) -> ModelBundle:
+        """Load ``version`` completely, then swap it in and persist the ACTIVE pointer."""
+        bundle = self._load(version)
+        if not bundle.active:
+            raise ModelNotFound(f"Model version {version} has no loadable models")
+        with self._lock:
+            pointer = os.path.join(self.root, ACTIVE_FILE)
+            tmp = f"{pointer}.tmp-{os.getpid()}"
+            with open(tmp, "w") as f:
+                f.write(version)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, pointer)
+            self._bundle = bundle
+            self._checked_at = time.monotonic()
+        logger.info(f"Model version {version} is now active")
+        self._record_active(version)
+        return bundle
+
+    def rollback(self) -> ModelBundle:
+        """Activate the version published before the active one (the baseline is the oldest)."""
+        names = [v["version"] for v in self.versions()]
+        current = self._bundle.version
+        if current not in names or names.index(current) == 0:
+            raise ModelNotFound("No earlier model version to roll back to")
+        return self.activate(names[names.index(current) - 1])
+
+    # ----------------- ml_models bookkeeping -----------------
+    def _record(self, version: str, feature_meta: Dict[str, Any]):
+        if not os.getenv("DATABASE_URL"):
+            return
+        path = os.path.join(self.versions_dir, version)
+        price_r2 = feature_meta.get("price_r2")
+        win_mae = feature_meta.get("win_mae")
+        rows = [
+            ("price_model", "price_prediction", price_r2, os.path.join(path, PRICE_FILE)),
+            ("win_model", "win_probability", (1.0 - win_mae) if win_mae is not None else None, os.path.join(path, WIN_FILE)),
+        ]
+        try:
+            from db_config import get_db_manager
+            with get_db_manager().get_connection() as conn:
+                with conn.cursor() as cur:
+                    for name, model_type, accuracy, model_path in rows:
+                        if accuracy is not None and not -1.0 <= accuracy <= 1.0:
+                            accuracy = None
+                        cur.execute("""
+                            INSERT INTO ml_models (model_name, model_type, version, tenant_id,
+                                                   training_data_count, accuracy_score, model_path, is_active)
+                            VALUES (%s, %s, %s, %s, %s, %s, %s, FALSE)
+                        """, (name, model_type, version, self.tenant_id,
+                              feature_meta.get("training_samples"), accuracy, model_path))
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"Could not record model version {version} in ml_models: {e}")
+
+    def _record_active(self, version: str):
+        if not os.getenv("DATABASE_URL"):
+            return
+        try:
+            from db_config import get_db_manager
+            get_db_manager().execute_query(
+                "UPDATE ml_models SET is_active = (version = %s) WHERE model_name IN ('price_model', 'win_model') "
+                "AND tenant_id IS NOT DISTINCT FROM %s",
+                (version, self.tenant_id),
+            )
+        except Exception as e:
+            logger.warning(f"Could not mark model version {version} active in ml_models: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        bundle = self._bundle
+        return {**bundle.describe(), "root": self.root, "refresh_seconds": self.refresh_seconds}
+
+def _tenant_dirname(tenant_id: str) -> str:
+    safe = re.sub(r"[^A-Za-z0-9_-]", "_", tenant_id)[:64]
+    if safe != tenant_id:
+        safe += "-" + hashlib.sha1(tenant_id.encode("utf-8")).hexdigest()[:10]
+    return safe
+
+class TenantModels:
+    """Per-tenant registries, loaded lazily and kept in a bounded LRU; the global registry is the fallback."""
+
+    def __init__(self, fallback: ModelRegistry, root: Optional[str] = None, max_items: int = TENANT_CACHE_ITEMS,
+                 max_bytes: int = TENANT_CACHE_BYTES):
+        self.fallback = fallback
+        self.tenants_dir = os.path.join(root or fallback.root, "tenants")
+        self._cache = LRUCache(max_items=max_items, max_bytes=max_bytes, sizeof=lambda reg: reg._bundle.nbytes)
+        # Striped: a fixed set of locks, however many tenants are ever seen
+        self._locks = [threading.Lock() for _ in range(TENANT_LOCK_STRIPES)]
+        self.loads = 0
+
+    def _path(self, tenant_id: str) -> str:
+        return os.path.join(self.tenants_dir, _tenant_dirname(tenant_id))
+
+    def _tenant_lock(self, tenant_id: str) -> threading.Lock:
+        return self._locks[hash(tenant_id) % len(self._locks)]
+
+    def registry(self, tenant_id: str) -> Optional[ModelRegistry]:
+        """The tenant's registry (loaded on first use), or None if the tenant has no models of its own."""
+        registry = self._cache.get(tenant_id)
+        if registry is not None:
+            return registry
+        path = self._path(tenant_id)
+        if not os.path.isdir(path):
+            return None
+        # One loader per tenant; concurrent cold requests wait for it and share the result
+        with self._tenant_lock(tenant_id):
+            if tenant_id in self._cache:
+                registry = self._cache.get(tenant_id)
+                if registry is not None:
+                    return registry
+            registry = ModelRegistry(path, self.fallback.refresh_seconds, tenant_id)
+            self.loads += 1
+            self._cache.put(tenant_id, registry)
+            return registry
+
+    def active(self, tenant_id: Optional[str]) -> ModelBundle:
+        """The tenant's active bundle, or the global one if the tenant has none."""
+        if tenant_id:
+            registry = self.registry(tenant_id)
+            if registry is not None:
+                bundle = registry.active
+                if bundle.active:
+                    return bundle
+        return self.fallback.active
+
+    def own(self, tenant_id: Optional[str]) -> Optional[ModelBundle]:
+        """The bundle published for ``tenant_id`` itself (the global one for None); None if it has none."""
+        if not tenant_id:
+            return self.fallback.active
+        registry = self.registry(tenant_id)
+        bundle = registry.active if registry is not None else None
+        return bundle if bundle is not None and bundle.active else None
+
+    def _update(self, tenant_id: Optional[str], change) -> ModelBundle:
+        if not tenant_id:
+            return change(self.fallback)
+        with self._tenant_lock(tenant_id):
+            registry = self._cache.get(tenant_id)
+            if registry is None:
+                os.makedirs(self._path(tenant_id), exist_ok=True)
+                registry = ModelRegistry(self._path(tenant_id), self.fallback.refresh_seconds, tenant_id)
+            bundle = change(registry)
+            # Re-put so the LRU accounts for the new bundle's size
+            self._cache.put(tenant_id, registry)
+            return bundle
+
+    def publish(self, tenant_id: Optional[str], price_model: Any, win_model: Any, feature_meta: Dict[str, Any],
+                reports: Optional[Dict[str, Any]] = None) -> ModelBundle:
+        """Publish and activate a version for ``tenant_id`` (the global registry when None)."""
+        return self._update(tenant_id, lambda r: r.publish(price_model, win_model, feature_meta, reports=reports))
+
+    def activate(self, tenant_id: Optional[str], version: str) -> ModelBundle:
+        return self._update(tenant_id, lambda r: r.activate(version))
+
+    def rollback(self, tenant_id: Optional[str]) -> ModelBundle:
+        return self._update(tenant_id, lambda r: r.rollback())
+
+    def versions(self, tenant_id: Optional[str]) -> List[Dict[str, Any]]:
+        if not tenant_id:
+            return self.fallback.versions()
+        registry = self.registry(tenant_id)
+        if registry is None:
+            return []
+        # A tenant directory has no baseline files of its own
+        return [v for v in registry.versions() if v["version"] != BASELINE]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"loads": self.loads, **self._cache.stats()}
+
+# Global registry instances
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+_tenant_models: Optional[TenantModels] = None
+
+def get_model_registry() -> ModelRegistry:
+    """Get or create the global model registry (loads the active version on first use)."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
+
+def tenant_models_loaded() -> bool:
+    """True once get_tenant_models() has loaded the global models (checking does not trigger the load)."""
+    return _tenant_models is not None
+
+def get_tenant_models() -> TenantModels:
+    """Get or create the per-tenant model cache (falls back to get_model_registry())."""
+    global _tenant_models
+    if _tenant_models is None:
+        fallback = get_model_registry()
+        with _registry_lock:
+            if _tenant_models is None:
+                _tenant_models = TenantModels(fallback)
+    return _tenant_models
+
+__all__ = ["BASELINE", "ModelBundle", "ModelNotFound", "ModelRegistry", "SharedModel", "TenantModels", "derive_columns",
+           "expected_columns_from_model", "get_model_registry", "get_tenant_models", "load_flat", "load_model",
+           "tenant_models_loaded", "write_flat"]
@@ -0,0 +1,166 @@
+# ml/param_search.py
+"""
+Successive-halving hyperparameter search for the XGBoost price / win models.
+
+train.py --search uses this instead of fitting one hard-coded configuration
+per model:
+  - The training split is split again into fit / validation rows. The
+    ColumnTransformer is fitted once, and the one-hot-encoded matrices are
+    written to a temporary directory as .npy files. Workers map them with
+    mmap_mode="r" and keep them for the rest of the search, so no candidate
+    re-encodes or re-pickles the data.
+  - Every grid candidate is first fitted with a few boosting rounds. The best
+    1/ETA advance to a rung with ETA times the rounds, until max_rounds or a
+    single candidate is left.
+  - Candidates run on a process pool (one XGBoost thread each). The price
+    and win searches share the pool, so both models are searched at the same
+    time. The search stops at a wall-clock budget: queued candidates are
+    cancelled and the best result of the highest completed rung wins.
+
+Scores are validation MAE (price) and log loss (win); lower is better.
+
+Configuration (environment):
+  - ML_SEARCH_BUDGET    wall-clock seconds per search (default 120)
+  - ML_SEARCH_WORKERS   worker processes (default: cpu count)
+  - ML_SEARCH_ETA       successive-halving reduction factor (default 3)
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BUDGET_SECONDS = float(os.getenv("ML_SEARCH_BUDGET", "120"))
+WORKERS = int(os.getenv("ML_SEARCH_WORKERS", str(os.cpu_count() or 1)))
+ETA = max(2, int(os.getenv("ML_SEARCH_ETA", "3")))
+
+METRICS = {"price": "mae", "win": "logloss"}
+
+# ----------------- worker side -----------------
+_matrices: Dict[str, Dict[str, np.ndarray]] = {}
+
+def _load_matrices(data_dir: str) -> Dict[str, np.ndarray]:
+    """The encoded fit / validation arrays of a search, mapped once per worker process."""
+    arrays = _matrices.get(data_dir)
+    if arrays is None:
+        _matrices.clear()  # one search's data at a time
+        arrays = _matrices[data_dir] = {
+            name: np.load(os.path.join(data_dir, f"{name}.npy"), mmap_mode="r")
+            for name in ("X_fit", "y_fit", "X_val", "y_val")
+        }
+    return arrays
+
+def _evaluate(kind: str, data_dir: str, params: Dict[str, Any], deadline_at: float) -> Tuple[float, float]:
+    """Fit one candidate; returns (validation score, seconds)."""
+    if time.time() >= deadline_at:
+        raise TimeoutError("search budget exhausted before the candidate started")
+    from sklearn.metrics import log_loss, mean_absolute_error
+    from xgboost import XGBClassifier, XGBRegressor
+
+    started = time.perf_counter()
+    data = _load_matrices(data_dir)
+    if kind == "price":
+        model = XGBRegressor(**params).fit(data["X_fit"], data["y_fit"])
+        score = mean_absolute_error(data["y_val"], model.predict(data["X_val"]))
+    else:
+        model = XGBClassifier(**params).fit(data["X_fit"], data["y_fit"])
+        score = log_loss(data["y_val"], model.predict_proba(data["X_val"])[:, 1], labels=[0, 1])
+    return float(score), time.perf_counter() - started
+
+# ----------------- parent side -----------------
+def candidates(grid: Dict[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    """Every combination of the grid's values."""
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+def search_pool(workers: int = WORKERS) -> ProcessPoolExecutor:
+    """A pool for search() calls; spawned workers import only this module (not train.py)."""
+    return ProcessPoolExecutor(max_workers=max(1, workers), mp_context=multiprocessing.get_context("spawn"))
+
+def _dense(matrix) -> np.ndarray:
+    matrix = matrix.toarray() if hasattr(matrix, "toarray") else matrix
+    return np.ascontiguousarray(matrix, dtype=np.float32)
+
+def search(kind: str, pre, X, y, grid: Dict[str, Sequence[Any]], base_params: Dict[str, Any],
+           pool: ProcessPoolExecutor, budget_seconds: float = BUDGET_SECONDS,
+           min_rounds: int = 50, max_rounds: int = 400, eta: int = ETA) -> Optional[Dict[str, Any]]:
+    """
+    Successive halving over ``grid`` for ``kind`` ("price" or "win"). ``pre`` is an
+    unfitted ColumnTransformer; (X, y) are the training rows (the caller keeps its own
+    test split). Returns the winning parameters (base_params + grid values +
+    n_estimators) with the score and time spent, or None if no candidate finished.
+    """
+    from sklearn.base import clone
+    from sklearn.model_selection import train_test_split
+
+    started = time.perf_counter()
+    deadline_at = time.time() + budget_seconds
+    stratify = y if kind == "win" else None
+    X_fit, X_val, y_fit, y_val = train_test_split(X, y, test_size=0.25, random_state=42, stratify=stratify)
+    encoder = clone(pre).fit(X_fit)
+
+    evaluated = 0
+    best: Optional[Tuple[float, Dict[str, Any]]] = None
+    with tempfile.TemporaryDirectory(prefix=f"search-{kind}-") as data_dir:
+        for name, values in (("X_fit", _dense(encoder.transform(X_fit))), ("y_fit", np.asarray(y_fit)),
+                             ("X_val", _dense(encoder.transform(X_val))), ("y_val", np.asarray(y_val))):
+            np.save(os.path.join(data_dir, f"{name}.npy"), values)
+
+        alive = candidates(grid)
+        rounds = min(min_rounds, max_rounds)
+        while alive:
+            params = [{**base_params, **c, "n_estimators": rounds, "n_jobs": 1} for c in alive]
+            futures = {pool.submit(_evaluate, kind, data_dir, p, deadline_at): p for p in params}
+            results: List[Tuple[float, Dict[str, Any]]] = []
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=max(0.0, deadline_at - time.time()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        score, _ = future.result()
+                    except Exception as e:
+                        logger.debug(f"[{kind}] candidate skipped: {e}")
+                        continue
+                    if math.isfinite(score):
+                        results.append((score, futures[future]))
+                if time.time() >= deadline_at:
+                    for future in pending:
+                        future.cancel()
+                    break
+            evaluated += len(results)
+            timed_out = time.time() >= deadline_at
+            if results and (len(results) == len(params) or best is None):
+                results.sort(key=lambda r: r[0])
+                best = results[0]
+            if timed_out or not results or rounds >= max_rounds or len(results) == 1:
+                break
+            keep = max(1, math.ceil(len(results) / eta))
+            alive = [{k: p[k] for k in grid} for _, p in results[:keep]]
+            rounds = min(rounds * eta, max_rounds)
+
+    if best is None:
+        return None
+    score, params = best
+    params = {k: v for k, v in params.items() if k != "n_jobs"}
+    return {
+        "params": params,
+        "metric": METRICS[kind],
+        "score": round(score, 6),
+        "candidates": len(candidates(grid)),
+        "evaluated": evaluated,
+        "budget_seconds": budget_seconds,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+__all__ = ["BUDGET_SECONDS", "WORKERS", "candidates", "search", "search_pool"]
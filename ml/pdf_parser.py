@@ -1,20 +1,27 @@
 # ml/pdf_parser.py
 from __future__ import annotations
 import io
+import os
 import re
-from typing import List, Dict, Any
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 
-# Try to import PyMuPDF for native text extraction (optional at runtime)
-try:
-    import fitz  # type: ignore
-except Exception:
-    fitz = None  # type: ignore
+from deadline import expired, remaining
+from startup_profile import lazy_import
+from quote_lexer import AREA, BLANK, CURRENCY_PRICE, DATE, DIMENSION, HEADER, TokenStream, tokenize
+from supplier_registry import GENERIC, HEADER_LINES, SupplierRegistry
 
-# Try to import PyPDF2 as a lightweight fallback when PyMuPDF is unavailable
-try:
-    from PyPDF2 import PdfReader  # type: ignore
-except Exception:
-    PdfReader = None  # type: ignore
+# Bump whenever extraction or parsing output changes so cached results
+# (see extract_cache.py) computed by older code are not reused.
+PARSER_VERSION = "4"
+
+# PyMuPDF for native text extraction (optional at runtime). Both PDF libraries
+# are imported on first use, not when the service starts (see startup_profile.py).
+fitz = lazy_import("fitz", optional=True)
+
+# PyPDF2 as a lightweight fallback when PyMuPDF is unavailable
+PyPDF2 = lazy_import("PyPDF2", optional=True)
 
 def _extract_text_pymupdf(pdf_bytes: bytes) -> str:
     """Best-effort text extraction using PyMuPDF. Returns '' if unavailable."""
@@ -34,10 +41,10 @@ def _extract_text_pymupdf(pdf_bytes: bytes) -> str:
 
 def _extract_text_pypdf(pdf_bytes: bytes) -> str:
     """Fallback text extraction using PyPDF2 when PyMuPDF is unavailable."""
-    if not PdfReader:
+    if not PyPDF2:
         return ""
     try:
-        reader = PdfReader(io.BytesIO(pdf_bytes))  # type: ignore
+        reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))  # type: ignore
         parts: List[str] = []
         for page in reader.pages:
             try:
@@ -50,32 +57,129 @@ def _extract_text_pypdf(pdf_bytes: bytes) -> str:
     except Exception:
         return ""
 
-def _ocr_pages(pdf_bytes: bytes, max_pages: int = 5) -> str:
+# OCR tuning (environment). Each page is rendered and recognised on its own, so
+# at most OCR_CONCURRENCY page bitmaps are alive at any time.
+OCR_MAX_PAGES = int(os.getenv("ML_OCR_MAX_PAGES", "5"))
+OCR_CONCURRENCY = max(1, int(os.getenv("ML_OCR_CONCURRENCY", str(min(4, os.cpu_count() or 1)))))
+OCR_DPI = int(os.getenv("ML_OCR_DPI", "200"))
+
+def _pdf_page_count(pdf_bytes: bytes) -> int:
+    """Page count without rendering anything. Returns 0 if it cannot be determined."""
+    if fitz:
+        try:
+            with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+                return int(doc.page_count)
+        except Exception:
+            pass
+    if PyPDF2:
+        try:
+            return len(PyPDF2.PdfReader(io.BytesIO(pdf_bytes)).pages)  # type: ignore
+        except Exception:
+            pass
+    return 0
+
+def _ocr_page_texts(pdf_bytes: bytes, pages: List[int], deadline_at: Optional[float] = None) -> Dict[int, str]:
     """
-    Optional OCR fallback on first few pages.
-    If pdf2image/Pillow/pytesseract are missing (e.g., on Render without system deps),
-    this returns '' and we just rely on PyMuPDF text.
+    OCR the given 1-based pages and return {page_no: text}.
+    Pages are rendered lazily one at a time and recognised in parallel across
+    up to OCR_CONCURRENCY threads (tesseract runs as a subprocess, so threads
+    scale across cores); each bitmap is released as soon as it is recognised.
+    With ``deadline_at`` (epoch seconds) pages not started in time are skipped
+    and poppler/tesseract are killed when the deadline passes; such pages are
+    missing from the result.
+    Returns {} if pdf2image/Pillow/pytesseract are missing.
     """
     try:
-        from pdf2image import convert_from_bytes  # type: ignore
+        from pdf2image import convert_from_path  # type: ignore
         import pytesseract  # type: ignore
         from PIL import Image  # type: ignore
     except Exception:
-        return ""
+        return {}
+
+    pages = sorted(set(p for p in pages if p >= 1))
+    if not pages:
+        return {}
+
+    # Each tesseract process should use one core; parallelism comes from running pages side by side
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
 
     try:
-        images = convert_from_bytes(pdf_bytes, fmt="png", first_page=1, last_page=max_pages, dpi=200)
-        out: List[str] = []
-        for img in images:
-            try:
-                txt = pytesseract.image_to_string(img) or ""
-                if txt.strip():
-                    out.append(txt)
-            except Exception:
-                pass
-        return "\n".join(out).strip()
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+            # pdf2image writes bytes to a temp file on every call; do it once and render per page from the path
+            tmp.write(pdf_bytes)
+            tmp.flush()
+
+            def time_left() -> Optional[float]:
+                left = remaining(deadline_at)
+                if left is not None and left <= 0:
+                    raise TimeoutError
+                return left
+
+            def ocr_page(page_no: int) -> Optional[str]:
+                try:
+                    left = time_left()
+                    images = convert_from_path(tmp.name, first_page=page_no, last_page=page_no, dpi=OCR_DPI,
+                                               timeout=left)
+                except TimeoutError:
+                    return None
+                except Exception:
+                    return None if expired(deadline_at) else ""
+                try:
+                    out = []
+                    for img in images:
+                        left = time_left()
+                        # pytesseract kills the tesseract process after `timeout` seconds (0 = no limit)
+                        out.append(pytesseract.image_to_string(img, timeout=left or 0) or "")
+                    return "\n".join(out)
+                except TimeoutError:
+                    return None
+                except Exception:
+                    return None if expired(deadline_at) else ""
+                finally:
+                    for img in images:
+                        img.close()
+                    del images
+
+            workers = min(OCR_CONCURRENCY, len(pages))
+            if workers <= 1:
+                results = [ocr_page(p) for p in pages]
+            else:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(ocr_page, pages))
+        return {p: t for p, t in zip(pages, results) if t is not None}
     except Exception:
-        return ""
+        return {}
+
+def _ocr_pages(pdf_bytes: bytes, max_pages: Optional[int] = None, pages: Optional[List[int]] = None,
+               deadline_at: Optional[float] = None) -> str:
+    """
+    Optional OCR fallback on the first few pages (or on explicit 1-based ``pages``),
+    capped at ``max_pages`` (default OCR_MAX_PAGES).
+    If pdf2image/Pillow/pytesseract are missing (e.g., on Render without system deps),
+    this returns '' and we just rely on PyMuPDF text.
+    """
+    budget = OCR_MAX_PAGES if max_pages is None else max_pages
+    if pages is None:
+        count = _pdf_page_count(pdf_bytes)
+        pages = list(range(1, (min(count, budget) if count else budget) + 1))
+    pages = sorted(set(p for p in pages if p >= 1))[:max(0, budget)]
+    texts = _ocr_page_texts(pdf_bytes, pages, deadline_at)
+    out = [texts[p] for p in pages if texts.get(p, "").strip()]
+    return "\n".join(out).strip()
+
+def _text_quality(text: str) -> Dict[str, float]:
+    """Character-class ratios used by the gibberish heuristics."""
+    clean = text.replace(' ', '').replace('\n', '').replace('\r', '').replace('\t', '')
+    n_clean = len(clean)
+    alpha_count = sum(1 for c in clean if c.isalnum())
+    extended_ascii_count = sum(1 for c in clean if ord(c) > 127)
+    delimiter_count = sum(1 for c in text if c in ' .,;:\'"')
+    return {
+        "chars": float(n_clean),
+        "alpha_ratio": alpha_count / n_clean if n_clean else 0.0,
+        "extended_ratio": extended_ascii_count / n_clean if n_clean else 0.0,
+        "delimiter_ratio": delimiter_count / len(text) if text else 0.0,
+    }
 
 def _is_gibberish(text: str) -> bool:
     """
@@ -85,540 +189,615 @@ def _is_gibberish(text: str) -> bool:
     if not text or len(text) < 20:
         return True
 
-    # Remove whitespace for analysis
-    clean = text.replace(' ', '').replace('\n', '').replace('\r', '').replace('\t', '')
-    if not clean:
+    q = _text_quality(text)
+    # Nothing but whitespace
+    if not q["chars"]:
         return True
-
-    # Count alphanumeric characters
-    alpha_count = sum(1 for c in clean if c.isalnum())
-    alpha_ratio = alpha_count / len(clean) if len(clean) > 0 else 0
-
     # If less than 60% alphanumeric, it's likely gibberish
-    if alpha_ratio < 0.6:
+    if q["alpha_ratio"] < 0.6:
+        return True
+    # If more than 30% extended ASCII (common in encoding issues), it's likely gibberish
+    if q["extended_ratio"] > 0.3:
+        return True
+    # If delimiters (spaces, punctuation) are too sparse, it's likely gibberish
+    if q["delimiter_ratio"] < 0.05:
         return True
 
-    # Check for excessive extended ASCII (common in encoding issues)
-    extended_ascii_count = sum(1 for c in clean if ord(c) > 127)
-    extended_ascii_ratio = extended_ascii_count / len(clean) if len(clean) > 0 else 0
+    return False
 
-    # If more than 30% extended ASCII, it's likely gibberish
-    if extended_ascii_ratio > 0.3:
-        return True
+# ----------------- per-page extraction routing -----------------
+# A page whose images cover at least this fraction of its area and which has
+# little or no text layer is treated as scanned and sent to OCR.
+SCANNED_IMAGE_COVERAGE = float(os.getenv("ML_SCANNED_IMAGE_COVERAGE", "0.5"))
+# Pages with fewer text characters than this are too short to judge as gibberish.
+MIN_JUDGEABLE_CHARS = 20
 
-    # Check for absence of meaningful delimiters (e.g., spaces, punctuation)
-    delimiter_count = sum(1 for c in text if c in ' .,;:\'"')
-    delimiter_ratio = delimiter_count / len(text) if len(text) > 0 else 0
+def _page_image_coverage(page: Any) -> float:
+    """Fraction of the page area covered by raster images (0..1)."""
+    try:
+        page_rect = page.rect
+        page_area = float(page_rect.width * page_rect.height) or 1.0
+        covered = 0.0
+        for info in page.get_image_info():
+            bbox = fitz.Rect(info.get("bbox")) & page_rect  # type: ignore[union-attr]
+            if not bbox.is_empty:
+                covered += float(bbox.width * bbox.height)
+        return min(1.0, covered / page_area)
+    except Exception:
+        return 0.0
 
-    # If delimiters are too sparse, it's likely gibberish
-    if delimiter_ratio < 0.05:
-        return True
+def _plan_page(page: Any, index: int) -> Dict[str, Any]:
+    """
+    Inspect one PyMuPDF page and decide how its text should be obtained.
+    Returns a provenance dict with the PyMuPDF text and the chosen route
+    ("pymupdf", "ocr" or "blank").
+    """
+    text = page.get_text("text") or ""
+    if not text.strip():
+        text = page.get_text("blocks") or ""
+        if not isinstance(text, str):
+            text = ""
+    try:
+        fonts = page.get_fonts()
+    except Exception:
+        fonts = []
+    coverage = _page_image_coverage(page)
+    stripped = text.strip()
+    rect = page.rect
+    area_k = max(1.0, float(rect.width * rect.height) / 1000.0)
+    gibberish = len(stripped) >= MIN_JUDGEABLE_CHARS and _is_gibberish(text)
 
-    return False
+    if gibberish:
+        route = "ocr"
+    elif len(stripped) < MIN_JUDGEABLE_CHARS and coverage >= SCANNED_IMAGE_COVERAGE:
+        route = "ocr"
+    elif not stripped:
+        route = "blank"
+    else:
+        route = "pymupdf"
 
+    return {
+        "page": index + 1,
+        "route": route,
+        "method": route,
+        "text": text,
+        "chars": len(stripped),
+        "gibberish": gibberish,
+        "image_coverage": round(coverage, 3),
+        "fonts": len(fonts),
+        "text_density": round(len(stripped) / area_k, 3),
+    }
 
-def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
+def extract_pdf(pdf_bytes: bytes, deadline_at: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Per-page extraction with provenance.
+
+    Every page is read once with PyMuPDF and routed on its own metadata (image
+    coverage, fonts, text density, gibberish score): good pages keep their text
+    layer, only scanned or garbled pages go to OCR (a single batched OCR pass,
+    capped at OCR_MAX_PAGES), and only pages OCR could not fix fall back to
+    PyPDF2. No stage runs twice.
+
+    With ``deadline_at`` (epoch seconds, see deadline.py) the remaining budget is
+    checked between pages and stages: pages left unread, OCR skipped or cut
+    short, and the PyPDF2 pass are dropped, and the best text gathered so far
+    (e.g. the text layer without OCR) is returned with ``truncated`` set.
+
+    Returns {"text", "method", "pages": [per-page provenance], "stages": {stage: pages},
+    "stages_completed": [stage, ...], "truncated": bool}.
+    Without PyMuPDF the legacy whole-document chain (PyPDF2 then OCR) is used.
+    """
+    if not fitz:
+        text, method = _extract_text_whole_document(pdf_bytes, deadline_at=deadline_at)
+        return _whole_document_result(text, method, deadline_at)
+
+    try:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    except Exception:
+        text, method = _extract_text_whole_document(pdf_bytes, skip_pymupdf=True, deadline_at=deadline_at)
+        return _whole_document_result(text, method, deadline_at)
+
+    truncated = False
+    completed: List[str] = []
+    with doc:
+        plans: List[Dict[str, Any]] = []
+        for index, page in enumerate(doc):
+            if expired(deadline_at):
+                # Only the first N pages made it; the rest are not part of the result
+                truncated = True
+                break
+            try:
+                plans.append(_plan_page(page, index))
+            except Exception:
+                plans.append({"page": index + 1, "route": "ocr", "method": "ocr", "text": "", "chars": 0,
+                              "gibberish": True, "image_coverage": 0.0, "fonts": 0, "text_density": 0.0})
+    if not truncated:
+        completed.append("pymupdf")
+
+    # No text layer anywhere (e.g. text drawn as vector paths): OCR is the only option
+    if plans and not any(p["chars"] for p in plans):
+        for plan in plans:
+            if plan["route"] == "blank":
+                plan["route"] = plan["method"] = "ocr"
+
+    stages: Dict[str, int] = {"pymupdf": len(plans)}
+    ocr_wanted = [p["page"] for p in plans if p["route"] == "ocr"]
+    ocr_pages = ocr_wanted[:max(0, OCR_MAX_PAGES)]
+    ocr_texts: Dict[int, str] = {}
+    if ocr_pages and not expired(deadline_at):
+        ocr_texts = _ocr_page_texts(pdf_bytes, ocr_pages, deadline_at)
+        stages["ocr"] = len(ocr_texts)
+    if ocr_pages:
+        if deadline_at is not None and len(ocr_texts) < len(ocr_pages):
+            truncated = True
+        else:
+            completed.append("ocr")
+
+    unresolved: List[Dict[str, Any]] = []
+    for plan in plans:
+        if plan["route"] != "ocr":
+            continue
+        ocr = ocr_texts.get(plan["page"], "")
+        if ocr.strip() and not _is_gibberish(ocr):
+            plan["text"], plan["method"] = ocr, "ocr"
+        else:
+            unresolved.append(plan)
+
+    # Last resort for pages OCR could not fix (OCR unavailable, over budget, or still garbled)
+    reader = None
+    if unresolved and PyPDF2 and expired(deadline_at):
+        truncated = True
+    elif unresolved and PyPDF2:
+        try:
+            reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))  # type: ignore
+            stages["pypdf"] = len(unresolved)
+            completed.append("pypdf")
+        except Exception:
+            reader = None
+    for plan in unresolved:
+        alt = ""
+        if reader is not None and not expired(deadline_at):
+            try:
+                alt = reader.pages[plan["page"] - 1].extract_text() or ""
+            except Exception:
+                alt = ""
+        ocr = ocr_texts.get(plan["page"], "")
+        if alt.strip() and not _is_gibberish(alt):
+            plan["text"], plan["method"] = alt, "pypdf"
+        elif ocr.strip():
+            # Prefer OCR output over a garbled text layer, as the whole-document chain did
+            plan["text"], plan["method"] = ocr, "ocr"
+        elif alt.strip() and not plan["text"].strip():
+            plan["text"], plan["method"] = alt, "pypdf"
+        else:
+            plan["method"] = "pymupdf" if plan["text"].strip() else "blank"
+
+    text = "\n".join(p["text"] for p in plans).strip()
+    methods = set(p["method"] for p in plans if p["method"] != "blank" and p["text"].strip())
+    if not methods:
+        method = "none"
+    elif len(methods) == 1:
+        method = methods.pop()
+    else:
+        method = "mixed"
+    pages = [{k: v for k, v in p.items() if k != "text"} for p in plans]
+    return {"text": text, "method": method, "pages": pages, "stages": stages,
+            "stages_completed": completed, "truncated": truncated}
+
+def _whole_document_result(text: str, method: str, deadline_at: Optional[float]) -> Dict[str, Any]:
+    # The legacy chain has no per-stage bookkeeping; running out of time means a stage may have been skipped
+    truncated = expired(deadline_at)
+    return {"text": text, "method": method, "pages": [], "stages": {method: 0},
+            "stages_completed": [] if truncated else [method], "truncated": truncated}
+
+def _extract_text_whole_document(pdf_bytes: bytes, skip_pymupdf: bool = False,
+                                 deadline_at: Optional[float] = None) -> Tuple[str, str]:
     """
-    Public API used by main.py.
+    Legacy whole-document fallback chain, used when PyMuPDF is unavailable
+    or cannot open the file:
     1) Try PyMuPDF
     2) Check if result is gibberish, if so try OCR
     3) Fallback to PyPDF2 if available
     4) Final fallback to OCR (if libs present)
     """
-    text = _extract_text_pymupdf(pdf_bytes)
+    ocr: Optional[str] = None
+    text = "" if skip_pymupdf else _extract_text_pymupdf(pdf_bytes)
     if text.strip() and not _is_gibberish(text):
-        return text
+        return text, "pymupdf"
     
     # If PyMuPDF gave us gibberish, try OCR immediately
-    if text.strip() and _is_gibberish(text):
-        ocr = _ocr_pages(pdf_bytes, max_pages=5)
+    if text.strip() and _is_gibberish(text) and not expired(deadline_at):
+        ocr = _ocr_pages(pdf_bytes, deadline_at=deadline_at)
         if ocr.strip() and not _is_gibberish(ocr):
-            return ocr
+            return ocr, "ocr"
 
     # Lightweight fallback that works without native dependencies.
+    if expired(deadline_at):
+        return (text, "pymupdf") if text.strip() else (ocr or "", "ocr" if ocr else "none")
     text = _extract_text_pypdf(pdf_bytes)
     if text.strip() and not _is_gibberish(text):
-        return text
+        return text, "pypdf"
+
+    # Only try OCR if other methods failed to get anything useful (and never twice)
+    if ocr is None and not expired(deadline_at):
+        ocr = _ocr_pages(pdf_bytes, deadline_at=deadline_at)
+    if ocr:
+        return ocr, "ocr"
+    return text or "", ("pypdf" if text else "none")  # Return even gibberish text if OCR fails
 
-    # Only try OCR if other methods failed to get anything useful.
-    ocr = _ocr_pages(pdf_bytes, max_pages=5)
-    return ocr or text or ""  # Return even gibberish text if OCR fails
 
-def parse_quote_lines_from_text(text: str) -> Dict[str, Any]:
+def extract_text_with_method(pdf_bytes: bytes) -> Tuple[str, str]:
     """
-    Enhanced parser to extract both individual line items and totals from supplier quotes.
-    Returns a dict with:
-      - currency (str|None)
-      - lines (list[dict]) individual line items with description, qty, unit_price
-      - detected_totals (list[float]) raw total candidates
-      - estimated_total (float|None) chosen total candidate
-      - confidence (float) 0..1 rough confidence score
-      - supplier (str|None) detected supplier name
+    Same as extract_text_from_pdf_bytes but also reports which extractor
+    produced the text: "pymupdf", "ocr", "pypdf", "mixed" or "none".
     """
-    if not text:
-        return {
-            "currency": None,
-            "lines": [],
-            "detected_totals": [],
-            "estimated_total": None,
-            "confidence": 0.0,
-            "supplier": None,
-        }
+    result = extract_pdf(pdf_bytes)
+    return result["text"], result["method"]
+
+def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
+    """Public API used by main.py. See extract_pdf for the per-page routing."""
+    return extract_text_with_method(pdf_bytes)[0]
+
+# ----------------- whole-text patterns -----------------
+# Each is paired with the lowercase literals every match must contain, so the
+# regex is skipped outright for documents that cannot match (see TokenStream.search).
+_CURRENCY_SYMBOL = re.compile(r"(?P<cur>£|\$|€)")
+_CURRENCY_CODES = [(code, re.compile(rf"\b{code}\b", re.IGNORECASE)) for code in ("GBP", "EUR", "USD")]
+
+_SUPPLIER_PATTERNS = [re.compile(p, re.IGNORECASE | re.MULTILINE) for p in [
+    r"(?:invoice|quotation|quote)\s+from\s+([A-Z][A-Za-z\s&]+?)(?:\n|$)",
+    r"(?:supplier|vendor)\s*[:\-]?\s*([A-Z][A-Za-z\s&]+?)(?:\n|$)",
+    r"^([A-Z][A-Za-z\s&]+?)\s*(?:ltd|limited|inc|corp|company)\.?\s*$",
+]]
+_SUPPLIER_NOT_A_NAME = re.compile(r"\b(outside|inside|left|right)\b", re.IGNORECASE)
+
+_DELIVERY_WORD = re.compile(r'delivery', re.IGNORECASE)
 
-    # Extract currency symbol or code (support GBP/EUR/USD when symbol is missing)
-    currency = None
-    mcur = re.search(r"(?P<cur>£|\$|€)", text)
+_ITEM_PATTERNS = [
+    (re.compile(r"([A-Za-z\s]+(?:door|window|frame|installation|hardware|handle|lock|glass).*?)\s+[£$€]\s*(\d+(?:,\d{3})*(?:\.\d{2})?)", re.IGNORECASE),
+     ("door", "window", "frame", "installation", "hardware", "handle", "lock", "glass")),
+    (re.compile(r"(\d+\s*(?:x\s*)?[A-Za-z\s]+)\s+[£$€]\s*(\d+(?:,\d{3})*(?:\.\d{2})?)", re.IGNORECASE), ()),
+]
+_ITEM_CURRENCY = ("£", "$", "€")
+_LEADING_QTY = re.compile(r"(\d+)\s*(?:x\s*)?")
+_LEADING_QTY_PREFIX = re.compile(r"^\d+\s*x?\s*")
+
+_TOTAL_PATTERNS = [(re.compile(p, re.IGNORECASE), lits) for p, lits in [
+    (r"grand\s+total\s*[:\-]?\s*[£$€]?\s*(\d[\d,]*\.?\d*)", ("total",)),
+    (r"total\s*(?:due|amount)?\s*[:\-]?\s*[£$€]?\s*(\d[\d,]*\.?\d*)", ("total",)),
+    (r"balance\s*due\s*[:\-]?\s*[£$€]?\s*(\d[\d,]*\.?\d*)", ("balance",)),
+    (r"sub.*total\s*[:\-]?\s*[£$€]?\s*(\d[\d,]*\.?\d*)", ("total",)),
+    (r"total\s+invoice\s*[:\-]?\s*[£$€]?\s*(\d[\d,]*\.?\d*)", ("total",)),
+    (r"total\s+investment\s*[:\-]?\s*[£$€]?\s*(\d[\d,]*\.?\d*)", ("total",)),
+]]
+_NON_NUMERIC = re.compile(r"[^\d\.]")
+
+def _item(description: str, qty: float, unit_price: float, total: float) -> Dict[str, Any]:
+    return {"description": description, "qty": qty, "unit_price": unit_price, "total": total}
+
+# ----------------- supplier quote stages -----------------
+# parse_quote_lines_from_text runs the generic pipeline below; supplier parsers
+# registered in SUPPLIERS combine only the stages their documents need.
+
+def _detect_currency(stream: TokenStream) -> Optional[str]:
+    """Currency symbol, or GBP/EUR/USD code when the symbol is missing (e.g. "Price, GBP")."""
+    mcur = stream.search(_CURRENCY_SYMBOL, *_ITEM_CURRENCY)
     if mcur:
-        currency = mcur.group("cur")
-    else:
-        # Look for common currency codes used in table headers like "Price, GBP"
-        if re.search(r"\bGBP\b", text, re.IGNORECASE):
-            currency = "GBP"
-        elif re.search(r"\bEUR\b", text, re.IGNORECASE):
-            currency = "EUR"
-        elif re.search(r"\bUSD\b", text, re.IGNORECASE):
-            currency = "USD"
-
-    # Extract supplier name (look for common patterns)
-    supplier = None
-    # Prefer explicit known suppliers to avoid false positives like "from the outside"
-    if re.search(r"\bLANGVALDA\b", text, re.IGNORECASE) or re.search(r"@langvalda\.lt", text, re.IGNORECASE):
-        supplier = "Langvalda"
-    elif re.search(r"\bWealden\s+Joinery\b", text, re.IGNORECASE):
-        supplier = "Wealden Joinery"
-    elif re.search(r"\bWoodleys\b", text, re.IGNORECASE):
-        supplier = "Woodleys"
-    else:
-        # Restrict generic patterns to the top section of the document
-        head = "\n".join(text.split("\n")[:80])
-        supplier_patterns = [
-            r"(?:invoice|quotation|quote)\s+from\s+([A-Z][A-Za-z\s&]+?)(?:\n|$)",
-            r"(?:supplier|vendor)\s*[:\-]?\s*([A-Z][A-Za-z\s&]+?)(?:\n|$)",
-            r"^([A-Z][A-Za-z\s&]+?)\s*(?:ltd|limited|inc|corp|company)\.?\s*$",
-        ]
-        for pat in supplier_patterns:
-            match = re.search(pat, head, re.IGNORECASE | re.MULTILINE)
-            if match:
-                cand = match.group(1).strip()
-                # Avoid capturing phrases like "the outside"
-                if not re.search(r"\b(outside|inside|left|right)\b", cand, re.IGNORECASE):
-                    supplier = cand
-                    break
+        return mcur.group("cur")
+    for code, pattern in _CURRENCY_CODES:
+        if stream.search(pattern, code.lower()):
+            return code
+    return None
 
-    # Extract line items from table-like structures
-    lines = []
-    
-    # Enhanced patterns for supplier quote tables
-    table_patterns = [
-        # Pattern: Number. Description [spaces] Qty [spaces] Unit Price [spaces] Total
-        r"^\s*\d+\.\s*(.+?)\s+(\d+(?:\.\d+)?)\s+[£$€]\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s+[£$€]\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*$",
-        # Pattern: Description [spaces] Qty [spaces] £Unit Price [spaces] £Total  
-        r"^(.+?)\s+(\d+(?:\.\d+)?)\s+[£$€]\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s+[£$€]\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*$",
-        # Pattern: Unit Price [spaces] Qty [spaces] Total (for lines with price before qty)
-        r"^(\d+(?:,\d{3})*(?:\.\d{2})?)\s+(\d+)\s+(\d+(?:,\d{3})*(?:\.\d{2})?)\s*$",
-    # Pattern: Description [spaces] Qty [spaces] Unit Price (no currency symbols, must have decimals)
-    r"^(.+?)\s+(\d+(?:\.\d+)?)\s+(\d+(?:,\d{3})*\.\d{2})\s*$",
-        # Pattern: Description £Price (assuming qty=1)
-        r"^(.+?)\s+[£$€]\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*$",
-        # Pattern: Qty x Description @ £Price
-        r"^(\d+(?:\.\d+)?)\s*x?\s*(.+?)\s*@\s*[£$€]?\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*$",
-    ]
-    
-    text_lines = text.split('\n')
-    
-    # First pass: look for structured table data where each number is on its own line
-    # This handles formats like:
-    # Dimensions line (2475x2058mm)
-    # Area line (5.09m²)
-    # Price line (4321.86)
-    # [blank line]
-    # Qty line (1)
-    # Total line (4321.86)
+def _detect_supplier_name(stream: TokenStream) -> Optional[str]:
+    """Generic supplier-name heuristics, restricted to the top section of the document."""
+    head = "\n".join(stream.lines[:HEADER_LINES])
+    for pattern in _SUPPLIER_PATTERNS:
+        match = pattern.search(head)
+        if match:
+            cand = match.group(1).strip()
+            # Avoid capturing phrases like "the outside"
+            if not _SUPPLIER_NOT_A_NAME.search(cand):
+                return cand
+    return None
+
+def _stacked_column_items(stream: TokenStream) -> List[Dict[str, Any]]:
+    """
+    Structured table data where each number is on its own line.
+    This handles formats like:
+      Dimensions line (2475x2058mm)
+      Area line (5.09m²)
+      Price line (4321.86)
+      [blank line]
+      Qty line (1)
+      Total line (4321.86)
+    """
+    tokens = stream.tokens
+    n = len(tokens)
+    lines: List[Dict[str, Any]] = []
     i = 0
     pending_description = None
     pending_specs = []
     in_quotation_section = False
     seen_langvalda_header = False  # Tracks header triplet: Price, GBP / pcs / Total, GBP
-    
-    while i < len(text_lines):
-        line = text_lines[i].strip()
-        
-        if not line:
-            i += 1
-            continue
-        
-        # Skip dates (e.g., "22 07 2025")
-        if re.match(r'^\d{1,2}\s+\d{1,2}\s+\d{4}$', line):
+
+    while i < n:
+        tok = tokens[i]
+        kind = tok.kind
+        line = tok.text
+
+        # Skip blanks and dates (e.g., "22 07 2025")
+        if kind == BLANK or kind == DATE:
             i += 1
             continue
-            
+
         # Toggle section on brochure-style PDFs
-        if re.search(r'^(Detailed Quotation|Ref|Description)$', line, re.IGNORECASE):
+        if tok.section_start:
             in_quotation_section = True
-        if re.search(r'^(Subtotal|VAT|Total Investment|Wealden Joinery Triple Guarantee|Terms & Conditions|Contact Information)$', line, re.IGNORECASE):
+        if tok.section_end:
             in_quotation_section = False
 
-        # Skip obvious header/footer lines  
-        if re.search(r'^(Price,?\s*GBP|pcs|Total,?\s*GBP|Quantity|Pcs:|m2:|Total weight:|TOTAL INVOICE|All prices|Item|Description|Unit|Cost|Validity|Unit / Line|Line Total)', line, re.IGNORECASE):
+        # Skip obvious header/footer lines
+        if kind == HEADER:
             # LANGVALDA table header tokens mark a local table context
-            if re.search(r'^(Price,?\s*GBP|pcs|Total,?\s*GBP)$', line, re.IGNORECASE):
+            if tok.langvalda_header:
                 seen_langvalda_header = True
             # Reset pending when we hit table headers
-            if re.search(r'^(Item|Description|Qty|Unit|Cost)', line, re.IGNORECASE):
+            if tok.header_reset:
                 pending_description = None
                 pending_specs = []
             i += 1
             continue
-        
-        # Check if this is a dimension line (e.g., "2475x2058mm" or just "880mm")
-        if re.match(r'^\d+x\d+mm', line) or re.match(r'^\d+mm$', line):
+
+        # Dimension lines (e.g., "2475x2058mm" or just "880mm")
+        if kind == DIMENSION:
             pending_specs.append(line)
             i += 1
             continue
 
         # Reset local table context when obvious section changes occur
-        if re.search(r'^(LANGVALDA /|TOTAL INVOICE|The quote is valid)', line, re.IGNORECASE):
+        if tok.langvalda_reset:
             seen_langvalda_header = False
-        
-        # Check if this is an area line (e.g., "5.09m²")
-        if re.match(r'^\d+(?:\.\d+)?m[²2]$', line, re.IGNORECASE):
+
+        # Area lines (e.g., "5.09m²")
+        if kind == AREA:
             pending_specs.append(line)
             i += 1
             continue
 
         # Handle TYPE lines of the form "TYPE" then next line "C"
-        if in_quotation_section and re.match(r'^TYPE\s*$', line, re.IGNORECASE):
-            if i + 1 < len(text_lines):
-                code = text_lines[i + 1].strip()
-                if re.match(r'^[A-Z0-9]{1,3}$', code):
-                    pending_description = f"TYPE {code}"
-                    i += 2
-                    continue
-        
-        # Check if this looks like a unit price with currency symbol (e.g., "£1,274.24")
-        price_with_currency = re.match(r'^[£$€]\s*(\d+(?:,\d{3})*\.\d{2})$', line)
-        if price_with_currency and (pending_description or pending_specs):
-            unit_price = float(price_with_currency.group(1).replace(',', ''))
-            
-            # Look ahead for total on next line (also with currency)
-            # But first we might need to find qty
-            qty = None
-            total = None
-            
+        if in_quotation_section and tok.type_marker and i + 1 < n and tokens[i + 1].short_code:
+            pending_description = f"TYPE {tokens[i + 1].text}"
+            i += 2
+            continue
+
+        # A unit price with currency symbol (e.g., "£1,274.24")
+        if kind == CURRENCY_PRICE and (pending_description or pending_specs):
+            unit_price = tok.currency_price
+
             # Look backwards for qty - should be a line with just a number a few lines back
-            for back_idx in range(max(0, i-5), i):
-                back_line = text_lines[back_idx].strip()
-                # Look for a standalone number (quantity)
-                if re.match(r'^\d+$', back_line):
-                    qty = float(back_line)
+            qty = None
+            for back_idx in range(max(0, i - 5), i):
+                if tokens[back_idx].bare_int:
+                    qty = tokens[back_idx].qty
                     break
-            
+
             # Look ahead for total (next non-blank line with currency)
-            j = i + 1
-            while j < len(text_lines) and not text_lines[j].strip():
-                j += 1
-            
-            if j < len(text_lines):
-                total_line = text_lines[j].strip()
-                total_match = re.match(r'^[£$€]\s*(\d+(?:,\d{3})*\.\d{2})$', total_line)
-                if total_match:
-                    total = float(total_match.group(1).replace(',', ''))
-                    
-                    if qty and (in_quotation_section or seen_langvalda_header or pending_description):
-                        # We have everything!
-                        description_parts = []
-                        if pending_description:
-                            description_parts.append(pending_description)
-                        description_parts.extend(pending_specs)
-                        
-                        description = ' '.join(description_parts)
-                        
-                        lines.append({
-                            "description": description,
-                            "qty": qty,
-                            "unit_price": unit_price,
-                            "total": total
-                        })
-                        
-                        # Reset and jump ahead
-                        pending_description = None
-                        pending_specs = []
-                        i = j + 1
-                        continue
+            j = stream.next_nonblank(i + 1)
+            if j < n and tokens[j].currency_price is not None:
+                total = tokens[j].currency_price
+                if qty and (in_quotation_section or seen_langvalda_header or pending_description):
+                    # We have everything!
+                    description_parts = [pending_description] if pending_description else []
+                    description_parts.extend(pending_specs)
+                    lines.append(_item(' '.join(description_parts), qty, unit_price, total))
+
+                    # Reset and jump ahead
+                    pending_description = None
+                    pending_specs = []
+                    i = j + 1
+                    continue
             # Special case: delivery fixed charge with only one currency amount (no qty/total lines)
-            if (pending_description and re.search(r'delivery', pending_description, re.IGNORECASE)) and (in_quotation_section or pending_description):
-                description_parts = []
-                if pending_description:
-                    description_parts.append(pending_description)
-                description_parts.extend(pending_specs)
-                description = ' '.join(description_parts)
-                lines.append({
-                    "description": description,
-                    "qty": 1.0,
-                    "unit_price": unit_price,
-                    "total": unit_price
-                })
+            if pending_description and _DELIVERY_WORD.search(pending_description):
+                description = ' '.join([pending_description] + pending_specs)
+                lines.append(_item(description, 1.0, unit_price, unit_price))
                 pending_description = None
                 pending_specs = []
                 i += 1
                 continue
-        
-        # Check if this looks like a unit price (decimal number, possibly with commas)
+
+        # A unit price (decimal number, possibly with commas)
         # But make sure we have some context (description or specs) first
-        price_match = re.match(r'^(\d+(?:,\d{3})*\.\d{2})$', line)
-        if price_match and (pending_description or pending_specs) and (in_quotation_section or seen_langvalda_header):
-            unit_price = float(price_match.group(1).replace(',', ''))
-            
-            # Look ahead for qty and total on next lines
-            qty = None
-            total = None
-            
-            # Skip blank lines
-            j = i + 1
-            while j < len(text_lines) and not text_lines[j].strip():
-                j += 1
-            
-            # Next should be quantity (could be "1" or "1 pc.")
-            if j < len(text_lines):
-                qty_line = text_lines[j].strip()
-                qty_match = re.match(r'^(\d+(?:\.\d+)?)\s*(?:pc\.?|pcs\.?)?$', qty_line, re.IGNORECASE)
-                if qty_match:
-                    qty = float(qty_match.group(1))
-                    j += 1
-                    
-                    # Skip blank lines again
-                    while j < len(text_lines) and not text_lines[j].strip():
-                        j += 1
-                    
-                    # Next should be total
-                    if j < len(text_lines):
-                        total_line = text_lines[j].strip()
-                        total_match = re.match(r'^(\d+(?:,\d{3})*\.\d{2})$', total_line)
-                        if total_match:
-                            total = float(total_match.group(1).replace(',', ''))
-                            
-                            # We found a complete line item!
-                            description_parts = []
-                            if pending_description:
-                                description_parts.append(pending_description)
-                            description_parts.extend(pending_specs)
-                            
-                            description = ' '.join(description_parts)
-                            
-                            lines.append({
-                                "description": description,
-                                "qty": qty,
-                                "unit_price": unit_price,
-                                "total": total
-                            })
-                            
-                            # Reset and jump ahead
-                            pending_description = None
-                            pending_specs = []
-                            i = j + 1
-                            continue
-        
+        if tok.price is not None and (pending_description or pending_specs) and (in_quotation_section or seen_langvalda_header):
+            # Next non-blank should be quantity (could be "1" or "1 pc."), then the total
+            j = stream.next_nonblank(i + 1)
+            if j < n and tokens[j].qty is not None:
+                qty = tokens[j].qty
+                j = stream.next_nonblank(j + 1)
+                if j < n and tokens[j].price is not None:
+                    # We found a complete line item!
+                    description_parts = [pending_description] if pending_description else []
+                    description_parts.extend(pending_specs)
+                    lines.append(_item(' '.join(description_parts), qty, tok.price, tokens[j].price))
+
+                    # Reset and jump ahead
+                    pending_description = None
+                    pending_specs = []
+                    i = j + 1
+                    continue
+
         # Check if this looks like a description line
         # Must contain letters and not be a header or specification detail
-        if re.search(r'[a-zA-Z]{3,}', line):
+        if tok.has_word:
             # Skip company/supplier names at the top
-            if re.search(r'(FENSTERCRAFT|Popieriaus|langvalda|GROUP|^JMS\s+\d|Wealden Joinery)', line, re.IGNORECASE):
+            if tok.company:
                 i += 1
                 continue
-            
-            # Skip reference lines
-            if re.search(r'Offer #|Reference|Brought Forward|Carried Forward|Quotation Number|Date of Quotation|QUOTATION', line, re.IGNORECASE):
-                # Reset pending description if we hit these
+
+            # Skip reference lines, resetting any pending description
+            if tok.reference:
                 pending_description = None
                 pending_specs = []
                 i += 1
                 continue
-            
-            # Special handling for "Type:" lines - extract the actual product description
-            type_match = re.match(r'^\d+\.\s*Type:\s*(.+)$', line, re.IGNORECASE)
-            if type_match and not pending_description:
-                pending_description = type_match.group(1).strip()
+
+            # "Type:" lines - extract the actual product description
+            if tok.type_text is not None and not pending_description:
+                pending_description = tok.type_text
                 i += 1
                 continue
-            
-            # Special handling for product lines like "Screen - (TYPE C)" or "Door"
-            product_match = re.match(r'^(Screen|Door|Window|Frame)\s*[-\s]*(\(TYPE\s+[A-Z0-9]+\))?', line, re.IGNORECASE)
-            if product_match and not pending_description:
-                pending_description = line.strip()
+
+            # Product lines like "Screen - (TYPE C)" or "Door"
+            if tok.product and not pending_description:
+                pending_description = line
                 i += 1
                 continue
-            
-            # Special handling for "Delivery" lines - grab next line too if it continues
-            if re.search(r'^Delivery|^Shipping', line, re.IGNORECASE):
+
+            # "Delivery" lines - grab next line too if it continues
+            if tok.delivery_start:
                 desc_parts = [line]
-                # Check if next line continues the description (has letters, no numbers at start)
-                if i + 1 < len(text_lines):
-                    next_line = text_lines[i + 1].strip()
-                    if next_line and re.search(r'^[\(\[]', next_line):  # Starts with ( or [
-                        desc_parts.append(next_line)
-                        i += 1
+                # Check if next line continues the description (starts with ( or [)
+                if i + 1 < n and tokens[i + 1].text and tokens[i + 1].opens_bracket:
+                    desc_parts.append(tokens[i + 1].text)
+                    i += 1
                 pending_description = ' '.join(desc_parts)
             elif not pending_description:  # Only set if we don't have one yet
-                # Product codes like "FD1" can be good descriptions
-                if re.match(r'^[A-Z]{2,}\d+$', line):
+                # Product codes like "FD1" can be good descriptions; skip specs, terms and contact info
+                if tok.product_code or tok.plain_description:
                     pending_description = line
-                # Skip numbered specification lines (1. Type:, 2. Wood:, etc.)
-                elif not re.match(r'^\d+\.\s*(Type:|Wood:|Finish:|Glass:|Fittings:|Water|sealing:)', line, re.IGNORECASE):
-                    # Skip other spec patterns
-                    if not re.match(r'^(View from|edge |double cylinder)', line):
-                        # Also skip lines that look like they're part of terms/conditions
-                        if not re.search(r'(valid for|excl\. VAT|unloading|tempered panes|Thank you for|represent your|your booking|Price is for|Price does not|Project Overview|Client Details|Specification|Highlights|Project Scope|Unit / Line|Line Total|Ref)', line, re.IGNORECASE):
-                            # Skip contact info and website
-                            if not re.search(r'(\+\d{3}|www\.|@|Tel\.|Email|Telephone:|Phone:|Address:)', line):
-                                pending_description = line
-        
+
         i += 1
-    
-    # Second pass: traditional single-line parsing
-    for line in text_lines:
-        line = line.strip()
-        if not line or len(line) < 10:  # Skip very short lines
-            continue
-            
-        # Skip header lines and footer lines
-        skip_patterns = [
-            r"(description|item|quantity|qty|price|total|sub.*total)",
-            r"(vat|tax|delivery|payment|terms|contact|phone|email|address|business\s+hours)",
-            r"^(subtotal|grand.*total|balance|amount.*due)",
-            r"^\s*[£$€]\s*[\d,]+\.?\d*\s*$",  # Lines with only money amounts
-            r"^(Wealden Joinery|Project Overview|Client Details|Specification|Highlights|Project Scope)$",
-        ]
-        
-        should_skip = False
-        for skip_pattern in skip_patterns:
-            if re.search(skip_pattern, line, re.IGNORECASE):
-                should_skip = True
-                break
-        
-        if should_skip:
-            continue
-            
-        # Try each pattern
-        for i, pattern in enumerate(table_patterns):
-            match = re.match(pattern, line, re.IGNORECASE)
-            if match:
-                if i == 0:  # Number. Description Qty Unit Price Total
-                    description = match.group(1).strip()
-                    qty = float(match.group(2))
-                    unit_price = float(match.group(3).replace(',', ''))
-                    total = float(match.group(4).replace(',', ''))
-                elif i == 1:  # Description Qty £Unit Price £Total
-                    description = match.group(1).strip()
-                    qty = float(match.group(2))
-                    unit_price = float(match.group(3).replace(',', ''))
-                    total = float(match.group(4).replace(',', ''))
-                elif i == 2:  # Unit Price Qty Total (numbers only)
-                    # This is just numbers, skip it as we handled it above
-                    continue
-                elif i == 3:  # Description Qty Unit Price
-                    description = match.group(1).strip()
-                    qty = float(match.group(2))
-                    unit_price = float(match.group(3).replace(',', ''))
-                    total = qty * unit_price
-                elif i == 4:  # Description Price (qty=1)
-                    description = match.group(1).strip()
-                    qty = 1.0
-                    unit_price = float(match.group(2).replace(',', ''))
-                    total = unit_price
-                elif i == 5:  # Qty x Description @ Price
-                    qty = float(match.group(1))
-                    description = match.group(2).strip()
-                    unit_price = float(match.group(3).replace(',', ''))
-                    total = qty * unit_price
-                
-                # Filter out likely non-item lines
-                skip_keywords = ['total', 'subtotal', 'vat', 'tax', 'delivery', 'shipping', 'discount', 'payment', 'terms', 'reference', 'invoice']
-                if not any(keyword in description.lower() for keyword in skip_keywords) and len(description) > 3:
-                    lines.append({
-                        "description": description,
-                        "qty": qty,
-                        "unit_price": unit_price,
-                        "total": total
-                    })
-                break
 
-    # If no structured lines found, try to extract from more freeform text
-    if not lines:
-        # Look for "Delivery" followed by price and quantity on next line
-        # Pattern: Delivery to London area TBC* \n 990.01  1 pc.  990.01
-        for i, line in enumerate(text_lines):
-            if re.search(r'delivery|shipping', line, re.IGNORECASE):
-                # Check next few lines for pricing
-                for j in range(i+1, min(i+4, len(text_lines))):
-                    next_line = text_lines[j].strip()
-                    delivery_match = re.match(r'(\d+(?:,\d{3})*(?:\.\d{2})?)\s+(\d+)\s*(?:pc|pcs)?\.?\s+(\d+(?:,\d{3})*(?:\.\d{2})?)', next_line)
-                    if delivery_match:
-                        unit_price = float(delivery_match.group(1).replace(',', ''))
-                        qty = float(delivery_match.group(2))
-                        total = float(delivery_match.group(3).replace(',', ''))
-                        
-                        lines.append({
-                            "description": line.strip(),
-                            "qty": qty,
-                            "unit_price": unit_price,
-                            "total": total
-                        })
-                        break
-        
-        # Look for patterns like "Door £500" or "Window installation £300"
-        item_patterns = [
-            r"([A-Za-z\s]+(?:door|window|frame|installation|hardware|handle|lock|glass).*?)\s+[£$€]\s*(\d+(?:,\d{3})*(?:\.\d{2})?)",
-            r"(\d+\s*(?:x\s*)?[A-Za-z\s]+)\s+[£$€]\s*(\d+(?:,\d{3})*(?:\.\d{2})?)",
-        ]
-        
-        for pattern in item_patterns:
-            for match in re.finditer(pattern, text, re.IGNORECASE):
-                description = match.group(1).strip()
-                price = float(match.group(2).replace(',', ''))
-                
-                # Extract quantity if present in description
-                qty_match = re.search(r"(\d+)\s*(?:x\s*)?", description)
-                if qty_match:
-                    qty = float(qty_match.group(1))
-                    description = re.sub(r"^\d+\s*x?\s*", "", description).strip()
-                    unit_price = price / qty if qty > 0 else price
-                else:
-                    qty = 1.0
-                    unit_price = price
-                
-                lines.append({
-                    "description": description,
-                    "qty": qty,
-                    "unit_price": unit_price,
-                    "total": price
-                })
-
-    # Extract totals using existing logic
-    total_patterns = [
-        r"grand\s+total\s*[:\-]?\s*[£$€]?\s*(\d[\d,]*\.?\d*)",
-        r"total\s*(?:due|amount)?\s*[:\-]?\s*[£$€]?\s*(\d[\d,]*\.?\d*)",
-        r"balance\s*due\s*[:\-]?\s*[£$€]?\s*(\d[\d,]*\.?\d*)",
-        r"sub.*total\s*[:\-]?\s*[£$€]?\s*(\d[\d,]*\.?\d*)",
-        r"total\s+invoice\s*[:\-]?\s*[£$€]?\s*(\d[\d,]*\.?\d*)",
-        r"total\s+investment\s*[:\-]?\s*[£$€]?\s*(\d[\d,]*\.?\d*)",
-    ]
+    return lines
+
+def _table_row_items(stream: TokenStream) -> List[Dict[str, Any]]:
+    """Traditional single-line table rows (description, qty and prices on one line)."""
+    return [dict(tok.table_item) for tok in stream.tokens if tok.table_item is not None]
+
+def _delivery_row_items(stream: TokenStream) -> List[Dict[str, Any]]:
+    """
+    "Delivery" lines followed by price and quantity within the next few lines.
+    Pattern: Delivery to London area TBC* \\n 990.01  1 pc.  990.01
+    """
+    lines: List[Dict[str, Any]] = []
+    if not stream.has("delivery", "shipping"):
+        return lines
+    tokens = stream.tokens
+    n = len(tokens)
+    for i, tok in enumerate(tokens):
+        if tok.delivery_mention:
+            for j in range(i + 1, min(i + 4, n)):
+                row = tokens[j].delivery_row
+                if row:
+                    unit_price, qty, total = row
+                    lines.append(_item(tok.text, qty, unit_price, total))
+                    break
+    return lines
+
+def _freeform_items(stream: TokenStream) -> List[Dict[str, Any]]:
+    """Free-form text: delivery rows, then patterns like "Door £500" or "Window installation £300"."""
+    lines = _delivery_row_items(stream)
+    if not stream.has(*_ITEM_CURRENCY):
+        return lines
+    for pattern, literals in _ITEM_PATTERNS:
+        for match in stream.finditer(pattern, *literals):
+            description = match.group(1).strip()
+            price = float(match.group(2).replace(',', ''))
 
+            # Extract quantity if present in description
+            qty_match = _LEADING_QTY.search(description)
+            if qty_match:
+                qty = float(qty_match.group(1))
+                description = _LEADING_QTY_PREFIX.sub("", description).strip()
+                unit_price = price / qty if qty > 0 else price
+            else:
+                qty = 1.0
+                unit_price = price
+
+            lines.append(_item(description, qty, unit_price, price))
+    return lines
+
+def _detect_totals(stream: TokenStream) -> List[float]:
     candidates: List[float] = []
-    for pat in total_patterns:
-        for m in re.finditer(pat, text, flags=re.IGNORECASE):
-            num = m.group(1)
-            num = re.sub(r"[^\d\.]", "", num)
+    for pat, literals in _TOTAL_PATTERNS:
+        for m in stream.finditer(pat, *literals):
+            num = _NON_NUMERIC.sub("", m.group(1))
             try:
                 val = float(num)
                 if val > 0:
                     candidates.append(val)
             except Exception:
                 pass
+    return candidates
+
+def _column_items(stream: TokenStream) -> List[Dict[str, Any]]:
+    """
+    Stacked columns (Langvalda's Price, GBP / pcs / Total, GBP; Wealden's "Detailed
+    Quotation" £unit / £total lines) together with the one-line rows both mix in
+    (extras, installation, older layouts).
+    """
+    return _stacked_column_items(stream) + _table_row_items(stream)
+
+def _generic_items(stream: TokenStream) -> List[Dict[str, Any]]:
+    # If no structured lines found, try to extract from more freeform text
+    return _column_items(stream) or _freeform_items(stream)
+
+SUPPLIERS = SupplierRegistry()
+SUPPLIERS.register("Langvalda", _column_items, names=["LANGVALDA"], domains=["langvalda.lt"],
+                   header_triplets=[("Price, GBP", "pcs", "Total, GBP")])
+SUPPLIERS.register("Wealden Joinery", _column_items, names=["Wealden Joinery"])
+# No layout-specific parser yet: named, but parsed by the generic path
+SUPPLIERS.register("Woodleys", names=["Woodleys"])
+
+def parse_quote_lines_from_text(text: str, fingerprints: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Enhanced parser to extract both individual line items and totals from supplier quotes.
+    Documents whose header matches a registered supplier fingerprint (or one of the
+    tenant ``fingerprints``, see supplier_registry.tenant_fingerprints) run that
+    supplier's parser, and the generic pipeline only if it finds no lines.
+    Returns a dict with:
+      - currency (str|None)
+      - lines (list[dict]) individual line items with description, qty, unit_price
+      - detected_totals (list[float]) raw total candidates
+      - estimated_total (float|None) chosen total candidate
+      - confidence (float) 0..1 rough confidence score
+      - supplier (str|None) detected supplier name
+      - parser (str) which parser produced the lines ("generic" or a supplier key)
+    """
+    if not text:
+        return {
+            "currency": None,
+            "lines": [],
+            "detected_totals": [],
+            "estimated_total": None,
+            "confidence": 0.0,
+            "supplier": None,
+            "parser": GENERIC,
+        }
+
+    stream = tokenize(text)
+    currency = _detect_currency(stream)
+
+    match = SUPPLIERS.match(stream, fingerprints or ())
+    parser = GENERIC
+    lines: List[Dict[str, Any]] = []
+    if match is not None:
+        supplier = match.name
+        if match.parse:
+            lines = match.parse(stream)
+            parser = match.key
+    else:
+        supplier = _detect_supplier_name(stream)
+    if not lines:
+        lines = _generic_items(stream)
+        parser = GENERIC
+
+    candidates = _detect_totals(stream)
 
     # Calculate estimated total
     estimated = None
     confidence = 0.0
-    
+
     if lines:
         # If we have line items, calculate total from them
         calculated_total = sum(line.get("total", 0) for line in lines)
@@ -640,9 +819,10 @@ def parse_quote_lines_from_text(text: str) -> Dict[str, Any]:
         "estimated_total": estimated,
         "confidence": confidence,
         "supplier": supplier,
+        "parser": parser,
     }
 
-def parse_totals_from_text(text: str) -> Dict[str, Any]:
+def parse_totals_from_text(text: str, fingerprints: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
     """
     Legacy function that previously did basic total extraction.
     Now delegates to the enhanced parser for full line item extraction.
@@ -655,8 +835,57 @@ def parse_totals_from_text(text: str) -> Dict[str, Any]:
       - confidence (float) 0..1 rough confidence score
     """
     # Delegate to the enhanced parser for full line item extraction
-    return parse_quote_lines_from_text(text)
+    return parse_quote_lines_from_text(text, fingerprints)
+
+_CLIENT_NAME = re.compile(r"^([A-Z][A-Za-z\s]+)$", re.MULTILINE)
+_CLIENT_DETAILS = [(key, re.compile(p, re.IGNORECASE), lit) for key, p, lit in [
+    ("reference", r"Reference\s*([A-Za-z0-9]+)", "reference"),
+    ("estimate_number", r"Estimate Number\s*([A-Za-z0-9]+)", "estimate"),
+    ("estimate_date", r"Date of Estimate\s*(\d{1,2}\s+\w+\s+\d{4})", "estimate"),
+    ("validity", r"Validity\s*(\d+\s+days)", "validity"),
+]]
+_LOCATION_PATTERNS = [
+    re.compile(r"([A-Z][A-Za-z\s]+(?:Church|School|Hospital|Centre|Hall|Building))", re.MULTILINE),
+    _CLIENT_NAME,  # Generic location line
+]
+_PROJECT_TYPES = [("windows", re.compile(r"window|sash|frame", re.IGNORECASE), ("window", "sash", "frame")),
+                  ("doors", re.compile(r"door|entrance", re.IGNORECASE), ("door", "entrance")),
+                  ("joinery", re.compile(r"joinery|timber|wood", re.IGNORECASE), ("joinery", "timber", "wood"))]
+
+def _first_label(stream: TokenStream, options: List[Tuple[Any, str, Tuple[str, ...]]]) -> Any:
+    """Value of the first (value, pattern, literals) option whose pattern occurs in the text."""
+    for value, pattern, literals in options:
+        if stream.search(pattern, *literals):
+            return value
+    return None
 
+_GLAZING_TYPES = [(v, re.compile(p, re.IGNORECASE), lits) for v, p, lits in [
+    ("Vacuum Glass", r"vacuum\s+glass|vacuum\s+glazing", ("vacuum",)),
+    ("Triple Glazing", r"triple\s+glaz", ("triple",)),
+    ("Single Glazing", r"single\s+glaz", ("single",)),
+    ("Standard Double Glazing", r"double\s+glaz|glazing", ("glaz",)),
+]]
+# (pattern, *literals), ready to splat into TokenStream.search
+_CURVES = (re.compile(r"arch|curved|radius|bespoke.*curve|arched", re.IGNORECASE), "arch", "curve", "radius")
+_PREMIUM_HARDWARE = (re.compile(r"premium\s+hardware|upgraded\s+hardware|bespoke\s+ironmongery|high\s+quality\s+fittings", re.IGNORECASE),
+                     "hardware", "ironmongery", "fittings")
+_CUSTOM_FINISHES = [(v, re.compile(p, re.IGNORECASE), lits) for v, p, lits in [
+    ("Paint", r"factory.*paint|pre.*painted|spray.*finish", ("paint", "finish")),
+    ("Stain", r"stain|wood\s+stain", ("stain",)),
+    ("Lacquer", r"lacquer|varnish", ("lacquer", "varnish")),
+    ("Oil", r"oil|oiled\s+finish", ("oil",)),
+]]
+_INSTALLATION = (re.compile(r"installation\s+included|fitting\s+included|supply\s+and\s+install|supply\s+&\s+fit", re.IGNORECASE),
+                 "included", "supply")
+_LISTED_BUILDING = (re.compile(r"listed\s+building|conservation\s+area|heritage\s+approval|planning\s+consent", re.IGNORECASE),
+                    "listed", "conservation", "heritage", "planning")
+_ACCOYA = re.compile(r"ACCOYA", re.IGNORECASE)
+_LEAD_WEIGHTS = re.compile(r"Lead Weights", re.IGNORECASE)
+_WEATHERSTRIP = re.compile(r"Weatherstrip", re.IGNORECASE)
+
+_SUBTOTAL = re.compile(r"£([\d,]+\.?\d*)\s*VAT")
+_VAT = re.compile(r"VAT.*?£([\d,]+\.?\d*)")
+_QUOTED_TOTAL = re.compile(r"Total\s*£([\d,]+\.?\d*)")
 
 def parse_client_quote_from_text(text: str) -> Dict[str, Any]:
     """
@@ -679,152 +908,113 @@ def parse_client_quote_from_text(text: str) -> Dict[str, Any]:
             "outcome": None,
             "confidence": 0.0,
         }
-    
+
+    stream = tokenize(text)
+    tokens = stream.tokens
+
     # Initialize return structure
     questionnaire_answers = {}
     project_details = {}
     line_items = []
     quoted_price = None
     confidence = 0.0
-    
+
     # Extract company/client information
-    client_name = None
-    client_match = re.search(r"^([A-Z][A-Za-z\s]+)$", text, re.MULTILINE)
+    client_match = _CLIENT_NAME.search(text)
     if client_match:
-        client_name = client_match.group(1).strip()
-        project_details["client_name"] = client_name
-    
-    # Extract reference and project information
-    ref_match = re.search(r"Reference\s*([A-Za-z0-9]+)", text, re.IGNORECASE)
-    if ref_match:
-        project_details["reference"] = ref_match.group(1)
-    
-    # Extract estimate details
-    estimate_match = re.search(r"Estimate Number\s*([A-Za-z0-9]+)", text, re.IGNORECASE)
-    if estimate_match:
-        project_details["estimate_number"] = estimate_match.group(1)
-    
-    # Extract date
-    date_match = re.search(r"Date of Estimate\s*(\d{1,2}\s+\w+\s+\d{4})", text, re.IGNORECASE)
-    if date_match:
-        project_details["estimate_date"] = date_match.group(1)
-    
-    # Extract validity period
-    validity_match = re.search(r"Validity\s*(\d+\s+days)", text, re.IGNORECASE)
-    if validity_match:
-        project_details["validity"] = validity_match.group(1)
-    
+        project_details["client_name"] = client_match.group(1).strip()
+
+    # Extract reference, estimate number, date and validity period
+    for key, pattern, literal in _CLIENT_DETAILS:
+        match = stream.search(pattern, literal)
+        if match:
+            project_details[key] = match.group(1)
+
     # Extract project location/name
-    location_patterns = [
-        r"([A-Z][A-Za-z\s]+(?:Church|School|Hospital|Centre|Hall|Building))",
-        r"^([A-Z][A-Za-z\s]+)$",  # Generic location line
-    ]
-    for pattern in location_patterns:
-        location_match = re.search(pattern, text, re.MULTILINE)
+    for pattern in _LOCATION_PATTERNS:
+        location_match = pattern.search(text)
         if location_match and "Wealden" not in location_match.group(1):
             project_details["project_location"] = location_match.group(1).strip()
             break
-    
+
     # Extract project type from context
-    if re.search(r"window|sash|frame", text, re.IGNORECASE):
-        questionnaire_answers["project_type"] = "windows"
-    elif re.search(r"door|entrance", text, re.IGNORECASE):
-        questionnaire_answers["project_type"] = "doors"
-    elif re.search(r"joinery|timber|wood", text, re.IGNORECASE):
-        questionnaire_answers["project_type"] = "joinery"
-    
+    project_type = _first_label(stream, _PROJECT_TYPES)
+    if project_type:
+        questionnaire_answers["project_type"] = project_type
+
+    if project_type == "joinery":
         # Extract standard premium features for ML training
-    
-        # Glazing type detection
-        if re.search(r"vacuum\s+glass|vacuum\s+glazing", text, re.IGNORECASE):
-            questionnaire_answers["glazing_type"] = "Vacuum Glass"
-        elif re.search(r"triple\s+glaz", text, re.IGNORECASE):
-            questionnaire_answers["glazing_type"] = "Triple Glazing"
-        elif re.search(r"single\s+glaz", text, re.IGNORECASE):
-            questionnaire_answers["glazing_type"] = "Single Glazing"
-        elif re.search(r"double\s+glaz|glazing", text, re.IGNORECASE):
-            questionnaire_answers["glazing_type"] = "Standard Double Glazing"
-    
+        glazing_type = _first_label(stream, _GLAZING_TYPES)
+        if glazing_type:
+            questionnaire_answers["glazing_type"] = glazing_type
+
         # Curved/arched design detection
-        if re.search(r"arch|curved|radius|bespoke.*curve|arched", text, re.IGNORECASE):
+        if stream.search(*_CURVES):
             questionnaire_answers["has_curves"] = True
-    
+
         # Premium hardware detection
-        if re.search(r"premium\s+hardware|upgraded\s+hardware|bespoke\s+ironmongery|high\s+quality\s+fittings", text, re.IGNORECASE):
+        if stream.search(*_PREMIUM_HARDWARE):
             questionnaire_answers["premium_hardware"] = True
-    
+
         # Custom finish detection
-        if re.search(r"factory.*paint|pre.*painted|spray.*finish", text, re.IGNORECASE):
-            questionnaire_answers["custom_finish"] = "Paint"
-        elif re.search(r"stain|wood\s+stain", text, re.IGNORECASE):
-            questionnaire_answers["custom_finish"] = "Stain"
-        elif re.search(r"lacquer|varnish", text, re.IGNORECASE):
-            questionnaire_answers["custom_finish"] = "Lacquer"
-        elif re.search(r"oil|oiled\s+finish", text, re.IGNORECASE):
-            questionnaire_answers["custom_finish"] = "Oil"
-    
+        custom_finish = _first_label(stream, _CUSTOM_FINISHES)
+        if custom_finish:
+            questionnaire_answers["custom_finish"] = custom_finish
+
         # Installation detection
-        if re.search(r"installation\s+included|fitting\s+included|supply\s+and\s+install|supply\s+&\s+fit", text, re.IGNORECASE):
+        if stream.search(*_INSTALLATION):
             questionnaire_answers["installation_required"] = True
-    
+
         # Listed building detection
-        if re.search(r"listed\s+building|conservation\s+area|heritage\s+approval|planning\s+consent", text, re.IGNORECASE):
+        if stream.search(*_LISTED_BUILDING):
             questionnaire_answers["property_listed"] = True
-    
+
     # Extract materials information
     wood_types = []
-    if re.search(r"ACCOYA", text, re.IGNORECASE):
+    if stream.search(_ACCOYA, "accoya"):
         wood_types.append("Accoya")
-    if re.search(r"Lead Weights", text, re.IGNORECASE):
+    if stream.search(_LEAD_WEIGHTS, "lead"):
         questionnaire_answers["lead_weights"] = True
-    if re.search(r"Weatherstrip", text, re.IGNORECASE):
+    if stream.search(_WEATHERSTRIP, "weatherstrip"):
         questionnaire_answers["weatherstrip"] = True
-    
+
     if wood_types:
         questionnaire_answers["wood_type"] = wood_types[0]
         questionnaire_answers["materials_grade"] = "premium" if "Accoya" in wood_types else "standard"
-    
-    # Extract line items from the main table
-    lines = text.split('\n')
-    in_items_section = False
+
+    # Extract line items from the main table (only documents with the items header have one)
     total_area = 0.0
-    
-    for i, line in enumerate(lines):
-        line = line.strip()
-        
-        # Look for item table headers
-        if re.search(r"Item\s+Description\s+Number\s+Width\s+Height", line, re.IGNORECASE):
-            in_items_section = True
-            continue
-        
-        # Stop at totals section
-        if re.search(r"VAT|Total|£\d", line) and "Description" not in line:
-            in_items_section = False
-        
-        if in_items_section and line:
+    if stream.has("width"):
+        n = len(tokens)
+        in_items_section = False
+        for i, tok in enumerate(tokens):
+            # Look for item table headers
+            if tok.items_header:
+                in_items_section = True
+                continue
+
+            # Stop at totals section
+            if tok.totals_stop:
+                in_items_section = False
+
             # Parse sliding sash items
-            if re.search(r"Sliding Sash", line, re.IGNORECASE):
-                # Look for next lines with details
-                description = line
+            if in_items_section and tok.text and tok.sliding_sash:
+                description = tok.text
                 specs = {}
-                
+
                 # Extract dimensions and quantity from current and next lines
-                for j in range(i, min(i+5, len(lines))):
-                    detail_line = lines[j].strip()
-                    
-                    # Extract quantity
-                    qty_match = re.search(r"(\d+)\s+(\d+mm)\s+(\d+mm)", detail_line)
-                    if qty_match:
-                        qty = int(qty_match.group(1))
-                        width = qty_match.group(2)
-                        height = qty_match.group(3)
-                        
+                for j in range(i, min(i + 5, n)):
+                    detail = tokens[j]
+                    if detail.qty_dims:
+                        qty_s, width, height = detail.qty_dims
+                        qty = int(qty_s)
+
                         # Calculate area
                         width_mm = int(width.replace('mm', ''))
                         height_mm = int(height.replace('mm', ''))
                         area_m2 = (width_mm * height_mm * qty) / 1000000
                         total_area += area_m2
-                        
+
                         line_items.append({
                             "description": description,
                             "quantity": qty,
@@ -834,33 +1024,31 @@ def parse_client_quote_from_text(text: str) -> Dict[str, Any]:
                             "specifications": specs
                         })
                         break
-                    
+
                     # Extract specifications
-                    if re.search(r"BOX FRAME|Lead Weights|Weatherstrip|ACCOYA", detail_line, re.IGNORECASE):
-                        specs["details"] = detail_line
-    
+                    if detail.spec_detail:
+                        specs["details"] = detail.text
+
     # Calculate total project area
     if total_area > 0:
         questionnaire_answers["area_m2"] = round(total_area, 2)
         project_details["total_area_m2"] = round(total_area, 2)
-    
+
     # Extract pricing information
     # Look for subtotal, VAT, and total
-    subtotal_match = re.search(r"£([\d,]+\.?\d*)\s*VAT", text)
+    subtotal_match = stream.search(_SUBTOTAL, "vat")
     if subtotal_match:
-        subtotal = float(subtotal_match.group(1).replace(',', ''))
-        project_details["subtotal"] = subtotal
-    
-    vat_match = re.search(r"VAT.*?£([\d,]+\.?\d*)", text)
+        project_details["subtotal"] = float(subtotal_match.group(1).replace(',', ''))
+
+    vat_match = stream.search(_VAT, "vat")
     if vat_match:
-        vat = float(vat_match.group(1).replace(',', ''))
-        project_details["vat"] = vat
-    
-    total_match = re.search(r"Total\s*£([\d,]+\.?\d*)", text)
+        project_details["vat"] = float(vat_match.group(1).replace(',', ''))
+
+    total_match = stream.search(_QUOTED_TOTAL, "total")
     if total_match:
         quoted_price = float(total_match.group(1).replace(',', ''))
         project_details["total"] = quoted_price
-    
+
     # Calculate confidence based on extracted data
     confidence_factors = 0
     if quoted_price: confidence_factors += 3
@@ -868,9 +1056,9 @@ def parse_client_quote_from_text(text: str) -> Dict[str, Any]:
     if questionnaire_answers.get("project_type"): confidence_factors += 2
     if project_details.get("project_location"): confidence_factors += 1
     if questionnaire_answers.get("area_m2"): confidence_factors += 2
-    
+
     confidence = min(confidence_factors / 10.0, 1.0)
-    
+
     return {
         "questionnaire_answers": questionnaire_answers,
         "project_details": project_details,
@@ -880,6 +1068,40 @@ def parse_client_quote_from_text(text: str) -> Dict[str, Any]:
         "confidence": confidence,
     }
 
+_SUPPLIER_INDICATORS = [(re.compile(p, re.IGNORECASE), lits) for p, lits in [
+    (r"supplier|vendor|invoice\s+from|quote\s+from", ("supplier", "vendor", "from")),
+    (r"remit\s+to|payment\s+terms|pay\s+within|net\s+\d+\s+days", ("remit", "pay", "net")),
+    (r"account\s+number|sort\s+code|bank\s+details", ("account", "sort", "bank")),
+    (r"order\s+number|purchase\s+order", ("order",)),
+    (r"quote\s+reference.*[A-Z]{2,}\d+", ("quote",)),  # Quote references like JS2024-001
+    (r"supplies?\s+ltd|materials?\s+ltd|joinery\s+supplies", ("ltd", "supplies")),
+    (r"terms:.*net|payment.*due", ("terms:", "payment")),
+]]
+
+_CLIENT_INDICATORS = [(re.compile(p, re.IGNORECASE), lits) for p, lits in [
+    (r"ESTIMATE|QUOTATION|PROPOSAL", ("estimate", "quotation", "proposal")),
+    (r"Reference\s*[A-Za-z0-9]+.*Estimate\s+Number", ("reference",)),
+    (r"Date\s+of\s+Estimate|Validity\s*\d+\s+days", ("estimate", "validity")),
+    (r"dear\s+(?:mr|mrs|ms|miss)", ("dear",)),
+    (r"thank\s+you\s+for\s+your\s+enquiry", ("enquiry",)),
+    (r"we\s+are\s+pleased\s+to\s+quote", ("pleased",)),
+    (r"project\s+requirements|questionnaire", ("requirements", "questionnaire")),
+    (r"terms\s+and\s+conditions\s+apply", ("conditions",)),
+    (r"VAT\s+@\s+\d+%.*Total", ("vat",)),  # Client quotes show VAT breakdown
+    (r"Item\s+Description\s+Number\s+Width\s+Height", ("width",)),  # Detailed specification table
+    (r"specialists\s+in.*joinery", ("specialists",)),
+]]
+
+# (pattern, literals, weight)
+_STRONG_CLIENT_INDICATORS = [
+    (re.compile(r"ESTIMATE.*Reference.*Windows", re.IGNORECASE | re.DOTALL), ("windows",), 3),
+    (re.compile(r"Specialists\s+in.*Joinery", re.IGNORECASE), ("specialists",), 2),
+]
+_STRONG_SUPPLIER_INDICATORS = [
+    (re.compile(r"Item\s+Description\s+Qty\s+Unit\s+Price", re.IGNORECASE), ("unit",), 2),
+    (re.compile(r"Subtotal.*VAT.*Total", re.IGNORECASE | re.DOTALL), ("subtotal",), 1),
+]
+
 def determine_quote_type(text: str) -> str:
     """
     Determine if this is a supplier quote or client quote based on content.
@@ -891,56 +1113,16 @@ def determine_quote_type(text: str) -> str:
     """
     if not text:
         return "unknown"
-    
-    # Look for indicators of supplier quotes
-    supplier_indicators = [
-        r"supplier|vendor|invoice\s+from|quote\s+from",
-        r"remit\s+to|payment\s+terms|pay\s+within|net\s+\d+\s+days",
-        r"account\s+number|sort\s+code|bank\s+details",
-        r"order\s+number|purchase\s+order",
-        r"quote\s+reference.*[A-Z]{2,}\d+",  # Quote references like JS2024-001
-        r"supplies?\s+ltd|materials?\s+ltd|joinery\s+supplies",
-        r"terms:.*net|payment.*due",
-    ]
-    
-    # Look for indicators of client quotes (estimates/proposals to customers)
-    client_indicators = [
-        r"ESTIMATE|QUOTATION|PROPOSAL",
-        r"Reference\s*[A-Za-z0-9]+.*Estimate\s+Number",
-        r"Date\s+of\s+Estimate|Validity\s*\d+\s+days",
-        r"dear\s+(?:mr|mrs|ms|miss)",
-        r"thank\s+you\s+for\s+your\s+enquiry",
-        r"we\s+are\s+pleased\s+to\s+quote",
-        r"project\s+requirements|questionnaire",
-        r"terms\s+and\s+conditions\s+apply",
-        r"VAT\s+@\s+\d+%.*Total",  # Client quotes show VAT breakdown
-        r"Item\s+Description\s+Number\s+Width\s+Height",  # Detailed specification table
-        r"specialists\s+in.*joinery",
-    ]
-    
-    supplier_score = 0
-    client_score = 0
-    
-    for pattern in supplier_indicators:
-        if re.search(pattern, text, re.IGNORECASE):
-            supplier_score += 1
-            
-    for pattern in client_indicators:
-        if re.search(pattern, text, re.IGNORECASE):
-            client_score += 1
-    
-    # Strong indicators for client quotes
-    if re.search(r"ESTIMATE.*Reference.*Windows", text, re.IGNORECASE | re.DOTALL):
-        client_score += 3
-    if re.search(r"Specialists\s+in.*Joinery", text, re.IGNORECASE):
-        client_score += 2
-        
-    # Strong indicators for supplier quotes
-    if re.search(r"Item\s+Description\s+Qty\s+Unit\s+Price", text, re.IGNORECASE):
-        supplier_score += 2
-    if re.search(r"Subtotal.*VAT.*Total", text, re.IGNORECASE | re.DOTALL):
-        supplier_score += 1
-        
+
+    stream = tokenize(text)
+
+    supplier_score = sum(1 for pattern, literals in _SUPPLIER_INDICATORS if stream.search(pattern, *literals))
+    client_score = sum(1 for pattern, literals in _CLIENT_INDICATORS if stream.search(pattern, *literals))
+
+    # Strong indicators for either side
+    client_score += sum(w for pattern, literals, w in _STRONG_CLIENT_INDICATORS if stream.search(pattern, *literals))
+    supplier_score += sum(w for pattern, literals, w in _STRONG_SUPPLIER_INDICATORS if stream.search(pattern, *literals))
+
     if client_score > supplier_score:
         return "client"
     elif supplier_score > client_score:
@@ -948,4 +1130,5 @@ def determine_quote_type(text: str) -> str:
     else:
         return "unknown"
 
-__all__ = ["extract_text_from_pdf_bytes", "parse_totals_from_text", "parse_quote_lines_from_text", "parse_client_quote_from_text", "determine_quote_type", "_is_gibberish"]
+
+__all__ = ["PARSER_VERSION", "SUPPLIERS", "extract_pdf", "extract_text_from_pdf_bytes", "extract_text_with_method", "parse_totals_from_text", "parse_quote_lines_from_text", "parse_client_quote_from_text", "determine_quote_type", "_is_gibberish"]
@@ -0,0 +1,319 @@
+# ml/pdf_pool.py
+"""
+Process pool for PDF extraction, OCR and quote parsing.
+
+PyMuPDF, tesseract and the regex parsers are CPU bound and hold the GIL, so
+running them inside an ``async def`` handler stalls every other request on the
+uvicorn worker (``/health`` included). This module owns a dedicated
+``ProcessPoolExecutor`` and exposes an awaitable API so handlers can offload
+the work and keep the event loop responsive.
+
+Configuration (environment):
+  - ML_PDF_WORKERS               number of worker processes (default: min(4, cpu count));
+                                 0 runs jobs in a thread instead of a process
+  - ML_PDF_MAX_TASKS_PER_CHILD   recycle a worker after N jobs to contain PyMuPDF /
+                                 tesseract memory growth (default: 50)
+  - ML_PDF_SHM_THRESHOLD         payloads at least this many bytes are handed to workers
+                                 through shared memory instead of the pickle pipe
+                                 (default: 1 MiB)
+  - ML_PDF_START_METHOD          multiprocessing start method (default: spawn)
+
+A PDF is passed either as bytes or as a binary file such as the spooled body
+of a download (see http_fetch.py). A file is hashed and copied into shared
+memory in chunks, so a large download is never held as one bytes object.
+
+Every call accepts an optional ``deadline_at`` (epoch seconds, see deadline.py).
+Extraction checks it inside the worker and returns partial text; jobs still
+queued at the deadline are cancelled before they start.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple, Union
+
+import pdf_parser
+from deadline import DeadlineExceeded, expired, remaining
+from extract_cache import get_extraction_cache, pdf_digest
+from supplier_registry import GENERIC
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+WORKERS = int(os.getenv("ML_PDF_WORKERS", str(DEFAULT_WORKERS)))
+MAX_TASKS_PER_CHILD = int(os.getenv("ML_PDF_MAX_TASKS_PER_CHILD", "50"))
+SHM_THRESHOLD = int(os.getenv("ML_PDF_SHM_THRESHOLD", str(1024 * 1024)))
+START_METHOD = os.getenv("ML_PDF_START_METHOD", "spawn")
+# How long past its deadline a worker may take to hand back its partial result
+DEADLINE_GRACE = 0.25
+
+# Parsers that may be dispatched by name. Keeping the table here (instead of
+# pickling function objects) means the worker side only ever imports pdf_parser.
+PARSERS: Dict[str, Callable[[str], Any]] = {
+    "supplier": pdf_parser.parse_quote_lines_from_text,
+    "client": pdf_parser.parse_client_quote_from_text,
+    "totals": pdf_parser.parse_totals_from_text,
+    "quote_type": pdf_parser.determine_quote_type,
+}
+
+# Parsers that accept per-tenant supplier fingerprints (see supplier_registry.py)
+FINGERPRINT_PARSERS = ("supplier", "totals")
+
+# A payload is either raw bytes (small PDFs) or a (shm_name, size) handle.
+PdfPayload = Union[bytes, Tuple[str, int]]
+
+# What callers hand in: PDF bytes, or a binary file (read from the start)
+PdfSource = Union[bytes, IO[bytes]]
+
+FILL_CHUNK = 1024 * 1024
+
+# ----------------- sources -----------------
+def _is_bytes(pdf: PdfSource) -> bool:
+    return isinstance(pdf, (bytes, bytearray))
+
+def _source_size(pdf: PdfSource) -> int:
+    if _is_bytes(pdf):
+        return len(pdf)
+    pdf.seek(0, os.SEEK_END)
+    size = pdf.tell()
+    pdf.seek(0)
+    return size
+
+def _read_source(pdf: IO[bytes]) -> bytes:
+    pdf.seek(0)
+    return pdf.read()
+
+def _fill(buf: memoryview, pdf: IO[bytes], size: int):
+    """Copy a PDF file into shared memory chunk by chunk."""
+    pdf.seek(0)
+    pos = 0
+    while pos < size:
+        chunk = pdf.read(min(FILL_CHUNK, size - pos))
+        if not chunk:
+            raise ValueError(f"PDF file ended after {pos} of {size} bytes")
+        buf[pos:pos + len(chunk)] = chunk
+        pos += len(chunk)
+
+# ----------------- worker side -----------------
+def _load_payload(payload: PdfPayload) -> bytes:
+    if isinstance(payload, (bytes, bytearray)):
+        return bytes(payload)
+    from multiprocessing import shared_memory
+    name, size = payload
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return bytes(shm.buf[:size])
+    finally:
+        shm.close()
+
+def _job_extract(payload: PdfPayload, deadline_at: Optional[float] = None) -> Dict[str, Any]:
+    return pdf_parser.extract_pdf(_load_payload(payload), deadline_at)
+
+def _job_parse(kind: str, text: str, deadline_at: Optional[float] = None,
+               fingerprints: Optional[List[Dict[str, Any]]] = None) -> Tuple[Any, float]:
+    """Run a named parser; returns (result, elapsed_ms) so the parent can keep per-parser stats."""
+    # Jobs that sat in the queue past the deadline are not worth starting
+    if expired(deadline_at):
+        raise DeadlineExceeded(kind)
+    started = time.perf_counter()
+    if fingerprints:
+        value = PARSERS[kind](text, fingerprints)
+    else:
+        value = PARSERS[kind](text)
+    return value, (time.perf_counter() - started) * 1000.0
+
+def _fingerprints_key(fingerprints: List[Dict[str, Any]]) -> str:
+    raw = json.dumps(fingerprints, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+def _empty_extraction() -> Dict[str, Any]:
+    return {"text": "", "method": "none", "pages": [], "stages": {},
+            "stages_completed": [], "truncated": True}
+
+# ----------------- parent side -----------------
+class PdfWorkerPool:
+    """
+    Lazily created process pool with an awaitable submission API.
+    A broken pool (worker killed by the OOM killer, segfault in a native lib)
+    is replaced transparently on the next submission.
+    """
+
+    def __init__(self, workers: int = WORKERS, max_tasks_per_child: int = MAX_TASKS_PER_CHILD):
+        self.workers = max(0, workers)
+        self.max_tasks_per_child = max(1, max_tasks_per_child)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.restarts = 0
+        self.deadline_exceeded = 0
+        # How pages were resolved across all extractions (pymupdf / ocr / pypdf / blank)
+        self.pages_by_method: Dict[str, int] = {}
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers == 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                ctx = multiprocessing.get_context(START_METHOD)
+                kwargs: Dict[str, Any] = {"max_workers": self.workers, "mp_context": ctx}
+                # max_tasks_per_child is not supported with the fork start method
+                if START_METHOD != "fork":
+                    kwargs["max_tasks_per_child"] = self.max_tasks_per_child
+                self._executor = ProcessPoolExecutor(**kwargs)
+                logger.info(f"PDF worker pool started ({self.workers} workers, start={START_METHOD})")
+            return self._executor
+
+    def _reset(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+                self.restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    async def _submit(self, fn: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        if executor is None:
+            return await asyncio.to_thread(fn, *args)
+        try:
+            return await loop.run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            logger.warning("PDF worker pool broken; restarting and retrying once")
+            self._reset(executor)
+            executor = self._get_executor()
+            return await loop.run_in_executor(executor, fn, *args)
+
+    async def run(self, fn: Callable[..., Any], *args: Any, deadline_at: Optional[float] = None) -> Any:
+        """
+        Run a picklable top-level function in the pool and await its result.
+        With ``deadline_at`` the wait is bounded: a job still queued when time runs
+        out is cancelled before it starts, and DeadlineExceeded is raised.
+        """
+        self.submitted += 1
+        if deadline_at is None:
+            return await self._submit(fn, *args)
+        if expired(deadline_at):
+            self.deadline_exceeded += 1
+            raise DeadlineExceeded(getattr(fn, "__name__", "job"))
+        try:
+            # wait_for cancels the executor future on timeout, which drops it from the queue if not yet running
+            return await asyncio.wait_for(self._submit(fn, *args), timeout=remaining(deadline_at) + DEADLINE_GRACE)
+        except asyncio.TimeoutError:
+            self.deadline_exceeded += 1
+            raise DeadlineExceeded(getattr(fn, "__name__", "job")) from None
+
+    async def _extract(self, pdf: PdfSource, deadline_at: Optional[float] = None) -> Dict[str, Any]:
+        size = _source_size(pdf)
+        if self.workers == 0 or size < SHM_THRESHOLD:
+            payload = pdf if _is_bytes(pdf) else await asyncio.to_thread(_read_source, pdf)
+            return await self.run(_job_extract, payload, deadline_at, deadline_at=deadline_at)
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        try:
+            if _is_bytes(pdf):
+                shm.buf[:size] = pdf
+            else:
+                await asyncio.to_thread(_fill, shm.buf, pdf, size)
+            return await self.run(_job_extract, (shm.name, size), deadline_at, deadline_at=deadline_at)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    async def extract(self, pdf: PdfSource, digest: Optional[str] = None,
+                      deadline_at: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Extract text from a PDF in a worker process.
+        Returns {"text", "method", "pages", "stages_completed", "truncated", "cached"}
+        where pages is the per-page provenance from pdf_parser.extract_pdf. Results
+        are served from / stored in the extraction cache keyed by the PDF digest;
+        results truncated by ``deadline_at`` are returned but never cached.
+        """
+        cache = get_extraction_cache()
+        if cache is not None:
+            if digest is None:
+                digest = pdf_digest(pdf) if _is_bytes(pdf) else await asyncio.to_thread(pdf_digest, pdf)
+            hit = cache.get_extraction(digest)
+            if hit is not None:
+                hit.update({"cached": True, "stages_completed": ["cache"], "truncated": False})
+                return hit
+        try:
+            result = await self._extract(pdf, deadline_at)
+        except DeadlineExceeded:
+            result = _empty_extraction()
+        for page in result.get("pages") or []:
+            method = page.get("method") or "unknown"
+            self.pages_by_method[method] = self.pages_by_method.get(method, 0) + 1
+        if cache is not None and not result.get("truncated"):
+            cache.put_text(digest, result["text"], result["method"], result.get("pages"))
+        result["cached"] = False
+        return result
+
+    async def extract_text(self, pdf: PdfSource, digest: Optional[str] = None) -> str:
+        """Extract text from a PDF in a worker process (see extract)."""
+        return (await self.extract(pdf, digest))["text"] or ""
+
+    async def parse(self, kind: str, text: str, digest: Optional[str] = None,
+                    deadline_at: Optional[float] = None,
+                    fingerprints: Optional[List[Dict[str, Any]]] = None) -> Any:
+        """
+        Run one of the named parsers (see PARSERS) in a worker process.
+        When the source PDF digest is given, the output is cached alongside its text
+        (pass no digest for text from a truncated extraction).
+        ``fingerprints`` are extra supplier fingerprints for the supplier parsers
+        (see supplier_registry.tenant_fingerprints); they are part of the cache key.
+        Raises DeadlineExceeded if ``deadline_at`` passes before the result is ready.
+        """
+        if kind not in PARSERS:
+            raise ValueError(f"unknown parser: {kind}")
+        if kind not in FINGERPRINT_PARSERS:
+            fingerprints = None
+        cache_kind = f"{kind}@{_fingerprints_key(fingerprints)}" if fingerprints else kind
+        cache = get_extraction_cache() if digest else None
+        if cache is not None:
+            hit, value = cache.get_parsed(digest, cache_kind)
+            if hit:
+                return value
+        value, elapsed_ms = await self.run(_job_parse, kind, text, deadline_at, fingerprints, deadline_at=deadline_at)
+        if kind in FINGERPRINT_PARSERS and isinstance(value, dict):
+            pdf_parser.SUPPLIERS.record(value.get("parser") or GENERIC, elapsed_ms)
+        if cache is not None:
+            cache.put_parsed(digest, cache_kind, value)
+        return value
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_tasks_per_child": self.max_tasks_per_child,
+            "started": self._executor is not None,
+            "submitted": self.submitted,
+            "restarts": self.restarts,
+            "deadline_exceeded": self.deadline_exceeded,
+            "pages_by_method": dict(self.pages_by_method),
+            "supplier_parsers": pdf_parser.SUPPLIERS.stats(),
+        }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+            logger.info("PDF worker pool shut down")
+
+# Global pool instance
+_pool: Optional[PdfWorkerPool] = None
+
+def get_pdf_pool() -> PdfWorkerPool:
+    """Get or create the global PDF worker pool."""
+    global _pool
+    if _pool is None:
+        _pool = PdfWorkerPool()
+    return _pool
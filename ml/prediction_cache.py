@@ -0,0 +1,81 @@
+# ml/prediction_cache.py
+"""
+In-process cache of /predict results.
+
+The quote builder and configurator re-ask /predict for the same questionnaire
+answers many times while a user edits a quote. PredictionCache remembers the
+(price, win probability) pair for a quote, keyed by the model version plus the
+normalized feature vector: numeric columns go through the same coercion the
+encoder applies, categorical columns are str()-ed, and columns a quote does
+not set take their defaults. Two quotes with the same key are therefore
+indistinguishable to the models.
+
+The model version is part of the key, so a reload (or a different tenant's
+bundle) never sees another version's entries; those simply age out of the LRU.
+
+Configuration (environment):
+  - ML_PREDICT_CACHE_SIZE   entries kept (default 4096; 0 disables the cache)
+  - ML_PREDICT_CACHE_TTL    seconds an entry stays valid (default: no expiry)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Dict, Hashable, Iterable, Optional, Sequence, Tuple
+
+from feature_encoder import _to_number
+from lru import LRUCache
+
+CACHE_SIZE = int(os.getenv("ML_PREDICT_CACHE_SIZE", "4096"))
+CACHE_TTL = float(os.getenv("ML_PREDICT_CACHE_TTL", "0")) or None
+
+def feature_key(values: Dict[str, Any], columns: Sequence[str], numeric_columns: Iterable[str]) -> Tuple:
+    """Normalized feature vector of a quote (see quote_feature_values), in column order."""
+    numeric = numeric_columns if isinstance(numeric_columns, (set, frozenset)) else set(numeric_columns)
+    key = []
+    for column in columns:
+        if column in numeric:
+            key.append(_to_number(values.get(column, 0)))
+        else:
+            key.append(str(values.get(column, "")))
+    return tuple(key)
+
+class PredictionCache:
+    """Bounded LRU of prediction results keyed by (model version, feature key)."""
+
+    def __init__(self, max_items: int = CACHE_SIZE, ttl: Optional[float] = CACHE_TTL):
+        self.enabled = max_items > 0
+        self._cache = LRUCache(max_items=max(1, max_items), ttl=ttl)
+
+    def get(self, version: Hashable, key: Tuple) -> Optional[Tuple[float, float]]:
+        if not self.enabled:
+            return None
+        return self._cache.get((version, key))
+
+    def put(self, version: Hashable, key: Tuple, result: Tuple[float, float]):
+        if self.enabled:
+            self._cache.put((version, key), result)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        if not self.enabled:
+            return {"enabled": False}
+        return {"enabled": True, **self._cache.stats()}
+
+# Global cache instance
+_cache: Optional[PredictionCache] = None
+_cache_lock = threading.Lock()
+
+def get_prediction_cache() -> PredictionCache:
+    """Get or create the global prediction cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PredictionCache()
+    return _cache
+
+__all__ = ["PredictionCache", "feature_key", "get_prediction_cache"]
@@ -1,40 +1,44 @@
 #!/usr/bin/env python3
 """
-preload.py - Preload heavy ML modules to speed up first requests
+preload.py - Check (or warm) the heavy ML modules before the service starts
+
+By default each module is only located (importlib.util.find_spec), which
+is instant: the service imports them on first use (see startup_profile.py),
+so importing them here, in a separate process, only delayed the port bind.
+--import imports them and prints the time each took, e.g. to warm the page
+cache on a fresh instance or to investigate a slow cold start.
 """
-import time
+import importlib
+import importlib.util
 import sys
+import time
 
-def preload_modules():
-    """Preload critical modules that cause slow first requests"""
+REQUIRED = ["numpy", "pandas", "sklearn", "joblib", "fastapi", "uvicorn"]
+OPTIONAL = ["xgboost", "fitz", "PyPDF2", "pytesseract", "psycopg"]
+
+def preload_modules(do_import: bool = False):
+    """True if every required module is available (and, with do_import, imports)."""
     start_time = time.time()
-    
-    try:
-        # Core scientific computing
-        import numpy
-        import pandas
-        
-        # ML libraries (heaviest imports)
-        import sklearn
-        import joblib
-        import xgboost
-        
-        # PDF/OCR libraries
-        import fitz  # PyMuPDF
-        import pytesseract
-        
-        # FastAPI components we'll need
-        from fastapi import FastAPI, UploadFile
-        import uvicorn
-        
-        load_time = time.time() - start_time
-        print(f"✅ Preloaded ML modules in {load_time:.2f}s")
-        return True
-        
-    except ImportError as e:
-        print(f"❌ Failed to preload modules: {e}")
+    missing = []
+    for name in REQUIRED + OPTIONAL:
+        try:
+            if importlib.util.find_spec(name) is None:
+                raise ImportError(f"No module named {name!r}")
+            if do_import:
+                started = time.time()
+                importlib.import_module(name)
+                print(f"  {name:<12} {time.time() - started:6.2f}s")
+        except Exception as e:
+            if name in REQUIRED:
+                missing.append(name)
+            print(f"{'❌' if name in REQUIRED else '⚠️ '} {name}: {e}")
+
+    if missing:
+        print(f"❌ Missing required modules: {', '.join(missing)}")
         return False
+    print(f"✅ ML modules {'imported' if do_import else 'available'} in {time.time() - start_time:.2f}s")
+    return True
 
 if __name__ == "__main__":
-    success = preload_modules()
-    sys.exit(0 if success else 1)
\ No newline at end of file
+    success = preload_modules("--import" in sys.argv[1:])
+    sys.exit(0 if success else 1)
@@ -0,0 +1,363 @@
+# ml/quote_lexer.py
+"""
+Single-pass line lexer shared by the quote parsers in pdf_parser.py.
+
+The parsers used to run their regexes inline: for every line of the first-pass
+loop, again for each look-ahead / look-back line, again in the second pass and
+once more per parser over the full text. tokenize() splits a document once and
+classifies each line once with precompiled patterns, recording the captured
+numbers; parse_quote_lines_from_text, parse_client_quote_from_text and
+determine_quote_type all read the same TokenStream (memoized per text), so the
+cost grows with the number of lines rather than lines x patterns x parsers.
+
+Line kinds (LineToken.kind, first match wins):
+  blank, date, header, dimension, area, currency_price, price, qty,
+  total_label, description, other
+Captured values are kept independently of the kind (e.g. "4321.86" is a price
+and also a valid quantity), because the parsers' look-ahead rules depend on them.
+Rarely needed classifications are computed lazily, still at most once per line.
+"""
+
+from __future__ import annotations
+
+import re
+from functools import cached_property
+from typing import Any, Dict, Iterator, List, Optional, Pattern, Tuple
+
+from lru import LRUCache
+
+BLANK = "blank"
+DATE = "date"
+HEADER = "header"
+DIMENSION = "dimension"
+AREA = "area"
+CURRENCY_PRICE = "currency_price"
+PRICE = "price"
+QTY = "qty"
+TOTAL_LABEL = "total_label"
+DESCRIPTION = "description"
+OTHER = "other"
+
+# ----------------- line patterns (supplier first pass) -----------------
+_DATE = re.compile(r'^\d{1,2}\s+\d{1,2}\s+\d{4}$')
+_SECTION_START = re.compile(r'^(Detailed Quotation|Ref|Description)$', re.IGNORECASE)
+_SECTION_END = re.compile(r'^(Subtotal|VAT|Total Investment|Wealden Joinery Triple Guarantee|Terms & Conditions|Contact Information)$', re.IGNORECASE)
+_HEADER = re.compile(r'^(Price,?\s*GBP|pcs|Total,?\s*GBP|Quantity|Pcs:|m2:|Total weight:|TOTAL INVOICE|All prices|Item|Description|Unit|Cost|Validity|Unit / Line|Line Total)', re.IGNORECASE)
+_LANGVALDA_HEADER = re.compile(r'^(Price,?\s*GBP|pcs|Total,?\s*GBP)$', re.IGNORECASE)
+_HEADER_RESET = re.compile(r'^(Item|Description|Qty|Unit|Cost)', re.IGNORECASE)
+_DIMENSION = re.compile(r'^\d+x\d+mm')
+_DIMENSION_MM = re.compile(r'^\d+mm$')
+_LANGVALDA_RESET = re.compile(r'^(LANGVALDA /|TOTAL INVOICE|The quote is valid)', re.IGNORECASE)
+_AREA = re.compile(r'^\d+(?:\.\d+)?m[²2]$', re.IGNORECASE)
+_TYPE_MARKER = re.compile(r'^TYPE\s*$', re.IGNORECASE)
+_SHORT_CODE = re.compile(r'^[A-Z0-9]{1,3}$')
+_CURRENCY_PRICE = re.compile(r'^[£$€]\s*(\d+(?:,\d{3})*\.\d{2})$')
+_PRICE = re.compile(r'^(\d+(?:,\d{3})*\.\d{2})$')
+_QTY = re.compile(r'^(\d+(?:\.\d+)?)\s*(?:pc\.?|pcs\.?)?$', re.IGNORECASE)
+_BARE_INT = re.compile(r'^\d+$')
+_HAS_WORD = re.compile(r'[a-zA-Z]{3,}')
+_TOTAL_LABEL = re.compile(r'^(?:sub\s*-?\s*total|grand\s+total|total|balance\s+due|amount\s+due|vat)\b', re.IGNORECASE)
+
+# Description roles
+_COMPANY = re.compile(r'(FENSTERCRAFT|Popieriaus|langvalda|GROUP|^JMS\s+\d|Wealden Joinery)', re.IGNORECASE)
+_REFERENCE = re.compile(r'Offer #|Reference|Brought Forward|Carried Forward|Quotation Number|Date of Quotation|QUOTATION', re.IGNORECASE)
+_TYPE_LINE = re.compile(r'^\d+\.\s*Type:\s*(.+)$', re.IGNORECASE)
+_PRODUCT = re.compile(r'^(Screen|Door|Window|Frame)\s*[-\s]*(\(TYPE\s+[A-Z0-9]+\))?', re.IGNORECASE)
+_DELIVERY_START = re.compile(r'^Delivery|^Shipping', re.IGNORECASE)
+_OPENS_BRACKET = re.compile(r'^[\(\[]')
+_PRODUCT_CODE = re.compile(r'^[A-Z]{2,}\d+$')
+_NUMBERED_SPEC = re.compile(r'^\d+\.\s*(Type:|Wood:|Finish:|Glass:|Fittings:|Water|sealing:)', re.IGNORECASE)
+_OTHER_SPEC = re.compile(r'^(View from|edge |double cylinder)')
+_TERMS = re.compile(r'(valid for|excl\. VAT|unloading|tempered panes|Thank you for|represent your|your booking|Price is for|Price does not|Project Overview|Client Details|Specification|Highlights|Project Scope|Unit / Line|Line Total|Ref)', re.IGNORECASE)
+_CONTACT = re.compile(r'(\+\d{3}|www\.|@|Tel\.|Email|Telephone:|Phone:|Address:)')
+
+# ----------------- line patterns (supplier second pass) -----------------
+# The former per-line skip list, as one alternation (a search for A|B matches iff A or B does)
+_TABLE_SKIP = re.compile("|".join(f"(?:{p})" for p in [
+    r"(description|item|quantity|qty|price|total|sub.*total)",
+    r"(vat|tax|delivery|payment|terms|contact|phone|email|address|business\s+hours)",
+    r"^(subtotal|grand.*total|balance|amount.*due)",
+    r"^\s*[£$€]\s*[\d,]+\.?\d*\s*$",  # Lines with only money amounts
+    r"^(Wealden Joinery|Project Overview|Client Details|Specification|Highlights|Project Scope)$",
+]), re.IGNORECASE)
+
+_TABLE_PATTERNS: List[Pattern[str]] = [re.compile(p, re.IGNORECASE) for p in [
+    # Pattern: Number. Description [spaces] Qty [spaces] Unit Price [spaces] Total
+    r"^\s*\d+\.\s*(.+?)\s+(\d+(?:\.\d+)?)\s+[£$€]\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s+[£$€]\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*$",
+    # Pattern: Description [spaces] Qty [spaces] £Unit Price [spaces] £Total
+    r"^(.+?)\s+(\d+(?:\.\d+)?)\s+[£$€]\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s+[£$€]\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*$",
+    # Pattern: Unit Price [spaces] Qty [spaces] Total (for lines with price before qty)
+    r"^(\d+(?:,\d{3})*(?:\.\d{2})?)\s+(\d+)\s+(\d+(?:,\d{3})*(?:\.\d{2})?)\s*$",
+    # Pattern: Description [spaces] Qty [spaces] Unit Price (no currency symbols, must have decimals)
+    r"^(.+?)\s+(\d+(?:\.\d+)?)\s+(\d+(?:,\d{3})*\.\d{2})\s*$",
+    # Pattern: Description £Price (assuming qty=1)
+    r"^(.+?)\s+[£$€]\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*$",
+    # Pattern: Qty x Description @ £Price
+    r"^(\d+(?:\.\d+)?)\s*x?\s*(.+?)\s*@\s*[£$€]?\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*$",
+]]
+
+_TABLE_SKIP_KEYWORDS = ['total', 'subtotal', 'vat', 'tax', 'delivery', 'shipping', 'discount', 'payment', 'terms', 'reference', 'invoice']
+
+# ----------------- line patterns (free-form fallback) -----------------
+_DELIVERY_MENTION = re.compile(r'delivery|shipping', re.IGNORECASE)
+_DELIVERY_ROW = re.compile(r'(\d+(?:,\d{3})*(?:\.\d{2})?)\s+(\d+)\s*(?:pc|pcs)?\.?\s+(\d+(?:,\d{3})*(?:\.\d{2})?)')
+
+# ----------------- line patterns (client quotes) -----------------
+_ITEMS_HEADER = re.compile(r"Item\s+Description\s+Number\s+Width\s+Height", re.IGNORECASE)
+_TOTALS_STOP = re.compile(r"VAT|Total|£\d")
+_SLIDING_SASH = re.compile(r"Sliding Sash", re.IGNORECASE)
+_QTY_DIMS = re.compile(r"(\d+)\s+(\d+mm)\s+(\d+mm)")
+_SPEC_DETAIL = re.compile(r"BOX FRAME|Lead Weights|Weatherstrip|ACCOYA", re.IGNORECASE)
+
+def _money(s: str) -> float:
+    return float(s.replace(',', ''))
+
+def _match_table_row(line: str) -> Optional[Dict[str, Any]]:
+    """Second-pass single-line table parse; the first matching pattern decides."""
+    for i, pattern in enumerate(_TABLE_PATTERNS):
+        match = pattern.match(line)
+        if match:
+            if i == 0 or i == 1:  # [Number.] Description Qty £Unit Price £Total
+                description = match.group(1).strip()
+                qty = float(match.group(2))
+                unit_price = _money(match.group(3))
+                total = _money(match.group(4))
+            elif i == 2:  # Unit Price Qty Total (numbers only) - handled by the first pass
+                continue
+            elif i == 3:  # Description Qty Unit Price
+                description = match.group(1).strip()
+                qty = float(match.group(2))
+                unit_price = _money(match.group(3))
+                total = qty * unit_price
+            elif i == 4:  # Description Price (qty=1)
+                description = match.group(1).strip()
+                qty = 1.0
+                unit_price = _money(match.group(2))
+                total = unit_price
+            else:  # Qty x Description @ Price
+                qty = float(match.group(1))
+                description = match.group(2).strip()
+                unit_price = _money(match.group(3))
+                total = qty * unit_price
+
+            # Filter out likely non-item lines
+            lowered = description.lower()
+            if not any(keyword in lowered for keyword in _TABLE_SKIP_KEYWORDS) and len(description) > 3:
+                return {"description": description, "qty": qty, "unit_price": unit_price, "total": total}
+            return None
+    return None
+
+class LineToken:
+    """One stripped line of a document with its classification and captured numbers."""
+
+    def __init__(self, index: int, raw: str):
+        self.index = index
+        self.raw = raw
+        self.text = line = raw.strip()
+        self.currency_price: Optional[float] = None
+        self.price: Optional[float] = None
+        self.qty: Optional[float] = None
+        self.bare_int = False
+        self.section_start = False
+        self.section_end = False
+        self.header = False
+        self.langvalda_header = False
+        self.header_reset = False
+        self.langvalda_reset = False
+        self.type_marker = False
+        self.short_code = len(line) <= 3 and bool(_SHORT_CODE.match(line))
+        self.has_word = bool(_HAS_WORD.search(line))
+
+        if not line:
+            self.kind = BLANK
+            return
+
+        first = line[0]
+        kind = None
+        if first.isdigit():
+            # Only numeric patterns can match
+            if _DATE.match(line):
+                kind = DATE
+            elif _DIMENSION.match(line) or _DIMENSION_MM.match(line):
+                kind = DIMENSION
+            elif _AREA.match(line):
+                kind = AREA
+            m = _PRICE.match(line)
+            if m:
+                self.price = _money(m.group(1))
+            m = _QTY.match(line)
+            if m:
+                self.qty = float(m.group(1))
+                self.bare_int = bool(_BARE_INT.match(line))
+            if kind is None:
+                kind = PRICE if self.price is not None else QTY if self.qty is not None else None
+        elif first in "£$€":
+            m = _CURRENCY_PRICE.match(line)
+            if m:
+                self.currency_price = _money(m.group(1))
+                kind = CURRENCY_PRICE
+        elif first.isalpha():
+            self.section_start = bool(_SECTION_START.match(line))
+            self.section_end = bool(_SECTION_END.match(line))
+            if _HEADER.match(line):
+                kind = HEADER
+                self.header = True
+                self.langvalda_header = bool(_LANGVALDA_HEADER.match(line))
+                self.header_reset = bool(_HEADER_RESET.match(line))
+            self.langvalda_reset = bool(_LANGVALDA_RESET.match(line))
+            self.type_marker = bool(_TYPE_MARKER.match(line))
+            if kind is None and _TOTAL_LABEL.match(line):
+                kind = TOTAL_LABEL
+
+        if kind is None:
+            kind = DESCRIPTION if self.has_word else OTHER
+        self.kind = kind
+
+    # ---- description roles (supplier first pass), only consulted for lines with words ----
+    @cached_property
+    def company(self) -> bool:
+        return bool(_COMPANY.search(self.text))
+
+    @cached_property
+    def reference(self) -> bool:
+        return bool(_REFERENCE.search(self.text))
+
+    @cached_property
+    def type_text(self) -> Optional[str]:
+        m = _TYPE_LINE.match(self.text)
+        return m.group(1).strip() if m else None
+
+    @cached_property
+    def product(self) -> bool:
+        return bool(_PRODUCT.match(self.text))
+
+    @cached_property
+    def delivery_start(self) -> bool:
+        return bool(_DELIVERY_START.search(self.text))
+
+    @cached_property
+    def opens_bracket(self) -> bool:
+        return bool(_OPENS_BRACKET.search(self.text))
+
+    @cached_property
+    def product_code(self) -> bool:
+        return bool(_PRODUCT_CODE.match(self.text))
+
+    @cached_property
+    def plain_description(self) -> bool:
+        """A free-text line that may serve as an item description (not a spec, term or contact line)."""
+        line = self.text
+        return not (_NUMBERED_SPEC.match(line) or _OTHER_SPEC.match(line)
+                    or _TERMS.search(line) or _CONTACT.search(line))
+
+    # ---- supplier second pass / free-form fallback ----
+    @cached_property
+    def table_item(self) -> Optional[Dict[str, Any]]:
+        line = self.text
+        if not line or len(line) < 10 or _TABLE_SKIP.search(line):
+            return None
+        return _match_table_row(line)
+
+    @cached_property
+    def delivery_mention(self) -> bool:
+        return bool(_DELIVERY_MENTION.search(self.text))
+
+    @cached_property
+    def delivery_row(self) -> Optional[Tuple[float, float, float]]:
+        m = _DELIVERY_ROW.match(self.text)
+        if not m:
+            return None
+        return _money(m.group(1)), float(m.group(2)), _money(m.group(3))
+
+    # ---- client quotes ----
+    @cached_property
+    def items_header(self) -> bool:
+        return bool(_ITEMS_HEADER.search(self.text))
+
+    @cached_property
+    def totals_stop(self) -> bool:
+        return bool(_TOTALS_STOP.search(self.text)) and "Description" not in self.text
+
+    @cached_property
+    def sliding_sash(self) -> bool:
+        return bool(_SLIDING_SASH.search(self.text))
+
+    @cached_property
+    def qty_dims(self) -> Optional[Tuple[str, str, str]]:
+        m = _QTY_DIMS.search(self.text)
+        return (m.group(1), m.group(2), m.group(3)) if m else None
+
+    @cached_property
+    def spec_detail(self) -> bool:
+        return bool(_SPEC_DETAIL.search(self.text))
+
+    def __repr__(self) -> str:
+        return f"LineToken({self.index}, {self.kind}, {self.text!r})"
+
+# Characters that case-insensitive regexes match against ASCII letters but that
+# str.lower() does not map to them (dotted/dotless i, long s). When any is present
+# the literal prefilters below are bypassed.
+_FOLD_EXCEPTIONS = ("İ", "ı", "ſ")
+
+class TokenStream:
+    """
+    A tokenized document. Besides the line tokens it offers prefiltered
+    whole-text searches for the multi-line patterns: each pattern is paired with
+    literals (lowercase) of which every match must contain one, and the regex
+    only runs when one of them occurs in the text.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lines = text.split('\n')
+        self.tokens = [LineToken(i, raw) for i, raw in enumerate(self.lines)]
+        self.lower = text.lower()
+        self._prefilter = not any(c in text for c in _FOLD_EXCEPTIONS)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def has(self, *literals: str) -> bool:
+        """True if the text may contain any of the (lowercase) literals."""
+        if not self._prefilter:
+            return True
+        lower = self.lower
+        return any(lit in lower for lit in literals)
+
+    def search(self, pattern: Pattern[str], *literals: str) -> Optional["re.Match[str]"]:
+        if literals and not self.has(*literals):
+            return None
+        return pattern.search(self.text)
+
+    def finditer(self, pattern: Pattern[str], *literals: str) -> Iterator["re.Match[str]"]:
+        if literals and not self.has(*literals):
+            return iter(())
+        return pattern.finditer(self.text)
+
+    def next_nonblank(self, j: int) -> int:
+        """Index of the first non-blank token at or after j (len(self) if none)."""
+        tokens = self.tokens
+        n = len(tokens)
+        while j < n and tokens[j].kind == BLANK:
+            j += 1
+        return j
+
+    def kinds(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for tok in self.tokens:
+            counts[tok.kind] = counts.get(tok.kind, 0) + 1
+        return counts
+
+# The same text is usually parsed by several parsers in a row (type detection,
+# then supplier and/or client parsing), so keep the last few streams around.
+_streams = LRUCache(max_items=8)
+
+def tokenize(text: str) -> TokenStream:
+    """Tokenize a document (memoized per text)."""
+    stream = _streams.get(text)
+    if stream is None:
+        stream = TokenStream(text)
+        _streams.put(text, stream)
+    return stream
+
+__all__ = ["LineToken", "TokenStream", "tokenize"]
@@ -23,6 +23,30 @@ CREATE INDEX IF NOT EXISTS idx_ml_training_data_tenant_id ON ml_training_data(te
 CREATE INDEX IF NOT EXISTS idx_ml_training_data_created_at ON ml_training_data(created_at);
 CREATE INDEX IF NOT EXISTS idx_ml_training_data_source_type ON ml_training_data(tenant_id, source_type);
 
+-- Training features extracted from parsed_data in SQL, plus a partial covering index for the
+-- /train-client-quotes query (see training_data.py; keep the two in sync)
+ALTER TABLE ml_training_data
+    ADD COLUMN IF NOT EXISTS estimated_total DECIMAL(12,2),
+    ADD COLUMN IF NOT EXISTS project_type TEXT,
+    ADD COLUMN IF NOT EXISTS quote_type TEXT,
+    ADD COLUMN IF NOT EXISTS source_type TEXT DEFAULT 'client_quote',
+    ADD COLUMN IF NOT EXISTS qa_area_m2 float8 GENERATED ALWAYS AS (COALESCE(NULLIF((CASE WHEN (parsed_data->'questionnaire_answers'->>'area_m2') ~ '^[[:space:]]*-?[0-9]+([.][0-9]+)?[[:space:]]*$' THEN (parsed_data->'questionnaire_answers'->>'area_m2')::float8 END), 0), NULLIF((CASE WHEN (parsed_data->>'area_m2') ~ '^[[:space:]]*-?[0-9]+([.][0-9]+)?[[:space:]]*$' THEN (parsed_data->>'area_m2')::float8 END), 0), NULLIF((CASE WHEN (parsed_data->>'total_area') ~ '^[[:space:]]*-?[0-9]+([.][0-9]+)?[[:space:]]*$' THEN (parsed_data->>'total_area')::float8 END), 0))) STORED,
+    ADD COLUMN IF NOT EXISTS qa_materials_grade text GENERATED ALWAYS AS (COALESCE(NULLIF(parsed_data->'questionnaire_answers'->>'materials_grade', ''), NULLIF(parsed_data->>'materials_grade', ''))) STORED,
+    ADD COLUMN IF NOT EXISTS qa_project_type text GENERATED ALWAYS AS (COALESCE(NULLIF(parsed_data->'questionnaire_answers'->>'project_type', ''), NULLIF(parsed_data->>'project_type', ''))) STORED,
+    ADD COLUMN IF NOT EXISTS qa_glazing_type text GENERATED ALWAYS AS (parsed_data->'questionnaire_answers'->>'glazing_type') STORED,
+    ADD COLUMN IF NOT EXISTS qa_custom_finish text GENERATED ALWAYS AS (parsed_data->'questionnaire_answers'->>'custom_finish') STORED,
+    ADD COLUMN IF NOT EXISTS qa_has_curves boolean GENERATED ALWAYS AS (COALESCE(lower(parsed_data->'questionnaire_answers'->>'has_curves') IN ('true', 't', '1', 'yes'), false)) STORED,
+    ADD COLUMN IF NOT EXISTS qa_premium_hardware boolean GENERATED ALWAYS AS (COALESCE(lower(parsed_data->'questionnaire_answers'->>'premium_hardware') IN ('true', 't', '1', 'yes'), false)) STORED,
+    ADD COLUMN IF NOT EXISTS qa_installation_required boolean GENERATED ALWAYS AS (COALESCE(lower(parsed_data->'questionnaire_answers'->>'installation_required') IN ('true', 't', '1', 'yes'), false)) STORED,
+    ADD COLUMN IF NOT EXISTS qa_property_listed boolean GENERATED ALWAYS AS (COALESCE(lower(parsed_data->'questionnaire_answers'->>'property_listed') IN ('true', 't', '1', 'yes'), false)) STORED,
+    ADD COLUMN IF NOT EXISTS qa_door_height_mm float8 GENERATED ALWAYS AS ((CASE WHEN (parsed_data->'questionnaire_answers'->>'door_height_mm') ~ '^[[:space:]]*-?[0-9]+([.][0-9]+)?[[:space:]]*$' THEN (parsed_data->'questionnaire_answers'->>'door_height_mm')::float8 END)) STORED,
+    ADD COLUMN IF NOT EXISTS qa_door_width_mm float8 GENERATED ALWAYS AS ((CASE WHEN (parsed_data->'questionnaire_answers'->>'door_width_mm') ~ '^[[:space:]]*-?[0-9]+([.][0-9]+)?[[:space:]]*$' THEN (parsed_data->'questionnaire_answers'->>'door_width_mm')::float8 END)) STORED,
+    ADD COLUMN IF NOT EXISTS qa_num_doors float8 GENERATED ALWAYS AS ((CASE WHEN (parsed_data->'questionnaire_answers'->>'num_doors') ~ '^[[:space:]]*-?[0-9]+([.][0-9]+)?[[:space:]]*$' THEN (parsed_data->'questionnaire_answers'->>'num_doors')::float8 END)) STORED,
+    ADD COLUMN IF NOT EXISTS qa_num_windows float8 GENERATED ALWAYS AS ((CASE WHEN (parsed_data->'questionnaire_answers'->>'num_windows') ~ '^[[:space:]]*-?[0-9]+([.][0-9]+)?[[:space:]]*$' THEN (parsed_data->'questionnaire_answers'->>'num_windows')::float8 END)) STORED;
+CREATE INDEX IF NOT EXISTS idx_ml_training_data_trainable ON ml_training_data(tenant_id, created_at)
+    INCLUDE (confidence, estimated_total, quoted_price, source_type, project_type, qa_area_m2, qa_materials_grade, qa_project_type, qa_glazing_type, qa_custom_finish, qa_has_curves, qa_premium_hardware, qa_installation_required, qa_property_listed, qa_door_height_mm, qa_door_width_mm, qa_num_doors, qa_num_windows)
+    WHERE estimated_total > 0 AND confidence > 0.3;
+
 -- Table for storing model metadata and performance metrics
 CREATE TABLE IF NOT EXISTS ml_models (
     id SERIAL PRIMARY KEY,
@@ -44,8 +68,8 @@ CREATE INDEX IF NOT EXISTS idx_ml_models_active ON ml_models(tenant_id, model_ty
 CREATE TABLE IF NOT EXISTS ml_training_jobs (
     id SERIAL PRIMARY KEY,
     tenant_id TEXT NOT NULL,
-    job_type TEXT NOT NULL, -- 'email_discovery', 'model_training', etc.
-    status TEXT NOT NULL DEFAULT 'pending', -- 'pending', 'running', 'completed', 'failed'
+    job_type TEXT NOT NULL, -- 'train', 'email_training', 'train_client_quotes' (see jobs.py)
+    status TEXT NOT NULL DEFAULT 'pending', -- 'pending', 'running', 'completed', 'failed', 'cancelled'
     parameters JSONB,
     results JSONB,
     error_message TEXT,
@@ -54,9 +78,21 @@ CREATE TABLE IF NOT EXISTS ml_training_jobs (
     created_at TIMESTAMP DEFAULT NOW()
 );
 
+-- Job queue bookkeeping: progress, retries after a worker crash (lease via heartbeat_at) and cancellation
+ALTER TABLE ml_training_jobs
+    ADD COLUMN IF NOT EXISTS progress REAL NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS progress_message TEXT,
+    ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS max_attempts INTEGER NOT NULL DEFAULT 3,
+    ADD COLUMN IF NOT EXISTS worker_id TEXT,
+    ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT NOW();
+
 -- Index for job tracking
 CREATE INDEX IF NOT EXISTS idx_ml_training_jobs_tenant_status ON ml_training_jobs(tenant_id, status);
 CREATE INDEX IF NOT EXISTS idx_ml_training_jobs_created_at ON ml_training_jobs(created_at);
+CREATE INDEX IF NOT EXISTS idx_ml_training_jobs_queue ON ml_training_jobs(created_at) WHERE status IN ('pending', 'running');
 
 -- Table for email service configurations (encrypted credentials)
 CREATE TABLE IF NOT EXISTS ml_email_configs (
@@ -3,9 +3,10 @@ from __future__ import annotations
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Dict, Any
-import traceback, urllib.request
+import traceback
 
 from pdf_parser import extract_text_from_pdf_bytes, parse_totals_from_text
+from http_fetch import get_fetcher
 
 app = FastAPI(title="JoineryAI ML API")
 
@@ -24,9 +25,8 @@ app.add_middleware(
 )
 
 def _http_get_bytes(url: str) -> bytes:
-    """Download bytes from URL"""
-    with urllib.request.urlopen(url) as resp:
-        return resp.read()
+    """Download bytes from URL through the shared pooled fetcher (see http_fetch.py)"""
+    return get_fetcher().fetch_bytes(url)
 
 @app.get("/")
 async def root():
@@ -22,17 +22,10 @@ else
     echo "🗄️  Database URL configured: ⚠️  No (email training disabled)"
 fi
 
-# Pre-load critical modules to speed up first requests
-echo "📦 Pre-loading ML modules..."
-python -c "
-import sys
-try:
-    import numpy, pandas, sklearn, joblib
-    print('✅ Core ML libraries loaded')
-except ImportError as e:
-    print(f'⚠️  ML library loading issue: {e}')
-    sys.exit(1)
-" || exit 1
+# Check the ML modules are installed without importing them: the service
+# imports heavy libraries on first use and loads models after binding the port
+echo "📦 Checking ML modules..."
+python preload.py || exit 1
 
 # Start the service with optimized settings for Render
 echo "🌟 Starting ML service on port ${PORT:-8000}..."
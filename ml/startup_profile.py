@@ -0,0 +1,212 @@
+# ml/startup_profile.py
+"""
+Startup profile and lazy imports for the ML service.
+
+Importing main.py used to pull in pandas, joblib, the PyMuPDF / PyPDF2 stack
+and email_trainer (psycopg, the Gmail code), and to load both models, all
+before uvicorn bound its port. This module measures where startup time and
+memory go, and provides the lazy imports that keep that work off the
+import path:
+
+  - lazy_import(name) returns a stand-in for a module that is imported on
+    first attribute access. The deferred import is recorded in the profile,
+    with the time and memory it took and the step that triggered it. Passing
+    optional=True returns None when the package is not installed (the spec
+    is looked up without importing it).
+  - StartupProfile.begin() wraps builtins.__import__ until finish(). Every
+    module imported for the first time during startup is recorded with its
+    inclusive time, RSS growth, nesting depth and importer. Modules that
+    took less than ML_STARTUP_PROFILE_MIN_MS (default 1) are left out of
+    the report.
+  - StartupProfile.step(name) times an init step (model load, job runner, ...)
+    the same way.
+
+report() returns the imports, steps and lazy loads sorted by time, together
+with the process age when the app became ready; main.py serves it at
+GET /startup-profile and logs a summary. ML_STARTUP_PROFILE=0 disables the
+import hook (steps and lazy loads are still recorded).
+"""
+
+from __future__ import annotations
+
+import builtins
+import contextlib
+import importlib
+import importlib.util
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("ML_STARTUP_PROFILE", "1").lower() not in ("0", "false", "no")
+MIN_MS = float(os.getenv("ML_STARTUP_PROFILE_MIN_MS", "1"))
+TOP_N = 15
+
+def rss_mb() -> Optional[float]:
+    """Current resident set size in MB (Linux), else None."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 2)
+
+def process_age() -> Optional[float]:
+    """Seconds since this process started (Linux), else None."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 3)
+
+def _delta(before: Optional[float], after: Optional[float]) -> Optional[float]:
+    return round(after - before, 2) if before is not None and after is not None else None
+
+class StartupProfile:
+    """Import, init-step and lazy-load timings of this process."""
+
+    def __init__(self):
+        self.created_age = process_age()
+        self.imports: List[Dict[str, Any]] = []
+        self.steps: List[Dict[str, Any]] = []
+        self.lazy: List[Dict[str, Any]] = []
+        self.ready_age: Optional[float] = None
+        self._original_import = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    # ----------------- import hook -----------------
+    def begin(self) -> "StartupProfile":
+        """Start recording first-time imports (no-op if disabled or already recording)."""
+        if ENABLED and self._original_import is None:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._import
+        return self
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        if level or not name or name in sys.modules or original is None:
+            return original(name, globals, locals, fromlist, level)
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        before, started = rss_mb(), time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            self._local.depth = depth
+            ms = (time.perf_counter() - started) * 1000.0
+            if ms >= MIN_MS:
+                with self._lock:
+                    self.imports.append({"module": name, "ms": round(ms, 2), "rss_mb": _delta(before, rss_mb()),
+                                         "depth": depth, "importer": (globals or {}).get("__name__")})
+
+    def finish(self):
+        """Stop recording imports and mark the app ready."""
+        if self._original_import is not None and builtins.__import__ == self._import:
+            builtins.__import__ = self._original_import
+        self._original_import = None
+        if self.ready_age is None:
+            self.ready_age = process_age()
+
+    # ----------------- steps and lazy loads -----------------
+    @contextlib.contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        """Time an init step; errors are recorded and re-raised."""
+        before, started = rss_mb(), time.perf_counter()
+        entry: Dict[str, Any] = {"step": name}
+        try:
+            yield
+        except BaseException as e:
+            entry["error"] = str(e)
+            raise
+        finally:
+            entry.update(ms=round((time.perf_counter() - started) * 1000.0, 2), rss_mb=_delta(before, rss_mb()),
+                         thread=threading.current_thread().name)
+            with self._lock:
+                self.steps.append(entry)
+
+    def record_lazy(self, module: str, ms: float, rss: Optional[float]):
+        with self._lock:
+            self.lazy.append({"module": module, "ms": round(ms, 2), "rss_mb": rss, "age": process_age()})
+
+    def report(self, top: int = TOP_N) -> Dict[str, Any]:
+        with self._lock:
+            imports = sorted(self.imports, key=lambda e: -e["ms"])
+            steps, lazy = list(self.steps), list(self.lazy)
+        return {
+            "pid": os.getpid(),
+            "import_hook": ENABLED,
+            "profile_created_age": self.created_age,
+            "ready_age": self.ready_age,
+            "age": process_age(),
+            "rss_mb": rss_mb(),
+            "imports_ms": round(sum(e["ms"] for e in imports if e["depth"] == 0), 2),
+            "imports": [e for e in imports if e["depth"] <= 1][:top * 2],
+            "slowest_imports": imports[:top],
+            "steps": steps,
+            "lazy_loads": lazy,
+        }
+
+    def log_summary(self, top: int = 5):
+        report = self.report(top)
+        slowest = ", ".join(f"{e['module']} {e['ms']:.0f}ms" for e in report["slowest_imports"][:top])
+        logger.info(f"Startup: ready {report['ready_age']}s after process start, imports {report['imports_ms']:.0f}ms, "
+                    f"RSS {report['rss_mb']} MB; slowest imports: {slowest or 'n/a'}")
+
+_profile = StartupProfile()
+
+def get_startup_profile() -> StartupProfile:
+    return _profile
+
+class LazyModule:
+    """A module imported on first attribute access (see lazy_import)."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            before, started = rss_mb(), time.perf_counter()
+            module = importlib.import_module(self._name)
+            _profile.record_lazy(self._name, (time.perf_counter() - started) * 1000.0, _delta(before, rss_mb()))
+            self._module = module
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str):
+        if attr.startswith("__") and attr.endswith("__"):
+            raise AttributeError(attr)
+        return getattr(self._load(), attr)
+
+    def __bool__(self) -> bool:
+        return True
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self._name!r} ({'loaded' if self.loaded else 'not loaded'})>"
+
+def lazy_import(name: str, optional: bool = False) -> Optional[LazyModule]:
+    """A LazyModule for ``name``; with optional=True, None when the package is not installed."""
+    if name in sys.modules:
+        module = LazyModule(name)
+        module._module = sys.modules[name]
+        return module
+    if optional:
+        try:
+            if importlib.util.find_spec(name) is None:
+                return None
+        except (ImportError, ValueError):
+            return None
+    return LazyModule(name)
+
+__all__ = ["LazyModule", "StartupProfile", "get_startup_profile", "lazy_import", "process_age", "rss_mb"]
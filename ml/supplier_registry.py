@@ -0,0 +1,242 @@
+# ml/supplier_registry.py
+"""
+Registry of supplier-specific quote parsers with fingerprint dispatch.
+
+Each entry carries a fingerprint (company names, email/web domains and table
+header triplets such as "Price, GBP / pcs / Total, GBP"). match() scans the
+top of a tokenized document once: all names and domains are folded into a
+single alternation searched over the header text, and the header triplets are
+compared against a sliding window of normalized header lines. The first
+registered entry that matches wins; documents with no match use the generic
+parser. The header is the first HEADER_LINES lines (ML_SUPPLIER_HEADER_LINES,
+default 80): a supplier whose name, domain or column headers only appear
+further down, e.g. after a long cover page or only in the footer, is not
+detected and gets the generic parser.
+
+A specialised parser must cover every row its supplier's quotes contain;
+pdf_parser runs the generic parser instead only when it finds no lines.
+
+Entries registered without a parse function only name the supplier and run
+the generic path. That is how per-tenant fingerprints loaded from the
+"Supplier" table are applied (see tenant_fingerprints); they are passed to
+the parser as plain dicts so they can cross the worker-process boundary.
+
+Timing is recorded per parser name. Parsing runs in worker processes, so the
+parent records the timings the workers report back (see pdf_pool.parse).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Pattern, Sequence, Tuple
+
+from lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# How many lines from the top of a document count as its header
+HEADER_LINES = int(os.getenv("ML_SUPPLIER_HEADER_LINES", "80"))
+# How long a tenant's supplier fingerprints are reused before being re-read
+TENANT_TTL = float(os.getenv("ML_SUPPLIER_FINGERPRINT_TTL", "300"))
+
+GENERIC = "generic"
+
+def _normalize_header(line: str) -> str:
+    return " ".join(line.lower().replace(",", " ").split())
+
+def _name_pattern(name: str) -> str:
+    words = [re.escape(w) for w in name.split()]
+    return r"\b" + r"\s+".join(words) + r"\b"
+
+def _domain_pattern(domain: str) -> str:
+    return r"(?:@|www\.)" + re.escape(domain.lower().lstrip("@")) + r"\b"
+
+class SupplierParser:
+    """One registry entry: a supplier name, its fingerprint and an optional specialised parser."""
+
+    def __init__(
+        self,
+        name: str,
+        parse: Optional[Callable[[Any], List[Dict[str, Any]]]] = None,
+        key: Optional[str] = None,
+        names: Iterable[str] = (),
+        domains: Iterable[str] = (),
+        header_triplets: Iterable[Sequence[str]] = (),
+    ):
+        self.name = name
+        self.parse = parse
+        self.key = key or (re.sub(r"\W+", "_", name.lower()).strip("_") if parse else GENERIC)
+        self.names = [n for n in names if n and n.strip()]
+        self.domains = [d for d in domains if d and d.strip()]
+        self.header_triplets = [tuple(_normalize_header(h) for h in t) for t in header_triplets if len(t) == 3]
+
+    def patterns(self) -> List[str]:
+        return [_name_pattern(n) for n in self.names] + [_domain_pattern(d) for d in self.domains]
+
+    def __repr__(self) -> str:
+        return f"SupplierParser({self.name!r}, key={self.key!r})"
+
+class _Index:
+    """Compiled fingerprint index over an ordered list of entries."""
+
+    def __init__(self, entries: List[SupplierParser]):
+        self.entries = entries
+        alternatives = []
+        self._group_entry: Dict[str, int] = {}
+        for i, entry in enumerate(entries):
+            for j, pattern in enumerate(entry.patterns()):
+                group = f"e{i}_{j}"
+                self._group_entry[group] = i
+                alternatives.append(f"(?P<{group}>{pattern})")
+        self.pattern: Optional[Pattern[str]] = re.compile("|".join(alternatives), re.IGNORECASE) if alternatives else None
+        self.triplets: Dict[Tuple[str, ...], int] = {}
+        for i, entry in enumerate(entries):
+            for triplet in entry.header_triplets:
+                self.triplets.setdefault(triplet, i)
+
+    def best(self, head_text: str, head_lines: List[str]) -> Optional[int]:
+        """Index of the earliest-registered entry whose fingerprint occurs in the header."""
+        best: Optional[int] = None
+        if self.pattern is not None:
+            for m in self.pattern.finditer(head_text):
+                i = self._group_entry[m.lastgroup]
+                if best is None or i < best:
+                    best = i
+                    if best == 0:
+                        return 0
+        if self.triplets:
+            for k in range(len(head_lines) - 2):
+                i = self.triplets.get((head_lines[k], head_lines[k + 1], head_lines[k + 2]))
+                if i is not None and (best is None or i < best):
+                    best = i
+        return best
+
+class SupplierRegistry:
+    """Ordered supplier parsers with a lazily (re)built fingerprint index and per-parser timing stats."""
+
+    def __init__(self):
+        self._entries: List[SupplierParser] = []
+        self._index: Optional[_Index] = None
+        # Indexes for per-request (tenant) fingerprint lists, keyed by their content
+        self._extra_indexes = LRUCache(max_items=64)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def register(self, name: str, parse: Optional[Callable[[Any], List[Dict[str, Any]]]] = None, **fingerprint: Any) -> SupplierParser:
+        """Add a supplier; fingerprint keywords are those of SupplierParser (key, names, domains, header_triplets)."""
+        entry = SupplierParser(name, parse, **fingerprint)
+        with self._lock:
+            self._entries.append(entry)
+            self._index = None
+        return entry
+
+    def entries(self) -> List[SupplierParser]:
+        return list(self._entries)
+
+    def _builtin_index(self) -> _Index:
+        index = self._index
+        if index is None:
+            with self._lock:
+                index = self._index = _Index(list(self._entries))
+        return index
+
+    def _index_for(self, extra: Sequence[Dict[str, Any]]) -> _Index:
+        key = tuple(
+            (f.get("name"), tuple(f.get("names") or ()), tuple(f.get("domains") or ()),
+             tuple(tuple(t) for t in f.get("header_triplets") or ()))
+            for f in extra
+        )
+        index = self._extra_indexes.get(key)
+        if index is None:
+            index = _Index([SupplierParser(name, None, names=names, domains=domains, header_triplets=triplets)
+                            for name, names, domains, triplets in key if name])
+            self._extra_indexes.put(key, index)
+        return index
+
+    def match(self, stream: Any, extra: Sequence[Dict[str, Any]] = ()) -> Optional[SupplierParser]:
+        """
+        Entry whose fingerprint occurs in the first HEADER_LINES lines of a TokenStream.
+        Registered entries take precedence over ``extra`` fingerprints
+        ({"name", "names", "domains", "header_triplets"} dicts).
+        """
+        head = stream.tokens[:HEADER_LINES]
+        head_text = "\n".join(tok.text for tok in head)
+        head_lines = [_normalize_header(tok.text) for tok in head if tok.text]
+
+        index = self._builtin_index()
+        i = index.best(head_text, head_lines)
+        if i is not None:
+            return index.entries[i]
+        if extra:
+            index = self._index_for(extra)
+            i = index.best(head_text, head_lines)
+            if i is not None:
+                return index.entries[i]
+        return None
+
+    def record(self, key: str, elapsed_ms: float):
+        """Account one parse of ``key`` (a SupplierParser.key, or GENERIC)."""
+        with self._lock:
+            s = self._stats.get(key)
+            if s is None:
+                s = self._stats[key] = {"calls": 0, "total_ms": 0.0, "max_ms": 0.0}
+            s["calls"] += 1
+            s["total_ms"] += elapsed_ms
+            s["max_ms"] = max(s["max_ms"], elapsed_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            parsers = {
+                key: {
+                    "calls": int(s["calls"]),
+                    "total_ms": round(s["total_ms"], 2),
+                    "avg_ms": round(s["total_ms"] / s["calls"], 2) if s["calls"] else 0.0,
+                    "max_ms": round(s["max_ms"], 2),
+                }
+                for key, s in self._stats.items()
+            }
+        return {"registered": [e.name for e in self._entries], "parsers": parsers}
+
+# ----------------- per-tenant fingerprints -----------------
+_tenant_cache = LRUCache(max_items=256, ttl=TENANT_TTL)
+
+def _email_domain(email: Optional[str]) -> Optional[str]:
+    if not email or "@" not in email:
+        return None
+    domain = email.rsplit("@", 1)[1].strip().lower()
+    # Shared mailbox providers say nothing about the sender
+    if domain in ("gmail.com", "googlemail.com", "outlook.com", "hotmail.com", "hotmail.co.uk", "yahoo.com", "yahoo.co.uk", "icloud.com", "btinternet.com"):
+        return None
+    return domain or None
+
+def tenant_fingerprints(tenant_id: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Fingerprints for a tenant's active suppliers (name and email domain), read from
+    the shared "Supplier" table and cached for ML_SUPPLIER_FINGERPRINT_TTL seconds.
+    Returns [] without a tenant or when the database is unavailable.
+    """
+    if not tenant_id:
+        return []
+    cached = _tenant_cache.get(tenant_id)
+    if cached is not None:
+        return cached
+    fingerprints: List[Dict[str, Any]] = []
+    try:
+        from db_config import get_db_manager
+        with get_db_manager().get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute('SELECT "name", "email" FROM "Supplier" WHERE "tenantId" = %s AND "isActive" = true', (tenant_id,))
+                for name, email in cur.fetchall():
+                    if not name or len(name.strip()) < 3:
+                        continue
+                    domain = _email_domain(email)
+                    fingerprints.append({"name": name.strip(), "names": [name.strip()], "domains": [domain] if domain else []})
+    except Exception as e:
+        logger.warning(f"Could not load supplier fingerprints for tenant {tenant_id}: {e}")
+    _tenant_cache.put(tenant_id, fingerprints)
+    return fingerprints
+
+__all__ = ["GENERIC", "HEADER_LINES", "SupplierParser", "SupplierRegistry", "tenant_fingerprints"]
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Supplier parser regression tests (pdf_parser.py / supplier_registry.py).
+
+The fixture quotes mix the supplier's stacked-column layout with single-line
+table rows. The expected lines and totals are what the parser produced before
+supplier dispatch (one pass running every heuristic), so a matched supplier
+must not lose rows its specialised parser does not cover.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from pdf_parser import parse_quote_lines_from_text
+
+LANGVALDA_TEXT = """LANGVALDA / UAB Langvalda
+www.langvalda.lt
+Offer # 2025-118
+22 07 2025
+Price, GBP
+pcs
+Total, GBP
+Window W1
+2475x2058mm
+5.09m²
+4321.86
+1 pc.
+4321.86
+Door D1
+880mm
+1250.00
+2 pcs.
+2500.00
+Delivery to London area TBC*
+990.01  1 pc.  990.01
+Casement window 2 150.00
+1. Sash window 3 £300.00 £900.00
+TOTAL INVOICE 8161.87
+The quote is valid for 30 days
+"""
+
+WEALDEN_TEXT = """Wealden Joinery
+Project Overview
+Detailed Quotation
+Ref
+TYPE
+C
+2
+2400x1200mm
+£1,274.24
+£2,548.48
+TYPE
+D
+1
+£980.00
+£980.00
+1. Sash window 3 £300.00 £900.00
+Casement window 2 150.00
+Subtotal
+£4,878.48
+VAT
+£975.70
+Total Investment
+£5,854.18
+"""
+
+# Baseline output: (description, qty, unit_price, total) per line, estimated_total, detected_totals
+LANGVALDA_BASELINE = (
+    [
+        ("Window W1 2475x2058mm 5.09m²", 1.0, 4321.86, 4321.86),
+        ("Door D1 880mm", 2.0, 1250.0, 2500.0),
+        ("Casement window", 2.0, 150.0, 300.0),
+        ("Sash window", 3.0, 300.0, 900.0),
+    ],
+    8021.86,
+    [8161.87, 8021.86],
+)
+
+WEALDEN_BASELINE = (
+    [
+        ("TYPE C 2400x1200mm", 2.0, 1274.24, 2548.48),
+        ("TYPE D", 1.0, 980.0, 980.0),
+        ("Sash window", 3.0, 300.0, 900.0),
+        ("Casement window", 2.0, 150.0, 300.0),
+    ],
+    4728.48,
+    [4878.48, 4878.48, 5854.18, 4728.48],
+)
+
+def as_rows(result):
+    return [(l["description"], l["qty"], l["unit_price"], l["total"]) for l in result["lines"]]
+
+def check_baseline(result, baseline):
+    lines, estimated, totals = baseline
+    assert as_rows(result) == lines
+    assert result["estimated_total"] == estimated
+    assert result["detected_totals"] == totals
+
+def test_langvalda_matches_baseline():
+    result = parse_quote_lines_from_text(LANGVALDA_TEXT)
+    assert result["supplier"] == "Langvalda"
+    assert result["currency"] == "£"
+    check_baseline(result, LANGVALDA_BASELINE)
+
+def test_wealden_matches_baseline():
+    result = parse_quote_lines_from_text(WEALDEN_TEXT)
+    assert result["supplier"] == "Wealden Joinery"
+    check_baseline(result, WEALDEN_BASELINE)
+
+def test_specialised_parser_kept_when_it_covers_the_layout():
+    # Only stacked columns: the Langvalda parser finds every line the generic pass does
+    text = LANGVALDA_TEXT.replace("Casement window 2 150.00\n", "").replace("1. Sash window 3 £300.00 £900.00\n", "")
+    result = parse_quote_lines_from_text(text)
+    assert result["parser"] == "langvalda"
+    assert as_rows(result) == LANGVALDA_BASELINE[0][:2]
+    assert result["estimated_total"] == 6821.86
+
+def test_langvalda_single_line_rows_match_baseline():
+    # One-line rows take precedence over the delivery row, as in the baseline parser
+    text = """LANGVALDA / UAB Langvalda
+www.langvalda.lt
+Price, GBP
+pcs
+Total, GBP
+Delivery to London area TBC*
+990.01  1 pc.  990.01
+Installation £500.00
+TOTAL INVOICE 1490.01
+"""
+    result = parse_quote_lines_from_text(text)
+    assert result["parser"] == "langvalda"
+    check_baseline(result, ([("Installation", 1.0, 500.0, 500.0)], 500.0, [1490.01, 500.0]))
+
+def test_generic_fallback_when_specialised_parser_finds_nothing():
+    text = "UAB Langvalda\nDelivery to London area TBC*\n990.01  1 pc.  990.01\nTOTAL INVOICE 990.01\n"
+    result = parse_quote_lines_from_text(text)
+    assert result["supplier"] == "Langvalda"
+    assert result["parser"] == "generic"
+    check_baseline(result, ([("Delivery to London area TBC*", 1.0, 990.01, 990.01)], 990.01, [990.01, 990.01]))
@@ -6,10 +6,8 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(__file__))
 
-from pdf_parser import extract_text_from_pdf_bytes
+from pdf_parser import extract_text_from_pdf_bytes, determine_quote_type, parse_quote_lines_from_text
 from main import (
-    determine_quote_type,
-    parse_quote_lines_from_text,
     parse_client_quote_from_text,
     build_client_quote_from_supplier_parsed,
 )
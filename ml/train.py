@@ -1,7 +1,26 @@
 # ml/train.py
+"""
+Train the price and win models from Quote / Opportunity history.
+
+  python train.py                   full retrain on the whole history
+  python train.py --incremental     continue boosting from models/ on rows newer
+                                    than the stored watermarks (see incremental.py)
+  python train.py --incremental --compare-full
+                                    also fit from scratch to measure the quality delta
+  python train.py --search [--search-budget SECONDS]
+                                    successive-halving search over the XGBoost parameters,
+                                    both models at once (see param_search.py); the winners
+                                    are kept in feature_meta.json and reused by later full retrains
+  python train.py --benchmark       measure XGBoost sizes and a RandomForest for cost and quality
+                                    and keep the Pareto-optimal model (see model_benchmark.py);
+                                    the report is written to models/benchmark.json
+"""
+import argparse
 import os
 import json
 import math
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import joblib
@@ -10,11 +29,18 @@ import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, roc_auc_score
 from sklearn.preprocessing import OneHotEncoder
 from xgboost import XGBRegressor, XGBClassifier  # requires libomp on macOS
 import psycopg
 
+from incremental import FULL, INCREMENTAL, continue_boosting, quality_delta, training_mode, watermark
+from training_data import PRICE_QUERY, WIN_QUERY, TrainingQuery
+from training_snapshots import get_snapshot_store
+from param_search import BUDGET_SECONDS, WORKERS, search, search_pool
+from model_benchmark import run as benchmark_models, save_report
+
 
 # ----------------------------
 # 0) Tiny .env loader (no deps)
@@ -61,149 +87,250 @@ if "sslmode=" not in DB_URL:
 
 
 # ----------------------------
-# 1) SQL queries
+# 1) DB helpers
 # ----------------------------
-PRICE_SQL = """
-SELECT
-  q.id,
-  q."totalGBP" AS price,
-  COALESCE(l.custom->>'projectType','') AS project_type,
-  (l.custom->>'area_m2')::float AS area_m2,
-  COALESCE(l.custom->>'materials_grade','') AS materials_grade,
-  COALESCE(l.custom->>'source','') AS lead_source,
-  'uk'::text AS region
-FROM "Quote" q
-LEFT JOIN "Lead" l ON l.id = q."leadId"
-WHERE q."status" IN ('ACCEPTED','SENT') AND q."totalGBP" IS NOT NULL;
-"""
-
-WIN_SQL = """
-SELECT
-  o.id,
-  (o.stage = 'WON')::int AS won,
-  COALESCE(q."totalGBP", 0) AS quote_value_gbp,
-  0::int AS num_emails_thread,
-  0::int AS days_to_first_reply,
-  COALESCE(l.custom->>'projectType','') AS project_type,
-  COALESCE(l.custom->>'materials_grade','') AS materials_grade,
-  (l.custom->>'area_m2')::float AS area_m2,
-  COALESCE(l.custom->>'source','') AS lead_source,
-  'uk'::text AS region
-FROM "Opportunity" o
-JOIN "Lead" l ON l.id = o."leadId"
-LEFT JOIN "Quote" q ON q."leadId" = o."leadId";
-"""
+# Features are built in SQL and streamed into typed columns (see training_data.py),
+# and kept in a local snapshot that only fetches rows past its watermark (see training_snapshots.py)
+def df_from_sql(query: TrainingQuery, since: str = None) -> pd.DataFrame:
+    def fetch(after):
+        with psycopg.connect(DB_URL) as conn:
+            return query.load(conn, {"since": after})
+
+    store = get_snapshot_store()
+    if not store.enabled:
+        return fetch(since)
+    df = store.load(query, None, fetch, "changed_at")
+    if since:
+        df = df[df["changed_at"] > pd.Timestamp(since)].copy()
+    return df
+
+def load_previous(models_dir: Path, name: str, mode: str):
+    """The model an incremental run continues from (None -> the run is a full retrain)."""
+    path = models_dir / name
+    if mode != INCREMENTAL or not path.exists():
+        return None
+    try:
+        pipe = joblib.load(path)
+    except Exception as e:
+        print(f"[{name}] could not load previous model ({e}); doing a full retrain")
+        return None
+    if not hasattr(pipe.steps[-1][1], "get_booster"):
+        print(f"[{name}] previous model is not boosted (benchmark pick); doing a full retrain")
+        return None
+    return pipe
+
+def run_meta(mode: str, started: float, df: pd.DataFrame, previous: dict, metrics: dict, full_metrics: dict) -> dict:
+    """Watermark, run counters, timing and quality delta recorded with each trained model."""
+    incremental = mode == INCREMENTAL
+    return {
+        "training_mode": mode,
+        "watermark": watermark(list(df["changed_at"]) + [previous.get("watermark") if incremental else None]),
+        "incremental_rounds": int(previous.get("incremental_rounds") or 0) + 1 if incremental else 0,
+        "full_metrics": previous.get("full_metrics") if incremental else metrics,
+        "quality_delta": quality_delta(metrics, full_metrics if incremental else None),
+        "duration_seconds": round(time.perf_counter() - started, 3),
+    }
 
 
 # ----------------------------
-# 2) DB helpers
+# 2) Training: Price model
 # ----------------------------
-def df_from_sql(sql: str) -> pd.DataFrame:
-    with psycopg.connect(DB_URL) as conn:
-        return pd.read_sql_query(sql, conn)
+PRICE_PARAMS = dict(
+    n_estimators=200,
+    learning_rate=0.08,
+    max_depth=5,
+    subsample=0.9,
+    colsample_bytree=0.9,
+    random_state=42,
+    n_jobs=2,
+)
+
+PRICE_GRID = {
+    "learning_rate": [0.03, 0.08, 0.15],
+    "max_depth": [3, 5, 7],
+    "subsample": [0.8, 1.0],
+    "colsample_bytree": [0.8, 1.0],
+}
+
+def price_pipeline(num_cols, cat_cols, params: dict = None) -> Pipeline:
+    pre = ColumnTransformer(
+        transformers=[
+            ("num", "passthrough", num_cols),
+            ("cat", OneHotEncoder(handle_unknown="ignore"), cat_cols),
+        ]
+    )
 
+    model = XGBRegressor(**{**PRICE_PARAMS, **(params or {})})
 
-# ----------------------------
-# 3) Training: Price model
-# ----------------------------
-def train_price(models_dir: Path) -> dict:
-    df = df_from_sql(PRICE_SQL)
-
-    # Basic cleanliness
-    df = df.dropna(subset=["price"])
-    # Some installs may have area_m2 as None/NaN — fill with median
-    if "area_m2" in df.columns:
-        df["area_m2"] = pd.to_numeric(df["area_m2"], errors="coerce")
-        if df["area_m2"].isna().all():
-            df["area_m2"] = 0.0
-        else:
-            df["area_m2"] = df["area_m2"].fillna(df["area_m2"].median())
+    return Pipeline(steps=[("pre", pre), ("model", model)])
+
+def search_params(kind: str, pipe: Pipeline, X, y, grid: dict, base: dict, pool, budget: float):
+    """Run the parameter search for a full retrain; None (keep the current parameters) if it finds nothing."""
+    if pool is None:
+        return None
+    if len(X) < 20:
+        print(f"[{kind}] {len(X)} training rows is too few to search; using the current parameters.")
+        return None
+    try:
+        result = search(kind, pipe.named_steps["pre"], X, y, grid, base, pool, budget)
+    except Exception as e:
+        print(f"[{kind}] parameter search failed ({e}); using the current parameters.")
+        return None
+    if result is None:
+        print(f"[{kind}] no search candidate finished within {budget:.0f}s; using the current parameters.")
     else:
+        print(f"[{kind}] search: best {result['metric']} {result['score']:.4f} with {result['params']} "
+              f"({result['evaluated']} fits of {result['candidates']} candidates in {result['seconds']:.1f}s)")
+    return result
+
+def benchmark_candidates(kind: str, num_cols, cat_cols, params: dict = None) -> list:
+    """XGBoost at the current (or tuned) size and two smaller ones, plus a RandomForest on the same encoding."""
+    make = price_pipeline if kind == "price" else win_pipeline
+    base = {**(PRICE_PARAMS if kind == "price" else WIN_PARAMS), **(params or {})}
+    rounds, depth = int(base["n_estimators"]), int(base["max_depth"])
+    sizes = dict.fromkeys([(rounds, depth), (max(20, rounds // 2), depth), (max(20, rounds // 4), max(2, depth - 2))])
+    candidates = [
+        (f"xgboost-{n}-d{d}", "xgboost", lambda n=n, d=d: make(num_cols, cat_cols, {**(params or {}), "n_estimators": n, "max_depth": d}))
+        for n, d in sizes
+    ]
+    forest = RandomForestRegressor if kind == "price" else RandomForestClassifier
+    candidates.append(("random_forest-200-d10", "random_forest", lambda: Pipeline(steps=[
+        ("pre", make(num_cols, cat_cols).named_steps["pre"]),
+        ("model", forest(n_estimators=200, max_depth=10, min_samples_leaf=2, random_state=42, n_jobs=2)),
+    ])))
+    return candidates
+
+def benchmark_pipeline(kind: str, candidates: list, Xtr, ytr, Xte, yte):
+    """Benchmark ``candidates`` and return (selected fitted pipeline, report); (None, None) to keep the default model."""
+    task = "regression" if kind == "price" else "classification"
+    try:
+        pipe, report = benchmark_models(candidates, task, Xtr, ytr, Xte, yte)
+    except Exception as e:
+        print(f"[{kind}] benchmark failed ({e}); using the default model.")
+        return None, None
+    if pipe is None:
+        print(f"[{kind}] no benchmark candidate could be measured; using the default model.")
+        return None, report
+    print(f"[{kind}] benchmark selected {report['selected']}"
+          + ("" if report["ceilings_met"] else " (no candidate met the latency / memory ceilings)"))
+    return pipe, report
+
+def train_price(models_dir: Path, previous: dict = None, incremental: bool = False, compare_full: bool = False,
+                pool=None, budget: float = BUDGET_SECONDS, benchmark: bool = False) -> dict:
+    started = time.perf_counter()
+    previous = previous or {}
+    mode = training_mode(incremental, previous)
+    prev_pipe = load_previous(models_dir, "price_model.joblib", mode)
+    if prev_pipe is None:
+        mode = FULL
+    df = df_from_sql(PRICE_QUERY, previous.get("watermark") if mode == INCREMENTAL else None)
+
+    # Some installs may have area_m2 missing or non-numeric (NaN from SQL) — fill with median
+    if df["area_m2"].isna().all():
         df["area_m2"] = 0.0
+    else:
+        df["area_m2"] = df["area_m2"].fillna(df["area_m2"].median())
 
     # Features we expect
     num_cols = ["area_m2"]
     cat_cols = ["materials_grade", "project_type", "lead_source", "region"]
-    # Ensure missing categorical columns exist
-    for c in cat_cols:
-        if c not in df.columns:
-            df[c] = ""
 
     features = num_cols + cat_cols
     X = df[features].copy()
     y = df["price"].astype(float)
 
     if len(df) < 5:
+        if mode == INCREMENTAL:
+            print(f"[price] {len(df)} new rows since {previous.get('watermark')}; model unchanged.")
+            return {**previous, "up_to_date": True}
         print(f"[price] Not enough rows to train (got {len(df)}). Skipping.")
         return {"rows": len(df), "trained": False}
 
     Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=0.2, random_state=42)
 
-    pre = ColumnTransformer(
-        transformers=[
-            ("num", "passthrough", num_cols),
-            ("cat", OneHotEncoder(handle_unknown="ignore"), cat_cols),
-        ]
-    )
-
-    model = XGBRegressor(
-        n_estimators=200,
-        learning_rate=0.08,
-        max_depth=5,
-        subsample=0.9,
-        colsample_bytree=0.9,
-        random_state=42,
-        n_jobs=2,
-    )
-
-    pipe = Pipeline(steps=[("pre", pre), ("model", model)])
-    pipe.fit(Xtr, ytr)
+    found = report = None
+    if mode == INCREMENTAL:
+        pipe = continue_boosting(prev_pipe, Xtr, ytr)
+    else:
+        found = search_params("price", price_pipeline(num_cols, cat_cols), Xtr, ytr, PRICE_GRID, PRICE_PARAMS, pool, budget)
+        tuned = found or previous.get("search") or {}
+        pipe = None
+        if benchmark:
+            candidates = benchmark_candidates("price", num_cols, cat_cols, tuned.get("params"))
+            pipe, report = benchmark_pipeline("price", candidates, Xtr, ytr, Xte, yte)
+        if pipe is None:
+            pipe = price_pipeline(num_cols, cat_cols, tuned.get("params"))
+            pipe.fit(Xtr, ytr)
 
     ypred = pipe.predict(Xte)
     mae = float(mean_absolute_error(yte, ypred)) if len(yte) else math.nan
 
+    full_metrics = previous.get("full_metrics")
+    if mode == INCREMENTAL and compare_full:
+        full = df_from_sql(PRICE_QUERY)
+        full = full[~full["id"].isin(set(df.loc[Xte.index, "id"]))]
+        full["area_m2"] = full["area_m2"].fillna(0.0)
+        full_pipe = price_pipeline(num_cols, cat_cols).fit(full[features], full["price"].astype(float))
+        full_metrics = {"mae": float(mean_absolute_error(yte, full_pipe.predict(Xte)))}
+
     models_dir.mkdir(parents=True, exist_ok=True)
     joblib.dump(pipe, models_dir / "price_model.joblib")
 
-    print(f"[price] trained on {len(df)} quotes — MAE: £{mae:,.2f}")
+    meta = run_meta(mode, started, df, previous, {"mae": mae}, full_metrics)
+    rows = len(df) + (int(previous.get("rows") or 0) if mode == INCREMENTAL else 0)
+    print(f"[price] {mode} training on {len(df)} quotes in {meta['duration_seconds']:.1f}s — MAE: £{mae:,.2f}"
+          + (f" (vs full: {meta['quality_delta']})" if meta["quality_delta"] else ""))
     return {
-        "rows": len(df),
+        "rows": rows,
         "trained": True,
         "mae": mae,
         "features": features,
         "num_cols": num_cols,
         "cat_cols": cat_cols,
+        "search": found or previous.get("search"),
+        "model": report["selected"] if report and report["selected"] else type(pipe.steps[-1][1]).__name__,
+        "benchmark": report,
+        **meta,
     }
 
 
 # ----------------------------
-# 4) Training: Win model
+# 3) Training: Win model
 # ----------------------------
-def train_win(models_dir: Path) -> dict:
-    df = df_from_sql(WIN_SQL)
-
-    # Ensure required columns exist and types are OK
-    must_have = [
-        "won",
-        "quote_value_gbp",
-        "num_emails_thread",
-        "days_to_first_reply",
-        "project_type",
-        "materials_grade",
-        "area_m2",
-        "lead_source",
-        "region",
-    ]
-    for c in must_have:
-        if c not in df.columns:
-            # create sensible defaults if missing
-            df[c] = 0 if c in {"won", "quote_value_gbp", "num_emails_thread", "days_to_first_reply", "area_m2"} else ""
+WIN_PARAMS = dict(
+    n_estimators=250,
+    learning_rate=0.08,
+    max_depth=5,
+    subsample=0.9,
+    colsample_bytree=0.9,
+    random_state=42,
+    n_jobs=2,
+    eval_metric="logloss",
+)
+
+WIN_GRID = PRICE_GRID
+
+def win_pipeline(num_cols, cat_cols, params: dict = None) -> Pipeline:
+    pre = ColumnTransformer(
+        transformers=[
+            ("num", "passthrough", num_cols),
+            ("cat", OneHotEncoder(handle_unknown="ignore"), cat_cols),
+        ]
+    )
 
-    df["won"] = pd.to_numeric(df["won"], errors="coerce").fillna(0).astype(int)
-    df["quote_value_gbp"] = pd.to_numeric(df["quote_value_gbp"], errors="coerce").fillna(0.0)
-    df["num_emails_thread"] = pd.to_numeric(df["num_emails_thread"], errors="coerce").fillna(0).astype(int)
-    df["days_to_first_reply"] = pd.to_numeric(df["days_to_first_reply"], errors="coerce").fillna(0).astype(int)
-    df["area_m2"] = pd.to_numeric(df["area_m2"], errors="coerce").fillna(0.0)
+    model = XGBClassifier(**{**WIN_PARAMS, **(params or {})})
+
+    return Pipeline(steps=[("pre", pre), ("model", model)])
+
+def train_win(models_dir: Path, previous: dict = None, incremental: bool = False, compare_full: bool = False,
+              pool=None, budget: float = BUDGET_SECONDS, benchmark: bool = False) -> dict:
+    started = time.perf_counter()
+    previous = previous or {}
+    mode = training_mode(incremental, previous)
+    prev_pipe = load_previous(models_dir, "win_model.joblib", mode)
+    if prev_pipe is None:
+        mode = FULL
+    df = df_from_sql(WIN_QUERY, previous.get("watermark") if mode == INCREMENTAL else None)
 
     # Features we’ll train with (keep aligned with API’s /predict)
     num_cols = ["area_m2", "quote_value_gbp", "num_emails_thread", "days_to_first_reply"]
@@ -211,6 +338,9 @@ def train_win(models_dir: Path) -> dict:
 
     # Ensure we have at least two classes
     class_counts = df["won"].value_counts()
+    if mode == INCREMENTAL and (len(df) < 5 or len(class_counts) < 2 or class_counts.min() < 2):
+        print(f"[win] {len(df)} new rows since {previous.get('watermark')} (counts: {class_counts.to_dict()}); model unchanged.")
+        return {**previous, "up_to_date": True}
     if len(class_counts) < 2:
         print(f"[win] Only one class present in data (counts: {class_counts.to_dict()}). Seeding or more data required.")
         return {"rows": int(len(df)), "trained": False}
@@ -227,26 +357,19 @@ def train_win(models_dir: Path) -> dict:
         X, y, test_size=test_size, random_state=42, stratify=y
     )
 
-    pre = ColumnTransformer(
-        transformers=[
-            ("num", "passthrough", num_cols),
-            ("cat", OneHotEncoder(handle_unknown="ignore"), cat_cols),
-        ]
-    )
-
-    model = XGBClassifier(
-        n_estimators=250,
-        learning_rate=0.08,
-        max_depth=5,
-        subsample=0.9,
-        colsample_bytree=0.9,
-        random_state=42,
-        n_jobs=2,
-        eval_metric="logloss",
-    )
-
-    pipe = Pipeline(steps=[("pre", pre), ("model", model)])
-    pipe.fit(Xtr, ytr)
+    found = report = None
+    if mode == INCREMENTAL:
+        pipe = continue_boosting(prev_pipe, Xtr, ytr)
+    else:
+        found = search_params("win", win_pipeline(num_cols, cat_cols), Xtr, ytr, WIN_GRID, WIN_PARAMS, pool, budget)
+        tuned = found or previous.get("search") or {}
+        pipe = None
+        if benchmark:
+            candidates = benchmark_candidates("win", num_cols, cat_cols, tuned.get("params"))
+            pipe, report = benchmark_pipeline("win", candidates, Xtr, ytr, Xte, yte)
+        if pipe is None:
+            pipe = win_pipeline(num_cols, cat_cols, tuned.get("params"))
+            pipe.fit(Xtr, ytr)
 
     # AUC (guard if test set tiny)
     try:
@@ -255,29 +378,75 @@ def train_win(models_dir: Path) -> dict:
     except Exception:
         auc = float("nan")
 
+    full_metrics = previous.get("full_metrics")
+    if mode == INCREMENTAL and compare_full:
+        full = df_from_sql(WIN_QUERY)
+        full = full[~full["id"].isin(set(df.loc[Xte.index, "id"]))]
+        full_pipe = win_pipeline(num_cols, cat_cols).fit(full[num_cols + cat_cols], full["won"])
+        try:
+            full_metrics = {"auc": float(roc_auc_score(yte, full_pipe.predict_proba(Xte)[:, 1]))}
+        except Exception:
+            full_metrics = {"auc": float("nan")}
+
     models_dir.mkdir(parents=True, exist_ok=True)
     joblib.dump(pipe, models_dir / "win_model.joblib")
 
-    print(f"[win] trained on {len(df)} opportunities — ROC-AUC: {auc:.3f}")
+    meta = run_meta(mode, started, df, previous, {"auc": auc}, full_metrics)
+    rows = int(len(df)) + (int(previous.get("rows") or 0) if mode == INCREMENTAL else 0)
+    print(f"[win] {mode} training on {len(df)} opportunities in {meta['duration_seconds']:.1f}s — ROC-AUC: {auc:.3f}"
+          + (f" (vs full: {meta['quality_delta']})" if meta["quality_delta"] else ""))
     return {
-        "rows": int(len(df)),
+        "rows": rows,
         "trained": True,
         "auc": auc,
         "features": num_cols + cat_cols,
         "num_cols": num_cols,
         "cat_cols": cat_cols,
+        "search": found or previous.get("search"),
+        "model": report["selected"] if report and report["selected"] else type(pipe.steps[-1][1]).__name__,
+        "benchmark": report,
+        **meta,
     }
 
 
 # ----------------------------
-# 5) Orchestration
+# 4) Orchestration
 # ----------------------------
-def main():
+RUN_KEYS = ("training_mode", "watermark", "incremental_rounds", "full_metrics", "quality_delta", "duration_seconds", "search", "model")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the price and win models")
+    parser.add_argument("--incremental", action="store_true", help="only train on rows newer than the stored watermarks")
+    parser.add_argument("--compare-full", action="store_true", help="with --incremental, also fit from scratch and report the quality delta")
+    parser.add_argument("--search", action="store_true", help="search the XGBoost parameters of full retrains (both models concurrently)")
+    parser.add_argument("--search-budget", type=float, default=BUDGET_SECONDS, help="wall-clock seconds per model search")
+    parser.add_argument("--search-workers", type=int, default=WORKERS, help="search worker processes")
+    parser.add_argument("--benchmark", action="store_true", help="benchmark model families / sizes on full retrains and keep the Pareto-optimal one")
+    args = parser.parse_args(argv)
+
     print("Set DATABASE_URL")
     models_dir = Path(__file__).parent / "models"
-
-    price_info = train_price(models_dir)
-    win_info = train_win(models_dir)
+    previous = {}
+    if (models_dir / "feature_meta.json").exists():
+        with open(models_dir / "feature_meta.json") as f:
+            previous = json.load(f) or {}
+
+    if args.search:
+        pool = search_pool(args.search_workers)
+        try:
+            with ThreadPoolExecutor(max_workers=2) as threads:
+                price_job = threads.submit(train_price, models_dir, previous.get("price"), args.incremental,
+                                           args.compare_full, pool, args.search_budget, args.benchmark)
+                win_job = threads.submit(train_win, models_dir, previous.get("win"), args.incremental,
+                                         args.compare_full, pool, args.search_budget, args.benchmark)
+                price_info, win_info = price_job.result(), win_job.result()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+    else:
+        price_info = train_price(models_dir, previous.get("price"), args.incremental, args.compare_full,
+                                 benchmark=args.benchmark)
+        win_info = train_win(models_dir, previous.get("win"), args.incremental, args.compare_full,
+                             benchmark=args.benchmark)
 
     # Save a small meta file so the API knows expected features
     meta = {
@@ -288,6 +457,7 @@ def main():
             "cat_cols": price_info.get("cat_cols", []),
             "mae": price_info.get("mae"),
             "rows": price_info.get("rows"),
+            **{k: price_info.get(k) for k in RUN_KEYS},
         },
         "win": {
             "trained": bool(win_info.get("trained")),
@@ -296,6 +466,7 @@ def main():
             "cat_cols": win_info.get("cat_cols", []),
             "auc": win_info.get("auc"),
             "rows": win_info.get("rows"),
+            **{k: win_info.get(k) for k in RUN_KEYS},
         },
     }
     (Path(__file__).parent / "models").mkdir(parents=True, exist_ok=True)
@@ -303,6 +474,10 @@ def main():
         json.dump(meta, f, indent=2)
 
     print("[ok] wrote", models_dir / "feature_meta.json")
+
+    reports = {kind: info["benchmark"] for kind, info in (("price", price_info), ("win", win_info)) if info.get("benchmark")}
+    if reports:
+        print("[ok] wrote", save_report(reports, models_dir))
     print("Training complete.")
 
 
@@ -0,0 +1,427 @@
+# ml/training_data.py
+"""
+Training-set loading shared by /train-client-quotes and train.py.
+
+Both entry points used to pull whole rows into Python and build features
+there: /train-client-quotes fetched every parsed_data JSONB blob (all parsed
+lines included) to dig out a dozen questionnaire answers with dict lookups,
+and train.py ran pd.read_sql_query on unbounded joins. Here every feature is
+computed in SQL and only the finished, typed columns cross the wire:
+  - JSONB extraction and casting happen in Postgres. On ml_training_data the
+    questionnaire answers are stored generated columns (qa_*), and a partial
+    covering index on (tenant_id, created_at) lets the training query run as
+    an index-only scan. If the DDL cannot be applied (an older table layout,
+    no ALTER privilege) the same expressions are evaluated inline instead.
+  - Rows stream through a server-side (named) cursor in batches of
+    ML_TRAINING_FETCH_ROWS and are written straight into preallocated numpy
+    columns of the declared dtype, so no list of row tuples or dicts is ever
+    built.
+  - A TrainingQuery pairs the SQL with its column layout, and load() is the
+    one path from a query to a DataFrame for every training entry point.
+
+Casts are guarded (non-numeric strings become NULL rather than failing the
+insert or the query), and every column a query declares as int or float is
+COALESCEd in SQL, so the frames need no pandas clean-up afterwards.
+
+Configuration (environment):
+  - ML_TRAINING_FETCH_ROWS   rows per server-side cursor fetch (default 2000)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from startup_profile import lazy_import
+
+pd = lazy_import("pandas")
+
+logger = logging.getLogger(__name__)
+
+FETCH_ROWS = int(os.getenv("ML_TRAINING_FETCH_ROWS", "2000"))
+
+# ----------------- SQL expression helpers -----------------
+_NUMBER_RE = "'^[[:space:]]*-?[0-9]+([.][0-9]+)?[[:space:]]*$'"
+
+def _num(expr: str) -> str:
+    """expr (text) as float8, NULL unless it is a plain decimal number."""
+    return f"(CASE WHEN ({expr}) ~ {_NUMBER_RE} THEN ({expr})::float8 END)"
+
+def _flag(expr: str) -> str:
+    """expr (text) as a non-null boolean: true for true/t/1/yes."""
+    return f"COALESCE(lower({expr}) IN ('true', 't', '1', 'yes'), false)"
+
+def _text(expr: str) -> str:
+    return f"NULLIF({expr}, '')"
+
+_QA = "parsed_data->'questionnaire_answers'"
+
+# Questionnaire answers inside ml_training_data.parsed_data, as (name, type, expression)
+QA_COLUMNS: Tuple[Tuple[str, str, str], ...] = (
+    ("qa_area_m2", "float8", "COALESCE(" + ", ".join(
+        f"NULLIF({_num(source)}, 0)"
+        for source in (_QA + "->>'area_m2'", "parsed_data->>'area_m2'", "parsed_data->>'total_area'")) + ")"),
+    ("qa_materials_grade", "text",
+     "COALESCE(" + _text(_QA + "->>'materials_grade'") + ", " + _text("parsed_data->>'materials_grade'") + ")"),
+    ("qa_project_type", "text",
+     "COALESCE(" + _text(_QA + "->>'project_type'") + ", " + _text("parsed_data->>'project_type'") + ")"),
+    ("qa_glazing_type", "text", _QA + "->>'glazing_type'"),
+    ("qa_custom_finish", "text", _QA + "->>'custom_finish'"),
+    ("qa_has_curves", "boolean", _flag(_QA + "->>'has_curves'")),
+    ("qa_premium_hardware", "boolean", _flag(_QA + "->>'premium_hardware'")),
+    ("qa_installation_required", "boolean", _flag(_QA + "->>'installation_required'")),
+    ("qa_property_listed", "boolean", _flag(_QA + "->>'property_listed'")),
+    ("qa_door_height_mm", "float8", _num(_QA + "->>'door_height_mm'")),
+    ("qa_door_width_mm", "float8", _num(_QA + "->>'door_width_mm'")),
+    ("qa_num_doors", "float8", _num(_QA + "->>'num_doors'")),
+    ("qa_num_windows", "float8", _num(_QA + "->>'num_windows'")),
+)
+
+# Rows /train-client-quotes can use; the covering index is partial on the same predicate
+TRAINABLE_WHERE = "estimated_total > 0 AND confidence > 0.3"
+
+SCHEMA_SQL = (
+    "ALTER TABLE ml_training_data\n"
+    "    ADD COLUMN IF NOT EXISTS estimated_total DECIMAL(12,2),\n"
+    "    ADD COLUMN IF NOT EXISTS project_type TEXT,\n"
+    "    ADD COLUMN IF NOT EXISTS quote_type TEXT,\n"
+    "    ADD COLUMN IF NOT EXISTS source_type TEXT DEFAULT 'client_quote',\n"
+    + ",\n".join(f"    ADD COLUMN IF NOT EXISTS {name} {sqltype} GENERATED ALWAYS AS ({expr}) STORED"
+                 for name, sqltype, expr in QA_COLUMNS)
+    + ";\n"
+    "CREATE INDEX IF NOT EXISTS idx_ml_training_data_trainable ON ml_training_data(tenant_id, created_at)\n"
+    "    INCLUDE (confidence, estimated_total, quoted_price, source_type, project_type, "
+    + ", ".join(name for name, _, _ in QA_COLUMNS)
+    + f")\n    WHERE {TRAINABLE_WHERE};\n"
+)
+
+# ----------------- queries -----------------
+def schema_version(name: str, sql: str, columns: Sequence[Tuple[str, Any]]) -> str:
+    """Short hash of a query's SQL and column layout; any change to either changes the feature schema."""
+    layout = ";".join(f"{col}:{np.dtype(dtype).str}" for col, dtype in columns)
+    return hashlib.sha256(f"{name}\n{sql}\n{layout}".encode()).hexdigest()[:12]
+
+class TrainingQuery:
+    """
+    SQL returning exactly ``columns`` (name, numpy dtype), in that order.
+    ``schema`` identifies the feature layout (training_snapshots.py keys on it).
+    """
+
+    def __init__(self, name: str, sql: str, columns: Sequence[Tuple[str, Any]], schema: Optional[str] = None):
+        self.name = name
+        self.sql = sql
+        self.columns = tuple((col, np.dtype(dtype)) for col, dtype in columns)
+        self.schema = schema or schema_version(name, sql, self.columns)
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        return tuple(col for col, _ in self.columns)
+
+    def load(self, conn, params: Any = None, capacity: int = 1024) -> pd.DataFrame:
+        """Stream the query through a server-side cursor into a DataFrame of typed columns."""
+        return pd.DataFrame(stream_columns(conn, self.sql, params, self.columns, capacity), columns=list(self.names), copy=False)
+
+def stream_columns(conn, sql: str, params: Any, columns: Sequence[Tuple[str, np.dtype]],
+                   capacity: int = 1024, fetch_rows: int = FETCH_ROWS) -> Dict[str, np.ndarray]:
+    """
+    Run ``sql`` on a named cursor and fill one preallocated array per column,
+    doubling the arrays when they fill up. Float columns take NULL as NaN; other
+    numeric columns must be non-null in SQL. Returns views trimmed to the row count.
+    """
+    capacity = max(1, int(capacity))
+    arrays = {name: np.empty(capacity, dtype=dtype) for name, dtype in columns}
+    n = 0
+    with conn.cursor(name=f"training_{uuid.uuid4().hex[:12]}") as cur:
+        cur.itersize = fetch_rows
+        cur.execute(sql, params)
+        while True:
+            batch = cur.fetchmany(fetch_rows)
+            if not batch:
+                break
+            end = n + len(batch)
+            if end > capacity:
+                while capacity < end:
+                    capacity *= 2
+                for name, arr in arrays.items():
+                    grown = np.empty(capacity, dtype=arr.dtype)
+                    grown[:n] = arr[:n]
+                    arrays[name] = grown
+            for j, (name, _) in enumerate(columns):
+                arrays[name][n:end] = [row[j] for row in batch]
+            n = end
+    return {name: arr[:n] for name, arr in arrays.items()}
+
+# Model inputs of the /train-client-quotes forests, encoded in SQL by client_quote_query()
+CLIENT_QUOTE_FEATURES = [
+    "area_m2",
+    "materials_grade_Premium",
+    "materials_grade_Standard",
+    "materials_grade_Basic",
+    "project_type_windows",
+    "project_type_doors",
+    "glazing_vacuum",
+    "glazing_triple",
+    "has_curves_int",
+    "premium_hardware_int",
+    "has_custom_finish",
+    "installation_int",
+    "listed_building",
+    "door_height_mm",
+    "door_width_mm",
+    "num_doors",
+    "num_windows",
+    "confidence",
+]
+
+_CLIENT_QUOTE_COLUMNS = (
+    ("id", np.int64),
+    ("created_at", "datetime64[us]"),
+    ("area_m2", np.float64),
+    ("materials_grade_Premium", np.int8),
+    ("materials_grade_Standard", np.int8),
+    ("materials_grade_Basic", np.int8),
+    ("project_type_windows", np.int8),
+    ("project_type_doors", np.int8),
+    ("glazing_vacuum", np.int8),
+    ("glazing_triple", np.int8),
+    ("has_curves_int", np.int8),
+    ("premium_hardware_int", np.int8),
+    ("has_custom_finish", np.int8),
+    ("installation_int", np.int8),
+    ("listed_building", np.int8),
+    ("door_height_mm", np.float64),
+    ("door_width_mm", np.float64),
+    ("num_doors", np.int32),
+    ("num_windows", np.int32),
+    ("confidence", np.float64),
+    ("target_price", np.float64),
+    ("win_probability", np.float64),
+)
+
+def _client_quote_body(qa: Dict[str, str]) -> str:
+    """SELECT list and FROM clause of the /train-client-quotes query."""
+    return f"""
+        SELECT
+            t.id,
+            t.created_at,
+            COALESCE({qa["qa_area_m2"]}, 30.0),
+            (f.grade = 'Premium')::int,
+            (f.grade = 'Standard')::int,
+            (f.grade = 'Basic')::int,
+            (position('window' in lower(f.project)) > 0)::int,
+            (position('door' in lower(f.project)) > 0)::int,
+            (position('vacuum' in lower(f.glazing)) > 0)::int,
+            (position('triple' in lower(f.glazing)) > 0)::int,
+            {qa["qa_has_curves"]}::int,
+            {qa["qa_premium_hardware"]}::int,
+            (COALESCE({qa["qa_custom_finish"]}, 'None') <> 'None')::int,
+            {qa["qa_installation_required"]}::int,
+            {qa["qa_property_listed"]}::int,
+            COALESCE(NULLIF({qa["qa_door_height_mm"]}, 0), 2100.0),
+            COALESCE(NULLIF({qa["qa_door_width_mm"]}, 0), 900.0),
+            COALESCE(trunc({qa["qa_num_doors"]}), 0)::int,
+            COALESCE(trunc({qa["qa_num_windows"]}), 0)::int,
+            p.conf,
+            p.price,
+            CASE
+                WHEN p.price < 5000 THEN LEAST(0.9, p.conf * 1.2)
+                WHEN p.price < 15000 THEN p.conf
+                ELSE GREATEST(0.3, p.conf * 0.8)
+            END
+        FROM ml_training_data t,
+        LATERAL (
+            SELECT
+                COALESCE(NULLIF(t.quoted_price, 0), t.estimated_total)::float8
+                    * CASE WHEN t.source_type = 'supplier_quote' THEN 1.35 ELSE 1.0 END AS price,
+                COALESCE(t.confidence, 0.5)::float8 AS conf
+        ) p,
+        LATERAL (
+            SELECT
+                COALESCE({qa["qa_materials_grade"]}, 'Standard') AS grade,
+                COALESCE(NULLIF(t.project_type, ''), {qa["qa_project_type"]}, 'windows') AS project,
+                COALESCE({qa["qa_glazing_type"]}, 'Standard Double Glazing') AS glazing
+        ) f"""
+
+# The generated-column and inline forms compute the same values, so they share one schema version
+CLIENT_QUOTE_SCHEMA = schema_version(
+    "client_quotes", _client_quote_body({name: name for name, _, _ in QA_COLUMNS}), _CLIENT_QUOTE_COLUMNS
+)
+
+def client_quote_query(tenant_id: Optional[str] = None, since: Optional[Any] = None, limit: Optional[int] = 1000,
+                       generated: bool = True) -> Tuple[TrainingQuery, Tuple[Any, ...]]:
+    """
+    The /train-client-quotes query and its parameters: the newest ``limit`` trainable
+    rows, or with ``since`` the oldest ``limit`` created after that watermark
+    (limit=None: every matching row, oldest first).
+    Without ``generated`` the qa_* expressions are evaluated inline.
+
+    Supplier quotes are cost prices, so their target gets the 35% trade markup;
+    the win probability is estimated from confidence and price band.
+    """
+    qa = {name: (name if generated else f"({expr})") for name, _, expr in QA_COLUMNS}
+    where = [TRAINABLE_WHERE]
+    params = []
+    if tenant_id:
+        where.append("tenant_id = %s")
+        params.append(tenant_id)
+    if since:
+        where.append("created_at > %s")
+        params.append(since)
+    sql = f"""{_client_quote_body(qa)}
+        WHERE {" AND ".join(where)} AND p.price > 0
+        ORDER BY t.created_at {"DESC" if limit and not since else "ASC"}
+        {"LIMIT %s" if limit else ""}
+    """
+    if limit:
+        params.append(int(limit))
+    return TrainingQuery("client_quotes", sql, _CLIENT_QUOTE_COLUMNS, schema=CLIENT_QUOTE_SCHEMA), tuple(params)
+
+# train.py price / win models on the app's Quote / Opportunity tables.
+# %(since)s is the incremental watermark (NULL for a full retrain). Opportunity
+# has no updatedAt, so the win watermark is the latest of its created / won /
+# lost times: a stage change re-fetches the row and the snapshot replaces it.
+# Rows committed after a later watermark with an older timestamp are only
+# picked up by the snapshot's periodic full rebuild.
+PRICE_QUERY = TrainingQuery("price", f"""
+    SELECT
+      q.id,
+      q."updatedAt",
+      q."totalGBP"::float8,
+      COALESCE(l.custom->>'projectType', ''),
+      {_num("l.custom->>'area_m2'")},
+      COALESCE(l.custom->>'materials_grade', ''),
+      COALESCE(l.custom->>'source', ''),
+      'uk'::text
+    FROM "Quote" q
+    LEFT JOIN "Lead" l ON l.id = q."leadId"
+    WHERE q."status" IN ('ACCEPTED','SENT') AND q."totalGBP" IS NOT NULL
+      AND (%(since)s::timestamp IS NULL OR q."updatedAt" > %(since)s::timestamp)
+""", (
+    ("id", object),
+    ("changed_at", "datetime64[us]"),
+    ("price", np.float64),
+    ("project_type", object),
+    ("area_m2", np.float64),
+    ("materials_grade", object),
+    ("lead_source", object),
+    ("region", object),
+))
+
+WIN_QUERY = TrainingQuery("win", f"""
+    SELECT
+      o.id,
+      GREATEST(o."createdAt", o."wonAt", o."lostAt"),
+      (o.stage = 'WON')::int,
+      COALESCE(q."totalGBP", 0)::float8,
+      0::int,
+      0::int,
+      COALESCE(l.custom->>'projectType', ''),
+      COALESCE(l.custom->>'materials_grade', ''),
+      COALESCE({_num("l.custom->>'area_m2'")}, 0),
+      COALESCE(l.custom->>'source', ''),
+      'uk'::text
+    FROM "Opportunity" o
+    JOIN "Lead" l ON l.id = o."leadId"
+    LEFT JOIN "Quote" q ON q."leadId" = o."leadId"
+    WHERE (%(since)s::timestamp IS NULL OR GREATEST(o."createdAt", o."wonAt", o."lostAt") > %(since)s::timestamp)
+""", (
+    ("id", object),
+    ("changed_at", "datetime64[us]"),
+    ("won", np.int64),
+    ("quote_value_gbp", np.float64),
+    ("num_emails_thread", np.int64),
+    ("days_to_first_reply", np.int64),
+    ("project_type", object),
+    ("materials_grade", object),
+    ("area_m2", np.float64),
+    ("lead_source", object),
+    ("region", object),
+))
+
+# ----------------- ml_training_data loader -----------------
+class TrainingDataLoader:
+    """Applies the ml_training_data DDL once per process and loads /train-client-quotes frames."""
+
+    def __init__(self, db_manager=None):
+        self._db = db_manager
+        self._generated: Optional[bool] = None
+        self._lock = threading.Lock()
+
+    def _manager(self):
+        if self._db is None:
+            from db_config import get_db_manager
+            self._db = get_db_manager()
+        return self._db
+
+    def ensure_schema(self) -> bool:
+        """True once the qa_* columns and covering index exist; False -> inline expressions."""
+        if self._generated is None:
+            with self._lock:
+                if self._generated is None:
+                    try:
+                        with self._manager().get_connection() as conn:
+                            conn.execute(SCHEMA_SQL)
+                            conn.commit()
+                        self._generated = True
+                    except Exception as e:
+                        logger.warning(f"ml_training_data feature columns unavailable, extracting inline: {e}")
+                        self._generated = False
+        return self._generated
+
+    def client_quotes(self, tenant_id: Optional[str] = None, since: Optional[Any] = None,
+                      limit: Optional[int] = 1000) -> pd.DataFrame:
+        """
+        Encoded /train-client-quotes frame: id, created_at, CLIENT_QUOTE_FEATURES, target_price,
+        win_probability. Served from the tenant's training snapshot when snapshots are enabled.
+        """
+        from training_snapshots import get_snapshot_store
+
+        generated = self.ensure_schema()
+        store = get_snapshot_store()
+        if not store.enabled:
+            query, params = client_quote_query(tenant_id, since, limit, generated=generated)
+            with self._manager().get_connection() as conn:
+                return query.load(conn, params, capacity=limit or 1024)
+
+        def fetch(after: Optional[str]) -> pd.DataFrame:
+            query, params = client_quote_query(tenant_id, after, limit=None, generated=generated)
+            with self._manager().get_connection() as conn:
+                return query.load(conn, params)
+
+        frame = store.load(client_quote_query(tenant_id, generated=generated)[0], tenant_id, fetch, "created_at")
+        if since:
+            frame = frame[frame["created_at"] > pd.Timestamp(since)]
+            return frame.head(limit) if limit else frame
+        return frame.tail(limit) if limit else frame
+
+# Global loader instance
+_loader: Optional[TrainingDataLoader] = None
+_loader_lock = threading.Lock()
+
+def get_training_data_loader() -> TrainingDataLoader:
+    """Get or create the global ml_training_data loader."""
+    global _loader
+    if _loader is None:
+        with _loader_lock:
+            if _loader is None:
+                _loader = TrainingDataLoader()
+    return _loader
+
+__all__ = [
+    "CLIENT_QUOTE_FEATURES",
+    "PRICE_QUERY",
+    "QA_COLUMNS",
+    "SCHEMA_SQL",
+    "TrainingDataLoader",
+    "TrainingQuery",
+    "WIN_QUERY",
+    "client_quote_query",
+    "get_training_data_loader",
+    "stream_columns",
+]
@@ -0,0 +1,312 @@
+# ml/training_snapshots.py
+"""
+Local columnar snapshots of training matrices.
+
+Every retrain (/train-client-quotes, train.py, and through it
+EmailTrainingWorkflow.trigger_ml_training) used to re-run its training query
+over the whole history. A snapshot keeps the output of a TrainingQuery on
+local disk, one raw file per column, and each retrain only fetches the rows
+past the snapshot's watermark and appends them. Reading a snapshot maps the
+column files with np.memmap, so numeric and timestamp columns reach the
+DataFrame without a copy, a DB round trip or a Python row loop. That makes
+them cheap for offline evaluation as well (SnapshotStore.read needs no DB).
+
+Layout under ML_TRAINING_SNAPSHOT_DIR (default cache/training):
+  <query>/<tenant | _all>/<schema>/
+      snapshot.json         row count, watermark, generation, column dtypes and
+                            string vocabularies; replaced with os.replace
+      g<generation>/<column>.bin
+                            raw column values; string columns hold int32 codes
+                            into their vocabulary (-1 = NULL)
+
+<schema> is TrainingQuery.schema, a hash of the query's SQL and column
+layout. A feature change therefore starts a new snapshot, and snapshots of
+other schemas for the same query and tenant are deleted.
+
+Column files only ever grow. An append writes past the recorded row count
+first and updates snapshot.json after that, so readers never see a partial
+append. A rebuild writes a new generation directory. Snapshots are rebuilt
+from scratch:
+  - after ML_TRAINING_SNAPSHOT_MAX_AGE seconds (default 86400), so edited or
+    deleted rows are picked up;
+  - when an append re-fetches ids already in the snapshot (rows whose
+    watermark column is an update timestamp). The old copies are dropped.
+Writers take a per-snapshot thread lock and, where fcntl exists, a file lock,
+so gunicorn workers sharing the directory do not interleave appends.
+
+Configuration (environment):
+  - ML_TRAINING_SNAPSHOTS           set to 0 to always load from the database
+  - ML_TRAINING_SNAPSHOT_DIR        snapshot root (default cache/training)
+  - ML_TRAINING_SNAPSHOT_MAX_AGE    seconds before a full rebuild (default 86400)
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from model_registry import _tenant_dirname
+from startup_profile import lazy_import
+from training_data import TrainingQuery
+
+pd = lazy_import("pandas")
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; the thread lock still serialises writers in one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOTS_ENABLED = os.getenv("ML_TRAINING_SNAPSHOTS", "1") not in ("0", "false", "no")
+SNAPSHOT_DIR = os.getenv("ML_TRAINING_SNAPSHOT_DIR", "cache/training")
+MAX_AGE = float(os.getenv("ML_TRAINING_SNAPSHOT_MAX_AGE", "86400"))
+
+MANIFEST_FILE = "snapshot.json"
+LOCK_FILE = ".lock"
+CODE_DTYPE = np.dtype("<i4")
+
+Fetch = Callable[[Optional[str]], "pd.DataFrame"]
+
+def _is_string(dtype: np.dtype) -> bool:
+    return dtype.kind == "O"
+
+def _stored_dtype(dtype: np.dtype) -> np.dtype:
+    return CODE_DTYPE if _is_string(dtype) else dtype.newbyteorder("<")
+
+def _encode(values: Any, vocab: List[str]) -> np.ndarray:
+    """int32 codes of ``values`` in ``vocab`` (extended in place); None / NaN -> -1."""
+    index = {v: i for i, v in enumerate(vocab)}
+    codes = np.empty(len(values), dtype=CODE_DTYPE)
+    for i, v in enumerate(values):
+        if v is None or (isinstance(v, float) and v != v):
+            codes[i] = -1
+            continue
+        v = str(v)
+        code = index.get(v)
+        if code is None:
+            code = index[v] = len(vocab)
+            vocab.append(v)
+        codes[i] = code
+    return codes
+
+def _watermark(frame: pd.DataFrame, column: str, previous: Optional[str] = None) -> Optional[str]:
+    newest = pd.to_datetime(frame[column]).max() if len(frame) else pd.NaT
+    if previous is not None and (pd.isna(newest) or pd.Timestamp(previous) >= newest):
+        return previous
+    return None if pd.isna(newest) else newest.isoformat()
+
+class SnapshotStore:
+    """Per-(query, tenant, schema) columnar snapshots of training frames."""
+
+    def __init__(self, directory: str = SNAPSHOT_DIR, max_age: float = MAX_AGE, enabled: bool = SNAPSHOTS_ENABLED):
+        self.directory = Path(directory)
+        self.max_age = max_age
+        self.enabled = enabled
+        self.hits = 0
+        self.appends = 0
+        self.rebuilds = 0
+        self.failures = 0
+        self._locks: Dict[Path, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    # ----------------- paths and locking -----------------
+    def path(self, query: TrainingQuery, tenant_id: Optional[str]) -> Path:
+        return self.directory / query.name / (_tenant_dirname(tenant_id) if tenant_id else "_all") / query.schema
+
+    @contextlib.contextmanager
+    def _locked(self, path: Path):
+        with self._locks_lock:
+            lock = self._locks.setdefault(path, threading.Lock())
+        with lock:
+            path.mkdir(parents=True, exist_ok=True)
+            with open(path / LOCK_FILE, "a") as handle:
+                if fcntl is not None:
+                    fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(handle, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _manifest(path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path / MANIFEST_FILE) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_manifest(path: Path, manifest: Dict[str, Any]):
+        tmp = path / f"{MANIFEST_FILE}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path / MANIFEST_FILE)
+
+    # ----------------- reading -----------------
+    def read(self, query: TrainingQuery, tenant_id: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """The stored frame for ``query`` / ``tenant_id`` as it is on disk (no DB access); None if there is none."""
+        path = self.path(query, tenant_id)
+        manifest = self._manifest(path)
+        if manifest is None or manifest.get("schema") != query.schema:
+            return None
+        return self._frame(path, manifest)
+
+    @staticmethod
+    def _frame(path: Path, manifest: Dict[str, Any]) -> pd.DataFrame:
+        rows = int(manifest["rows"])
+        generation = path / f"g{manifest['generation']}"
+        data = {}
+        for column in manifest["columns"]:
+            dtype = np.dtype(column["dtype"])
+            stored = _stored_dtype(dtype)
+            if rows:
+                values = np.memmap(generation / f"{column['name']}.bin", dtype=stored, mode="c", shape=(rows,))
+            else:
+                values = np.empty(0, dtype=stored)
+            if _is_string(dtype):
+                values = np.array(column["vocab"] + [None], dtype=object)[values]
+            data[column["name"]] = values
+        return pd.DataFrame(data, columns=[c["name"] for c in manifest["columns"]], copy=False)
+
+    # ----------------- writing -----------------
+    def _rebuild(self, path: Path, query: TrainingQuery, frame: pd.DataFrame, watermark_column: str,
+                 previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        generation = int(previous["generation"]) + 1 if previous else 1
+        target = path / f"g{generation}"
+        shutil.rmtree(target, ignore_errors=True)
+        target.mkdir(parents=True)
+        columns = []
+        for name, dtype in query.columns:
+            column: Dict[str, Any] = {"name": name, "dtype": dtype.str}
+            if _is_string(dtype):
+                column["vocab"] = []
+                values = _encode(frame[name].tolist(), column["vocab"])
+            else:
+                values = np.ascontiguousarray(frame[name].to_numpy(dtype=dtype), dtype=_stored_dtype(dtype))
+            values.tofile(target / f"{name}.bin")
+            columns.append(column)
+        now = time.time()
+        manifest = {
+            "query": query.name,
+            "schema": query.schema,
+            "generation": generation,
+            "rows": int(len(frame)),
+            "watermark": _watermark(frame, watermark_column),
+            "built_at": now,
+            "updated_at": now,
+            "appends": 0,
+            "columns": columns,
+        }
+        self._write_manifest(path, manifest)
+        for child in path.iterdir():
+            if child.is_dir() and child.name != target.name:
+                shutil.rmtree(child, ignore_errors=True)
+        return manifest
+
+    def _append(self, path: Path, manifest: Dict[str, Any], frame: pd.DataFrame, watermark_column: str) -> Dict[str, Any]:
+        rows = int(manifest["rows"])
+        generation = path / f"g{manifest['generation']}"
+        columns = [dict(c) for c in manifest["columns"]]
+        for column in columns:
+            dtype = np.dtype(column["dtype"])
+            stored = _stored_dtype(dtype)
+            if _is_string(dtype):
+                column["vocab"] = list(column["vocab"])
+                values = _encode(frame[column["name"]].tolist(), column["vocab"])
+            else:
+                values = np.ascontiguousarray(frame[column["name"]].to_numpy(dtype=dtype), dtype=stored)
+            with open(generation / f"{column['name']}.bin", "r+b") as f:
+                f.truncate(rows * stored.itemsize)  # drop anything an interrupted append left behind
+                f.seek(0, os.SEEK_END)
+                f.write(values.tobytes())
+        manifest = {
+            **manifest,
+            "rows": rows + int(len(frame)),
+            "watermark": _watermark(frame, watermark_column, manifest.get("watermark")),
+            "updated_at": time.time(),
+            "appends": int(manifest.get("appends") or 0) + 1,
+            "columns": columns,
+        }
+        self._write_manifest(path, manifest)
+        return manifest
+
+    def _drop_other_schemas(self, path: Path):
+        for child in path.parent.iterdir():
+            if child.is_dir() and child.name != path.name:
+                logger.info(f"Dropping training snapshot {child} (feature schema changed)")
+                shutil.rmtree(child, ignore_errors=True)
+
+    def load(self, query: TrainingQuery, tenant_id: Optional[str], fetch: Fetch, watermark_column: str) -> pd.DataFrame:
+        """
+        The full frame for ``query`` / ``tenant_id``, brought up to date first:
+        ``fetch(since)`` must return the query's rows with ``watermark_column``
+        after ``since`` (every row for since=None). Falls back to fetch(None)
+        when snapshots are disabled or the store cannot be used.
+        """
+        if not self.enabled:
+            return fetch(None)
+        path = self.path(query, tenant_id)
+        try:
+            with self._locked(path):
+                manifest = self._manifest(path)
+                if (manifest is None or manifest.get("schema") != query.schema
+                        or time.time() - float(manifest.get("built_at") or 0) > self.max_age):
+                    manifest = self._rebuild(path, query, fetch(None), watermark_column, manifest)
+                    self.rebuilds += 1
+                else:
+                    new = fetch(manifest.get("watermark"))
+                    old = self._frame(path, manifest) if len(new) and "id" in new.columns else None
+                    if not len(new):
+                        self.hits += 1
+                    elif old is not None and old["id"].isin(new["id"]).any():
+                        merged = pd.concat([old[~old["id"].isin(new["id"])], new], ignore_index=True)
+                        manifest = self._rebuild(path, query, merged, watermark_column, manifest)
+                        self.rebuilds += 1
+                    else:
+                        manifest = self._append(path, manifest, new, watermark_column)
+                        self.appends += 1
+                self._drop_other_schemas(path)
+                return self._frame(path, manifest)
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Training snapshot {path} unavailable, loading from the database: {e}")
+            return fetch(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "directory": str(self.directory),
+            "max_age": self.max_age,
+            "hits": self.hits,
+            "appends": self.appends,
+            "rebuilds": self.rebuilds,
+            "failures": self.failures,
+        }
+
+# Global store instance
+_store: Optional[SnapshotStore] = None
+_store_lock = threading.Lock()
+
+def get_snapshot_store() -> SnapshotStore:
+    """Get or create the global training snapshot store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SnapshotStore()
+    return _store
+
+__all__ = ["SnapshotStore", "get_snapshot_store"]
@@ -0,0 +1,354 @@
+# ml/tree_engine.py
+"""
+Flattened tree-ensemble inference for RandomForest and XGBoost models.
+
+sklearn forests score through one Python-level estimator object per tree and
+XGBoost through its booster, so every call pays object-graph overhead that
+dwarfs the few comparisons a shallow tree needs. flatten() converts a fitted
+model into a handful of numpy arrays, with all trees concatenated:
+
+  feature[n]       split feature per node (0 at leaves)
+  threshold[n]     split threshold (float64 for sklearn, float32 for XGBoost)
+  left/right[n]    child indices, global; leaves point at themselves
+  default_left[n]  direction taken for NaN (XGBoost default / sklearn missing_go_to_left)
+  value[n, k]      leaf output
+  roots[t]         root node of each tree
+
+A batch is evaluated by advancing an (N rows x T trees) array of node indices
+max_depth times. Leaves are fixed points, so no per-row branching is needed.
+Aggregation follows the original models:
+  - sklearn: inputs cast to float32, "x <= threshold", per-tree outputs summed
+    in tree order and then divided by the tree count.
+  - XGBoost: "x < threshold" in float32, leaf weights added to the base margin
+    in float32, then the logistic link for binary:logistic.
+
+Only configurations that can be reproduced are flattened: single-output
+RandomForest/ExtraTrees regressors and classifiers; gbtree XGBRegressor
+(reg:squarederror); and binary XGBClassifier (binary:logistic) without
+categorical splits or early stopping. flatten() returns None for anything
+else. The original model stays attached as ``original`` and is used if the
+flat evaluation fails.
+
+XGBoost's own predictor is multi-threaded C++, so it outperforms the numpy
+traversal on large batches. Above ML_FLAT_XGB_MAX_ROWS rows (default 64),
+flattened XGBoost models hand the batch to the original booster. Forests use
+the flat path at every size.
+
+save()/load() store the arrays as a .npz file, which loads much faster than
+unpickling the estimator graph. save_arrays()/load_arrays() store one
+uncompressed .npy file per array in a directory and map them with
+mmap_mode="r": every process that loads the same directory shares one
+physical copy through the page cache (see model_registry.py).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RF_REGRESSOR, RF_CLASSIFIER, XGB_REGRESSOR, XGB_LOGISTIC = "rf_regressor", "rf_classifier", "xgb_regressor", "xgb_logistic"
+
+XGB_MAX_ROWS = int(os.getenv("ML_FLAT_XGB_MAX_ROWS", "64"))
+
+class FlatTreeEnsemble:
+    """A tree ensemble as flat numpy arrays; predict / predict_proba mirror the original estimator."""
+
+    def __init__(
+        self,
+        kind: str,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        default_left: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        n_features: int,
+        base_margin: float = 0.0,
+        classes: Optional[np.ndarray] = None,
+        original: Any = None,
+        children: Optional[np.ndarray] = None,
+    ):
+        self.kind = kind
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.base_margin = base_margin
+        self.classes_ = classes
+        self.original = original
+        self._failed = False
+        self.max_rows = XGB_MAX_ROWS if kind in (XGB_REGRESSOR, XGB_LOGISTIC) else None
+        # (left, right) pairs, so the next node is children[2 * node + went_right]
+        self.children = np.stack([left, right], axis=1).ravel() if children is None else children
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right,
+                                      self.default_left, self.value, self.roots))
+
+    # ----------------- evaluation -----------------
+    def leaves(self, X: Any) -> np.ndarray:
+        """Leaf node index per (row, tree)."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"expected {self.n_features_in_} features, got {X.shape[1]}")
+        n_rows = X.shape[0]
+        flat_x = X.ravel()
+        row_base = (np.arange(n_rows, dtype=np.int64) * X.shape[1])[:, None]
+        node = np.broadcast_to(self.roots, (n_rows, len(self.roots))).copy()
+        xgb = self.kind in (XGB_REGRESSOR, XGB_LOGISTIC)
+        for _ in range(self.max_depth):
+            x = flat_x.take(row_base + self.feature.take(node))
+            threshold = self.threshold.take(node)
+            if xgb:
+                go_right = ~(x < threshold)
+            else:
+                go_right = ~(x.astype(np.float64) <= threshold)
+            missing = np.isnan(x)
+            if missing.any():
+                go_right = np.where(missing, ~self.default_left.take(node), go_right)
+            node = self.children.take(node * 2 + go_right)
+        return node
+
+    def _raw(self, X: Any) -> np.ndarray:
+        # cumsum accumulates strictly in tree order (np.sum would add pairwise), as the originals do
+        node = self.leaves(X)
+        n_rows, n_trees = node.shape
+        if self.kind in (XGB_REGRESSOR, XGB_LOGISTIC):
+            weights = np.empty((n_rows, n_trees + 1), dtype=np.float32)
+            weights[:, 0] = self.base_margin
+            weights[:, 1:] = self.value[node, 0]
+            return np.cumsum(weights, axis=1, dtype=np.float32)[:, -1]
+        outputs = self.value[node]  # (rows, trees, k)
+        return np.cumsum(outputs, axis=1, dtype=np.float64)[:, -1] / n_trees
+
+    def _predict(self, X: Any) -> np.ndarray:
+        raw = self._raw(X)
+        if self.kind == RF_REGRESSOR:
+            return raw[:, 0]
+        if self.kind == XGB_REGRESSOR:
+            return raw
+        proba = self._proba_from_raw(raw)
+        return self.classes_.take(np.argmax(proba, axis=1), axis=0)
+
+    def _proba_from_raw(self, raw: np.ndarray) -> np.ndarray:
+        if self.kind == RF_CLASSIFIER:
+            return raw
+        if self.kind == XGB_LOGISTIC:
+            # XGBoost: 1.0f / (1.0f + expf(-x)); exp in float64 rounded to float32 matches expf
+            e = np.exp(-raw.astype(np.float64)).astype(np.float32)
+            p = np.float32(1.0) / (e + np.float32(1.0))
+            return np.vstack((np.float32(1.0) - p, p)).transpose()
+        raise AttributeError(f"{self.kind} has no predict_proba")
+
+    def _fallback(self, method: str, X: Any, error: Exception) -> np.ndarray:
+        if self.original is None:
+            raise error
+        if not self._failed:
+            logger.warning(f"Flat {self.kind} evaluation failed ({error}); using the original model")
+            self._failed = True
+        return getattr(self.original, method)(X)
+
+    def _use_original(self, X: Any) -> bool:
+        return self.original is not None and self.max_rows is not None and len(X) > self.max_rows
+
+    def predict(self, X: Any) -> np.ndarray:
+        if self._use_original(X):
+            return self.original.predict(X)
+        try:
+            return self._predict(X)
+        except Exception as e:
+            return self._fallback("predict", X, e)
+
+    def predict_proba(self, X: Any) -> np.ndarray:
+        if self.kind not in (RF_CLASSIFIER, XGB_LOGISTIC):
+            raise AttributeError(f"{self.kind} has no predict_proba")
+        if self._use_original(X):
+            return self.original.predict_proba(X)
+        try:
+            return self._proba_from_raw(self._raw(X))
+        except Exception as e:
+            return self._fallback("predict_proba", X, e)
+
+    # ----------------- persistence -----------------
+    def save(self, path: str):
+        meta = {"kind": self.kind, "max_depth": self.max_depth, "n_features": self.n_features_in_,
+                "base_margin": float(self.base_margin)}
+        arrays = dict(feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+                      default_left=self.default_left, value=self.value, roots=self.roots,
+                      meta=np.array(json.dumps(meta)))
+        if self.classes_ is not None:
+            arrays["classes"] = np.asarray(self.classes_)
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: str, original: Any = None) -> "FlatTreeEnsemble":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            base_margin = meta["base_margin"]
+            if meta["kind"] in (XGB_REGRESSOR, XGB_LOGISTIC):
+                base_margin = np.float32(base_margin)
+            return cls(meta["kind"], data["feature"], data["threshold"], data["left"], data["right"],
+                       data["default_left"], data["value"], data["roots"], meta["max_depth"], meta["n_features"],
+                       base_margin, data["classes"] if "classes" in data else None, original)
+
+    def save_arrays(self, directory: str):
+        """Write every array as an uncompressed .npy file (plus meta.json) under ``directory``, for load_arrays."""
+        os.makedirs(directory, exist_ok=True)
+        arrays = dict(feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+                      default_left=self.default_left, value=self.value, roots=self.roots, children=self.children)
+        if self.classes_ is not None:
+            arrays["classes"] = np.asarray(self.classes_)
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+        meta = {"kind": self.kind, "max_depth": self.max_depth, "n_features": self.n_features_in_,
+                "base_margin": float(self.base_margin), "arrays": sorted(arrays)}
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load_arrays(cls, directory: str, original: Any = None, mmap_mode: Optional[str] = "r") -> "FlatTreeEnsemble":
+        """Load a save_arrays directory; with mmap_mode="r" the arrays are read-only maps of the files."""
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        data = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+                for name in meta["arrays"]}
+        base_margin = meta["base_margin"]
+        if meta["kind"] in (XGB_REGRESSOR, XGB_LOGISTIC):
+            base_margin = np.float32(base_margin)
+        return cls(meta["kind"], data["feature"], data["threshold"], data["left"], data["right"],
+                   data["default_left"], data["value"], data["roots"], meta["max_depth"], meta["n_features"],
+                   base_margin, data.get("classes"), original, data["children"])
+
+# ----------------- builders -----------------
+def _depth(left: np.ndarray, right: np.ndarray, root: int = 0) -> int:
+    depth, frontier = 0, [root]
+    while True:
+        nxt = [c for n in frontier for c in (left[n], right[n]) if c != n and c >= 0]
+        if not nxt:
+            return depth
+        depth += 1
+        frontier = nxt
+
+class _Builder:
+    """Concatenates per-tree node arrays with global child indices."""
+
+    def __init__(self, threshold_dtype, value_dtype):
+        self.parts: Dict[str, List[np.ndarray]] = {k: [] for k in ("feature", "threshold", "left", "right", "default_left", "value")}
+        self.roots: List[int] = []
+        self.max_depth = 0
+        self.n_nodes = 0
+        self.threshold_dtype = threshold_dtype
+        self.value_dtype = value_dtype
+
+    def add(self, feature, threshold, left, right, default_left, value):
+        n = len(left)
+        own = np.arange(n)
+        is_leaf = left < 0
+        left = np.where(is_leaf, own, left)
+        right = np.where(is_leaf, own, right)
+        self.max_depth = max(self.max_depth, _depth(left, right))
+        offset = self.n_nodes
+        self.parts["feature"].append(np.where(is_leaf, 0, feature).astype(np.int32))
+        self.parts["threshold"].append(np.where(is_leaf, 0, threshold).astype(self.threshold_dtype))
+        self.parts["left"].append((left + offset).astype(np.int32))
+        self.parts["right"].append((right + offset).astype(np.int32))
+        self.parts["default_left"].append(np.asarray(default_left, dtype=bool))
+        self.parts["value"].append(np.asarray(value, dtype=self.value_dtype).reshape(n, -1))
+        self.roots.append(offset)
+        self.n_nodes += n
+
+    def build(self, kind, n_features, base_margin=0.0, classes=None, original=None) -> FlatTreeEnsemble:
+        arrays = {k: np.concatenate(v) for k, v in self.parts.items()}
+        return FlatTreeEnsemble(kind, arrays["feature"], arrays["threshold"], arrays["left"], arrays["right"],
+                                arrays["default_left"], arrays["value"], np.asarray(self.roots, dtype=np.int32),
+                                self.max_depth, n_features, base_margin, classes, original)
+
+def _flatten_sklearn_forest(model: Any) -> Optional[FlatTreeEnsemble]:
+    if getattr(model, "n_outputs_", 1) != 1 or not getattr(model, "estimators_", None):
+        return None
+    classifier = hasattr(model, "classes_")
+    builder = _Builder(np.float64, np.float64)
+    for tree in model.estimators_:
+        t = tree.tree_
+        left = t.children_left.astype(np.int64)
+        missing_left = getattr(t, "missing_go_to_left", None)
+        if missing_left is None:
+            missing_left = np.zeros(t.node_count, dtype=bool)
+        value = t.value[:, 0, :]
+        if classifier:
+            # DecisionTreeClassifier.predict_proba normalizes each leaf's class weights
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            value = value / normalizer
+        builder.add(t.feature, t.threshold, left, t.children_right.astype(np.int64), missing_left, value)
+    kind = RF_CLASSIFIER if classifier else RF_REGRESSOR
+    return builder.build(kind, model.n_features_in_, classes=getattr(model, "classes_", None), original=model)
+
+def _flatten_xgboost(model: Any) -> Optional[FlatTreeEnsemble]:
+    booster = model.get_booster()
+    if booster.attr("best_iteration") is not None:
+        return None
+    learner = json.loads(booster.save_raw("json"))["learner"]
+    gbm = learner["gradient_booster"]
+    objective = learner["objective"]["name"]
+    params = learner["learner_model_param"]
+    if gbm["name"] != "gbtree" or int(params.get("num_class", "0") or 0) > 1 or int(params.get("num_target", "1") or 1) != 1:
+        return None
+    base_score = float(params["base_score"])
+    if objective == "reg:squarederror":
+        kind, base_margin = XGB_REGRESSOR, np.float32(base_score)
+    elif objective == "binary:logistic":
+        kind, base_margin = XGB_LOGISTIC, np.float32(-math.log(1.0 / base_score - 1.0))
+    else:
+        return None
+    builder = _Builder(np.float32, np.float32)
+    for tree in gbm["model"]["trees"]:
+        if tree.get("categories_nodes"):
+            return None
+        left = np.asarray(tree["left_children"], dtype=np.int64)
+        conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+        # XGBoost stores a leaf's weight in split_conditions
+        builder.add(np.asarray(tree["split_indices"], dtype=np.int64), conditions, left,
+                    np.asarray(tree["right_children"], dtype=np.int64),
+                    np.asarray(tree["default_left"], dtype=bool), np.where(left < 0, conditions, 0.0))
+    n_features = int(params.get("num_feature") or getattr(model, "n_features_in_", 0))
+    classes = getattr(model, "classes_", None) if kind == XGB_LOGISTIC else None
+    return builder.build(kind, n_features, base_margin, classes, original=model)
+
+def flatten(model: Any) -> Optional[FlatTreeEnsemble]:
+    """FlatTreeEnsemble for a supported fitted forest / XGBoost estimator, else None."""
+    if model is None or isinstance(model, FlatTreeEnsemble):
+        return model
+    name = type(model).__name__
+    try:
+        if name in ("RandomForestRegressor", "RandomForestClassifier", "ExtraTreesRegressor", "ExtraTreesClassifier"):
+            return _flatten_sklearn_forest(model)
+        if name in ("XGBRegressor", "XGBClassifier"):
+            return _flatten_xgboost(model)
+    except Exception as e:
+        logger.warning(f"Could not flatten {name}: {e}")
+    return None
+
+__all__ = ["FlatTreeEnsemble", "flatten"]
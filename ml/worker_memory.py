@@ -0,0 +1,111 @@
+# ml/worker_memory.py
+"""
+Resident versus shared memory of each ML service worker.
+
+RSS counts every page a process has mapped, including the pages it shares
+with its sibling workers, so adding up the workers' RSS overstates their
+total. The kernel reports the split per process: smaps_rollup gives
+Shared_* / Private_* totals and PSS (each shared page divided by the number
+of processes mapping it, so PSS adds up across workers). smaps gives the
+same split per mapping, which shows how much of the models directory
+(memory-mapped flat tree arrays and .npy files, see model_registry.py) is
+shared.
+
+Under gunicorn the workers are the children of the master process; under a
+single uvicorn process the report covers just that process. Linux only:
+elsewhere the report says "available": false.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional
+
+PROC = "/proc"
+
+# smaps fields summed into the report, in kB
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty", "Anonymous", "Swap")
+
+def _parse_fields(lines, totals: Dict[str, int]):
+    for line in lines:
+        key, _, rest = line.partition(":")
+        if key in FIELDS:
+            totals[key] = totals.get(key, 0) + int(rest.split()[0])
+
+def _summary(kb: Dict[str, int]) -> Dict[str, float]:
+    mb = lambda *keys: round(sum(kb.get(k, 0) for k in keys) / 1024.0, 2)
+    return {"rss_mb": mb("Rss"), "pss_mb": mb("Pss"), "shared_mb": mb("Shared_Clean", "Shared_Dirty"),
+            "private_mb": mb("Private_Clean", "Private_Dirty"), "anonymous_mb": mb("Anonymous"), "swap_mb": mb("Swap")}
+
+def _mapped(pid: int, root: str) -> Dict[str, float]:
+    """The smaps split for mappings of files under ``root``."""
+    kb: Dict[str, int] = {}
+    files = set()
+    inside = False
+    with open(os.path.join(PROC, str(pid), "smaps")) as f:
+        for line in f:
+            head = line.split(None, 5)
+            if head and "-" in head[0] and not head[0].endswith(":"):  # a mapping header line
+                path = head[5].strip() if len(head) == 6 else ""
+                inside = path.startswith(root)
+                if inside:
+                    files.add(path)
+            elif inside:
+                _parse_fields((line,), kb)
+    return {"files": len(files), **_summary(kb)}
+
+def process_memory(pid: int, models_root: Optional[str] = None) -> Dict[str, Any]:
+    """Resident / shared / private memory of ``pid``, with the models directory's mappings broken out."""
+    kb: Dict[str, int] = {}
+    with open(os.path.join(PROC, str(pid), "smaps_rollup")) as f:
+        _parse_fields(f, kb)
+    report = {"pid": pid, **_summary(kb)}
+    if models_root:
+        report["models"] = _mapped(pid, os.path.abspath(models_root) + os.sep)
+    return report
+
+def _parent_of(pid: int) -> Optional[int]:
+    try:
+        with open(os.path.join(PROC, str(pid), "stat")) as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # pid (comm) state ppid ...; comm may contain spaces and parentheses
+    return int(stat.rsplit(")", 1)[1].split()[1])
+
+def _is_gunicorn(pid: int) -> bool:
+    try:
+        with open(os.path.join(PROC, str(pid), "cmdline"), "rb") as f:
+            return b"gunicorn" in f.read()
+    except OSError:
+        return False
+
+def worker_pids() -> List[int]:
+    """This process and its sibling workers (children of the same gunicorn master)."""
+    me, master = os.getpid(), os.getppid()
+    if not _is_gunicorn(master):
+        return [me]
+    pids = [int(name) for name in os.listdir(PROC) if name.isdigit() and _parent_of(int(name)) == master]
+    return sorted(pids) or [me]
+
+def memory_report(models_root: Optional[str] = None) -> Dict[str, Any]:
+    """Per-worker resident vs shared memory, and totals where PSS is the real combined footprint."""
+    if not os.path.exists(os.path.join(PROC, "self", "smaps_rollup")):
+        return {"available": False, "pid": os.getpid()}
+    workers = []
+    for pid in worker_pids():
+        try:
+            workers.append(process_memory(pid, models_root))
+        except (OSError, ValueError) as e:
+            workers.append({"pid": pid, "error": str(e)})
+    measured = [w for w in workers if "error" not in w]
+    total = lambda key: round(sum(w[key] for w in measured), 2)
+    return {
+        "available": True,
+        "pid": os.getpid(),
+        "workers": workers,
+        "totals": {"workers": len(measured), "rss_mb": total("rss_mb"), "pss_mb": total("pss_mb"),
+                   "private_mb": total("private_mb")},
+    }
+
+__all__ = ["memory_report", "process_memory", "worker_pids"]